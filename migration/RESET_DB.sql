@@ -60,6 +60,18 @@ BEGIN
     DROP POLICY IF EXISTS "Allow service role full access to archon_document_versions" ON archon_document_versions;
     DROP POLICY IF EXISTS "Allow authenticated users to read archon_document_versions" ON archon_document_versions;
     
+    -- Query log policies
+    DROP POLICY IF EXISTS "Allow service role full access to archon_query_log" ON archon_query_log;
+    
+    -- Source partition registry policies
+    DROP POLICY IF EXISTS "Allow service role full access to archon_source_partitions" ON archon_source_partitions;
+    
+    -- Page version policies
+    DROP POLICY IF EXISTS "Allow service role full access to archon_page_versions" ON archon_page_versions;
+    
+    -- Crawl checkpoint policies
+    DROP POLICY IF EXISTS "Allow service role full access to archon_crawl_checkpoints" ON archon_crawl_checkpoints;
+    
     -- Prompts policies
     DROP POLICY IF EXISTS "Allow service role full access to archon_prompts" ON archon_prompts;
     DROP POLICY IF EXISTS "Allow authenticated users to read archon_prompts" ON archon_prompts;
@@ -132,6 +144,7 @@ BEGIN
     -- Search functions (new with archon_ prefix)
     DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text) CASCADE;
     DROP FUNCTION IF EXISTS match_archon_code_examples(vector, int, jsonb, text) CASCADE;
+    DROP FUNCTION IF EXISTS match_archon_code_examples_by_text(text, int, text) CASCADE;
     
     -- Search functions (old without prefix)
     DROP FUNCTION IF EXISTS match_crawled_pages(vector, int, jsonb, text) CASCADE;
@@ -140,6 +153,13 @@ BEGIN
     -- Task management functions
     DROP FUNCTION IF EXISTS archive_task(UUID, TEXT) CASCADE;
     
+    -- Query log functions
+    DROP FUNCTION IF EXISTS get_popular_archon_queries(int, int, text) CASCADE;
+    
+    -- Source partition functions
+    DROP FUNCTION IF EXISTS create_archon_source_partition(text, text, boolean) CASCADE;
+    DROP FUNCTION IF EXISTS drop_archon_source_partitions(text) CASCADE;
+    
     RAISE NOTICE 'Functions dropped successfully.';
     
 EXCEPTION WHEN OTHERS THEN
@@ -164,6 +184,10 @@ BEGIN
     DROP TABLE IF EXISTS archon_prompts CASCADE;
     
     -- Knowledge Base System - new archon_ prefixed tables
+    DROP TABLE IF EXISTS archon_query_log CASCADE;
+    DROP TABLE IF EXISTS archon_source_partitions CASCADE;
+    DROP TABLE IF EXISTS archon_page_versions CASCADE;
+    DROP TABLE IF EXISTS archon_crawl_checkpoints CASCADE;
     DROP TABLE IF EXISTS archon_code_examples CASCADE;
     DROP TABLE IF EXISTS archon_crawled_pages CASCADE;
     DROP TABLE IF EXISTS archon_sources CASCADE;
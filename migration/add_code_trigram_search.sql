@@ -0,0 +1,61 @@
+-- =====================================================
+-- Add Trigram Code Search
+-- =====================================================
+-- Adds pg_trgm GIN indexes on code example content and summaries
+-- and the exact identifier / error string lookup function used by
+-- the code search fast path.
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Trigram indexes for exact identifier / error string lookups and keyword search
+CREATE INDEX IF NOT EXISTS idx_archon_code_examples_content_trgm ON archon_code_examples USING GIN (content gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_archon_code_examples_summary_trgm ON archon_code_examples USING GIN (summary gin_trgm_ops);
+
+-- Create a function to look up code examples containing an exact identifier or string
+-- (served by the trigram indexes; no embedding needed)
+CREATE OR REPLACE FUNCTION match_archon_code_examples_by_text (
+  search_text TEXT,
+  match_count INT DEFAULT 10,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  summary TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  -- Escape LIKE wildcards so identifiers such as model_validate match literally
+  pattern TEXT := '%' || replace(replace(replace(search_text, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+  RETURN QUERY
+  SELECT
+    id,
+    url,
+    chunk_number,
+    content,
+    summary,
+    metadata,
+    source_id,
+    (CASE
+      WHEN strpos(archon_code_examples.content, search_text) > 0 THEN 1.0
+      WHEN archon_code_examples.content ILIKE pattern THEN 0.9
+      ELSE 0.8
+    END)::FLOAT AS similarity
+  FROM archon_code_examples
+  WHERE (archon_code_examples.content ILIKE pattern OR archon_code_examples.summary ILIKE pattern)
+    AND (source_filter IS NULL OR source_id = source_filter)
+  ORDER BY 8 DESC, length(archon_code_examples.content)
+  LIMIT match_count;
+END;
+$$;
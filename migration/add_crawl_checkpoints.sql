@@ -0,0 +1,31 @@
+-- =====================================================
+-- Add Crawl Checkpoints
+-- =====================================================
+-- Stores the frontier of running crawls so a crawl interrupted by a
+-- restart, crash or cancellation can be resumed by its progress id.
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+-- =====================================================
+
+-- Saved frontier of running and interrupted crawls, keyed by progress id
+CREATE TABLE IF NOT EXISTS archon_crawl_checkpoints (
+    progress_id TEXT PRIMARY KEY,
+    source_id TEXT NOT NULL,                     -- No foreign key: the source may not exist yet
+    url TEXT NOT NULL,
+    crawl_type TEXT NOT NULL,                    -- webpage or sitemap
+    request JSONB NOT NULL DEFAULT '{}',         -- Original crawl request, replayed on resume
+    state JSONB NOT NULL DEFAULT '{}',           -- Depth, pending, next level and visited URLs
+    in_flight TEXT[] NOT NULL DEFAULT '{}',      -- Crawled but not fully stored; re-crawled on resume
+    pages_visited INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'cancelled', 'failed')),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_crawl_checkpoints_status ON archon_crawl_checkpoints (status, updated_at DESC);
+
+ALTER TABLE archon_crawl_checkpoints ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_crawl_checkpoints" ON archon_crawl_checkpoints
+    FOR ALL USING (auth.role() = 'service_role');
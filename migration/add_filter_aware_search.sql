@@ -0,0 +1,232 @@
+-- =====================================================
+-- Add Filter-Aware Vector Search
+-- =====================================================
+-- Updates the match functions so metadata filters (knowledge_type,
+-- tags, ...) no longer starve the ANN scan:
+-- - Selective filters are pre-filtered on the GIN metadata index
+--   and ranked exactly
+-- - Broad filters use iterative index scans (pgvector 0.8+) or
+--   extra ivfflat probes on older versions
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+-- =====================================================
+
+-- Create a function to search for documentation chunks
+CREATE OR REPLACE FUNCTION match_archon_crawled_pages (
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'::jsonb,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  -- Filters matching fewer rows than this are ranked exactly after a GIN pre-filter
+  prefilter_max_rows CONSTANT INT := 10000;
+  filtered_rows INT;
+BEGIN
+  IF filter <> '{}'::jsonb THEN
+    -- Estimate filter selectivity with a bounded count on the GIN metadata index
+    SELECT count(*) INTO filtered_rows FROM (
+      SELECT 1 FROM archon_crawled_pages
+      WHERE metadata @> filter
+        AND (source_filter IS NULL OR source_id = source_filter)
+      LIMIT prefilter_max_rows
+    ) AS candidates;
+
+    IF filtered_rows < prefilter_max_rows THEN
+      -- Selective filter: rank every matching row exactly. The ANN scan would run
+      -- out of candidates before LIMIT and return short results
+      RETURN QUERY
+      WITH filtered AS MATERIALIZED (
+        SELECT
+          id,
+          url,
+          chunk_number,
+          content,
+          metadata,
+          source_id,
+          archon_crawled_pages.embedding <=> query_embedding AS distance
+        FROM archon_crawled_pages
+        WHERE metadata @> filter
+          AND (source_filter IS NULL OR source_id = source_filter)
+      )
+      SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+      FROM filtered
+      ORDER BY distance
+      LIMIT match_count;
+      RETURN;
+    END IF;
+
+    -- Broad filter: let the index scan keep pulling candidates until enough pass
+    -- the filter (pgvector 0.8+); older versions probe more lists instead
+    BEGIN
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      PERFORM set_config('ivfflat.probes', '10', true);
+    END;
+  END IF;
+
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'WITH ranked AS MATERIALIZED (
+         SELECT id, url, chunk_number, content, metadata, source_id,
+                embedding <=> $1 AS distance
+         FROM archon_crawled_pages
+         WHERE metadata @> $2 AND source_id = %L
+         ORDER BY embedding <=> $1
+         LIMIT $3
+       )
+       SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+       FROM ranked
+       ORDER BY distance',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  -- Iterative scans may return rows slightly out of order, so re-sort the page
+  RETURN QUERY
+  WITH ranked AS MATERIALIZED (
+    SELECT
+      id,
+      url,
+      chunk_number,
+      content,
+      metadata,
+      source_id,
+      archon_crawled_pages.embedding <=> query_embedding AS distance
+    FROM archon_crawled_pages
+    WHERE metadata @> filter
+    ORDER BY archon_crawled_pages.embedding <=> query_embedding
+    LIMIT match_count
+  )
+  SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+  FROM ranked
+  ORDER BY distance;
+END;
+$$;
+
+-- Create a function to search for code examples
+CREATE OR REPLACE FUNCTION match_archon_code_examples (
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'::jsonb,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  summary TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  -- Filters matching fewer rows than this are ranked exactly after a GIN pre-filter
+  prefilter_max_rows CONSTANT INT := 10000;
+  filtered_rows INT;
+BEGIN
+  IF filter <> '{}'::jsonb THEN
+    -- Estimate filter selectivity with a bounded count on the GIN metadata index
+    SELECT count(*) INTO filtered_rows FROM (
+      SELECT 1 FROM archon_code_examples
+      WHERE metadata @> filter
+        AND (source_filter IS NULL OR source_id = source_filter)
+      LIMIT prefilter_max_rows
+    ) AS candidates;
+
+    IF filtered_rows < prefilter_max_rows THEN
+      -- Selective filter: rank every matching row exactly. The ANN scan would run
+      -- out of candidates before LIMIT and return short results
+      RETURN QUERY
+      WITH filtered AS MATERIALIZED (
+        SELECT
+          id,
+          url,
+          chunk_number,
+          content,
+          summary,
+          metadata,
+          source_id,
+          archon_code_examples.embedding <=> query_embedding AS distance
+        FROM archon_code_examples
+        WHERE metadata @> filter
+          AND (source_filter IS NULL OR source_id = source_filter)
+      )
+      SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+      FROM filtered
+      ORDER BY distance
+      LIMIT match_count;
+      RETURN;
+    END IF;
+
+    -- Broad filter: let the index scan keep pulling candidates until enough pass
+    -- the filter (pgvector 0.8+); older versions probe more lists instead
+    BEGIN
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      PERFORM set_config('ivfflat.probes', '10', true);
+    END;
+  END IF;
+
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'WITH ranked AS MATERIALIZED (
+         SELECT id, url, chunk_number, content, summary, metadata, source_id,
+                embedding <=> $1 AS distance
+         FROM archon_code_examples
+         WHERE metadata @> $2 AND source_id = %L
+         ORDER BY embedding <=> $1
+         LIMIT $3
+       )
+       SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+       FROM ranked
+       ORDER BY distance',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  -- Iterative scans may return rows slightly out of order, so re-sort the page
+  RETURN QUERY
+  WITH ranked AS MATERIALIZED (
+    SELECT
+      id,
+      url,
+      chunk_number,
+      content,
+      summary,
+      metadata,
+      source_id,
+      archon_code_examples.embedding <=> query_embedding AS distance
+    FROM archon_code_examples
+    WHERE metadata @> filter
+    ORDER BY archon_code_examples.embedding <=> query_embedding
+    LIMIT match_count
+  )
+  SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+  FROM ranked
+  ORDER BY distance;
+END;
+$$;
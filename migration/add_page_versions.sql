@@ -0,0 +1,36 @@
+-- =====================================================
+-- Add Page Versions for Incremental Refresh
+-- =====================================================
+-- Stores ETag, Last-Modified and a content hash per crawled URL so
+-- refreshes can skip unchanged pages and tombstone removed ones.
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+--
+-- Sources crawled before this migration have no versions yet; their
+-- next refresh re-ingests every page once and records them.
+-- =====================================================
+
+-- Per-URL version records used by incremental refreshes
+CREATE TABLE IF NOT EXISTS archon_page_versions (
+    id BIGSERIAL PRIMARY KEY,
+    source_id TEXT NOT NULL REFERENCES archon_sources(source_id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    etag TEXT,                                   -- ETag response header from the last crawl
+    last_modified TEXT,                          -- Last-Modified response header from the last crawl
+    content_hash TEXT,                           -- SHA-256 of the page markdown
+    word_count INTEGER NOT NULL DEFAULT 0,
+    links TEXT[] NOT NULL DEFAULT '{}',          -- Internal links, followed when the page is skipped
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'removed')),
+    last_checked_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    last_changed_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    removed_at TIMESTAMP WITH TIME ZONE,         -- Set when the page disappeared (tombstone)
+    UNIQUE (source_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_page_versions_source_status ON archon_page_versions (source_id, status);
+
+ALTER TABLE archon_page_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_page_versions" ON archon_page_versions
+    FOR ALL USING (auth.role() = 'service_role');
@@ -0,0 +1,80 @@
+-- =====================================================
+-- Add Search Query Log
+-- =====================================================
+-- Adds persistent query logging and the popular-queries function
+-- used by the search cache warmer.
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+-- =====================================================
+
+-- Search query log used to warm the embedding and result caches
+CREATE TABLE IF NOT EXISTS archon_query_log (
+    id BIGSERIAL PRIMARY KEY,
+    query_type TEXT NOT NULL DEFAULT 'rag',      -- 'rag' or 'code_examples'
+    query_text TEXT,                             -- Query as asked, replayed by the cache warmer
+    normalized_query TEXT NOT NULL,              -- Whitespace-collapsed query, used for grouping
+    source_filter TEXT,                          -- Optional source the query was filtered on
+    match_count INTEGER,
+    filters JSONB NOT NULL DEFAULT '{}'::jsonb,  -- Other request parameters (e.g. token_budget)
+    latency_ms INTEGER,
+    result_ids JSONB NOT NULL DEFAULT '[]'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+-- Installs that created the table before query_text was added
+ALTER TABLE archon_query_log ADD COLUMN IF NOT EXISTS query_text TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_archon_query_log_created_at ON archon_query_log (created_at);
+CREATE INDEX IF NOT EXISTS idx_archon_query_log_query ON archon_query_log (query_type, normalized_query);
+
+ALTER TABLE archon_query_log ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_query_log" ON archon_query_log
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Most frequent recent queries, optionally limited to those that can touch one source.
+-- Dropped first because its result columns have changed.
+DROP FUNCTION IF EXISTS get_popular_archon_queries(INT, INT, TEXT);
+CREATE OR REPLACE FUNCTION get_popular_archon_queries (
+  max_count INT DEFAULT 100,
+  since_days INT DEFAULT 7,
+  source TEXT DEFAULT NULL
+) RETURNS TABLE (
+  query_type TEXT,
+  query_text TEXT,
+  normalized_query TEXT,
+  source_filter TEXT,
+  match_count INTEGER,
+  filters JSONB,
+  hit_count BIGINT,
+  avg_latency_ms FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  SELECT
+    query_type,
+    (ARRAY_AGG(COALESCE(query_text, normalized_query) ORDER BY created_at DESC))[1] AS query_text,
+    normalized_query,
+    source_filter,
+    MAX(match_count) AS match_count,
+    (ARRAY_AGG(filters ORDER BY created_at DESC))[1] AS filters,
+    COUNT(*) AS hit_count,
+    AVG(latency_ms)::FLOAT AS avg_latency_ms
+  FROM archon_query_log
+  WHERE created_at > now() - make_interval(days => since_days)
+    AND (source IS NULL OR source_filter IS NULL OR source_filter = source)
+  GROUP BY query_type, normalized_query, source_filter
+  ORDER BY COUNT(*) DESC
+  LIMIT max_count;
+END;
+$$;
+
+-- Search Cache Warming Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CACHE_WARMING_ENABLED', 'true', false, 'rag_strategy', 'Re-run popular logged queries after startup and ingestion to pre-populate search caches'),
+('CACHE_WARMING_TOP_K', '100', false, 'rag_strategy', 'Number of most popular queries to warm (0 disables warming)')
+ON CONFLICT (key) DO NOTHING;
@@ -0,0 +1,253 @@
+-- =====================================================
+-- Add Source-Partitioned Vector Search
+-- =====================================================
+-- Adds per-source partial ivfflat indexes for large sources and
+-- routes source-filtered searches to them.
+--
+-- Run this script in your Supabase SQL Editor on existing installs.
+-- New installs get this from complete_setup.sql.
+--
+-- Sources that already exceed the default threshold (10,000 rows)
+-- are indexed at the end of this script. Building the indexes locks
+-- writes to the affected tables while it runs, so run it when no
+-- crawls are in progress. Indexes for sources that grow past the
+-- threshold later are only built after a crawl when
+-- SOURCE_PARTITION_AUTO_BUILD is enabled; otherwise re-run the
+-- backfill at the end of this script in a quiet period.
+-- =====================================================
+
+-- Registry of per-source partial vector indexes
+CREATE TABLE IF NOT EXISTS archon_source_partitions (
+    source_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,                    -- 'archon_crawled_pages' or 'archon_code_examples'
+    index_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,        -- Rows in the source when the index was built
+    lists INTEGER NOT NULL,                      -- ivfflat list count used for the build
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (source_id, table_name)
+);
+
+ALTER TABLE archon_source_partitions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_source_partitions" ON archon_source_partitions
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Build (or rebuild) a partial ivfflat index covering a single source's rows.
+-- The index is built with a plain CREATE INDEX (CONCURRENTLY cannot run inside a
+-- function), which blocks inserts, updates and deletes on the table until it is
+-- done. Call it when no crawls or uploads are writing to the table.
+-- Runs as its owner so the service role can index tables it does not own.
+CREATE OR REPLACE FUNCTION create_archon_source_partition (
+  source TEXT,
+  target_table TEXT,
+  rebuild BOOLEAN DEFAULT FALSE
+) RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  idx_name TEXT;
+  row_total BIGINT;
+  list_count INT;
+BEGIN
+  IF target_table NOT IN ('archon_crawled_pages', 'archon_code_examples') THEN
+    RAISE EXCEPTION 'Unsupported table for source partitioning: %', target_table;
+  END IF;
+
+  -- Hash the source id to keep index names short and valid
+  idx_name := 'idx_' || target_table || '_src_' || left(md5(source), 12);
+
+  EXECUTE format('SELECT count(*) FROM %I WHERE source_id = %L', target_table, source)
+    INTO row_total;
+
+  -- pgvector guidance: roughly rows / 1000 lists
+  list_count := GREATEST(10, LEAST(1000, (row_total / 1000)::INT));
+
+  IF rebuild THEN
+    EXECUTE format('DROP INDEX IF EXISTS %I', idx_name);
+  END IF;
+
+  EXECUTE format(
+    'CREATE INDEX IF NOT EXISTS %I ON %I USING ivfflat (embedding vector_cosine_ops) WITH (lists = %s) WHERE source_id = %L',
+    idx_name, target_table, list_count, source
+  );
+
+  INSERT INTO archon_source_partitions (source_id, table_name, index_name, row_count, lists)
+  VALUES (source, target_table, idx_name, row_total, list_count)
+  ON CONFLICT (source_id, table_name) DO UPDATE SET
+    index_name = EXCLUDED.index_name,
+    row_count = EXCLUDED.row_count,
+    lists = EXCLUDED.lists,
+    created_at = timezone('utc'::text, now());
+
+  RETURN idx_name;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION create_archon_source_partition(TEXT, TEXT, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_archon_source_partition(TEXT, TEXT, BOOLEAN) TO service_role;
+
+-- Drop all partial vector indexes for a source, returning how many were dropped
+CREATE OR REPLACE FUNCTION drop_archon_source_partitions (
+  source TEXT
+) RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  part RECORD;
+  dropped INT := 0;
+BEGIN
+  FOR part IN
+    SELECT index_name FROM archon_source_partitions WHERE source_id = source
+  LOOP
+    EXECUTE format('DROP INDEX IF EXISTS %I', part.index_name);
+    dropped := dropped + 1;
+  END LOOP;
+
+  DELETE FROM archon_source_partitions WHERE source_id = source;
+  RETURN dropped;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION drop_archon_source_partitions(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION drop_archon_source_partitions(TEXT) TO service_role;
+
+-- Source Partitioning Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('SOURCE_PARTITION_MIN_ROWS', '10000', false, 'rag_strategy', 'Build a dedicated vector index for a source once it has this many chunks or code examples (0 disables)'),
+('SOURCE_PARTITION_AUTO_BUILD', 'false', false, 'rag_strategy', 'Build source vector indexes automatically after crawls and uploads; building blocks writes to the table while it runs')
+ON CONFLICT (key) DO NOTHING;
+
+-- Create a function to search for documentation chunks
+CREATE OR REPLACE FUNCTION match_archon_crawled_pages (
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'::jsonb,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'SELECT id, url, chunk_number, content, metadata, source_id,
+              1 - (embedding <=> $1) AS similarity
+       FROM archon_crawled_pages
+       WHERE metadata @> $2 AND source_id = %L
+       ORDER BY embedding <=> $1
+       LIMIT $3',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    id,
+    url,
+    chunk_number,
+    content,
+    metadata,
+    source_id,
+    1 - (archon_crawled_pages.embedding <=> query_embedding) AS similarity
+  FROM archon_crawled_pages
+  WHERE metadata @> filter
+    AND (source_filter IS NULL OR source_id = source_filter)
+  ORDER BY archon_crawled_pages.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+-- Create a function to search for code examples
+CREATE OR REPLACE FUNCTION match_archon_code_examples (
+  query_embedding VECTOR(1536),
+  match_count INT DEFAULT 10,
+  filter JSONB DEFAULT '{}'::jsonb,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  summary TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'SELECT id, url, chunk_number, content, summary, metadata, source_id,
+              1 - (embedding <=> $1) AS similarity
+       FROM archon_code_examples
+       WHERE metadata @> $2 AND source_id = %L
+       ORDER BY embedding <=> $1
+       LIMIT $3',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    id,
+    url,
+    chunk_number,
+    content,
+    summary,
+    metadata,
+    source_id,
+    1 - (archon_code_examples.embedding <=> query_embedding) AS similarity
+  FROM archon_code_examples
+  WHERE metadata @> filter
+    AND (source_filter IS NULL OR source_id = source_filter)
+  ORDER BY archon_code_examples.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+-- Backfill: index sources that are already above the threshold
+DO $$
+DECLARE
+  min_rows INT;
+  large_source RECORD;
+BEGIN
+  SELECT COALESCE(NULLIF(value, '')::INT, 10000) INTO min_rows
+  FROM archon_settings WHERE key = 'SOURCE_PARTITION_MIN_ROWS';
+
+  IF min_rows IS NULL OR min_rows <= 0 THEN
+    RETURN;
+  END IF;
+
+  FOR large_source IN
+    SELECT source_id, 'archon_crawled_pages' AS table_name FROM archon_crawled_pages
+    GROUP BY source_id HAVING count(*) >= min_rows
+    UNION ALL
+    SELECT source_id, 'archon_code_examples' AS table_name FROM archon_code_examples
+    GROUP BY source_id HAVING count(*) >= min_rows
+  LOOP
+    RAISE NOTICE 'Building vector index for % in %', large_source.source_id, large_source.table_name;
+    PERFORM create_archon_source_partition(large_source.source_id, large_source.table_name);
+  END LOOP;
+END $$;
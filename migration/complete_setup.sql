@@ -15,6 +15,7 @@
 -- Enable required PostgreSQL extensions
 CREATE EXTENSION IF NOT EXISTS vector;
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- =====================================================
 -- SECTION 2: CREDENTIALS AND SETTINGS
@@ -139,6 +140,88 @@ INSERT INTO archon_settings (key, value, is_encrypted, category, description) VA
 ('CRAWL_DELAY_BEFORE_HTML', '0.5', false, 'rag_strategy', 'Time to wait for JavaScript rendering in seconds (0.1-5.0)')
 ON CONFLICT (key) DO NOTHING;
 
+-- Streaming Crawl Pipeline Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_STREAMING_PIPELINE', 'true', false, 'rag_strategy', 'Chunk, embed and store pages while the crawl is running instead of after it finishes'),
+('CRAWL_PIPELINE_QUEUE_SIZE', '50', false, 'rag_strategy', 'Crawled pages buffered before the crawler is slowed down (10-200)'),
+('CRAWL_PIPELINE_BATCH_SIZE', '25', false, 'rag_strategy', 'Chunks embedded and stored per pipeline batch (10-100)'),
+('CRAWL_PIPELINE_EMBED_WORKERS', '2', false, 'rag_strategy', 'Concurrent embedding batches in the streaming pipeline (1-8)'),
+('CRAWL_PIPELINE_STORE_WORKERS', '2', false, 'rag_strategy', 'Concurrent database insert batches in the streaming pipeline (1-8)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Per-Host Crawl Scheduling Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_HOST_SCHEDULER', 'true', false, 'rag_strategy', 'Share per-host concurrency windows between running crawls and adapt them to host responses'),
+('CRAWL_HOST_INITIAL_CONCURRENCY', '2', false, 'rag_strategy', 'Concurrent pages a host starts with before its window adapts (1-10)'),
+('CRAWL_HOST_MAX_CONCURRENCY', '10', false, 'rag_strategy', 'Upper bound on concurrent pages per host across all crawls (1-50)'),
+('CRAWL_HOST_SLOW_LATENCY', '10', false, 'rag_strategy', 'Average page latency in seconds above which a host window shrinks'),
+('CRAWL_HTTP_FAST_PATH', 'true', false, 'rag_strategy', 'Fetch static pages over plain HTTP and only use the browser for pages that need JavaScript')
+ON CONFLICT (key) DO NOTHING;
+
+-- Recursive Crawl and URL Canonicalization Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_CONTINUOUS_RECURSIVE', 'true', false, 'rag_strategy', 'Crawl links from a depth-ordered work queue as soon as they are found instead of one depth level at a time'),
+('CRAWL_MAX_PAGES', '0', false, 'rag_strategy', 'Maximum pages a recursive crawl visits unless the request sets max_pages (0 = no limit)'),
+('CRAWL_URL_STRIP_PARAMS', 'utm_*,fbclid,gclid,dclid,msclkid,mc_cid,mc_eid,_ga,_gl,_hsenc,_hsmi,ref_src,sessionid,phpsessid,jsessionid', false, 'rag_strategy', 'Comma separated globs of query parameters removed from crawled URLs; * removes all query strings'),
+('CRAWL_VISITED_MEMORY_LIMIT', '100000', false, 'rag_strategy', 'URLs a crawl remembers in memory before moving its visited set to a Bloom filter and a temporary file')
+ON CONFLICT (key) DO NOTHING;
+
+-- Local Page Cache Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_PAGE_CACHE', 'false', false, 'rag_strategy', 'Keep crawled pages in a local compressed cache and serve repeated crawls and retries from it'),
+('CRAWL_PAGE_CACHE_DIR', '', false, 'rag_strategy', 'Directory of the local page cache (empty = system temp directory)'),
+('CRAWL_PAGE_CACHE_TTL_HOURS', '24', false, 'rag_strategy', 'Hours a cached page is served before it is fetched again'),
+('CRAWL_PAGE_CACHE_MAX_MB', '1024', false, 'rag_strategy', 'Compressed size of the page cache above which least recently used pages are evicted')
+ON CONFLICT (key) DO NOTHING;
+
+-- Crawl Worker Pool Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_WORKER_PROCESSES', '0', false, 'rag_strategy', 'Worker processes that render crawled pages, each with its own browser (0 = crawl in the server process; applies after restart)'),
+('CRAWL_WORKER_MAX_IN_FLIGHT', '5', false, 'rag_strategy', 'Pages each crawl worker process renders at once')
+ON CONFLICT (key) DO NOTHING;
+
+-- HTML Spool Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_HTML_SPOOL', 'true', false, 'rag_strategy', 'Keep the raw HTML of crawled pages compressed on disk until code extraction instead of in memory'),
+('CRAWL_HTML_SPOOL_DIR', '', false, 'rag_strategy', 'Directory for per-crawl HTML spools (empty = system temp directory)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Domain Profile Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_DOMAIN_PROFILES', 'true', false, 'rag_strategy', 'Learn per-domain render settings: skip the render delay and page scroll on domains whose content is complete at load, and shorten page timeouts to observed render times'),
+('CRAWL_DOMAIN_PROFILE_PATH', '', false, 'rag_strategy', 'JSON file the learned domain profiles are kept in (empty = system temp directory)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Text Chunking Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CHUNK_MAX_TOKENS', '1200', false, 'rag_strategy', 'Maximum size of a crawled page chunk in embedding-model tokens'),
+('CHUNK_OVERLAP_TOKENS', '100', false, 'rag_strategy', 'Tokens of trailing text repeated at the start of the next chunk (code blocks are never repeated)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Document Preparation Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('DOCUMENT_PREP_PROCESSES', '2', false, 'rag_strategy', 'Worker processes that chunk crawled pages and build chunk metadata off the event loop (0 = use a thread in the server process)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Boilerplate Removal Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CRAWL_BOILERPLATE_REMOVAL', 'true', false, 'rag_strategy', 'Strip navigation, headers, footers and banners repeated across a site''s pages before chunking'),
+('CRAWL_BOILERPLATE_THRESHOLD', '0.6', false, 'rag_strategy', 'Share of pages a block must appear on to be treated as boilerplate (0.1-1.0)'),
+('CRAWL_BOILERPLATE_DIR', '', false, 'rag_strategy', 'Directory the learned per-source boilerplate templates are kept in (empty = system temp directory)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Near-Duplicate Chunk Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CHUNK_NEAR_DUPLICATES', 'true', false, 'rag_strategy', 'Link near-identical chunks (versioned or mirrored pages) to the first copy crawled: they reuse its embedding and search shows the group once'),
+('CHUNK_DEDUP_MAX_DISTANCE', '3', false, 'rag_strategy', 'Maximum differing bits between two chunks'' 64-bit SimHashes for them to count as near-duplicates (0-15)')
+ON CONFLICT (key) DO NOTHING;
+
+-- Code Extraction Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CODE_EXTRACTION_PROCESSES', '2', false, 'rag_strategy', 'Worker processes that extract code examples from crawled pages (0 = extract in a thread)'),
+('CODE_EXTRACTION_DOC_TIMEOUT', '30', false, 'rag_strategy', 'Seconds a single page may spend in code extraction before it is skipped')
+ON CONFLICT (key) DO NOTHING;
+
 -- Document Storage Performance Settings (from add_performance_settings.sql and optimize_batch_sizes.sql)
 INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
 ('DOCUMENT_STORAGE_BATCH_SIZE', '100', false, 'rag_strategy', 'Number of document chunks to process per batch (50-200) - increased for better performance'),
@@ -234,6 +317,10 @@ CREATE INDEX ON archon_code_examples USING ivfflat (embedding vector_cosine_ops)
 CREATE INDEX idx_archon_code_examples_metadata ON archon_code_examples USING GIN (metadata);
 CREATE INDEX idx_archon_code_examples_source_id ON archon_code_examples (source_id);
 
+-- Trigram indexes for exact identifier / error string lookups and keyword search
+CREATE INDEX idx_archon_code_examples_content_trgm ON archon_code_examples USING GIN (content gin_trgm_ops);
+CREATE INDEX idx_archon_code_examples_summary_trgm ON archon_code_examples USING GIN (summary gin_trgm_ops);
+
 -- =====================================================
 -- SECTION 5: SEARCH FUNCTIONS
 -- =====================================================
@@ -256,21 +343,93 @@ CREATE OR REPLACE FUNCTION match_archon_crawled_pages (
 LANGUAGE plpgsql
 AS $$
 #variable_conflict use_column
+DECLARE
+  -- Filters matching fewer rows than this are ranked exactly after a GIN pre-filter
+  prefilter_max_rows CONSTANT INT := 10000;
+  filtered_rows INT;
 BEGIN
+  IF filter <> '{}'::jsonb THEN
+    -- Estimate filter selectivity with a bounded count on the GIN metadata index
+    SELECT count(*) INTO filtered_rows FROM (
+      SELECT 1 FROM archon_crawled_pages
+      WHERE metadata @> filter
+        AND (source_filter IS NULL OR source_id = source_filter)
+      LIMIT prefilter_max_rows
+    ) AS candidates;
+
+    IF filtered_rows < prefilter_max_rows THEN
+      -- Selective filter: rank every matching row exactly. The ANN scan would run
+      -- out of candidates before LIMIT and return short results
+      RETURN QUERY
+      WITH filtered AS MATERIALIZED (
+        SELECT
+          id,
+          url,
+          chunk_number,
+          content,
+          metadata,
+          source_id,
+          archon_crawled_pages.embedding <=> query_embedding AS distance
+        FROM archon_crawled_pages
+        WHERE metadata @> filter
+          AND (source_filter IS NULL OR source_id = source_filter)
+      )
+      SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+      FROM filtered
+      ORDER BY distance
+      LIMIT match_count;
+      RETURN;
+    END IF;
+
+    -- Broad filter: let the index scan keep pulling candidates until enough pass
+    -- the filter (pgvector 0.8+); older versions probe more lists instead
+    BEGIN
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      PERFORM set_config('ivfflat.probes', '10', true);
+    END;
+  END IF;
+
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'WITH ranked AS MATERIALIZED (
+         SELECT id, url, chunk_number, content, metadata, source_id,
+                embedding <=> $1 AS distance
+         FROM archon_crawled_pages
+         WHERE metadata @> $2 AND source_id = %L
+         ORDER BY embedding <=> $1
+         LIMIT $3
+       )
+       SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+       FROM ranked
+       ORDER BY distance',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  -- Iterative scans may return rows slightly out of order, so re-sort the page
   RETURN QUERY
-  SELECT
-    id,
-    url,
-    chunk_number,
-    content,
-    metadata,
-    source_id,
-    1 - (archon_crawled_pages.embedding <=> query_embedding) AS similarity
-  FROM archon_crawled_pages
-  WHERE metadata @> filter
-    AND (source_filter IS NULL OR source_id = source_filter)
-  ORDER BY archon_crawled_pages.embedding <=> query_embedding
-  LIMIT match_count;
+  WITH ranked AS MATERIALIZED (
+    SELECT
+      id,
+      url,
+      chunk_number,
+      content,
+      metadata,
+      source_id,
+      archon_crawled_pages.embedding <=> query_embedding AS distance
+    FROM archon_crawled_pages
+    WHERE metadata @> filter
+    ORDER BY archon_crawled_pages.embedding <=> query_embedding
+    LIMIT match_count
+  )
+  SELECT id, url, chunk_number, content, metadata, source_id, 1 - distance AS similarity
+  FROM ranked
+  ORDER BY distance;
 END;
 $$;
 
@@ -293,6 +452,120 @@ CREATE OR REPLACE FUNCTION match_archon_code_examples (
 LANGUAGE plpgsql
 AS $$
 #variable_conflict use_column
+DECLARE
+  -- Filters matching fewer rows than this are ranked exactly after a GIN pre-filter
+  prefilter_max_rows CONSTANT INT := 10000;
+  filtered_rows INT;
+BEGIN
+  IF filter <> '{}'::jsonb THEN
+    -- Estimate filter selectivity with a bounded count on the GIN metadata index
+    SELECT count(*) INTO filtered_rows FROM (
+      SELECT 1 FROM archon_code_examples
+      WHERE metadata @> filter
+        AND (source_filter IS NULL OR source_id = source_filter)
+      LIMIT prefilter_max_rows
+    ) AS candidates;
+
+    IF filtered_rows < prefilter_max_rows THEN
+      -- Selective filter: rank every matching row exactly. The ANN scan would run
+      -- out of candidates before LIMIT and return short results
+      RETURN QUERY
+      WITH filtered AS MATERIALIZED (
+        SELECT
+          id,
+          url,
+          chunk_number,
+          content,
+          summary,
+          metadata,
+          source_id,
+          archon_code_examples.embedding <=> query_embedding AS distance
+        FROM archon_code_examples
+        WHERE metadata @> filter
+          AND (source_filter IS NULL OR source_id = source_filter)
+      )
+      SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+      FROM filtered
+      ORDER BY distance
+      LIMIT match_count;
+      RETURN;
+    END IF;
+
+    -- Broad filter: let the index scan keep pulling candidates until enough pass
+    -- the filter (pgvector 0.8+); older versions probe more lists instead
+    BEGIN
+      PERFORM set_config('ivfflat.iterative_scan', 'relaxed_order', true);
+    EXCEPTION WHEN OTHERS THEN
+      PERFORM set_config('ivfflat.probes', '10', true);
+    END;
+  END IF;
+
+  -- Source-filtered searches inline the source as a literal so the planner can pick
+  -- the source's partial vector index (large sources) or an exact scan via the
+  -- source_id index (small sources) instead of filtering the global index results
+  IF source_filter IS NOT NULL THEN
+    RETURN QUERY EXECUTE format(
+      'WITH ranked AS MATERIALIZED (
+         SELECT id, url, chunk_number, content, summary, metadata, source_id,
+                embedding <=> $1 AS distance
+         FROM archon_code_examples
+         WHERE metadata @> $2 AND source_id = %L
+         ORDER BY embedding <=> $1
+         LIMIT $3
+       )
+       SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+       FROM ranked
+       ORDER BY distance',
+      source_filter
+    ) USING query_embedding, filter, match_count;
+    RETURN;
+  END IF;
+
+  -- Iterative scans may return rows slightly out of order, so re-sort the page
+  RETURN QUERY
+  WITH ranked AS MATERIALIZED (
+    SELECT
+      id,
+      url,
+      chunk_number,
+      content,
+      summary,
+      metadata,
+      source_id,
+      archon_code_examples.embedding <=> query_embedding AS distance
+    FROM archon_code_examples
+    WHERE metadata @> filter
+    ORDER BY archon_code_examples.embedding <=> query_embedding
+    LIMIT match_count
+  )
+  SELECT id, url, chunk_number, content, summary, metadata, source_id, 1 - distance AS similarity
+  FROM ranked
+  ORDER BY distance;
+END;
+$$;
+
+-- Create a function to look up code examples containing an exact identifier or string
+-- (served by the trigram indexes; no embedding needed)
+CREATE OR REPLACE FUNCTION match_archon_code_examples_by_text (
+  search_text TEXT,
+  match_count INT DEFAULT 10,
+  source_filter TEXT DEFAULT NULL
+) RETURNS TABLE (
+  id BIGINT,
+  url VARCHAR,
+  chunk_number INTEGER,
+  content TEXT,
+  summary TEXT,
+  metadata JSONB,
+  source_id TEXT,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+  -- Escape LIKE wildcards so identifiers such as model_validate match literally
+  pattern TEXT := '%' || replace(replace(replace(search_text, '\', '\\'), '%', '\%'), '_', '\_') || '%';
 BEGIN
   RETURN QUERY
   SELECT
@@ -303,11 +576,15 @@ BEGIN
     summary,
     metadata,
     source_id,
-    1 - (archon_code_examples.embedding <=> query_embedding) AS similarity
+    (CASE
+      WHEN strpos(archon_code_examples.content, search_text) > 0 THEN 1.0
+      WHEN archon_code_examples.content ILIKE pattern THEN 0.9
+      ELSE 0.8
+    END)::FLOAT AS similarity
   FROM archon_code_examples
-  WHERE metadata @> filter
+  WHERE (archon_code_examples.content ILIKE pattern OR archon_code_examples.summary ILIKE pattern)
     AND (source_filter IS NULL OR source_id = source_filter)
-  ORDER BY archon_code_examples.embedding <=> query_embedding
+  ORDER BY 8 DESC, length(archon_code_examples.content)
   LIMIT match_count;
 END;
 $$;
@@ -783,6 +1060,244 @@ You are the Data-Builder Agent. Your purpose is to transform descriptions of dat
 
 Remember: Create production-ready data models.', 'System prompt for creating data models in the data array');
 
+-- =====================================================
+-- SECTION 11: SEARCH QUERY LOG AND CACHE WARMING
+-- =====================================================
+
+-- Search query log used to warm the embedding and result caches
+CREATE TABLE IF NOT EXISTS archon_query_log (
+    id BIGSERIAL PRIMARY KEY,
+    query_type TEXT NOT NULL DEFAULT 'rag',      -- 'rag' or 'code_examples'
+    query_text TEXT,                             -- Query as asked, replayed by the cache warmer
+    normalized_query TEXT NOT NULL,              -- Whitespace-collapsed query, used for grouping
+    source_filter TEXT,                          -- Optional source the query was filtered on
+    match_count INTEGER,
+    filters JSONB NOT NULL DEFAULT '{}'::jsonb,  -- Other request parameters (e.g. token_budget)
+    latency_ms INTEGER,
+    result_ids JSONB NOT NULL DEFAULT '[]'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+-- Installs that created the table before query_text was added
+ALTER TABLE archon_query_log ADD COLUMN IF NOT EXISTS query_text TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_archon_query_log_created_at ON archon_query_log (created_at);
+CREATE INDEX IF NOT EXISTS idx_archon_query_log_query ON archon_query_log (query_type, normalized_query);
+
+ALTER TABLE archon_query_log ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_query_log" ON archon_query_log
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Most frequent recent queries, optionally limited to those that can touch one source.
+-- Dropped first because its result columns have changed.
+DROP FUNCTION IF EXISTS get_popular_archon_queries(INT, INT, TEXT);
+CREATE OR REPLACE FUNCTION get_popular_archon_queries (
+  max_count INT DEFAULT 100,
+  since_days INT DEFAULT 7,
+  source TEXT DEFAULT NULL
+) RETURNS TABLE (
+  query_type TEXT,
+  query_text TEXT,
+  normalized_query TEXT,
+  source_filter TEXT,
+  match_count INTEGER,
+  filters JSONB,
+  hit_count BIGINT,
+  avg_latency_ms FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+  RETURN QUERY
+  SELECT
+    query_type,
+    (ARRAY_AGG(COALESCE(query_text, normalized_query) ORDER BY created_at DESC))[1] AS query_text,
+    normalized_query,
+    source_filter,
+    MAX(match_count) AS match_count,
+    (ARRAY_AGG(filters ORDER BY created_at DESC))[1] AS filters,
+    COUNT(*) AS hit_count,
+    AVG(latency_ms)::FLOAT AS avg_latency_ms
+  FROM archon_query_log
+  WHERE created_at > now() - make_interval(days => since_days)
+    AND (source IS NULL OR source_filter IS NULL OR source_filter = source)
+  GROUP BY query_type, normalized_query, source_filter
+  ORDER BY COUNT(*) DESC
+  LIMIT max_count;
+END;
+$$;
+
+-- Search Cache Warming Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('CACHE_WARMING_ENABLED', 'true', false, 'rag_strategy', 'Re-run popular logged queries after startup and ingestion to pre-populate search caches'),
+('CACHE_WARMING_TOP_K', '100', false, 'rag_strategy', 'Number of most popular queries to warm (0 disables warming)')
+ON CONFLICT (key) DO NOTHING;
+
+-- =====================================================
+-- SECTION 12: SOURCE-PARTITIONED VECTOR INDEXES
+-- =====================================================
+
+-- Registry of per-source partial vector indexes
+CREATE TABLE IF NOT EXISTS archon_source_partitions (
+    source_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,                    -- 'archon_crawled_pages' or 'archon_code_examples'
+    index_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,        -- Rows in the source when the index was built
+    lists INTEGER NOT NULL,                      -- ivfflat list count used for the build
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (source_id, table_name)
+);
+
+ALTER TABLE archon_source_partitions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_source_partitions" ON archon_source_partitions
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Build (or rebuild) a partial ivfflat index covering a single source's rows.
+-- The index is built with a plain CREATE INDEX (CONCURRENTLY cannot run inside a
+-- function), which blocks inserts, updates and deletes on the table until it is
+-- done. Call it when no crawls or uploads are writing to the table.
+-- Runs as its owner so the service role can index tables it does not own.
+CREATE OR REPLACE FUNCTION create_archon_source_partition (
+  source TEXT,
+  target_table TEXT,
+  rebuild BOOLEAN DEFAULT FALSE
+) RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  idx_name TEXT;
+  row_total BIGINT;
+  list_count INT;
+BEGIN
+  IF target_table NOT IN ('archon_crawled_pages', 'archon_code_examples') THEN
+    RAISE EXCEPTION 'Unsupported table for source partitioning: %', target_table;
+  END IF;
+
+  -- Hash the source id to keep index names short and valid
+  idx_name := 'idx_' || target_table || '_src_' || left(md5(source), 12);
+
+  EXECUTE format('SELECT count(*) FROM %I WHERE source_id = %L', target_table, source)
+    INTO row_total;
+
+  -- pgvector guidance: roughly rows / 1000 lists
+  list_count := GREATEST(10, LEAST(1000, (row_total / 1000)::INT));
+
+  IF rebuild THEN
+    EXECUTE format('DROP INDEX IF EXISTS %I', idx_name);
+  END IF;
+
+  EXECUTE format(
+    'CREATE INDEX IF NOT EXISTS %I ON %I USING ivfflat (embedding vector_cosine_ops) WITH (lists = %s) WHERE source_id = %L',
+    idx_name, target_table, list_count, source
+  );
+
+  INSERT INTO archon_source_partitions (source_id, table_name, index_name, row_count, lists)
+  VALUES (source, target_table, idx_name, row_total, list_count)
+  ON CONFLICT (source_id, table_name) DO UPDATE SET
+    index_name = EXCLUDED.index_name,
+    row_count = EXCLUDED.row_count,
+    lists = EXCLUDED.lists,
+    created_at = timezone('utc'::text, now());
+
+  RETURN idx_name;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION create_archon_source_partition(TEXT, TEXT, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_archon_source_partition(TEXT, TEXT, BOOLEAN) TO service_role;
+
+-- Drop all partial vector indexes for a source, returning how many were dropped
+CREATE OR REPLACE FUNCTION drop_archon_source_partitions (
+  source TEXT
+) RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  part RECORD;
+  dropped INT := 0;
+BEGIN
+  FOR part IN
+    SELECT index_name FROM archon_source_partitions WHERE source_id = source
+  LOOP
+    EXECUTE format('DROP INDEX IF EXISTS %I', part.index_name);
+    dropped := dropped + 1;
+  END LOOP;
+
+  DELETE FROM archon_source_partitions WHERE source_id = source;
+  RETURN dropped;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION drop_archon_source_partitions(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION drop_archon_source_partitions(TEXT) TO service_role;
+
+-- Source Partitioning Settings
+INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
+('SOURCE_PARTITION_MIN_ROWS', '10000', false, 'rag_strategy', 'Build a dedicated vector index for a source once it has this many chunks or code examples (0 disables)'),
+('SOURCE_PARTITION_AUTO_BUILD', 'false', false, 'rag_strategy', 'Build source vector indexes automatically after crawls and uploads; building blocks writes to the table while it runs')
+ON CONFLICT (key) DO NOTHING;
+
+-- =====================================================
+-- SECTION 13: INCREMENTAL REFRESH PAGE VERSIONS
+-- =====================================================
+
+-- Per-URL version records used by incremental refreshes
+CREATE TABLE IF NOT EXISTS archon_page_versions (
+    id BIGSERIAL PRIMARY KEY,
+    source_id TEXT NOT NULL REFERENCES archon_sources(source_id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    etag TEXT,                                   -- ETag response header from the last crawl
+    last_modified TEXT,                          -- Last-Modified response header from the last crawl
+    content_hash TEXT,                           -- SHA-256 of the page markdown
+    word_count INTEGER NOT NULL DEFAULT 0,
+    links TEXT[] NOT NULL DEFAULT '{}',          -- Internal links, followed when the page is skipped
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'removed')),
+    last_checked_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    last_changed_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    removed_at TIMESTAMP WITH TIME ZONE,         -- Set when the page disappeared (tombstone)
+    UNIQUE (source_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_page_versions_source_status ON archon_page_versions (source_id, status);
+
+ALTER TABLE archon_page_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_page_versions" ON archon_page_versions
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- =====================================================
+-- SECTION 14: CRAWL CHECKPOINTS
+-- =====================================================
+
+-- Saved frontier of running and interrupted crawls, keyed by progress id
+CREATE TABLE IF NOT EXISTS archon_crawl_checkpoints (
+    progress_id TEXT PRIMARY KEY,
+    source_id TEXT NOT NULL,                     -- No foreign key: the source may not exist yet
+    url TEXT NOT NULL,
+    crawl_type TEXT NOT NULL,                    -- webpage or sitemap
+    request JSONB NOT NULL DEFAULT '{}',         -- Original crawl request, replayed on resume
+    state JSONB NOT NULL DEFAULT '{}',           -- Depth, pending, next level and visited URLs
+    in_flight TEXT[] NOT NULL DEFAULT '{}',      -- Crawled but not fully stored; re-crawled on resume
+    pages_visited INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'cancelled', 'failed')),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_crawl_checkpoints_status ON archon_crawl_checkpoints (status, updated_at DESC);
+
+ALTER TABLE archon_crawl_checkpoints ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow service role full access to archon_crawl_checkpoints" ON archon_crawl_checkpoints
+    FOR ALL USING (auth.role() = 'service_role');
+
 -- =====================================================
 -- SETUP COMPLETE
 -- =====================================================
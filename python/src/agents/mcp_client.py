@@ -98,11 +98,14 @@ class MCPClient:
 
     # Convenience methods for common MCP tools
 
-    async def perform_rag_query(self, query: str, source: str = None, match_count: int = 5) -> str:
+    async def perform_rag_query(
+        self, query: str, source: str = None, match_count: int = 5, token_budget: int = None
+    ) -> str:
         """Perform a RAG query through MCP."""
-        result = await self.call_tool(
-            "perform_rag_query", query=query, source=source, match_count=match_count
-        )
+        params = {"query": query, "source": source, "match_count": match_count}
+        if token_budget:
+            params["token_budget"] = token_budget
+        result = await self.call_tool("perform_rag_query", **params)
         return json.dumps(result) if isinstance(result, dict) else str(result)
 
     async def get_available_sources(self) -> str:
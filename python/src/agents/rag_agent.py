@@ -28,6 +28,7 @@ class RagDependencies(ArchonDependencies):
     project_id: str | None = None
     source_filter: str | None = None
     match_count: int = 5
+    token_budget: int | None = None  # Max tokens of retrieved context per search
     progress_callback: Any | None = None  # Callback for progress updates
 
 
@@ -125,6 +126,7 @@ class RagAgent(BaseAgent[RagDependencies, str]):
 - Project ID: {ctx.deps.project_id or "Global search"}
 - {source_info}
 - Max Results: {ctx.deps.match_count}
+- Context Budget: {f"{ctx.deps.token_budget} tokens" if ctx.deps.token_budget else "Unlimited"}
 - Timestamp: {datetime.now().isoformat()}
 """
 
@@ -142,7 +144,10 @@ class RagAgent(BaseAgent[RagDependencies, str]):
                 # Use MCP client to perform RAG query
                 mcp_client = await get_mcp_client()
                 result_json = await mcp_client.perform_rag_query(
-                    query=query, source=source_filter, match_count=ctx.deps.match_count
+                    query=query,
+                    source=source_filter,
+                    match_count=ctx.deps.match_count,
+                    token_budget=ctx.deps.token_budget,
                 )
 
                 # Parse the JSON response
@@ -166,8 +171,8 @@ class RagAgent(BaseAgent[RagDependencies, str]):
                     url = metadata.get("url", res.get("url", ""))
                     content = res.get("content", "")
 
-                    # Truncate content if too long
-                    if len(content) > 500:
+                    # Truncate content if too long (packed results already fit the budget)
+                    if not ctx.deps.token_budget and len(content) > 500:
                         content = content[:500] + "..."
 
                     formatted_results.append(
@@ -334,6 +339,7 @@ class RagAgent(BaseAgent[RagDependencies, str]):
         match_count: int = 5,
         user_id: str = None,
         progress_callback: Any = None,
+        token_budget: int | None = None,
     ) -> RagQueryResult:
         """
         Run the agent for conversational RAG queries.
@@ -345,6 +351,7 @@ class RagAgent(BaseAgent[RagDependencies, str]):
             match_count: Maximum number of results to return
             user_id: ID of the user making the request
             progress_callback: Optional callback for progress updates
+            token_budget: Optional max tokens of retrieved context per search
 
         Returns:
             Structured RagQueryResult
@@ -353,6 +360,7 @@ class RagAgent(BaseAgent[RagDependencies, str]):
             project_id=project_id,
             source_filter=source_filter,
             match_count=match_count,
+            token_budget=token_budget,
             user_id=user_id,
             progress_callback=progress_callback,
         )
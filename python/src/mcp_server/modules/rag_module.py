@@ -78,13 +78,21 @@ def register_rag_tools(mcp: FastMCP):
 
     @mcp.tool()
     async def perform_rag_query(
-        ctx: Context, query: str, source_domain: str = None, match_count: int = 5
+        ctx: Context,
+        query: str,
+        source_domain: str = None,
+        match_count: int = 5,
+        token_budget: int = None,
+        knowledge_type: str = None,
+        tags: list[str] = None,
     ) -> str:
         """
         Vector search on indexed content.
 
         Always specify source for precision. Use get_available_sources first.
         Minimum match_count of 10 recommended.
+        Set token_budget to get the best merged, deduplicated context within N tokens.
+        Filter with knowledge_type ("technical" or "business") and/or tags (all must match).
         """
         try:
             api_url = get_api_url()
@@ -94,20 +102,26 @@ def register_rag_tools(mcp: FastMCP):
                 request_data = {"query": query, "match_count": match_count}
                 if source_domain:
                     request_data["source"] = source_domain
+                if token_budget:
+                    request_data["token_budget"] = token_budget
+                if knowledge_type:
+                    request_data["knowledge_type"] = knowledge_type
+                if tags:
+                    request_data["tags"] = tags
 
                 response = await client.post(urljoin(api_url, "/api/rag/query"), json=request_data)
 
                 if response.status_code == 200:
                     result = response.json()
-                    return json.dumps(
-                        {
-                            "success": True,
-                            "results": result.get("results", []),
-                            "reranked": result.get("reranked", False),
-                            "error": None,
-                        },
-                        indent=2,
-                    )
+                    response_data = {
+                        "success": True,
+                        "results": result.get("results", []),
+                        "reranked": result.get("reranked", False),
+                        "error": None,
+                    }
+                    if token_budget:
+                        response_data["tokens_used"] = result.get("tokens_used", 0)
+                    return json.dumps(response_data, indent=2)
                 else:
                     error_detail = response.text
                     return json.dumps(
@@ -22,12 +22,19 @@ from ..utils import get_supabase_client
 from ..services.storage import DocumentStorageService
 from ..services.search.rag_service import RAGService
 from ..services.knowledge import KnowledgeItemService, DatabaseMetricsService
-from ..services.crawling import CrawlOrchestrationService
+from ..services.crawling import (
+    CrawlOrchestrationService,
+    get_active_orchestration,
+    list_crawl_checkpoints,
+    load_crawl_checkpoint,
+)
 from ..services.crawler_manager import get_crawler
 
 # Import unified logging
 from ..config.logfire_config import get_logger, safe_logfire_error, safe_logfire_info, safe_logfire_warning
 from ..services.crawler_manager import get_crawler
+from ..services.search.cache_warmer import on_source_updated
+from ..services.search.source_partition_service import get_source_partition_service
 from ..services.search.rag_service import RAGService
 from ..services.storage import DocumentStorageService
 from ..utils import get_supabase_client
@@ -66,6 +73,10 @@ class KnowledgeItemRequest(BaseModel):
     update_frequency: int = 7
     max_depth: int = 2  # Maximum crawl depth (1-5)
     extract_code_examples: bool = True  # Whether to extract code examples
+    include_patterns: list[str] = []  # Sitemap URLs must match one of these globs
+    exclude_patterns: list[str] = []  # Sitemap URLs matching these globs are skipped
+    max_pages: int | None = None  # Page budget for recursive crawls (None uses CRAWL_MAX_PAGES)
+    force_fresh: bool = False  # Bypass the local page cache and fetch every page again
 
     class Config:
         schema_extra = {
@@ -92,6 +103,9 @@ class RagQueryRequest(BaseModel):
     query: str
     source: str | None = None
     match_count: int = 5
+    token_budget: int | None = None  # Pack results into at most this many tokens
+    knowledge_type: str | None = None  # Only return chunks of this knowledge type
+    tags: list[str] | None = None  # Only return chunks carrying all of these tags
 
 
 @router.get("/test-socket-progress/{progress_id}")
@@ -259,8 +273,14 @@ async def get_knowledge_item_code_examples(source_id: str):
 
 
 @router.post("/knowledge-items/{source_id}/refresh")
-async def refresh_knowledge_item(source_id: str):
-    """Refresh a knowledge item by re-crawling its URL with the same metadata."""
+async def refresh_knowledge_item(source_id: str, incremental: bool = True):
+    """
+    Refresh a knowledge item by re-crawling its URL with the same metadata.
+
+    Incremental refreshes skip pages that have not changed since the last crawl, only
+    re-embed changed chunks and tombstone pages that no longer exist. Pass
+    incremental=false to re-ingest everything. Refreshes never read the local page cache.
+    """
     try:
         safe_logfire_info(f"Starting knowledge item refresh | source_id={source_id}")
 
@@ -330,6 +350,9 @@ async def refresh_knowledge_item(source_id: str):
             "max_depth": max_depth,
             "extract_code_examples": True,
             "generate_summary": True,
+            "incremental": incremental,
+            # Cached pages would show the content of the last crawl, so every page looks unchanged
+            "force_fresh": True,
         }
 
         # Create a wrapped task that acquires the semaphore
@@ -462,6 +485,10 @@ async def _perform_crawl_with_progress(progress_id: str, request: KnowledgeItemR
                 "tags": request.tags or [],
                 "max_depth": request.max_depth,
                 "extract_code_examples": request.extract_code_examples,
+                "include_patterns": request.include_patterns,
+                "exclude_patterns": request.exclude_patterns,
+                "max_pages": request.max_pages,
+                "force_fresh": request.force_fresh,
                 "generate_summary": True,
             }
 
@@ -505,6 +532,104 @@ async def _perform_crawl_with_progress(progress_id: str, request: KnowledgeItemR
                 )
 
 
+@router.get("/knowledge-items/crawl/checkpoints")
+async def get_crawl_checkpoints():
+    """List interrupted crawls that can be resumed."""
+    try:
+        checkpoints = await list_crawl_checkpoints(get_supabase_client())
+        for checkpoint in checkpoints:
+            checkpoint["active"] = bool(
+                checkpoint["progress_id"] in active_crawl_tasks
+                or get_active_orchestration(checkpoint["progress_id"])
+            )
+        return {"checkpoints": checkpoints, "count": len(checkpoints)}
+    except Exception as e:
+        safe_logfire_error(f"Failed to list crawl checkpoints | error={str(e)}")
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+
+@router.post("/knowledge-items/crawl/{progress_id}/resume")
+async def resume_crawl(progress_id: str):
+    """
+    Resume an interrupted crawl from its last checkpoint.
+
+    The crawl keeps its progress id and only fetches pages that were not stored
+    before it stopped.
+    """
+    try:
+        # The orchestration outlives the request task, so check both registries
+        if progress_id in active_crawl_tasks or get_active_orchestration(progress_id):
+            raise HTTPException(
+                status_code=409, detail={"error": f"Crawl {progress_id} is still running"}
+            )
+
+        supabase_client = get_supabase_client()
+        checkpoint = await load_crawl_checkpoint(supabase_client, progress_id)
+        if not checkpoint:
+            raise HTTPException(
+                status_code=404, detail={"error": f"No resumable crawl found for {progress_id}"}
+            )
+
+        request_dict = checkpoint.get("request") or {}
+        url = request_dict.get("url") or checkpoint.get("url")
+        safe_logfire_info(
+            f"Resuming crawl | progress_id={progress_id} | url={url} | pages_visited={checkpoint.get('pages_visited', 0)}"
+        )
+
+        await start_crawl_progress(
+            progress_id,
+            {
+                "progressId": progress_id,
+                "currentUrl": url,
+                "totalPages": 0,
+                "processedPages": 0,
+                "percentage": 0,
+                "status": "starting",
+                "message": "Resuming crawl...",
+                "logs": [f"Resuming crawl of {url}"],
+            },
+        )
+
+        try:
+            crawler = await get_crawler()
+            if crawler is None:
+                raise Exception("Crawler not available - initialization may have failed")
+        except Exception as e:
+            safe_logfire_error(f"Failed to get crawler | error={str(e)}")
+            raise HTTPException(
+                status_code=500, detail={"error": f"Failed to initialize crawler: {str(e)}"}
+            )
+
+        crawl_service = CrawlOrchestrationService(crawler=crawler, supabase_client=supabase_client)
+        crawl_service.set_progress_id(progress_id)
+
+        async def _perform_resume_with_semaphore():
+            try:
+                # Give the frontend time to subscribe to the progress room
+                await asyncio.sleep(1.0)
+
+                async with crawl_semaphore:
+                    safe_logfire_info(f"Acquired crawl semaphore for resume | progress_id={progress_id}")
+                    await crawl_service.orchestrate_crawl(request_dict, resume_from=checkpoint)
+            finally:
+                if progress_id in active_crawl_tasks:
+                    del active_crawl_tasks[progress_id]
+                    safe_logfire_info(
+                        f"Cleaned up resume task from registry | progress_id={progress_id}"
+                    )
+
+        task = asyncio.create_task(_perform_resume_with_semaphore())
+        active_crawl_tasks[progress_id] = task
+
+        return {"progressId": progress_id, "message": f"Resumed crawl of {url}"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        safe_logfire_error(f"Failed to resume crawl | error={str(e)} | progress_id={progress_id}")
+        raise HTTPException(status_code=500, detail={"error": str(e)})
+
+
 @router.post("/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -812,6 +937,10 @@ async def _perform_upload_with_progress(
             safe_logfire_info(
                 f"Document uploaded successfully | progress_id={progress_id} | source_id={result.get('source_id')} | chunks_stored={result.get('chunks_stored')}"
             )
+
+            # Refresh cached search results that may now miss the new content
+            on_source_updated(result.get("source_id"))
+            get_source_partition_service().schedule_partition_check(result.get("source_id"))
         else:
             error_msg = result.get("error", "Unknown error")
             await error_crawl_progress(progress_id, error_msg)
@@ -1178,6 +1307,11 @@ async def _perform_folder_upload_with_progress(
             error_msg = f"All files failed to process. Errors: {[f['error'] for f in failed_files[:3]]}"
             await error_crawl_progress(progress_id, error_msg)
 
+        if processed_files > 0:
+            # Refresh cached search results that may now miss the new content
+            on_source_updated(source_id)
+            get_source_partition_service().schedule_partition_check(source_id)
+
         safe_logfire_info(
             f"Folder upload processing completed | progress_id={progress_id} | source_id={source_id} | processed_files={processed_files}/{total_files} | chunks_stored={total_chunks_stored} | failed_files={len(failed_files)}"
         )
@@ -1230,7 +1364,12 @@ async def perform_rag_query(request: RagQueryRequest):
         # Use RAGService for RAG query
         search_service = RAGService(get_supabase_client())
         success, result = await search_service.perform_rag_query(
-            query=request.query, source=request.source, match_count=request.match_count
+            query=request.query,
+            source=request.source,
+            match_count=request.match_count,
+            token_budget=request.token_budget,
+            knowledge_type=request.knowledge_type,
+            tags=request.tags,
         )
 
         if success:
@@ -130,6 +130,15 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             api_logger.warning(f"Could not set main event loop: {e}")
 
+        # Warm search caches with popular queries once startup traffic settles
+        try:
+            from .services.search.cache_warmer import STARTUP_DELAY_SECONDS, get_cache_warmer
+
+            get_cache_warmer().schedule(delay=STARTUP_DELAY_SECONDS)
+            api_logger.info("✅ Search cache warming scheduled")
+        except Exception as e:
+            api_logger.warning(f"Could not schedule search cache warming: {e}")
+
         # MCP Client functionality removed from architecture
         # Agents now use MCP tools directly
 
@@ -156,6 +165,32 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             api_logger.warning("Could not cleanup crawling context", error=str(e))
 
+        # Stop document preparation worker processes
+        try:
+            from .services.crawling.document_preparation import shutdown_document_preparer
+
+            shutdown_document_preparer()
+        except Exception as e:
+            api_logger.warning("Could not stop document preparation workers", error=str(e))
+
+        # Stop code extraction worker processes
+        try:
+            from .services.crawling.code_extraction_pool import shutdown_code_extraction_pool
+
+            shutdown_code_extraction_pool()
+        except Exception as e:
+            api_logger.warning("Could not stop code extraction workers", error=str(e))
+
+        # Stop cache warming and persist any buffered query log entries
+        try:
+            from .services.search.cache_warmer import get_cache_warmer
+            from .services.search.query_log_service import get_query_log_service
+
+            await get_cache_warmer().stop()
+            await get_query_log_service().flush()
+        except Exception as e:
+            api_logger.warning("Could not flush search query log", error=str(e))
+
         # Cleanup background task manager
         try:
             await cleanup_task_manager()
@@ -0,0 +1,339 @@
+"""
+Crawl Worker Pool
+
+Runs page rendering in separate worker processes, each with its own browser, so
+crawl throughput scales with cores and rendering, markdown generation and link
+extraction stay off the API process's event loop.
+
+The pool looks like an AsyncWebCrawler to the crawl strategies: arun() and
+arun_many() take the same arguments and return results with the same fields.
+Each page goes to the worker with the fewest pages in flight through that
+worker's job queue, and the pool never has more than processes * max_in_flight
+pages outstanding. Because the parent knows which worker holds which page, a
+worker that dies fails exactly its own pages and is replaced.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from types import SimpleNamespace
+from typing import Any
+
+from ..config.logfire_config import get_logger, safe_logfire_error, safe_logfire_info
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 5
+
+# Upper bound on one page, covering a worker that died before reporting it
+JOB_TIMEOUT_SECONDS = 300.0
+
+MONITOR_INTERVAL_SECONDS = 1.0
+
+# Serialized run configs kept per side; strategies reuse a handful of configs
+CONFIG_CACHE_SIZE = 16
+
+RESULT_FIELDS = ("url", "success", "html", "links", "status_code", "response_headers", "error_message")
+
+
+def _default_crawler_factory():
+    from crawl4ai import AsyncWebCrawler
+
+    from .crawler_manager import build_browser_config
+
+    return AsyncWebCrawler(config=build_browser_config())
+
+
+def _to_payload(url: str, result: Any) -> dict[str, Any]:
+    """Reduce a crawl4ai result to the plain fields the strategies read."""
+    payload = {field: getattr(result, field, None) for field in RESULT_FIELDS}
+    payload["url"] = payload["url"] or url
+    markdown = getattr(result, "markdown", None)
+    payload["markdown"] = str(markdown) if markdown else None
+    payload["links"] = payload["links"] or {}
+    payload["response_headers"] = dict(payload["response_headers"] or {})
+    return payload
+
+
+def _failed_payload(url: str, error: str) -> dict[str, Any]:
+    return {
+        "url": url,
+        "success": False,
+        "markdown": None,
+        "html": None,
+        "links": {},
+        "status_code": None,
+        "response_headers": {},
+        "error_message": error,
+    }
+
+
+def _worker_main(worker_id: int, jobs, results, max_in_flight: int, crawler_factory: Callable) -> None:
+    """Entry point of a worker process."""
+    asyncio.run(_run_worker(worker_id, jobs, results, max_in_flight, crawler_factory))
+
+
+async def _run_worker(worker_id: int, jobs, results, max_in_flight: int, crawler_factory: Callable) -> None:
+    loop = asyncio.get_running_loop()
+    crawler = crawler_factory()
+    await crawler.__aenter__()
+    results.put(("ready", worker_id, None))
+
+    slots = asyncio.Semaphore(max_in_flight)
+    configs: dict[bytes, Any] = {}
+    tasks: set[asyncio.Task] = set()
+
+    async def _crawl(job_id: int, url: str, config: Any) -> None:
+        try:
+            result = await crawler.arun(url=url, config=config)
+            payload = _to_payload(url, result)
+        except Exception as e:
+            payload = _failed_payload(url, f"Crawler exception: {e}")
+        finally:
+            slots.release()
+        results.put(("result", job_id, payload))
+
+    try:
+        while True:
+            await slots.acquire()
+            job = await loop.run_in_executor(None, jobs.get)
+            if job is None:
+                break
+            job_id, url, config_bytes = job
+            if config_bytes not in configs:
+                if len(configs) >= CONFIG_CACHE_SIZE:
+                    configs.clear()
+                configs[config_bytes] = pickle.loads(config_bytes)
+            task = asyncio.create_task(_crawl(job_id, url, configs[config_bytes]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await crawler.__aexit__(None, None, None)
+
+
+class CrawlWorkerPool:
+    """Crawler stand-in that renders pages in worker processes"""
+
+    def __init__(
+        self,
+        processes: int,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        crawler_factory: Callable = _default_crawler_factory,
+        start_method: str = "spawn",
+        job_timeout: float = JOB_TIMEOUT_SECONDS,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            processes: Number of worker processes, each with its own browser
+            max_in_flight: Pages each worker renders at once
+            crawler_factory: Module-level callable that builds a worker's crawler
+            start_method: multiprocessing start method; spawn keeps workers free of
+                the API process's threads and event loop
+            job_timeout: Seconds before a page is reported as failed
+        """
+        self.processes = max(1, processes)
+        self.max_in_flight = max(1, max_in_flight)
+        self.crawler_factory = crawler_factory
+        self.job_timeout = job_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._results = None
+        self._workers: list = []
+        self._job_queues: list = []
+        self._loads: list[int] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        # Job -> (worker, URL) for pages sent to a worker and not yet returned
+        self._assigned: dict[int, tuple[int, str]] = {}
+        self._job_ids = itertools.count()
+        self._configs: dict[int, tuple[Any, bytes]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+        self._monitor: asyncio.Task | None = None
+        self._closing = False
+        self.pages = 0
+        self.restarts = 0
+
+    async def __aenter__(self) -> "CrawlWorkerPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Start the worker processes and the result reader."""
+        self._loop = asyncio.get_running_loop()
+        self._results = self._context.Queue()
+        self._slots = asyncio.Semaphore(self.processes * self.max_in_flight)
+        self._closing = False
+        self._job_queues = [None] * self.processes
+        self._workers = [self._spawn(worker_id) for worker_id in range(self.processes)]
+        self._loads = [0] * self.processes
+        self._reader = threading.Thread(target=self._read_results, name="crawl-pool-results", daemon=True)
+        self._reader.start()
+        self._monitor = asyncio.create_task(self._watch_workers())
+        safe_logfire_info(
+            f"Crawl worker pool started | processes={self.processes} | max_in_flight={self.max_in_flight}"
+        )
+
+    async def arun(self, url: str, config=None, **kwargs) -> SimpleNamespace:
+        """Render one page in a worker; errors come back as a failed result."""
+        try:
+            config_bytes = self._serialize_config(config)
+        except Exception as e:
+            return SimpleNamespace(**_failed_payload(url, f"Run config cannot be sent to crawl workers: {e}"))
+
+        async with self._slots:
+            job_id = next(self._job_ids)
+            future = self._loop.create_future()
+            self._pending[job_id] = future
+            # The slot guarantees some worker is below max_in_flight
+            worker_id = min(range(self.processes), key=self._loads.__getitem__)
+            self._loads[worker_id] += 1
+            self._assigned[job_id] = (worker_id, url)
+            self._job_queues[worker_id].put((job_id, url, config_bytes))
+            try:
+                payload = await asyncio.wait_for(future, timeout=self.job_timeout)
+            except asyncio.TimeoutError:
+                payload = _failed_payload(url, f"Crawl worker did not return the page within {self.job_timeout}s")
+            finally:
+                self._pending.pop(job_id, None)
+                if self._assigned.pop(job_id, None) is not None:
+                    self._loads[worker_id] -= 1
+        self.pages += 1
+        return SimpleNamespace(**payload)
+
+    async def arun_many(self, urls: list[str], config=None, **kwargs) -> AsyncIterator[SimpleNamespace]:
+        """
+        Render pages in the workers, streaming results as they complete.
+
+        A dispatcher argument is accepted for compatibility and ignored; the pool
+        bounds in-flight pages itself.
+        """
+
+        async def _stream():
+            tasks = [asyncio.create_task(self.arun(url, config)) for url in urls]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        return _stream()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "processes": self.processes,
+            "alive": sum(1 for worker in self._workers if worker.is_alive()),
+            "in_flight": len(self._pending),
+            "pages": self.pages,
+            "restarts": self.restarts,
+        }
+
+    async def close(self) -> None:
+        """Stop the workers after their current pages."""
+        self._closing = True
+        if self._monitor:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        for job_queue in self._job_queues:
+            job_queue.put(None)
+        await asyncio.to_thread(self._join_workers)
+        if self._results is not None:
+            self._results.put(("closed", None, None))
+        if self._reader:
+            await asyncio.to_thread(self._reader.join, 5)
+        for job_id, future in self._pending.items():
+            if not future.done():
+                _, url = self._assigned.get(job_id, (None, ""))
+                future.set_result(_failed_payload(url, "Crawl worker pool closed"))
+        safe_logfire_info("Crawl worker pool stopped")
+
+    # Internal helpers
+
+    def _spawn(self, worker_id: int):
+        # A fresh queue per process, so jobs left for a dead worker are not picked up twice
+        self._job_queues[worker_id] = self._context.Queue()
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self._job_queues[worker_id], self._results, self.max_in_flight, self.crawler_factory),
+            name=f"crawl-worker-{worker_id}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    def _serialize_config(self, config: Any) -> bytes:
+        cached = self._configs.get(id(config))
+        # Keep the config alongside its bytes so its id cannot be reused while cached
+        if cached is not None and cached[0] is config:
+            return cached[1]
+        data = pickle.dumps(config)
+        if len(self._configs) >= CONFIG_CACHE_SIZE:
+            self._configs.clear()
+        self._configs[id(config)] = (config, data)
+        return data
+
+    def _read_results(self) -> None:
+        """Reader thread: hand worker messages to the event loop."""
+        while True:
+            try:
+                message = self._results.get(timeout=MONITOR_INTERVAL_SECONDS)
+            except queue.Empty:
+                if self._closing and not any(worker.is_alive() for worker in self._workers):
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if message[0] == "closed":
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._on_message, message)
+            except RuntimeError:
+                # The event loop is gone; nothing is waiting for results any more
+                return
+
+    def _on_message(self, message: tuple) -> None:
+        kind, ref, payload = message
+        if kind == "result":
+            future = self._pending.get(ref)
+            if future is not None and not future.done():
+                future.set_result(payload)
+        elif kind == "ready":
+            logger.info(f"Crawl worker {ref} ready")
+
+    async def _watch_workers(self) -> None:
+        """Fail the pages of workers that died and start replacements."""
+        while not self._closing:
+            await asyncio.sleep(MONITOR_INTERVAL_SECONDS)
+            for worker_id, worker in enumerate(self._workers):
+                if worker.is_alive() or self._closing:
+                    continue
+                safe_logfire_error(
+                    f"Crawl worker {worker_id} exited with code {worker.exitcode}, restarting"
+                )
+                for job_id, (assigned_to, url) in list(self._assigned.items()):
+                    if assigned_to != worker_id:
+                        continue
+                    future = self._pending.get(job_id)
+                    if future is not None and not future.done():
+                        future.set_result(_failed_payload(url, f"Crawl worker {worker_id} exited"))
+                self.restarts += 1
+                self._workers[worker_id] = self._spawn(worker_id)
+
+    def _join_workers(self) -> None:
+        deadline = time.monotonic() + 30
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+            if worker.is_alive():
+                worker.terminate()
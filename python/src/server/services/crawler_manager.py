@@ -19,6 +19,52 @@ from ..config.logfire_config import get_logger, safe_logfire_error, safe_logfire
 logger = get_logger(__name__)
 
 
+def build_browser_config() -> "BrowserConfig":
+    """Browser settings shared by the in-process crawler and the crawl worker processes."""
+    # Same for Docker and local; crawl4ai/Playwright handle Docker-specific settings internally
+    return BrowserConfig(
+        headless=True,
+        verbose=False,
+        # Set viewport for proper rendering
+        viewport_width=1920,
+        viewport_height=1080,
+        # Add user agent to appear as a real browser
+        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        # Set browser type
+        browser_type="chromium",
+        # Extra args for Chromium - optimized for speed
+        extra_args=[
+            "--disable-blink-features=AutomationControlled",
+            "--disable-dev-shm-usage",
+            "--no-sandbox",
+            "--disable-setuid-sandbox",
+            "--disable-web-security",
+            "--disable-features=IsolateOrigins,site-per-process",
+            # Performance optimizations
+            "--disable-images",  # Skip image loading for faster page loads
+            "--disable-gpu",
+            "--disable-extensions",
+            "--disable-plugins",
+            "--disable-background-timer-throttling",
+            "--disable-backgrounding-occluded-windows",
+            "--disable-renderer-backgrounding",
+            "--disable-features=TranslateUI",
+            "--disable-ipc-flooding-protection",
+            # Additional speed optimizations
+            "--aggressive-cache-discard",
+            "--disable-background-networking",
+            "--disable-default-apps",
+            "--disable-sync",
+            "--metrics-recording-only",
+            "--no-first-run",
+            "--disable-popup-blocking",
+            "--disable-prompt-on-repost",
+            "--disable-domain-reliability",
+            "--disable-component-update",
+        ],
+    )
+
+
 class CrawlerManager:
     """Manages the global crawler instance."""
 
@@ -57,55 +103,21 @@ class CrawlerManager:
             # Check for Docker environment
             in_docker = os.path.exists("/.dockerenv") or os.getenv("DOCKER_CONTAINER", False)
 
-            # Initialize browser config - same for Docker and local
-            # crawl4ai/Playwright will handle Docker-specific settings internally
-            browser_config = BrowserConfig(
-                headless=True,
-                verbose=False,
-                # Set viewport for proper rendering
-                viewport_width=1920,
-                viewport_height=1080,
-                # Add user agent to appear as a real browser
-                user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                # Set browser type
-                browser_type="chromium",
-                # Extra args for Chromium - optimized for speed
-                extra_args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-dev-shm-usage",
-                    "--no-sandbox",
-                    "--disable-setuid-sandbox",
-                    "--disable-web-security",
-                    "--disable-features=IsolateOrigins,site-per-process",
-                    # Performance optimizations
-                    "--disable-images",  # Skip image loading for faster page loads
-                    "--disable-gpu",
-                    "--disable-extensions",
-                    "--disable-plugins",
-                    "--disable-background-timer-throttling",
-                    "--disable-backgrounding-occluded-windows",
-                    "--disable-renderer-backgrounding",
-                    "--disable-features=TranslateUI",
-                    "--disable-ipc-flooding-protection",
-                    # Additional speed optimizations
-                    "--aggressive-cache-discard",
-                    "--disable-background-networking",
-                    "--disable-default-apps",
-                    "--disable-sync",
-                    "--metrics-recording-only",
-                    "--no-first-run",
-                    "--disable-popup-blocking",
-                    "--disable-prompt-on-repost",
-                    "--disable-domain-reliability",
-                    "--disable-component-update",
-                ],
-            )
-
-            safe_logfire_info(f"Creating AsyncWebCrawler with config | in_docker={in_docker}")
-
-            # Initialize crawler with the correct parameter name
-            self._crawler = AsyncWebCrawler(config=browser_config)
-            safe_logfire_info("AsyncWebCrawler instance created, entering context...")
+            worker_processes, max_in_flight = await self._load_worker_settings()
+            if worker_processes > 0:
+                # Render pages in worker processes, each with its own browser
+                from .crawl_worker_pool import CrawlWorkerPool
+
+                safe_logfire_info(
+                    f"Creating crawl worker pool | processes={worker_processes} | in_docker={in_docker}"
+                )
+                self._crawler = CrawlWorkerPool(worker_processes, max_in_flight)
+            else:
+                safe_logfire_info(f"Creating AsyncWebCrawler with config | in_docker={in_docker}")
+
+                # Initialize crawler with the correct parameter name
+                self._crawler = AsyncWebCrawler(config=build_browser_config())
+            safe_logfire_info("Crawler instance created, entering context...")
             await self._crawler.__aenter__()
             self._initialized = True
             safe_logfire_info(f"Crawler entered context successfully | crawler={self._crawler}")
@@ -132,8 +144,26 @@ class CrawlerManager:
             self._initialized = False
             raise Exception(f"Failed to initialize Crawl4AI crawler: {e}")
 
+    @staticmethod
+    async def _load_worker_settings() -> tuple[int, int]:
+        """Read CRAWL_WORKER_PROCESSES and CRAWL_WORKER_MAX_IN_FLIGHT; 0 processes crawls in-process."""
+        from .crawl_worker_pool import DEFAULT_MAX_IN_FLIGHT
+        from .credential_service import credential_service
+
+        try:
+            settings = await credential_service.get_credentials_by_category("rag_strategy")
+            processes = int(settings.get("CRAWL_WORKER_PROCESSES", "0"))
+            max_in_flight = int(settings.get("CRAWL_WORKER_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT)))
+        except Exception as e:
+            logger.warning(f"Failed to load crawl worker settings, crawling in-process: {e}")
+            return 0, DEFAULT_MAX_IN_FLIGHT
+        return max(0, processes), max(1, max_in_flight)
+
     async def cleanup(self):
         """Clean up the crawler resources."""
+        from .crawling.http_fast_path import close_http_fast_path
+
+        await close_http_fast_path()
         if self._crawler and self._initialized:
             try:
                 await self._crawler.__aexit__(None, None, None)
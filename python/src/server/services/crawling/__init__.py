@@ -12,9 +12,16 @@ from .crawling_service import (
     register_orchestration,
     unregister_orchestration
 )
+from .code_extraction_pool import CodeExtractionPool
 from .code_extraction_service import CodeExtractionService
+from .crawl_checkpoint import CrawlCheckpoint, list_crawl_checkpoints, load_crawl_checkpoint
+from .document_preparation import DocumentPreparer
 from .document_storage_operations import DocumentStorageOperations
+from .domain_profiles import DomainProfileStore
+from .html_spool import HtmlSpool
+from .page_cache import PageCache, get_page_cache
 from .progress_mapper import ProgressMapper
+from .visited_set import VisitedSet
 
 # Export strategies
 from .strategies.batch import BatchCrawlStrategy
@@ -25,12 +32,19 @@ from .strategies.sitemap import SitemapCrawlStrategy
 # Export helpers
 from .helpers.url_handler import URLHandler
 from .helpers.site_config import SiteConfig
+from .helpers.url_canonicalizer import UrlCanonicalizer
 
 __all__ = [
     "CrawlingService",
     "CrawlOrchestrationService",
+    "CodeExtractionPool",
     "CodeExtractionService",
+    "CrawlCheckpoint",
+    "DocumentPreparer",
     "DocumentStorageOperations",
+    "DomainProfileStore",
+    "HtmlSpool",
+    "PageCache",
     "ProgressMapper",
     "BatchCrawlStrategy",
     "RecursiveCrawlStrategy",
@@ -38,7 +52,12 @@ __all__ = [
     "SitemapCrawlStrategy",
     "URLHandler",
     "SiteConfig",
+    "UrlCanonicalizer",
+    "VisitedSet",
     "get_active_orchestration",
     "register_orchestration",
-    "unregister_orchestration"
+    "unregister_orchestration",
+    "get_page_cache",
+    "list_crawl_checkpoints",
+    "load_crawl_checkpoint"
 ]
@@ -0,0 +1,260 @@
+"""
+Boilerplate Removal
+
+Documentation sites repeat the same navigation, header, footer and cookie
+banner on every page, and the crawler's markdown keeps most of it. Left in,
+that text is chunked, embedded, stored and searched once per page. The
+detector hashes every block (text between blank lines) and every line of each
+page. It counts how many pages each hash appears on, and strips the blocks
+found on more than a threshold share of the site's pages before the page is
+chunked. A block made almost entirely of such lines is stripped as well, which
+catches a navigation list whose active entry differs from page to page. Code
+blocks and headings are never stripped.
+
+The learned template is saved per source, so a refresh strips boilerplate from
+its first page instead of relearning the site.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+
+logger = get_logger(__name__)
+
+DEFAULT_TEMPLATE_DIR = os.path.join(tempfile.gettempdir(), "archon-boilerplate")
+
+# Share of pages a block must appear on to count as boilerplate
+DEFAULT_THRESHOLD = 0.6
+
+# Pages held back while a crawl without a saved template learns the site
+LEARN_PAGES = 20
+
+# Fewer pages than this say nothing about what repeats across a site
+MIN_PAGES = 5
+
+# A block repeated on fewer pages than this is never boilerplate, whatever the share
+MIN_OCCURRENCES = 3
+
+# Share of a block's lines that must be boilerplate lines to strip the block
+LINE_SHARE = 0.9
+
+# Pages between recomputations of the template from the counts
+RECOMPUTE_INTERVAL = 25
+
+# Pages between dropping hashes seen only once, to keep the counts small
+PRUNE_INTERVAL = 500
+
+_BLOCK_BREAK = re.compile(r"(\n[ \t]*\n)")
+
+
+def _hash(text: str) -> str:
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _lines(block: str) -> list[str]:
+    return [line for line in (line.strip() for line in block.split("\n")) if line]
+
+
+def _blocks(markdown: str) -> list[tuple[str, str, bool]]:
+    """Split markdown into (block, separator after it, protected) triples; protected blocks are kept as-is."""
+    parts = _BLOCK_BREAK.split(markdown)
+    blocks = []
+    in_code = False
+    for i in range(0, len(parts), 2):
+        block = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        fences = sum(1 for line in block.split("\n") if line.lstrip().startswith("```"))
+        lines = _lines(block)
+        heading = len(lines) == 1 and lines[0].startswith("#")
+        blocks.append((block, separator, in_code or fences > 0 or heading or not lines))
+        if fences % 2:
+            in_code = not in_code
+    return blocks
+
+
+class BoilerplateDetector:
+    """Learns the blocks a site repeats on every page and strips them"""
+
+    def __init__(
+        self,
+        source_id: str,
+        threshold: float = DEFAULT_THRESHOLD,
+        directory: str = DEFAULT_TEMPLATE_DIR,
+        learn_pages: int = LEARN_PAGES,
+    ):
+        """
+        Initialize a detector for one crawl of a source.
+
+        Args:
+            source_id: The source being crawled; its saved template is used until enough pages are seen
+            threshold: Share of pages a block must appear on to be stripped
+            directory: Directory templates are saved in, one file per source
+            learn_pages: Pages to see before stripping when there is no saved template
+        """
+        self.source_id = source_id
+        self.threshold = threshold
+        self.directory = directory
+        self.learn_pages = learn_pages
+        self.pages = 0
+        self.blocks_removed = 0
+        self.chars_removed = 0
+        self._block_counts: Counter[str] = Counter()
+        self._line_counts: Counter[str] = Counter()
+        self._saved: tuple[frozenset[str], frozenset[str]] | None = None
+        self._template: tuple[frozenset[str], frozenset[str]] | None = None
+        self._template_pages = 0
+
+    @property
+    def path(self) -> str:
+        name = hashlib.sha1(self.source_id.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{name}.json")
+
+    @property
+    def ready(self) -> bool:
+        """Whether pages can be stripped now, rather than held back while the site is learned."""
+        return self._saved is not None or self.pages >= self.learn_pages
+
+    def observe(self, markdown: str) -> None:
+        """Count the blocks and lines of a page."""
+        blocks: set[str] = set()
+        lines: set[str] = set()
+        for block, _, protected in _blocks(markdown):
+            if protected:
+                continue
+            blocks.add(_hash(block))
+            lines.update(_hash(line) for line in _lines(block))
+        self._block_counts.update(blocks)
+        self._line_counts.update(lines)
+        self.pages += 1
+        if self.pages % PRUNE_INTERVAL == 0:
+            for counts in (self._block_counts, self._line_counts):
+                for key in [key for key, count in counts.items() if count == 1]:
+                    del counts[key]
+
+    def strip(self, markdown: str) -> str:
+        """Remove the boilerplate blocks from a page."""
+        template = self._current_template()
+        if template is None:
+            return markdown
+        block_hashes, line_hashes = template
+        kept = []
+        for block, separator, protected in _blocks(markdown):
+            if not protected and self._is_boilerplate(block, block_hashes, line_hashes):
+                self.blocks_removed += 1
+                self.chars_removed += len(block) + len(separator)
+                continue
+            kept.append(block + separator)
+        return "".join(kept).strip()
+
+    def get_stats(self) -> dict[str, Any]:
+        template = self._current_template()
+        return {
+            "pages": self.pages,
+            "template_blocks": len(template[0]) if template else 0,
+            "blocks_removed": self.blocks_removed,
+            "chars_removed": self.chars_removed,
+        }
+
+    async def load(self) -> None:
+        """Load the template saved by an earlier crawl of the source."""
+        try:
+            data = await asyncio.to_thread(self._read)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable boilerplate template for {self.source_id}: {e}")
+            return
+        self._saved = (frozenset(data.get("blocks", [])), frozenset(data.get("lines", [])))
+
+    async def save(self) -> None:
+        """Save the template learned by this crawl, if it saw enough pages to learn one."""
+        if self.pages < MIN_PAGES:
+            return
+        blocks, lines = self._compute()
+        data = {
+            "source_id": self.source_id,
+            "pages": self.pages,
+            "threshold": self.threshold,
+            "blocks": sorted(blocks),
+            "lines": sorted(lines),
+            "updated_at": time.time(),
+        }
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            logger.warning(f"Failed to save boilerplate template for {self.source_id}: {e}")
+
+    # Internal helpers
+
+    def _is_boilerplate(self, block: str, block_hashes: frozenset[str], line_hashes: frozenset[str]) -> bool:
+        if _hash(block) in block_hashes:
+            return True
+        lines = _lines(block)
+        if len(lines) < 2:
+            return False
+        repeated = sum(1 for line in lines if _hash(line) in line_hashes)
+        return repeated >= LINE_SHARE * len(lines)
+
+    def _current_template(self) -> tuple[frozenset[str], frozenset[str]] | None:
+        if self.pages < MIN_PAGES or (self._saved is not None and self.pages < self.learn_pages):
+            return self._saved
+        if self._template is None or self.pages - self._template_pages >= RECOMPUTE_INTERVAL:
+            self._template = self._compute()
+            self._template_pages = self.pages
+        return self._template
+
+    def _compute(self) -> tuple[frozenset[str], frozenset[str]]:
+        minimum = max(MIN_OCCURRENCES, math.ceil(self.threshold * self.pages))
+        return (
+            frozenset(key for key, count in self._block_counts.items() if count >= minimum),
+            frozenset(key for key, count in self._line_counts.items() if count >= minimum),
+        )
+
+    def _read(self) -> dict[str, Any]:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, data: dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+async def create_boilerplate_detector(source_id: str) -> BoilerplateDetector | None:
+    """
+    Create a detector for a crawl if CRAWL_BOILERPLATE_REMOVAL is enabled.
+
+    Returns:
+        The detector with the source's saved template loaded, or None when removal is off
+    """
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load boilerplate removal settings: {e}")
+        settings = {}
+    if str(settings.get("CRAWL_BOILERPLATE_REMOVAL", "true")).lower() != "true":
+        return None
+
+    try:
+        threshold = float(settings.get("CRAWL_BOILERPLATE_THRESHOLD", DEFAULT_THRESHOLD))
+    except (TypeError, ValueError):
+        threshold = DEFAULT_THRESHOLD
+    threshold = min(1.0, max(0.1, threshold))
+    directory = settings.get("CRAWL_BOILERPLATE_DIR") or DEFAULT_TEMPLATE_DIR
+
+    detector = BoilerplateDetector(source_id, threshold, directory)
+    await detector.load()
+    return detector
@@ -0,0 +1,326 @@
+"""
+Code Classification
+
+Every candidate block found on a page is checked before it is kept: that it
+was extracted cleanly, that it shows enough signs of code, that it is not
+mostly comments, prose or a drawn diagram, and, for a block without a language
+tag, which language it looks like. scan_code() reads a block once into its
+words, lines and characters and records every feature those checks use;
+CodeClassifier then compares the features with its thresholds. Most features
+are set lookups on the words and characters, so only a handful of patterns are
+run over the block itself.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+# Fenced languages that describe diagrams rather than code
+DIAGRAM_LANGUAGES = frozenset({"mermaid", "plantuml", "graphviz", "dot", "diagram"})
+
+# Minimum block length by language, before context adjustments
+BASE_LENGTHS = {
+    "json": 100,  # JSON can be short
+    "yaml": 100,  # YAML too
+    "xml": 100,  # XML structures
+    "html": 150,  # HTML snippets
+    "css": 150,  # CSS rules
+    "sql": 150,  # SQL queries
+    "python": 200,  # Python functions
+    "javascript": 250,  # JavaScript typically longer
+    "typescript": 250,  # TypeScript typically longer
+    "java": 300,  # Java even more verbose
+    "c++": 300,  # C++ similar to Java
+    "cpp": 300,  # C++ alternative
+    "c": 250,  # C slightly less verbose
+    "rust": 250,  # Rust medium verbosity
+    "go": 200,  # Go is concise
+}
+
+# Words around a block that change how long it needs to be, with the factor, checked in order
+CONTEXT_LENGTH_FACTORS = (
+    (("example", "snippet", "sample", "demo"), 0.7),  # Examples can be shorter
+    (("implementation", "complete", "full"), 1.5),  # Full implementations should be longer
+    (("minimal", "simple", "basic"), 0.8),  # Simple examples can be shorter
+)
+
+# Code indicators found by word: a block shows the indicator if it contains any of the words
+WORD_INDICATORS = {
+    "control_flow": frozenset({"if", "for", "while", "switch", "case", "try", "catch", "except"}),
+    "declarations": frozenset(
+        {"var", "let", "const", "def", "class", "function", "interface", "type", "struct", "enum"}
+    ),
+    "imports": frozenset({"import", "from", "require", "include", "using", "use"}),
+    "keywords": frozenset({"return", "break", "continue", "yield", "await", "async"}),
+}
+
+# Code indicators found by character
+CHAR_INDICATORS = {
+    "brackets": frozenset("{}[]"),
+    "operators": frozenset("+-*/%&|^<>=!"),
+}
+
+# Code indicators that need a pattern, with a character the block must contain for it to match
+PATTERN_INDICATORS = {
+    "function_calls": (re.compile(r"\w\s*\([^)]*\)"), "("),
+    "assignments": (re.compile(r"\w\s*=\s*."), "="),
+    "method_chains": (re.compile(r"\.\w+"), "."),
+}
+
+# Words that mark prose, counted case-insensitively
+PROSE_WORDS = frozenset(
+    "the this that these those is are was were will would should could have has had "
+    "however therefore furthermore moreover nevertheless".split()
+)
+
+# Line prefixes of comments and docstrings
+COMMENT_PREFIXES = ("//", "#", "/*", "*", "<!--", '"""', "'''")
+
+# Box-drawing characters of text diagrams and directory trees
+DIAGRAM_CHARS = frozenset(chr(code) for code in range(0x2500, 0x2580))
+
+# Share of a block's lines that may be drawn with box-drawing characters
+MAX_DIAGRAM_LINE_RATIO = 0.5
+
+# Language signatures, by the word each one starts with; a signature is only tried when its word occurs
+LANGUAGE_SIGNATURES = {
+    "python": [
+        ("def", r"\bdef\s+\w+\s*\("),
+        ("class", r"\bclass\s+\w+"),
+        ("import", r"\bimport\s+\w+"),
+        ("from", r"\bfrom\s+\w+\s+import"),
+    ],
+    "javascript": [
+        ("function", r"\bfunction\s+\w+\s*\("),
+        ("const", r"\bconst\s+\w+\s*="),
+        ("let", r"\blet\s+\w+\s*="),
+        ("var", r"\bvar\s+\w+\s*="),
+    ],
+    "typescript": [
+        ("interface", r"\binterface\s+\w+"),
+        (None, r":\s*\w+\[\]"),
+        ("type", r"\btype\s+\w+\s*="),
+        ("class", r"\bclass\s+\w+.*\{"),
+    ],
+    "java": [
+        ("public", r"\bpublic\s+class\s+\w+"),
+        ("private", r"\bprivate\s+\w+\s+\w+"),
+        ("public", r"\bpublic\s+static\s+void\s+main"),
+    ],
+    "rust": [
+        ("fn", r"\bfn\s+\w+\s*\("),
+        ("let", r"\blet\s+mut\s+\w+"),
+        ("impl", r"\bimpl\s+\w+"),
+        ("struct", r"\bstruct\s+\w+"),
+    ],
+    "go": [
+        ("func", r"\bfunc\s+\w+\s*\("),
+        ("package", r"\bpackage\s+\w+"),
+        ("type", r"\btype\s+\w+\s+struct"),
+    ],
+}
+
+_LANGUAGE_SIGNATURES = {
+    language: [(word, re.compile(pattern, re.MULTILINE)) for word, pattern in signatures]
+    for language, signatures in LANGUAGE_SIGNATURES.items()
+}
+
+_WORD = re.compile(r"\w+")
+
+# Signs of a poor extraction: keywords run into the next word (camelCase is fine), undecoded
+# HTML entities, very long tags and runs of highlighting spans
+RUN_ON_KEYWORDS = ("from", "import", "def", "class", "if", "for", "while", "return")
+_RUN_ON_KEYWORD = re.compile(rf"(?:{'|'.join(RUN_ON_KEYWORDS)})[a-z]")
+_HTML_ENTITY = re.compile(r"&[lg]t;|&amp;|&quot;|&#\d+;")
+_LONG_TAG = re.compile(r"<[^>]{50,}>")
+_SPAN_RUN = re.compile(r"(?:<span[^>]*>){5,}")
+
+# Unbroken strings at least this long are extraction debris
+MAX_UNBROKEN_CHARS = 200
+
+_SENTENCE_BREAK = re.compile(r"[.!?]\s+[A-Z]", re.IGNORECASE)
+
+
+@dataclass
+class CodeFeatures:
+    """Everything the quality checks need to know about a block"""
+
+    words: frozenset[str]
+    word_count: int
+    malformed: bool
+    indicators: list[str]
+    lines: int
+    non_empty_lines: int
+    comment_lines: int
+    long_lines: int
+    diagram_lines: int
+    prose_score: int
+
+
+def scan_code(code: str) -> CodeFeatures:
+    """Read a block once and record the features of code, prose and diagrams it shows."""
+    counts = Counter(_WORD.findall(code))
+    words = frozenset(counts)
+    chars = frozenset(code)
+    pieces = code.split()
+
+    malformed = (
+        max(map(len, pieces), default=0) >= MAX_UNBROKEN_CHARS
+        or any(word.startswith(RUN_ON_KEYWORDS) and _RUN_ON_KEYWORD.match(word) for word in counts)
+        or ("&" in chars and _HTML_ENTITY.search(code) is not None)
+        or ("<" in chars and (_LONG_TAG.search(code) is not None or _SPAN_RUN.search(code) is not None))
+    )
+
+    indicators = [name for name, vocabulary in WORD_INDICATORS.items() if not vocabulary.isdisjoint(words)]
+    indicators += [name for name, symbols in CHAR_INDICATORS.items() if not symbols.isdisjoint(chars)]
+    indicators += [
+        name for name, (pattern, required) in PATTERN_INDICATORS.items() if required in chars and pattern.search(code)
+    ]
+    if "=>" in code or "->" in code:
+        indicators.append("arrows")
+
+    lines = code.split("\n")
+    non_empty_lines = comment_lines = long_lines = diagram_lines = 0
+    has_diagram_chars = not DIAGRAM_CHARS.isdisjoint(chars)
+    for line in lines:
+        if len(line) > 300:
+            long_lines += 1
+        stripped = line.strip()
+        if not stripped:
+            continue
+        non_empty_lines += 1
+        if stripped.startswith(COMMENT_PREFIXES):
+            comment_lines += 1
+        if has_diagram_chars and not DIAGRAM_CHARS.isdisjoint(stripped):
+            diagram_lines += 1
+
+    prose_score = sum(count for word, count in counts.items() if word.lower() in PROSE_WORDS)
+    if "." in chars or "!" in chars or "?" in chars:
+        prose_score += len(_SENTENCE_BREAK.findall(code))
+
+    return CodeFeatures(
+        words=words,
+        word_count=len(pieces),
+        malformed=malformed,
+        indicators=indicators,
+        lines=len(lines),
+        non_empty_lines=non_empty_lines,
+        comment_lines=comment_lines,
+        long_lines=long_lines,
+        diagram_lines=diagram_lines,
+        prose_score=prose_score,
+    )
+
+
+def detect_language(code: str, words: frozenset[str] | None = None) -> str:
+    """
+    Guess a block's language from the signatures it matches.
+
+    Args:
+        code: The block
+        words: The block's words, when already scanned
+
+    Returns:
+        The language with the most matching signatures, or "" when none match
+    """
+    if words is None:
+        words = frozenset(_WORD.findall(code))
+    scores = {}
+    for language, signatures in _LANGUAGE_SIGNATURES.items():
+        score = sum(1 for word, pattern in signatures if (word is None or word in words) and pattern.search(code))
+        if score:
+            scores[language] = score
+    return max(scores, key=scores.get) if scores else ""
+
+
+class CodeClassifier:
+    """Decides whether an extracted block is code worth keeping"""
+
+    def __init__(
+        self,
+        min_length: int = 250,
+        contextual_length: bool = True,
+        min_indicators: int = 3,
+        prose_filtering: bool = True,
+        max_prose_ratio: float = 0.15,
+        diagram_filtering: bool = True,
+        language_indicators: dict[str, list[str]] | None = None,
+    ):
+        """
+        Initialize the classifier with the extraction settings.
+
+        Args:
+            min_length: Minimum block length when context does not say otherwise
+            contextual_length: Adjust the minimum length for the language and surrounding text
+            min_indicators: Kinds of code indicator a block must show
+            prose_filtering: Reject blocks that read as prose
+            max_prose_ratio: Prose words and sentence breaks allowed per word
+            diagram_filtering: Reject diagram languages and blocks drawn with box-drawing characters
+            language_indicators: Substrings a block tagged with a language must show at least two of
+        """
+        self.min_length = min_length
+        self.contextual_length = contextual_length
+        self.min_indicators = min_indicators
+        self.prose_filtering = prose_filtering
+        self.max_prose_ratio = max_prose_ratio
+        self.diagram_filtering = diagram_filtering
+        self.language_indicators = language_indicators or {}
+
+    def is_code(self, code: str, language: str = "") -> bool:
+        """Whether a block is cleanly extracted code rather than prose, comments or a diagram."""
+        if not code or len(code.strip()) < 20:
+            return False
+        language = language.lower()
+        if self.diagram_filtering and language in DIAGRAM_LANGUAGES:
+            return False
+
+        features = scan_code(code)
+        if features.malformed or len(features.indicators) < self.min_indicators:
+            return False
+        if not features.non_empty_lines:
+            return False
+        # Allow up to 70% comments (documentation is important)
+        if features.comment_lines / features.non_empty_lines > 0.7:
+            return False
+
+        indicators = self.language_indicators.get(language)
+        if indicators is not None:
+            code_lower = code.lower()
+            if sum(1 for indicator in indicators if indicator in code_lower) < 2:
+                return False
+
+        if features.non_empty_lines < 3:
+            return False
+        if features.long_lines > features.lines * 0.5:
+            return False
+        if self.diagram_filtering and features.diagram_lines > features.non_empty_lines * MAX_DIAGRAM_LINE_RATIO:
+            return False
+        if (
+            self.prose_filtering
+            and features.word_count > 0
+            and features.prose_score / features.word_count > self.max_prose_ratio
+        ):
+            return False
+        return True
+
+    def min_length_for(self, language: str, context: str) -> int:
+        """
+        Minimum length of a block, adjusted for its language and the text around it.
+
+        Args:
+            language: The block's language, if known
+            context: Text surrounding the block
+
+        Returns:
+            Minimum length in characters
+        """
+        if not self.contextual_length:
+            return self.min_length
+        min_length = BASE_LENGTHS.get(language.lower(), self.min_length)
+        context_lower = context.lower()
+        for words, factor in CONTEXT_LENGTH_FACTORS:
+            if any(word in context_lower for word in words):
+                min_length = int(min_length * factor)
+                break
+        # Ensure reasonable bounds
+        return max(100, min(1000, min_length))
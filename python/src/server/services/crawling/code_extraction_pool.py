@@ -0,0 +1,276 @@
+"""
+Code Extraction Pool
+
+Finding code in a crawled page runs dozens of regular expressions over its
+HTML and markdown. On a large crawl that is seconds of CPU that would otherwise
+hold the event loop, and a pathological page can keep one pattern
+backtracking for minutes. CodeExtractionPool extracts each page in a pool of
+worker processes and hands its blocks back as soon as it is done. A page that
+runs past its timeout is given up on: the workers of that extraction call are
+stopped and replaced, so the rest of the crawl carries on. Every call has
+workers of its own, so other crawls extracting at the same time are unaffected.
+"""
+
+import asyncio
+import multiprocessing
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+from .html_spool import read_html
+
+logger = get_logger(__name__)
+
+DEFAULT_PROCESSES = 2
+
+# Seconds a single page may spend in extraction
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+# Times a page is sent to a fresh pool after its worker exited unexpectedly
+MAX_ATTEMPTS = 2
+
+# Executors kept warm between extraction calls
+MAX_IDLE_EXECUTORS = 2
+
+
+def worker_ready() -> None:
+    """Run once per new worker, so the pool is started before pages are sent to it."""
+
+
+def extract_document(doc: dict[str, str], settings: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Extract the code blocks of one page.
+
+    Runs in a worker process, so it only touches its arguments.
+
+    Args:
+        doc: The page's url, markdown, html and content_type
+        settings: Extraction settings, from CodeExtractionService.load_extraction_settings()
+
+    Returns:
+        The page's code blocks
+    """
+    from .code_extraction_service import CodeExtractionService
+
+    return CodeExtractionService(None, settings)._extract_document_code_blocks(doc)
+
+
+class CodeExtractionPool:
+    """Extracts code from crawled pages in pools of worker processes"""
+
+    def __init__(
+        self,
+        processes: int = DEFAULT_PROCESSES,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        start_method: str = "spawn",
+    ):
+        """
+        Initialize the pool. Worker processes start on first use.
+
+        Args:
+            processes: Worker processes per extraction call; 0 extracts in a thread
+                instead, where a page past its timeout is skipped but cannot be stopped
+            timeout: Seconds a single page may spend in extraction
+            start_method: multiprocessing start method; spawn keeps workers free of
+                the server's threads and open connections
+        """
+        self.processes = max(0, processes)
+        self.timeout = timeout
+        self.start_method = start_method
+        # Each extraction call leases an executor of its own, so stopping the workers of a
+        # stuck page never touches another crawl's pages. Idle executors are kept warm for reuse.
+        self._idle: list[ProcessPoolExecutor] = []
+        self._leased: set[ProcessPoolExecutor] = set()
+
+    async def extract(
+        self, docs: Iterable[dict[str, Any]], settings: dict[str, Any]
+    ) -> AsyncIterator[tuple[int, list[dict[str, Any]]]]:
+        """
+        Extract code from pages, yielding each one's blocks as soon as it is done.
+
+        Every page is yielded once, as (position in docs, blocks), in completion
+        order. Pages without content, that failed or that timed out have no blocks.
+        """
+        loop = asyncio.get_running_loop()
+        queue = enumerate(docs)
+        limit = max(1, self.processes)
+        executor: ProcessPoolExecutor | None = None
+        # Future -> (position, fields, attempt, deadline)
+        in_flight: dict[asyncio.Future, tuple[int, dict[str, str], int, float]] = {}
+
+        async def _submit(fields: dict[str, str]) -> asyncio.Future:
+            nonlocal executor
+            if not self.processes:
+                return asyncio.ensure_future(asyncio.to_thread(extract_document, fields, settings))
+            if executor is None:
+                executor = await self._lease()
+            return loop.run_in_executor(executor, extract_document, fields, settings)
+
+        try:
+            while True:
+                # The leased executor has a started worker for every page in flight, so a page
+                # starts when it is submitted and its deadline runs from then
+                while len(in_flight) < limit:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    index, doc = item
+                    fields = await self._fields(doc)
+                    if fields is None:
+                        yield index, []
+                        continue
+                    in_flight[await _submit(fields)] = (index, fields, 1, loop.time() + self.timeout)
+                if not in_flight:
+                    return
+
+                next_deadline = min(deadline for _, _, _, deadline in in_flight.values())
+                done, _ = await asyncio.wait(
+                    in_flight, timeout=max(0.0, next_deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                retry: list[tuple[int, dict[str, str], int]] = []
+                for future in done:
+                    index, fields, attempt, _ = in_flight.pop(future)
+                    try:
+                        yield index, future.result()
+                    except BrokenProcessPool:
+                        if attempt < MAX_ATTEMPTS:
+                            retry.append((index, fields, attempt + 1))
+                            continue
+                        logger.warning(f"Code extraction worker exited unexpectedly on {fields['url']}; skipping it")
+                        yield index, []
+                    except Exception as e:
+                        logger.warning(f"Code extraction failed for {fields['url']}: {e}")
+                        yield index, []
+
+                expired = [future for future, (*_, deadline) in in_flight.items() if deadline <= loop.time()]
+                for future in expired:
+                    index, fields, _, _ = in_flight.pop(future)
+                    future.cancel()
+                    logger.warning(f"Code extraction timed out after {self.timeout}s on {fields['url']}; skipping it")
+                    yield index, []
+
+                if (retry or expired) and executor is not None:
+                    # This call's workers are stuck or gone; start fresh ones for everything still in flight
+                    self._terminate(executor)
+                    executor = None
+                    for future, (index, fields, attempt, _) in list(in_flight.items()):
+                        future.cancel()
+                        retry.append((index, fields, attempt))
+                    in_flight.clear()
+                for index, fields, attempt in retry:
+                    in_flight[await _submit(fields)] = (index, fields, attempt, loop.time() + self.timeout)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            if executor is not None:
+                if in_flight:
+                    # Abandoned part way; its workers may still be busy
+                    self._terminate(executor)
+                else:
+                    self._release(executor)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes once work already sent to them is done."""
+        for executor in [*self._idle, *self._leased]:
+            executor.shutdown(wait=False)
+        self._idle.clear()
+        self._leased.clear()
+
+    # Internal helpers
+
+    async def _fields(self, doc: dict[str, Any]) -> dict[str, str] | None:
+        """The page fields extraction reads, with spooled HTML read back; None when there is no content."""
+        html = doc.get("html")
+        if html is not None and not isinstance(html, str):
+            html = await asyncio.to_thread(read_html, html)
+        markdown = doc.get("markdown") or ""
+        if not markdown and not html:
+            return None
+        return {
+            "url": doc.get("url") or "",
+            "markdown": markdown,
+            "html": html or "",
+            "content_type": doc.get("content_type") or "",
+        }
+
+    async def _lease(self) -> ProcessPoolExecutor:
+        """An executor for one extraction call, with its workers started."""
+        while self._idle:
+            executor = self._idle.pop()
+            if not getattr(executor, "_broken", False):
+                break
+            executor.shutdown(wait=False)
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context(self.start_method)
+            )
+            # Start the workers before any page is sent, so worker startup does not count
+            # against a page's deadline
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *(loop.run_in_executor(executor, worker_ready) for _ in range(self.processes)),
+                return_exceptions=True,
+            )
+        self._leased.add(executor)
+        return executor
+
+    def _release(self, executor: ProcessPoolExecutor) -> None:
+        if executor in self._leased and len(self._idle) < MAX_IDLE_EXECUTORS:
+            self._leased.discard(executor)
+            self._idle.append(executor)
+        else:
+            self._leased.discard(executor)
+            executor.shutdown(wait=False)
+
+    def _terminate(self, executor: ProcessPoolExecutor) -> None:
+        """Stop an executor's worker processes now, abandoning the work sent to them."""
+        self._leased.discard(executor)
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+_code_extraction_pool: CodeExtractionPool | None = None
+
+
+async def get_code_extraction_pool() -> CodeExtractionPool:
+    """
+    Get the process-wide pool, configured from the rag_strategy settings.
+
+    CODE_EXTRACTION_PROCESSES sets the worker processes (0 = extract in a thread);
+    CODE_EXTRACTION_DOC_TIMEOUT sets the seconds a single page may take.
+    """
+    global _code_extraction_pool
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load code extraction settings: {e}")
+        settings = {}
+
+    try:
+        processes = max(0, int(settings.get("CODE_EXTRACTION_PROCESSES", DEFAULT_PROCESSES)))
+    except (TypeError, ValueError):
+        processes = DEFAULT_PROCESSES
+    try:
+        timeout = max(1.0, float(settings.get("CODE_EXTRACTION_DOC_TIMEOUT", DEFAULT_TIMEOUT_SECONDS)))
+    except (TypeError, ValueError):
+        timeout = DEFAULT_TIMEOUT_SECONDS
+
+    if _code_extraction_pool is None or _code_extraction_pool.processes != processes:
+        if _code_extraction_pool is not None:
+            _code_extraction_pool.shutdown()
+        _code_extraction_pool = CodeExtractionPool(processes)
+    _code_extraction_pool.timeout = timeout
+    return _code_extraction_pool
+
+
+def shutdown_code_extraction_pool() -> None:
+    """Stop the process-wide pool's worker processes."""
+    global _code_extraction_pool
+    if _code_extraction_pool is not None:
+        _code_extraction_pool.shutdown()
+        _code_extraction_pool = None
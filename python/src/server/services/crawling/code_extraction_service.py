@@ -11,10 +11,204 @@ from urllib.parse import urlparse
 
 from ...config.logfire_config import safe_logfire_error, safe_logfire_info
 from ...services.credential_service import credential_service
+from ..storage.code_dedup import CodeBlockIndex
 from ..storage.code_storage_service import (
     add_code_examples_to_supabase,
     generate_code_summaries_batch,
 )
+from .code_classifier import CodeClassifier, detect_language
+from .code_extraction_pool import CodeExtractionPool, get_code_extraction_pool
+
+# Comprehensive patterns for various code block formats: (pattern, source type, text the page must
+# contain for the pattern to match). Order matters - more specific patterns first
+HTML_CODE_PATTERNS = [
+    # GitHub/GitLab patterns
+    (
+        r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*(?:language-)?(\w+)[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "github-highlight",
+        "highlight",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*snippet-clipboard-content[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "github-snippet",
+        "snippet-clipboard-content",
+    ),
+    # Docusaurus patterns
+    (
+        r'<div[^>]*class=["\'][^"\']*codeBlockContainer[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</pre>',
+        "docusaurus",
+        "codeblockcontainer",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*["\'][^>]*>(.*?)</pre>',
+        "docusaurus-alt",
+        "prism-code",
+    ),
+    # Milkdown specific patterns - check their actual HTML structure
+    (
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "milkdown-typed",
+        "language-",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*code-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "milkdown-wrapper",
+        "code-wrapper",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*code-block-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-wrapper-code",
+        "code-block-wrapper",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*milkdown-code-block[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-code-block",
+        "milkdown-code-block",
+    ),
+    (
+        r'<pre[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown",
+        "code-block",
+    ),
+    (r"<div[^>]*data-code-block[^>]*>.*?<pre[^>]*>(.*?)</pre>", "milkdown-alt", "data-code-block"),
+    (
+        r'<div[^>]*class=["\'][^"\']*milkdown[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-div",
+        "milkdown",
+    ),
+    # Monaco Editor - capture all view-lines content
+    (
+        r'<div[^>]*class=["\'][^"\']*monaco-editor[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*view-lines[^"\']*[^>]*>(.*?)</div>(?=.*?</div>.*?</div>)',
+        "monaco",
+        "monaco-editor",
+    ),
+    # CodeMirror patterns
+    (
+        r'<div[^>]*class=["\'][^"\']*cm-content[^"\']*["\'][^>]*>((?:<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>.*?</div>\s*)+)</div>',
+        "codemirror",
+        "cm-content",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*CodeMirror[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*CodeMirror-code[^"\']*["\'][^>]*>(.*?)</div>',
+        "codemirror-legacy",
+        "codemirror-code",
+    ),
+    # Prism.js with language - must be before generic pre
+    (
+        r'<pre[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
+        "prism",
+        "language-",
+    ),
+    (
+        r'<pre[^>]*>\s*<code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code>\s*</pre>',
+        "prism-alt",
+        "language-",
+    ),
+    # highlight.js - must be before generic pre/code
+    (
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*hljs(?:\s+language-(\w+))?[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "hljs",
+        "hljs",
+    ),
+    (
+        r'<pre[^>]*class=["\'][^"\']*hljs[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "hljs-pre",
+        "hljs",
+    ),
+    # Shiki patterns (VitePress, Astro, etc.)
+    (
+        r'<pre[^>]*class=["\'][^"\']*shiki[^"\']*["\'][^>]*(?:.*?style=["\'][^"\']*background-color[^"\']*["\'])?[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
+        "shiki",
+        "shiki",
+    ),
+    (r'<pre[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>(.*?)</pre>', "astro-shiki", "astro-code"),
+    (
+        r'<div[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "astro-wrapper",
+        "astro-code",
+    ),
+    # VitePress/Vue patterns
+    (
+        r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "vitepress",
+        "language-",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*vp-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "vitepress-vp",
+        "vp-code",
+    ),
+    # Nextra patterns
+    (r"<div[^>]*data-nextra-code[^>]*>.*?<pre[^>]*>(.*?)</pre>", "nextra", "data-nextra-code"),
+    (
+        r'<pre[^>]*class=["\'][^"\']*nx-[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "nextra-nx",
+        "nx-",
+    ),
+    # Standard pre/code patterns - should be near the end
+    (
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "standard-lang",
+        "language-",
+    ),
+    (r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", "standard", "<code"),
+    # Generic patterns - should be last
+    (
+        r'<div[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "generic-div",
+        "code-block",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*codeblock[^"\']*["\'][^>]*>(.*?)</div>',
+        "generic-codeblock",
+        "codeblock",
+    ),
+    (
+        r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "highlight",
+        "highlight",
+    ),
+]
+
+# Compiled once per process, so each document only runs them
+_HTML_CODE_PATTERNS = [
+    (re.compile(pattern, re.DOTALL | re.IGNORECASE), source_type, literal)
+    for pattern, source_type, literal in HTML_CODE_PATTERNS
+]
+_LANGUAGE_CLASS = re.compile(r'class=["\'].*?language-(\w+)')
+_CM_LINE = re.compile(r'<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>(.*?)</div>', re.DOTALL)
+_SPAN_OPEN = re.compile(r"<span[^>]*>")
+_SPAN_CLOSE = re.compile(r"</span>")
+_DIV_OPEN = re.compile(r"<div[^>]*>")
+_DIV_CLOSE = re.compile(r"</div>")
+_ANY_TAG = re.compile(r"<[^>]+>")
+_STANDALONE_CODE = re.compile(r"<code[^>]*>(.*?)</code>", re.DOTALL | re.IGNORECASE)
+_TEXT_BACKTICK_BLOCK = re.compile(r"```(\w*)[^\n]*\n(.*?)```", re.DOTALL | re.MULTILINE)
+_TEXT_LANGUAGE_BLOCK = re.compile(
+    r"(?:^|\n)((?:typescript|javascript|python|java|c\+\+|rust|go|ruby|php|swift|kotlin|scala|r|matlab|julia|dart|elixir|erlang|haskell|clojure|lua|perl|shell|bash|sql|html|css|xml|json|yaml|toml|ini|dockerfile|makefile|cmake|gradle|maven|npm|yarn|pip|cargo|gem|pod|composer|nuget|apt|yum|brew|choco|snap|flatpak|appimage|msi|exe|dmg|pkg|deb|rpm|tar|zip|7z|rar|gz|bz2|xz|zst|lz4|lzo|lzma|lzip|lzop|compress|uncompress|gzip|gunzip|bzip2|bunzip2|xz|unxz|zstd|unzstd|lz4|unlz4|lzo|unlzo|lzma|unlzma|lzip|lunzip|lzop|unlzop)\s*(?:code|example|snippet)?)[:\s]*\n((?:(?:^[ \t]+.*\n?)+)|(?:.*\n)+?)(?=\n(?:[A-Z][a-z]+\s*:|^\s*$|\n#|\n\*|\n-|\n\d+\.))",
+    re.IGNORECASE | re.MULTILINE,
+)
+_WORD = re.compile(r"(\w+)")
+
+# Natural ends of a code block, tried in order
+_BOUNDARY_PATTERNS = [
+    re.compile(pattern, re.MULTILINE)
+    for pattern in (
+        r"\n}\s*$",  # Closing brace at end of line
+        r"\n}\s*;?\s*$",  # Closing brace with optional semicolon
+        r"\n\)\s*;?\s*$",  # Closing parenthesis
+        r"\n\s*$\n\s*$",  # Double newline (paragraph break)
+        r"\n(?=class\s)",  # Before next class
+        r"\n(?=function\s)",  # Before next function
+        r"\n(?=def\s)",  # Before next Python function
+        r"\n(?=export\s)",  # Before next export
+        r"\n(?=const\s)",  # Before next const declaration
+        r"\n(?=//)",  # Before comment block
+        r"\n(?=#)",  # Before Python comment
+        r"\n(?=\*)",  # Before JSDoc/comment
+        r"\n(?=```)",  # Before next code block
+    )
+]
 
 
 class CodeExtractionService:
@@ -56,15 +250,32 @@ class CodeExtractionService:
         },
     }
 
-    def __init__(self, supabase_client):
+    # Settings read while extracting code from a document, with their defaults
+    EXTRACTION_SETTINGS = {
+        "MIN_CODE_BLOCK_LENGTH": 250,
+        "MAX_CODE_BLOCK_LENGTH": 5000,
+        "ENABLE_COMPLETE_BLOCK_DETECTION": True,
+        "ENABLE_LANGUAGE_SPECIFIC_PATTERNS": True,
+        "ENABLE_PROSE_FILTERING": True,
+        "MAX_PROSE_RATIO": 0.15,
+        "MIN_CODE_INDICATORS": 3,
+        "ENABLE_DIAGRAM_FILTERING": True,
+        "ENABLE_CONTEXTUAL_LENGTH": True,
+        "CONTEXT_WINDOW_SIZE": 1000,
+    }
+
+    def __init__(self, supabase_client, settings: dict[str, Any] | None = None):
         """
         Initialize the code extraction service.
 
         Args:
             supabase_client: The Supabase client for database operations
+            settings: Settings already loaded, as in an extraction worker process
         """
         self.supabase_client = supabase_client
-        self._settings_cache = {}
+        self._settings_cache = dict(settings or {})
+        self._classifier: CodeClassifier | None = None
+        self.extraction_pool: CodeExtractionPool | None = None
 
     async def _get_setting(self, key: str, default: Any) -> Any:
         """Get a setting from credential service with caching."""
@@ -88,45 +299,69 @@ class CodeExtractionService:
             self._settings_cache[key] = default
             return default
 
-    async def _get_min_code_length(self) -> int:
+    async def load_extraction_settings(self) -> dict[str, Any]:
+        """Load the settings extraction reads, so extracting a document needs no lookups."""
+        self._classifier = None
+        return {key: await self._get_setting(key, default) for key, default in self.EXTRACTION_SETTINGS.items()}
+
+    def _extraction_setting(self, key: str) -> Any:
+        return self._settings_cache.get(key, self.EXTRACTION_SETTINGS[key])
+
+    def _code_classifier(self) -> CodeClassifier:
+        """The classifier that checks candidate blocks, built from the loaded settings."""
+        if self._classifier is None:
+            self._classifier = CodeClassifier(
+                min_length=self._get_min_code_length(),
+                contextual_length=self._is_contextual_length_enabled(),
+                min_indicators=self._get_min_code_indicators(),
+                prose_filtering=self._is_prose_filtering_enabled(),
+                max_prose_ratio=self._get_max_prose_ratio(),
+                diagram_filtering=self._is_diagram_filtering_enabled(),
+                language_indicators={
+                    language: patterns["min_indicators"] for language, patterns in self.LANGUAGE_PATTERNS.items()
+                },
+            )
+        return self._classifier
+
+    def _get_min_code_length(self) -> int:
         """Get minimum code block length setting."""
-        return await self._get_setting("MIN_CODE_BLOCK_LENGTH", 250)
+        return self._extraction_setting("MIN_CODE_BLOCK_LENGTH")
 
-    async def _get_max_code_length(self) -> int:
+    def _get_max_code_length(self) -> int:
         """Get maximum code block length setting."""
-        return await self._get_setting("MAX_CODE_BLOCK_LENGTH", 5000)
+        return self._extraction_setting("MAX_CODE_BLOCK_LENGTH")
 
-    async def _is_complete_block_detection_enabled(self) -> bool:
+    def _is_complete_block_detection_enabled(self) -> bool:
         """Check if complete block detection is enabled."""
-        return await self._get_setting("ENABLE_COMPLETE_BLOCK_DETECTION", True)
+        return self._extraction_setting("ENABLE_COMPLETE_BLOCK_DETECTION")
 
-    async def _is_language_patterns_enabled(self) -> bool:
+    def _is_language_patterns_enabled(self) -> bool:
         """Check if language-specific patterns are enabled."""
-        return await self._get_setting("ENABLE_LANGUAGE_SPECIFIC_PATTERNS", True)
+        return self._extraction_setting("ENABLE_LANGUAGE_SPECIFIC_PATTERNS")
 
-    async def _is_prose_filtering_enabled(self) -> bool:
+    def _is_prose_filtering_enabled(self) -> bool:
         """Check if prose filtering is enabled."""
-        return await self._get_setting("ENABLE_PROSE_FILTERING", True)
+        return self._extraction_setting("ENABLE_PROSE_FILTERING")
 
-    async def _get_max_prose_ratio(self) -> float:
+    def _get_max_prose_ratio(self) -> float:
         """Get maximum allowed prose ratio."""
-        return await self._get_setting("MAX_PROSE_RATIO", 0.15)
+        return self._extraction_setting("MAX_PROSE_RATIO")
 
-    async def _get_min_code_indicators(self) -> int:
+    def _get_min_code_indicators(self) -> int:
         """Get minimum required code indicators."""
-        return await self._get_setting("MIN_CODE_INDICATORS", 3)
+        return self._extraction_setting("MIN_CODE_INDICATORS")
 
-    async def _is_diagram_filtering_enabled(self) -> bool:
+    def _is_diagram_filtering_enabled(self) -> bool:
         """Check if diagram filtering is enabled."""
-        return await self._get_setting("ENABLE_DIAGRAM_FILTERING", True)
+        return self._extraction_setting("ENABLE_DIAGRAM_FILTERING")
 
-    async def _is_contextual_length_enabled(self) -> bool:
+    def _is_contextual_length_enabled(self) -> bool:
         """Check if contextual length adjustment is enabled."""
-        return await self._get_setting("ENABLE_CONTEXTUAL_LENGTH", True)
+        return self._extraction_setting("ENABLE_CONTEXTUAL_LENGTH")
 
-    async def _get_context_window_size(self) -> int:
+    def _get_context_window_size(self) -> int:
         """Get context window size for code blocks."""
-        return await self._get_setting("CONTEXT_WINDOW_SIZE", 1000)
+        return self._extraction_setting("CONTEXT_WINDOW_SIZE")
 
     async def _is_code_summaries_enabled(self) -> bool:
         """Check if code summaries generation is enabled."""
@@ -139,6 +374,7 @@ class CodeExtractionService:
         progress_callback: Callable | None = None,
         start_progress: int = 0,
         end_progress: int = 100,
+        code_index: CodeBlockIndex | None = None,
     ) -> int:
         """
         Extract code examples from crawled documents and store them.
@@ -149,6 +385,8 @@ class CodeExtractionService:
             progress_callback: Optional async callback for progress updates
             start_progress: Starting progress percentage (default: 0)
             end_progress: Ending progress percentage (default: 100)
+            code_index: Index of the code already extracted by this crawl, for crawls that
+                extract in several calls; blocks matching an earlier one are skipped
 
         Returns:
             Number of code examples stored
@@ -163,7 +401,7 @@ class CodeExtractionService:
 
         # Extract code blocks from all documents
         all_code_blocks = await self._extract_code_blocks_from_documents(
-            crawl_results, progress_callback, start_progress, extract_end
+            crawl_results, progress_callback, start_progress, extract_end, code_index
         )
 
         if not all_code_blocks:
@@ -204,322 +442,141 @@ class CodeExtractionService:
         progress_callback: Callable | None = None,
         start_progress: int = 0,
         end_progress: int = 100,
+        code_index: CodeBlockIndex | None = None,
     ) -> list[dict[str, Any]]:
         """
         Extract code blocks from all documents.
 
+        Documents are extracted in the code extraction worker processes and come
+        back as they finish. A block repeated across documents is kept once, from
+        the first document it appears in.
+
         Returns:
             List of code blocks with metadata
         """
-        # Progress will be reported during the loop below
+        if code_index is None:
+            code_index = CodeBlockIndex()
+        settings = await self.load_extraction_settings()
+        pool = self.extraction_pool or await get_code_extraction_pool()
 
-        all_code_blocks = []
+        extracted: dict[int, list[dict[str, Any]]] = {}
         total_docs = len(crawl_results)
         completed_docs = 0
+        reported_progress = None
+        async for index, code_blocks in pool.extract(crawl_results, settings):
+            extracted[index] = code_blocks
+            completed_docs += 1
+            if not progress_callback:
+                continue
+            # Calculate progress within the specified range; report only when it moves
+            mapped_progress = start_progress + int(completed_docs / total_docs * (end_progress - start_progress))
+            if mapped_progress != reported_progress or completed_docs == total_docs:
+                reported_progress = mapped_progress
+                await progress_callback({
+                    "status": "code_extraction",
+                    "percentage": mapped_progress,
+                    "log": f"Extracted code from {completed_docs}/{total_docs} documents",
+                    "completed_documents": completed_docs,
+                    "total_documents": total_docs,
+                })
 
-        for doc in crawl_results:
-            try:
-                source_url = doc["url"]
-                html_content = doc.get("html", "")
-                md = doc.get("markdown", "")
-
-                # Debug logging
-                safe_logfire_info(
-                    f"Document content check | url={source_url} | has_html={bool(html_content)} | has_markdown={bool(md)} | html_len={len(html_content) if html_content else 0} | md_len={len(md) if md else 0}"
-                )
-
-                # Get dynamic minimum length based on document context
-                # Extract some context from the document for analysis
-                doc_context = md[:1000] if md else html_content[:1000] if html_content else ""
-
-                # Check markdown first to see if it has code blocks
-                if md:
-                    has_backticks = "```" in md
-                    backtick_count = md.count("```")
-                    safe_logfire_info(
-                        f"Markdown check | url={source_url} | has_backticks={has_backticks} | backtick_count={backtick_count}"
-                    )
-
-                    if "getting-started" in source_url and md:
-                        # Log a sample of the markdown
-                        sample = md[:500]
-                        safe_logfire_info(f"Markdown sample for getting-started: {sample}...")
-
-                # Improved extraction logic - check for text files first, then HTML, then markdown
-                code_blocks = []
-
-                # Check if this is a text file (e.g., .txt, .md)
-                is_text_file = source_url.endswith((
-                    ".txt",
-                    ".text",
-                    ".md",
-                )) or "text/plain" in doc.get("content_type", "")
-
-                if is_text_file:
-                    # For text files, use specialized text extraction
-                    safe_logfire_info(f"🎯 TEXT FILE DETECTED | url={source_url}")
-                    safe_logfire_info(
-                        f"📊 Content types - has_html={bool(html_content)}, has_md={bool(md)}"
-                    )
-                    # For text files, the HTML content should be the raw text (not wrapped in <pre>)
-                    text_content = html_content if html_content else md
-                    if text_content:
-                        safe_logfire_info(
-                            f"📝 Using {'HTML' if html_content else 'MARKDOWN'} content for text extraction"
-                        )
-                        safe_logfire_info(
-                            f"🔍 Content preview (first 500 chars): {repr(text_content[:500])}..."
-                        )
-                        code_blocks = await self._extract_text_file_code_blocks(
-                            text_content, source_url
-                        )
-                        safe_logfire_info(
-                            f"📦 Text extraction complete | found={len(code_blocks)} blocks | url={source_url}"
-                        )
-                    else:
-                        safe_logfire_info(f"⚠️ NO CONTENT for text file | url={source_url}")
-
-                # If not a text file or no code blocks found, try HTML extraction first
-                if len(code_blocks) == 0 and html_content and not is_text_file:
-                    safe_logfire_info(
-                        f"Trying HTML extraction first | url={source_url} | html_length={len(html_content)}"
-                    )
-                    html_code_blocks = await self._extract_html_code_blocks(html_content)
-                    if html_code_blocks:
-                        code_blocks = html_code_blocks
-                        safe_logfire_info(
-                            f"Found {len(code_blocks)} code blocks from HTML | url={source_url}"
-                        )
+        # Documents finish in any order; keep the crawl order so the first copy of a block wins
+        all_code_blocks = []
+        repeated_blocks = 0
+        for index in sorted(extracted):
+            source_url = crawl_results[index]["url"]
+            # Always extract source_id from URL
+            parsed_url = urlparse(source_url)
+            source_id = parsed_url.netloc or parsed_url.path
+
+            for block in extracted[index]:
+                _, first = code_index.assign(block["code"])
+                if not first:
+                    # Already extracted from an earlier document
+                    repeated_blocks += 1
+                    continue
+                all_code_blocks.append({
+                    "block": block,
+                    "source_url": source_url,
+                    "source_id": source_id,
+                })
 
-                # If still no code blocks, try markdown extraction as fallback
-                if len(code_blocks) == 0 and md and "```" in md:
-                    safe_logfire_info(
-                        f"No code blocks from HTML, trying markdown extraction | url={source_url}"
-                    )
-                    from ..storage.code_storage_service import extract_code_blocks
+        if repeated_blocks:
+            safe_logfire_info(
+                f"Skipped {repeated_blocks} code blocks repeated across documents | kept={len(all_code_blocks)}"
+            )
+        return all_code_blocks
 
-                    # Use dynamic minimum for markdown extraction
-                    base_min_length = 250  # Default for markdown
-                    code_blocks = extract_code_blocks(md, min_length=base_min_length)
-                    safe_logfire_info(
-                        f"Found {len(code_blocks)} code blocks from markdown | url={source_url}"
-                    )
+    def _extract_document_code_blocks(self, doc: dict[str, str]) -> list[dict[str, Any]]:
+        """
+        Extract the code blocks of one document: text files first, then HTML, then markdown.
 
-                if code_blocks:
-                    # Always extract source_id from URL
-                    parsed_url = urlparse(source_url)
-                    source_id = parsed_url.netloc or parsed_url.path
+        Only reads its argument and the loaded settings, so it runs in a worker process.
 
-                    for block in code_blocks:
-                        all_code_blocks.append({
-                            "block": block,
-                            "source_url": source_url,
-                            "source_id": source_id,
-                        })
+        Args:
+            doc: The document's url, markdown, html (as a string) and content_type
 
-                # Update progress only after completing document extraction
-                completed_docs += 1
-                if progress_callback and total_docs > 0:
-                    # Calculate progress within the specified range
-                    raw_progress = completed_docs / total_docs
-                    mapped_progress = start_progress + int(
-                        raw_progress * (end_progress - start_progress)
-                    )
-                    await progress_callback({
-                        "status": "code_extraction",
-                        "percentage": mapped_progress,
-                        "log": f"Extracted code from {completed_docs}/{total_docs} documents",
-                        "completed_documents": completed_docs,
-                        "total_documents": total_docs,
-                    })
+        Returns:
+            List of code blocks with metadata
+        """
+        source_url = doc["url"]
+        html_content = doc.get("html", "")
+        md = doc.get("markdown", "")
+        code_blocks = []
 
-            except Exception as e:
-                safe_logfire_error(
-                    f"Error processing code from document | url={doc.get('url')} | error={str(e)}"
-                )
+        # Check if this is a text file (e.g., .txt, .md)
+        is_text_file = source_url.endswith((
+            ".txt",
+            ".text",
+            ".md",
+        )) or "text/plain" in doc.get("content_type", "")
+
+        if is_text_file:
+            # For text files, the HTML content should be the raw text (not wrapped in <pre>)
+            text_content = html_content if html_content else md
+            if text_content:
+                code_blocks = self._extract_text_file_code_blocks(text_content, source_url)
+
+        # If not a text file or no code blocks found, try HTML extraction first
+        if not code_blocks and html_content and not is_text_file:
+            code_blocks = self._extract_html_code_blocks(html_content)
+
+        # If still no code blocks, try markdown extraction as fallback
+        if not code_blocks and md and "```" in md:
+            from ..storage.code_storage_service import extract_code_blocks
+
+            # Settings as the credential cache holds them, which a worker process does not have
+            settings = {
+                key: str(self._extraction_setting(key)).lower()
+                if isinstance(default, bool)
+                else str(self._extraction_setting(key))
+                for key, default in self.EXTRACTION_SETTINGS.items()
+            }
+            code_blocks = extract_code_blocks(md, min_length=250, settings=settings)
 
-        return all_code_blocks
+        return code_blocks
 
-    async def _extract_html_code_blocks(self, content: str) -> list[dict[str, Any]]:
+    def _extract_html_code_blocks(self, content: str) -> list[dict[str, Any]]:
         """
         Extract code blocks from HTML patterns in content.
         This is a fallback when markdown conversion didn't preserve code blocks.
 
         Args:
             content: The content to search for HTML code patterns
-            min_length: Minimum length for code blocks
 
         Returns:
             List of code blocks with metadata
         """
-        import re
-
-        # Add detailed logging
-        safe_logfire_info(f"Processing HTML of length {len(content)} for code extraction")
-
-        # Check if we have actual content
-        if len(content) < 1000:
-            safe_logfire_info(
-                f"Warning: HTML content seems too short, first 500 chars: {repr(content[:500])}"
-            )
-
-        # Look for specific indicators of code blocks
-        has_prism = "prism" in content.lower()
-        has_highlight = "highlight" in content.lower()
-        has_shiki = "shiki" in content.lower()
-        has_codemirror = "codemirror" in content.lower() or "cm-" in content
-        safe_logfire_info(
-            f"Code library indicators | prism={has_prism} | highlight={has_highlight} | shiki={has_shiki} | codemirror={has_codemirror}"
-        )
-
-        # Check for any pre tags with different attributes
-        pre_matches = re.findall(r"<pre[^>]*>", content[:5000], re.IGNORECASE)
-        if pre_matches:
-            safe_logfire_info(f"Found {len(pre_matches)} <pre> tags in first 5000 chars")
-            for i, pre_tag in enumerate(pre_matches[:3]):  # Show first 3
-                safe_logfire_info(f"Pre tag {i + 1}: {pre_tag}")
-
         code_blocks = []
         extracted_positions = set()  # Track already extracted code block positions
+        content_lower = content.lower()
 
-        # Comprehensive patterns for various code block formats
-        # Order matters - more specific patterns first
-        patterns = [
-            # GitHub/GitLab patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*(?:language-)?(\w+)[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "github-highlight",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*snippet-clipboard-content[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "github-snippet",
-            ),
-            # Docusaurus patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*codeBlockContainer[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</pre>',
-                "docusaurus",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*["\'][^>]*>(.*?)</pre>',
-                "docusaurus-alt",
-            ),
-            # Milkdown specific patterns - check their actual HTML structure
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "milkdown-typed",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*code-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "milkdown-wrapper",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*code-block-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-wrapper-code",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*milkdown-code-block[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-code-block",
-            ),
-            (
-                r'<pre[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown",
-            ),
-            (r"<div[^>]*data-code-block[^>]*>.*?<pre[^>]*>(.*?)</pre>", "milkdown-alt"),
-            (
-                r'<div[^>]*class=["\'][^"\']*milkdown[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-div",
-            ),
-            # Monaco Editor - capture all view-lines content
-            (
-                r'<div[^>]*class=["\'][^"\']*monaco-editor[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*view-lines[^"\']*[^>]*>(.*?)</div>(?=.*?</div>.*?</div>)',
-                "monaco",
-            ),
-            # CodeMirror patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*cm-content[^"\']*["\'][^>]*>((?:<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>.*?</div>\s*)+)</div>',
-                "codemirror",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*CodeMirror[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*CodeMirror-code[^"\']*["\'][^>]*>(.*?)</div>',
-                "codemirror-legacy",
-            ),
-            # Prism.js with language - must be before generic pre
-            (
-                r'<pre[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
-                "prism",
-            ),
-            (
-                r'<pre[^>]*>\s*<code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code>\s*</pre>',
-                "prism-alt",
-            ),
-            # highlight.js - must be before generic pre/code
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*hljs(?:\s+language-(\w+))?[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "hljs",
-            ),
-            (
-                r'<pre[^>]*class=["\'][^"\']*hljs[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "hljs-pre",
-            ),
-            # Shiki patterns (VitePress, Astro, etc.)
-            (
-                r'<pre[^>]*class=["\'][^"\']*shiki[^"\']*["\'][^>]*(?:.*?style=["\'][^"\']*background-color[^"\']*["\'])?[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
-                "shiki",
-            ),
-            (r'<pre[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>(.*?)</pre>', "astro-shiki"),
-            (
-                r'<div[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "astro-wrapper",
-            ),
-            # VitePress/Vue patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "vitepress",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*vp-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "vitepress-vp",
-            ),
-            # Nextra patterns
-            (r"<div[^>]*data-nextra-code[^>]*>.*?<pre[^>]*>(.*?)</pre>", "nextra"),
-            (
-                r'<pre[^>]*class=["\'][^"\']*nx-[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "nextra-nx",
-            ),
-            # Standard pre/code patterns - should be near the end
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "standard-lang",
-            ),
-            (r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", "standard"),
-            # Generic patterns - should be last
-            (
-                r'<div[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "generic-div",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*codeblock[^"\']*["\'][^>]*>(.*?)</div>',
-                "generic-codeblock",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "highlight",
-            ),
-        ]
-
-        for pattern_tuple in patterns:
-            pattern_str, source_type = pattern_tuple
-            matches = list(re.finditer(pattern_str, content, re.DOTALL | re.IGNORECASE))
-
-            # Log pattern matches for Milkdown patterns and CodeMirror
-            if matches and (
-                "milkdown" in source_type
-                or "codemirror" in source_type
-                or "milkdown" in content[:1000].lower()
-            ):
-                safe_logfire_info(f"Pattern {source_type} found {len(matches)} matches")
+        for pattern, source_type, literal in _HTML_CODE_PATTERNS:
+            # A pattern cannot match a page without its class name or attribute; skip the scan
+            if literal not in content_lower:
+                continue
 
-            for match in matches:
+            for match in pattern.finditer(content):
                 # Extract code content based on pattern type
                 if source_type in ["standard-lang", "prism", "vitepress", "hljs", "milkdown-typed"]:
                     # These patterns capture language in group 1, code in group 2
@@ -534,7 +591,7 @@ class CodeExtractionService:
                     code_content = match.group(1).strip()
                     # Try to extract language from the full match
                     full_match = match.group(0)
-                    lang_match = re.search(r'class=["\'].*?language-(\w+)', full_match)
+                    lang_match = _LANGUAGE_CLASS.search(full_match)
                     language = lang_match.group(1) if lang_match else ""
 
                 # Get the start position for complete block extraction
@@ -543,46 +600,42 @@ class CodeExtractionService:
                 # For CodeMirror, extract text from cm-lines
                 if source_type == "codemirror":
                     # Extract text from each cm-line div
-                    cm_lines = re.findall(
-                        r'<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>(.*?)</div>',
-                        code_content,
-                        re.DOTALL,
-                    )
+                    cm_lines = _CM_LINE.findall(code_content)
                     if cm_lines:
                         # Clean each line and join
                         cleaned_lines = []
                         for line in cm_lines:
                             # Remove span tags but keep content
-                            line = re.sub(r"<span[^>]*>", "", line)
-                            line = re.sub(r"</span>", "", line)
+                            line = _SPAN_OPEN.sub("", line)
+                            line = _SPAN_CLOSE.sub("", line)
                             # Remove other HTML tags
-                            line = re.sub(r"<[^>]+>", "", line)
+                            line = _ANY_TAG.sub("", line)
                             cleaned_lines.append(line)
                         code_content = "\n".join(cleaned_lines)
                     else:
                         # Fallback: just clean HTML
-                        code_content = re.sub(r"<span[^>]*>", "", code_content)
-                        code_content = re.sub(r"</span>", "", code_content)
-                        code_content = re.sub(r"<[^>]+>", "\n", code_content)
+                        code_content = _SPAN_OPEN.sub("", code_content)
+                        code_content = _SPAN_CLOSE.sub("", code_content)
+                        code_content = _ANY_TAG.sub("\n", code_content)
 
                 # For Monaco, extract text from nested divs
                 if source_type == "monaco":
                     # Extract actual code from Monaco's complex structure
-                    code_content = re.sub(r"<div[^>]*>", "\n", code_content)
-                    code_content = re.sub(r"</div>", "", code_content)
-                    code_content = re.sub(r"<span[^>]*>", "", code_content)
-                    code_content = re.sub(r"</span>", "", code_content)
+                    code_content = _DIV_OPEN.sub("\n", code_content)
+                    code_content = _DIV_CLOSE.sub("", code_content)
+                    code_content = _SPAN_OPEN.sub("", code_content)
+                    code_content = _SPAN_CLOSE.sub("", code_content)
 
                 # Calculate dynamic minimum length
                 context_for_length = content[max(0, code_start_pos - 500) : code_start_pos + 500]
-                min_length = await self._calculate_min_length(language, context_for_length)
+                min_length = self._code_classifier().min_length_for(language, context_for_length)
 
                 # Skip if initial content is too short
                 if len(code_content) < min_length:
                     # Try to find complete block if we have a language
                     if language and code_start_pos > 0:
                         # Look for complete code block
-                        complete_code, block_end_pos = await self._find_complete_code_block(
+                        complete_code, block_end_pos = self._find_complete_code_block(
                             content, code_start_pos, min_length, language
                         )
                         if len(complete_code) >= min_length:
@@ -621,12 +674,7 @@ class CodeExtractionService:
                     cleaned_code = self._clean_code_content(code_content, language)
 
                     # Validate code quality
-                    if await self._validate_code_quality(cleaned_code, language):
-                        # Log successful extraction
-                        safe_logfire_info(
-                            f"Extracted code block | source_type={source_type} | language={language} | min_length={min_length} | original_length={len(code_content)} | cleaned_length={len(cleaned_code)}"
-                        )
-
+                    if self._code_classifier().is_code(cleaned_code, language):
                         code_blocks.append({
                             "code": cleaned_code,
                             "language": language,
@@ -635,17 +683,10 @@ class CodeExtractionService:
                             "full_context": f"{context_before}\n\n{cleaned_code}\n\n{context_after}",
                             "source_type": source_type,  # Track which pattern matched
                         })
-                    else:
-                        safe_logfire_info(
-                            f"Code block failed validation | source_type={source_type} | language={language} | length={len(cleaned_code)}"
-                        )
 
         # Pattern 2: <code>...</code> (standalone)
         if not code_blocks:  # Only if we didn't find pre/code blocks
-            code_pattern = r"<code[^>]*>(.*?)</code>"
-            matches = re.finditer(code_pattern, content, re.DOTALL | re.IGNORECASE)
-
-            for match in matches:
+            for match in _STANDALONE_CODE.finditer(content):
                 code_content = match.group(1).strip()
                 # Clean the code content
                 cleaned_code = self._clean_code_content(code_content, "")
@@ -653,7 +694,7 @@ class CodeExtractionService:
                 # Check if it's multiline or substantial enough and validate quality
                 # Use a minimal length for standalone code tags
                 if len(cleaned_code) >= 100 and ("\n" in cleaned_code or len(cleaned_code) > 100):
-                    if await self._validate_code_quality(cleaned_code, ""):
+                    if self._code_classifier().is_code(cleaned_code, ""):
                         start_pos = match.start()
                         end_pos = match.end()
                         context_before = content[max(0, start_pos - 1000) : start_pos].strip()
@@ -666,14 +707,10 @@ class CodeExtractionService:
                             "context_after": context_after,
                             "full_context": f"{context_before}\n\n{cleaned_code}\n\n{context_after}",
                         })
-                    else:
-                        safe_logfire_info(
-                            f"Standalone code block failed validation | length={len(cleaned_code)}"
-                        )
 
         return code_blocks
 
-    async def _extract_text_file_code_blocks(
+    def _extract_text_file_code_blocks(
         self, content: str, url: str, min_length: int | None = None
     ) -> list[dict[str, Any]]:
         """
@@ -692,35 +729,14 @@ class CodeExtractionService:
         Returns:
             List of code blocks with metadata
         """
-        import re
-
-        safe_logfire_info(
-            f"🔍 TEXT FILE EXTRACTION START | url={url} | content_length={len(content)}"
-        )
-        safe_logfire_info(f"📄 First 1000 chars: {repr(content[:1000])}...")
-        safe_logfire_info(
-            f"📄 Sample showing backticks: {repr(content[5000:6000])}..."
-            if len(content) > 6000
-            else "Content too short for mid-sample"
-        )
-
         code_blocks = []
 
         # Method 1: Look for triple backtick code blocks (Markdown style)
         # Pattern allows for additional text after language (e.g., "typescript TypeScript")
-        backtick_pattern = r"```(\w*)[^\n]*\n(.*?)```"
-        matches = list(re.finditer(backtick_pattern, content, re.DOTALL | re.MULTILINE))
-        safe_logfire_info(f"📊 Backtick pattern matches: {len(matches)}")
-
-        for i, match in enumerate(matches):
+        for match in _TEXT_BACKTICK_BLOCK.finditer(content):
             language = match.group(1) or ""
             code_content = match.group(2).strip()
 
-            # Log match info without including the actual content that might break formatting
-            safe_logfire_info(
-                f"🔎 Match {i + 1}: language='{language}', raw_length={len(code_content)}"
-            )
-
             # Get position info first
             start_pos = match.start()
             end_pos = match.end()
@@ -728,7 +744,7 @@ class CodeExtractionService:
             # Calculate dynamic minimum length
             context_around = content[max(0, start_pos - 500) : min(len(content), end_pos + 500)]
             if min_length is None:
-                actual_min_length = await self._calculate_min_length(language, context_around)
+                actual_min_length = self._code_classifier().min_length_for(language, context_around)
             else:
                 actual_min_length = min_length
 
@@ -739,12 +755,8 @@ class CodeExtractionService:
 
                 # Clean and validate
                 cleaned_code = self._clean_code_content(code_content, language)
-                safe_logfire_info(f"🧹 After cleaning: length={len(cleaned_code)}")
 
-                if await self._validate_code_quality(cleaned_code, language):
-                    safe_logfire_info(
-                        f"✅ VALID backtick code block | language={language} | length={len(cleaned_code)}"
-                    )
+                if self._code_classifier().is_code(cleaned_code, language):
                     code_blocks.append({
                         "code": cleaned_code,
                         "language": language,
@@ -753,32 +765,18 @@ class CodeExtractionService:
                         "full_context": f"{context_before}\n\n{cleaned_code}\n\n{context_after}",
                         "source_type": "text_backticks",
                     })
-                else:
-                    safe_logfire_info(
-                        f"❌ INVALID code block failed validation | language={language}"
-                    )
-            else:
-                safe_logfire_info(
-                    f"❌ Code block too short: {len(code_content)} < {actual_min_length}"
-                )
 
         # Method 2: Look for language-labeled code blocks (e.g., "TypeScript:" or "Python example:")
-        language_pattern = r"(?:^|\n)((?:typescript|javascript|python|java|c\+\+|rust|go|ruby|php|swift|kotlin|scala|r|matlab|julia|dart|elixir|erlang|haskell|clojure|lua|perl|shell|bash|sql|html|css|xml|json|yaml|toml|ini|dockerfile|makefile|cmake|gradle|maven|npm|yarn|pip|cargo|gem|pod|composer|nuget|apt|yum|brew|choco|snap|flatpak|appimage|msi|exe|dmg|pkg|deb|rpm|tar|zip|7z|rar|gz|bz2|xz|zst|lz4|lzo|lzma|lzip|lzop|compress|uncompress|gzip|gunzip|bzip2|bunzip2|xz|unxz|zstd|unzstd|lz4|unlz4|lzo|unlzo|lzma|unlzma|lzip|lunzip|lzop|unlzop)\s*(?:code|example|snippet)?)[:\s]*\n((?:(?:^[ \t]+.*\n?)+)|(?:.*\n)+?)(?=\n(?:[A-Z][a-z]+\s*:|^\s*$|\n#|\n\*|\n-|\n\d+\.))"
-        matches = re.finditer(language_pattern, content, re.IGNORECASE | re.MULTILINE)
-
-        for match in matches:
+        for match in _TEXT_LANGUAGE_BLOCK.finditer(content):
             language_info = match.group(1).lower()
             # Extract just the language name
-            language = (
-                re.match(r"(\w+)", language_info).group(1)
-                if re.match(r"(\w+)", language_info)
-                else ""
-            )
+            language_match = _WORD.match(language_info)
+            language = language_match.group(1) if language_match else ""
             code_content = match.group(2).strip()
 
             # Calculate dynamic minimum length for language-labeled blocks
             if min_length is None:
-                actual_min_length_lang = await self._calculate_min_length(
+                actual_min_length_lang = self._code_classifier().min_length_for(
                     language, code_content[:500]
                 )
             else:
@@ -793,10 +791,7 @@ class CodeExtractionService:
 
                 # Clean and validate
                 cleaned_code = self._clean_code_content(code_content, language)
-                if await self._validate_code_quality(cleaned_code, language):
-                    safe_logfire_info(
-                        f"Found language-labeled code block | language={language} | length={len(cleaned_code)}"
-                    )
+                if self._code_classifier().is_code(cleaned_code, language):
                     code_blocks.append({
                         "code": cleaned_code,
                         "language": language,
@@ -830,7 +825,7 @@ class CodeExtractionService:
                     code_content = "\n".join(current_block)
 
                     # Try to detect language from content
-                    language = self._detect_language_from_content(code_content)
+                    language = detect_language(code_content)
 
                     # Get context
                     context_before_lines = lines[max(0, block_start_idx - 10) : block_start_idx]
@@ -840,10 +835,7 @@ class CodeExtractionService:
 
                     # Clean and validate
                     cleaned_code = self._clean_code_content(code_content, language)
-                    if await self._validate_code_quality(cleaned_code, language):
-                        safe_logfire_info(
-                            f"Found indented code block | language={language} | length={len(cleaned_code)}"
-                        )
+                    if self._code_classifier().is_code(cleaned_code, language):
                         code_blocks.append({
                             "code": cleaned_code,
                             "language": language,
@@ -865,68 +857,9 @@ class CodeExtractionService:
                         current_block = []
                         current_indent = None
 
-        safe_logfire_info(
-            f"📊 TEXT FILE EXTRACTION COMPLETE | total_blocks={len(code_blocks)} | url={url}"
-        )
-        for i, block in enumerate(code_blocks[:3]):  # Log first 3 blocks
-            safe_logfire_info(
-                f"📦 Block {i + 1} summary: language='{block.get('language', '')}', source_type='{block.get('source_type', '')}', length={len(block.get('code', ''))}"
-            )
         return code_blocks
 
-    def _detect_language_from_content(self, code: str) -> str:
-        """
-        Try to detect programming language from code content.
-        This is a simple heuristic approach.
-        """
-        import re
-
-        # Language detection patterns
-        patterns = {
-            "python": [
-                r"\bdef\s+\w+\s*\(",
-                r"\bclass\s+\w+",
-                r"\bimport\s+\w+",
-                r"\bfrom\s+\w+\s+import",
-            ],
-            "javascript": [
-                r"\bfunction\s+\w+\s*\(",
-                r"\bconst\s+\w+\s*=",
-                r"\blet\s+\w+\s*=",
-                r"\bvar\s+\w+\s*=",
-            ],
-            "typescript": [
-                r"\binterface\s+\w+",
-                r":\s*\w+\[\]",
-                r"\btype\s+\w+\s*=",
-                r"\bclass\s+\w+.*\{",
-            ],
-            "java": [
-                r"\bpublic\s+class\s+\w+",
-                r"\bprivate\s+\w+\s+\w+",
-                r"\bpublic\s+static\s+void\s+main",
-            ],
-            "rust": [r"\bfn\s+\w+\s*\(", r"\blet\s+mut\s+\w+", r"\bimpl\s+\w+", r"\bstruct\s+\w+"],
-            "go": [r"\bfunc\s+\w+\s*\(", r"\bpackage\s+\w+", r"\btype\s+\w+\s+struct"],
-        }
-
-        # Count matches for each language
-        scores = {}
-        for lang, lang_patterns in patterns.items():
-            score = 0
-            for pattern in lang_patterns:
-                if re.search(pattern, code, re.MULTILINE):
-                    score += 1
-            if score > 0:
-                scores[lang] = score
-
-        # Return language with highest score
-        if scores:
-            return max(scores, key=scores.get)
-
-        return ""
-
-    async def _find_complete_code_block(
+    def _find_complete_code_block(
         self,
         content: str,
         start_pos: int,
@@ -951,27 +884,13 @@ class CodeExtractionService:
             return content[start_pos:], len(content)
 
         # Look for natural code boundaries
-        boundary_patterns = [
-            r"\n}\s*$",  # Closing brace at end of line
-            r"\n}\s*;?\s*$",  # Closing brace with optional semicolon
-            r"\n\)\s*;?\s*$",  # Closing parenthesis
-            r"\n\s*$\n\s*$",  # Double newline (paragraph break)
-            r"\n(?=class\s)",  # Before next class
-            r"\n(?=function\s)",  # Before next function
-            r"\n(?=def\s)",  # Before next Python function
-            r"\n(?=export\s)",  # Before next export
-            r"\n(?=const\s)",  # Before next const declaration
-            r"\n(?=//)",  # Before comment block
-            r"\n(?=#)",  # Before Python comment
-            r"\n(?=\*)",  # Before JSDoc/comment
-            r"\n(?=```)",  # Before next code block
-        ]
+        boundary_patterns = _BOUNDARY_PATTERNS
 
         # Add language-specific patterns if available
         if language and language.lower() in self.LANGUAGE_PATTERNS:
             lang_patterns = self.LANGUAGE_PATTERNS[language.lower()]
             if "block_end" in lang_patterns:
-                boundary_patterns.insert(0, lang_patterns["block_end"])
+                boundary_patterns = [re.compile(lang_patterns["block_end"], re.MULTILINE), *boundary_patterns]
 
         # Extend until we find a boundary
         extended_pos = start_pos + min_length
@@ -981,7 +900,7 @@ class CodeExtractionService:
             lookahead = content[extended_pos:lookahead_end]
 
             for pattern in boundary_patterns:
-                match = re.search(pattern, lookahead, re.MULTILINE)
+                match = pattern.search(lookahead)
                 if match:
                     final_pos = extended_pos + match.end()
                     return content[start_pos:final_pos].rstrip(), final_pos
@@ -991,69 +910,15 @@ class CodeExtractionService:
 
             # Cap at maximum length
             if max_length is None:
-                max_length = await self._get_max_code_length()
+                max_length = self._get_max_code_length()
             if extended_pos - start_pos > max_length:
                 break
 
         # Return what we have
         return content[start_pos:extended_pos].rstrip(), extended_pos
 
-    async def _calculate_min_length(self, language: str, context: str) -> int:
-        """
-        Calculate appropriate minimum length based on language and context.
-
-        Args:
-            language: The detected programming language
-            context: Surrounding context of the code
-
-        Returns:
-            Calculated minimum length
-        """
-        # Base lengths by language
-        # Check if contextual length adjustment is enabled
-        if not await self._is_contextual_length_enabled():
-            # Return default minimum length
-            return await self._get_min_code_length()
-
-        # Base lengths by language
-        base_lengths = {
-            "json": 100,  # JSON can be short
-            "yaml": 100,  # YAML too
-            "xml": 100,  # XML structures
-            "html": 150,  # HTML snippets
-            "css": 150,  # CSS rules
-            "sql": 150,  # SQL queries
-            "python": 200,  # Python functions
-            "javascript": 250,  # JavaScript typically longer
-            "typescript": 250,  # TypeScript typically longer
-            "java": 300,  # Java even more verbose
-            "c++": 300,  # C++ similar to Java
-            "cpp": 300,  # C++ alternative
-            "c": 250,  # C slightly less verbose
-            "rust": 250,  # Rust medium verbosity
-            "go": 200,  # Go is concise
-        }
-
-        # Get default minimum from settings
-        default_min = await self._get_min_code_length()
-        min_length = base_lengths.get(language.lower(), default_min)
-
-        # Adjust based on context clues
-        context_lower = context.lower()
-        if any(word in context_lower for word in ["example", "snippet", "sample", "demo"]):
-            min_length = int(min_length * 0.7)  # Examples can be shorter
-        elif any(word in context_lower for word in ["implementation", "complete", "full"]):
-            min_length = int(min_length * 1.5)  # Full implementations should be longer
-        elif any(word in context_lower for word in ["minimal", "simple", "basic"]):
-            min_length = int(min_length * 0.8)  # Simple examples can be shorter
-
-        # Ensure reasonable bounds
-        return max(100, min(1000, min_length))
-
     def _decode_html_entities(self, text: str) -> str:
         """Decode common HTML entities and clean HTML tags from code."""
-        import re
-
         # First, handle span tags that wrap individual tokens
         # Check if spans are being used for syntax highlighting (no spaces between tags)
         if "</span><span" in text:
@@ -1115,8 +980,6 @@ class CodeExtractionService:
         Returns:
             Cleaned code content
         """
-        import re
-
         # First apply HTML entity decoding and tag cleaning
         code = self._decode_html_entities(code)
 
@@ -1179,162 +1042,6 @@ class CodeExtractionService:
 
         return "\n".join(cleaned_lines).strip()
 
-    async def _validate_code_quality(self, code: str, language: str = "") -> bool:
-        """
-        Enhanced validation to ensure extracted content is actual code.
-
-        Args:
-            code: The code content to validate
-            language: The detected language (optional)
-
-        Returns:
-            True if code passes quality checks, False otherwise
-        """
-        import re
-
-        # Basic checks
-        if not code or len(code.strip()) < 20:
-            return False
-
-        # Skip diagram languages if filtering is enabled
-        if await self._is_diagram_filtering_enabled():
-            if language.lower() in ["mermaid", "plantuml", "graphviz", "dot", "diagram"]:
-                safe_logfire_info(f"Skipping diagram language: {language}")
-                return False
-
-        # Check for common formatting issues that indicate poor extraction
-        bad_patterns = [
-            # Concatenated keywords without spaces (but allow camelCase)
-            r"\b(from|import|def|class|if|for|while|return)(?=[a-z])",
-            # HTML entities that weren't decoded
-            r"&[lg]t;|&amp;|&quot;|&#\d+;",
-            # Excessive HTML tags
-            r"<[^>]{50,}>",  # Very long HTML tags
-            # Multiple spans in a row (indicates poor extraction)
-            r"(<span[^>]*>){5,}",
-            # Suspicious character sequences
-            r"[^\s]{200,}",  # Very long unbroken strings (increased threshold)
-        ]
-
-        for pattern in bad_patterns:
-            if re.search(pattern, code):
-                safe_logfire_info(f"Code failed quality check: pattern '{pattern}' found")
-                return False
-
-        # Check for minimum code complexity using various indicators
-        code_indicators = {
-            "function_calls": r"\w+\s*\([^)]*\)",
-            "assignments": r"\w+\s*=\s*.+",
-            "control_flow": r"\b(if|for|while|switch|case|try|catch|except)\b",
-            "declarations": r"\b(var|let|const|def|class|function|interface|type|struct|enum)\b",
-            "imports": r"\b(import|from|require|include|using|use)\b",
-            "brackets": r"[\{\}\[\]]",
-            "operators": r"[\+\-\*\/\%\&\|\^<>=!]",
-            "method_chains": r"\.\w+",
-            "arrows": r"(=>|->)",
-            "keywords": r"\b(return|break|continue|yield|await|async)\b",
-        }
-
-        indicator_count = 0
-        indicator_details = []
-        for name, pattern in code_indicators.items():
-            if re.search(pattern, code):
-                indicator_count += 1
-                indicator_details.append(name)
-
-        # Require minimum code indicators
-        min_indicators = await self._get_min_code_indicators()
-        if indicator_count < min_indicators:
-            safe_logfire_info(
-                f"Code has insufficient indicators: {indicator_count} found ({', '.join(indicator_details)})"
-            )
-            return False
-
-        # Check code-to-comment ratio
-        lines = code.split("\n")
-        non_empty_lines = [line for line in lines if line.strip()]
-
-        if not non_empty_lines:
-            return False
-
-        # Count comment lines (various comment styles)
-        comment_patterns = [
-            r"^\s*(//|#|/\*|\*|<!--)",  # Single line comments
-            r'^\s*"""',  # Python docstrings
-            r"^\s*'''",  # Python docstrings alt
-            r"^\s*\*\s",  # JSDoc style
-        ]
-
-        comment_lines = 0
-        for line in lines:
-            for pattern in comment_patterns:
-                if re.match(pattern, line.strip()):
-                    comment_lines += 1
-                    break
-
-        # Allow up to 70% comments (documentation is important)
-        if non_empty_lines and comment_lines / len(non_empty_lines) > 0.7:
-            safe_logfire_info(
-                f"Code is mostly comments: {comment_lines}/{len(non_empty_lines)} lines"
-            )
-            return False
-
-        # Language-specific validation
-        if language.lower() in self.LANGUAGE_PATTERNS:
-            lang_info = self.LANGUAGE_PATTERNS[language.lower()]
-            min_indicators = lang_info.get("min_indicators", [])
-
-            # Check for language-specific indicators
-            found_lang_indicators = sum(
-                1 for indicator in min_indicators if indicator in code.lower()
-            )
-
-            if found_lang_indicators < 2:  # Need at least 2 language-specific indicators
-                safe_logfire_info(
-                    f"Code lacks {language} indicators: only {found_lang_indicators} found"
-                )
-                return False
-
-        # Check for reasonable structure
-        # Too few meaningful lines
-        if len(non_empty_lines) < 3:
-            safe_logfire_info(f"Code has too few non-empty lines: {len(non_empty_lines)}")
-            return False
-
-        # Check for reasonable line lengths
-        very_long_lines = sum(1 for line in lines if len(line) > 300)
-        if len(lines) > 0 and very_long_lines > len(lines) * 0.5:
-            safe_logfire_info("Code has too many very long lines")
-            return False
-
-        # Check if it's mostly prose/documentation
-        prose_indicators = [
-            r"\b(the|this|that|these|those|is|are|was|were|will|would|should|could|have|has|had)\b",
-            r"[.!?]\s+[A-Z]",  # Sentence endings followed by capital letter
-            r"\b(however|therefore|furthermore|moreover|nevertheless)\b",
-        ]
-
-        prose_score = 0
-        word_count = len(code.split())
-        for pattern in prose_indicators:
-            matches = len(re.findall(pattern, code, re.IGNORECASE))
-            prose_score += matches
-
-        # Check prose filtering
-        if await self._is_prose_filtering_enabled():
-            max_prose_ratio = await self._get_max_prose_ratio()
-            if word_count > 0 and prose_score / word_count > max_prose_ratio:
-                safe_logfire_info(
-                    f"Code appears to be prose: prose_score={prose_score}, word_count={word_count}"
-                )
-                return False
-
-        # Passed all checks
-        safe_logfire_info(
-            f"Code passed validation: indicators={indicator_count}, language={language}, lines={len(non_empty_lines)}"
-        )
-        return True
-
     async def _generate_code_summaries(
         self,
         all_code_blocks: list[dict[str, Any]],
@@ -0,0 +1,186 @@
+"""
+Crawl Checkpoints
+
+Periodically saves the frontier and visited set of a running crawl to the
+archon_crawl_checkpoints table, keyed by progress id. A crawl interrupted by a
+restart, crash or cancellation can be resumed from its last checkpoint without
+re-fetching pages that were already stored.
+
+Pages the streaming pipeline has accepted but not finished storing are saved as
+"in flight" and are put back on the frontier when the crawl resumes.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from ...config.logfire_config import safe_logfire_error, safe_logfire_info
+
+CHECKPOINTS_TABLE = "archon_crawl_checkpoints"
+
+CHECKPOINT_INTERVAL_SECONDS = 30.0
+
+# Crawls with a frontier worth saving; text files are a single fetch
+CHECKPOINTED_CRAWL_TYPES = ("webpage", "sitemap")
+
+# Statuses that can be resumed; completed crawls delete their checkpoint
+RESUMABLE_STATUSES = ("running", "cancelled", "failed")
+
+
+class CrawlCheckpoint:
+    """Durable frontier for one crawl"""
+
+    def __init__(
+        self,
+        supabase_client,
+        progress_id: str,
+        request: dict[str, Any],
+        source_id: str,
+        crawl_type: str,
+        in_flight: Callable[[], set[str]] | None = None,
+        stored_word_count: Callable[[], int] | None = None,
+        resume_from: dict[str, Any] | None = None,
+        interval: float = CHECKPOINT_INTERVAL_SECONDS,
+    ):
+        """
+        Initialize the checkpoint.
+
+        Args:
+            supabase_client: The Supabase client for database operations
+            progress_id: The crawl's progress id, used as the checkpoint key
+            request: The original crawl request, saved so the crawl can be restarted
+            source_id: The source being crawled
+            crawl_type: "webpage" or "sitemap"
+            in_flight: Returns URLs that were crawled but are not fully stored yet
+            stored_word_count: Returns the word count of fully stored pages
+            resume_from: A checkpoint row to resume from
+            interval: Minimum seconds between saves
+        """
+        self.supabase_client = supabase_client
+        self.progress_id = progress_id
+        self.request = request
+        self.source_id = source_id
+        self.crawl_type = crawl_type
+        self.in_flight = in_flight
+        self.stored_word_count = stored_word_count
+        self.interval = interval
+        self.resume_state = self._resume_state(resume_from) if resume_from else None
+        self._state: dict[str, Any] | None = self.resume_state
+        self._last_save = 0.0
+
+    @staticmethod
+    def _resume_state(row: dict[str, Any]) -> dict[str, Any]:
+        """Turn a saved row into strategy state, re-queueing pages that were not stored."""
+        state = dict(row.get("state") or {})
+        in_flight = list(row.get("in_flight") or [])
+        redo = set(in_flight)
+        state["visited"] = [url for url in state.get("visited", []) if url not in redo]
+        state["pending"] = list(dict.fromkeys(in_flight + list(state.get("pending", []))))
+        return state
+
+    @property
+    def initial_word_count(self) -> int:
+        if not self.resume_state:
+            return 0
+        return int(self.resume_state.get("stored_word_count") or 0)
+
+    async def save(
+        self, state: dict[str, Any] | Callable[[], dict[str, Any]], force: bool = False
+    ) -> bool:
+        """
+        Save the crawl frontier, at most once per interval unless forced.
+
+        Args:
+            state: Strategy state - depth, pending URLs, next level URLs and visited URLs -
+                or a callable that builds it, so large frontiers are only serialized
+                when a checkpoint is actually written
+
+        Returns:
+            True if the checkpoint was written
+        """
+        # Keep the latest state so a cancelled or failed crawl can write it on the way out
+        self._state = state
+        now = time.monotonic()
+        if not force and now - self._last_save < self.interval:
+            return False
+        self._last_save = now
+        return await self._write(state, "running")
+
+    async def finish(self, status: str) -> None:
+        """
+        Close the checkpoint when the crawl ends.
+
+        Completed crawls delete their checkpoint. Cancelled and failed crawls write their
+        latest state so they can be resumed.
+        """
+        if status != "completed":
+            if self._state is not None:
+                await self._write(self._state, status)
+            return
+        try:
+            await asyncio.to_thread(
+                lambda: self.supabase_client.table(CHECKPOINTS_TABLE)
+                .delete()
+                .eq("progress_id", self.progress_id)
+                .execute()
+            )
+        except Exception as e:
+            safe_logfire_error(f"Failed to delete crawl checkpoint | progress_id={self.progress_id} | error={e}")
+
+    async def _write(self, state: dict[str, Any] | Callable[[], dict[str, Any]], status: str) -> bool:
+        in_flight = sorted(self.in_flight()) if self.in_flight else []
+        state = dict(state() if callable(state) else state)
+        if self.stored_word_count:
+            state["stored_word_count"] = self.stored_word_count()
+
+        row = {
+            "progress_id": self.progress_id,
+            "source_id": self.source_id,
+            "url": self.request.get("url", ""),
+            "crawl_type": self.crawl_type,
+            "request": self.request,
+            "state": state,
+            "in_flight": in_flight,
+            "pages_visited": len(state.get("visited", [])),
+            "status": status,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            await asyncio.to_thread(
+                lambda: self.supabase_client.table(CHECKPOINTS_TABLE)
+                .upsert(row, on_conflict="progress_id")
+                .execute()
+            )
+            return True
+        except Exception as e:
+            # A missed checkpoint only costs re-crawling more pages on resume
+            safe_logfire_error(f"Failed to save crawl checkpoint | progress_id={self.progress_id} | error={e}")
+            return False
+
+
+async def load_crawl_checkpoint(supabase_client, progress_id: str) -> dict[str, Any] | None:
+    """Load a resumable checkpoint by progress id."""
+    response = await asyncio.to_thread(
+        lambda: supabase_client.table(CHECKPOINTS_TABLE)
+        .select("*")
+        .eq("progress_id", progress_id)
+        .in_("status", list(RESUMABLE_STATUSES))
+        .execute()
+    )
+    rows = response.data or []
+    return rows[0] if rows else None
+
+
+async def list_crawl_checkpoints(supabase_client) -> list[dict[str, Any]]:
+    """List resumable crawls, most recently updated first, without their frontier state."""
+    response = await asyncio.to_thread(
+        lambda: supabase_client.table(CHECKPOINTS_TABLE)
+        .select("progress_id, source_id, url, crawl_type, pages_visited, status, created_at, updated_at")
+        .in_("status", list(RESUMABLE_STATUSES))
+        .order("updated_at", desc=True)
+        .execute()
+    )
+    safe_logfire_info(f"Loaded {len(response.data or [])} resumable crawl checkpoints")
+    return response.data or []
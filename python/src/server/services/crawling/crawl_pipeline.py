@@ -0,0 +1,656 @@
+"""
+Streaming Crawl Pipeline
+
+Processes crawled pages while the crawl is still running. Pages flow through
+bounded queues into chunking, embedding and storage stages that run
+concurrently, so content becomes searchable before the crawl finishes and
+memory stays flat regardless of how many pages are crawled. A full queue
+blocks the stage feeding it, which in turn slows the crawler down.
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from ...config.logfire_config import safe_logfire_error, safe_logfire_info
+from ..credential_service import credential_service
+from ..storage.code_dedup import CodeBlockIndex
+from ..storage.document_storage_service import (
+    delete_documents_for_urls,
+    embed_document_batch,
+    insert_document_batch,
+)
+from ..storage.near_duplicates import SimHashIndex, chunk_key, create_simhash_index, link_chunk
+
+# Sentinel that tells a stage worker its input is exhausted
+_STOP = object()
+
+DEFAULT_QUEUE_SIZE = 50
+DEFAULT_EMBED_WORKERS = 2
+DEFAULT_STORE_WORKERS = 2
+DEFAULT_CHUNK_BATCH_SIZE = 25
+
+# Pages handed to code extraction at a time
+CODE_EXTRACTION_GROUP_SIZE = 20
+
+# Embeddings of canonical chunks kept for their near-duplicates
+CANONICAL_EMBEDDING_CACHE_SIZE = 1000
+
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# How often a blocked producer re-checks whether a downstream stage has failed
+PUT_POLL_SECONDS = 1.0
+
+
+async def is_streaming_pipeline_enabled() -> bool:
+    """Whether crawls should stream pages through the pipeline instead of storing after the crawl."""
+    try:
+        value = await credential_service.get_credential("CRAWL_STREAMING_PIPELINE", "true")
+        return str(value).lower() in ("true", "1", "yes", "on")
+    except Exception:
+        return True
+
+
+class StreamingCrawlPipeline:
+    """
+    Chunk, embed and store crawled pages concurrently with the crawl.
+
+    Usage:
+        pipeline = StreamingCrawlPipeline(storage_ops, request, crawl_type, source_id)
+        await pipeline.start()
+        await pipeline.submit_page(page)  # for every crawled page
+        results = await pipeline.finish()
+    """
+
+    def __init__(
+        self,
+        storage_ops,
+        request: dict[str, Any],
+        crawl_type: str,
+        source_id: str,
+        progress_callback: Callable | None = None,
+        cancellation_check: Callable | None = None,
+        extract_code_examples: bool = True,
+        page_versions=None,
+        initial_word_count: int = 0,
+        boilerplate=None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            storage_ops: DocumentStorageOperations used for chunking, source records and code extraction
+            request: The original crawl request
+            crawl_type: Type of crawl being performed
+            source_id: The source ID for all documents
+            progress_callback: Optional async callback receiving a dict of stage counters
+            cancellation_check: Optional function that raises when the crawl is cancelled
+            extract_code_examples: Whether to extract code examples from each page
+            page_versions: Optional PageVersionTracker. Pages are recorded in it, and on an
+                incremental refresh unchanged pages are skipped and unchanged chunks of
+                changed pages keep their stored embeddings.
+            initial_word_count: Words already stored by an earlier run of a resumed crawl
+            boilerplate: Optional BoilerplateDetector. Every page is observed, and blocks it
+                finds repeated across the site are stripped before chunking.
+        """
+        self.storage_ops = storage_ops
+        self.request = request
+        self.crawl_type = crawl_type
+        self.source_id = source_id
+        self.progress_callback = progress_callback
+        self.cancellation_check = cancellation_check
+        self.extract_code_examples = extract_code_examples
+        self.page_versions = page_versions
+        self.boilerplate = boilerplate
+
+        self.pages_received = 0
+        self.pages_chunked = 0
+        self.chunks_created = 0
+        self.chunks_embedded = 0
+        self.chunks_stored = 0
+        self.chunks_reused = 0
+        self.chunks_deduplicated = 0
+        self.code_examples_count = 0
+        self.total_word_count = initial_word_count
+        self.stored_word_count = initial_word_count
+
+        self._tasks: list[asyncio.Task] = []
+        self._error: BaseException | None = None
+        self._source_created = False
+        self._deleted_urls: set[str] = set()
+        # Outstanding work per URL - chunks not yet stored plus pending code extraction
+        self._unstored: dict[str, int] = {}
+        self._page_words: dict[str, int] = {}
+        self._delete_lock = asyncio.Lock()
+        self._embed_workers_running = 0
+        self._last_progress = 0.0
+        self._started = False
+        # Near-duplicate chunks of this crawl, see storage/near_duplicates.py
+        self._near_duplicates: SimHashIndex | None = None
+        self._canonical_embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        # Near-duplicates waiting for their canonical chunk to be embedded, by canonical key
+        self._followers: dict[str, list[tuple]] = {}
+        # Code blocks extracted so far, so a snippet repeated across pages is stored once
+        self._code_index = CodeBlockIndex()
+
+    async def _load_settings(self) -> None:
+        try:
+            settings = await credential_service.get_credentials_by_category("rag_strategy")
+        except Exception as e:
+            safe_logfire_error(f"Failed to load pipeline settings: {e}, using defaults")
+            settings = {}
+
+        def _int(key: str, default: int) -> int:
+            try:
+                return max(1, int(settings.get(key, default)))
+            except (TypeError, ValueError):
+                return default
+
+        self.queue_size = _int("CRAWL_PIPELINE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+        self.embed_workers = _int("CRAWL_PIPELINE_EMBED_WORKERS", DEFAULT_EMBED_WORKERS)
+        self.store_workers = _int("CRAWL_PIPELINE_STORE_WORKERS", DEFAULT_STORE_WORKERS)
+        self.batch_size = _int("CRAWL_PIPELINE_BATCH_SIZE", DEFAULT_CHUNK_BATCH_SIZE)
+        self.delete_batch_size = _int("DELETE_BATCH_SIZE", 50)
+        self.contextual_batch_size = _int("CONTEXTUAL_EMBEDDING_BATCH_SIZE", 50)
+
+        use_contextual = settings.get(
+            "USE_CONTEXTUAL_EMBEDDINGS", os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false")
+        )
+        self.use_contextual_embeddings = str(use_contextual).lower() == "true"
+
+    async def start(self) -> None:
+        """Load settings and start the stage workers."""
+        if self._started:
+            return
+        self._started = True
+        await self._load_settings()
+        self._near_duplicates = await create_simhash_index()
+
+        self._page_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.embed_workers * 2)
+        self._store_queue: asyncio.Queue = asyncio.Queue(maxsize=self.store_workers * 2)
+        self._code_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        self._embed_workers_running = self.embed_workers
+        self._spawn(self._chunk_worker())
+        for _ in range(self.embed_workers):
+            self._spawn(self._embed_worker())
+        for _ in range(self.store_workers):
+            self._spawn(self._store_worker())
+        if self.extract_code_examples:
+            self._spawn(self._code_worker())
+
+        safe_logfire_info(
+            f"Streaming crawl pipeline started | source_id={self.source_id} | queue_size={self.queue_size} | "
+            f"embed_workers={self.embed_workers} | store_workers={self.store_workers}"
+        )
+
+    async def submit_page(self, page: dict[str, Any]) -> None:
+        """
+        Hand a crawled page to the pipeline.
+
+        Blocks while the pipeline is saturated. Raises the error of a failed stage.
+        """
+        if not self._started:
+            await self.start()
+        self.pages_received += 1
+        self._acquire(page.get("url", ""))
+        await self._put(self._page_queue, page)
+        await self._report_progress()
+
+    async def finish(self) -> dict[str, Any]:
+        """
+        Drain all stages and return storage statistics.
+
+        Returns:
+            Dict with chunk_count, total_word_count, source_id, pages_processed
+            and code_examples_count
+        """
+        if not self._started:
+            await self.start()
+        await self._put(self._page_queue, _STOP)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._raise_if_failed()
+
+        if self._source_created:
+            # The source was created from the first page; record the final word count
+            await self._update_source_word_count()
+
+        await self._report_progress(force=True)
+        safe_logfire_info(
+            f"Streaming crawl pipeline finished | source_id={self.source_id} | pages={self.pages_chunked} | "
+            f"chunks={self.chunks_stored}/{self.chunks_created} | code_examples={self.code_examples_count}"
+        )
+
+        return {
+            "chunk_count": self.chunks_created,
+            "total_word_count": self.total_word_count,
+            "source_id": self.source_id,
+            "pages_processed": self.pages_chunked,
+            "code_examples_count": self.code_examples_count,
+        }
+
+    def pending_urls(self) -> set[str]:
+        """URLs handed to the pipeline whose chunks or code examples are not stored yet."""
+        return set(self._unstored)
+
+    async def abort(self) -> None:
+        """Stop all stage workers without draining."""
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Per-stage counters and queue depths."""
+        stats = {
+            "pages_crawled": self.pages_received,
+            "pages_chunked": self.pages_chunked,
+            "chunks_created": self.chunks_created,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_stored": self.chunks_stored,
+            "chunks_reused": self.chunks_reused,
+            "chunks_deduplicated": self.chunks_deduplicated,
+            "code_examples_found": self.code_examples_count,
+        }
+        if self.page_versions:
+            stats.update(self.page_versions.get_stats())
+        if self.boilerplate:
+            stats["boilerplate_chars_removed"] = self.boilerplate.chars_removed
+        if self._started:
+            stats["queue_depths"] = {
+                "pages": self._page_queue.qsize(),
+                "embedding": self._embed_queue.qsize(),
+                "storage": self._store_queue.qsize(),
+                "code": self._code_queue.qsize(),
+            }
+        return stats
+
+    # Internal helpers
+
+    def _spawn(self, coro) -> None:
+        self._tasks.append(asyncio.get_running_loop().create_task(self._run_stage(coro)))
+
+    async def _run_stage(self, coro) -> None:
+        try:
+            await coro
+        except asyncio.CancelledError as e:
+            # Raised by the cancellation check or by abort(); either way stop every stage
+            self._fail(e)
+            raise
+        except Exception as e:
+            safe_logfire_error(f"Streaming crawl pipeline stage failed | error={e}")
+            self._fail(e)
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current and not task.done():
+                task.cancel()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def _put(self, queue: asyncio.Queue, item: Any) -> None:
+        """Put with backpressure, without deadlocking when the consumer has failed."""
+        while True:
+            self._raise_if_failed()
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=PUT_POLL_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    def _acquire(self, url: str, count: int = 1) -> None:
+        self._unstored[url] = self._unstored.get(url, 0) + count
+
+    def _release(self, url: str, count: int = 1) -> None:
+        remaining = self._unstored.get(url, 0) - count
+        if remaining > 0:
+            self._unstored[url] = remaining
+            return
+        self._unstored.pop(url, None)
+        self.stored_word_count += self._page_words.pop(url, 0)
+
+    def _check_cancellation(self) -> None:
+        if self.cancellation_check:
+            self.cancellation_check()
+
+    async def _report_progress(self, force: bool = False) -> None:
+        if not self.progress_callback:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_progress = now
+        try:
+            await self.progress_callback(self.get_stats())
+        except Exception as e:
+            safe_logfire_error(f"Pipeline progress callback failed: {e}")
+
+    async def _update_source_word_count(self) -> None:
+        client = self.storage_ops.supabase_client
+        try:
+            await asyncio.to_thread(
+                lambda: client.table("archon_sources")
+                .update({"total_word_count": self.total_word_count})
+                .eq("source_id", self.source_id)
+                .execute()
+            )
+        except Exception as e:
+            safe_logfire_error(f"Failed to update word count for source '{self.source_id}': {e}")
+
+    # Stage workers
+
+    async def _chunk_worker(self) -> None:
+        """Chunk pages, create the source record and group chunks into embedding batches."""
+        batch: dict[str, list] = self._new_batch()
+        code_group: list[dict[str, Any]] = []
+        preparer = await self.storage_ops.get_document_preparer()
+
+        async for page in self._queued_pages():
+            url = page.get("url", "")
+            markdown = page.get("markdown", "")
+            if not markdown:
+                # Crawled without content: the page still exists, so it is not tombstoned
+                if self.page_versions:
+                    self.page_versions.mark_reached([url])
+                self._release(url)
+                continue
+
+            reusable = {}
+            if self.page_versions:
+                state = self.page_versions.observe(page)
+                if self.page_versions.incremental:
+                    if state == "unchanged":
+                        self._release(url)
+                        continue
+                    if state == "changed":
+                        reusable = await self.page_versions.get_reusable_chunks(url)
+
+            # Versions are recorded from the page as crawled; only what is chunked loses the boilerplate
+            if self.boilerplate:
+                markdown = self.boilerplate.strip(markdown)
+
+            # Chunking, counting and hashing run in the preparation worker processes
+            prepared = await preparer.prepare_one(
+                {**page, "markdown": markdown}, self.source_id, self.request, self.crawl_type
+            )
+            chunks = prepared.chunks if prepared else []
+            metadatas = prepared.metadatas if prepared else []
+            if not chunks:
+                self._release(url)
+                continue
+
+            # Hand the page's submit token over to its chunks (and code extraction)
+            self._acquire(url, len(chunks) + (1 if self.extract_code_examples else 0))
+            self._page_words[url] = sum(m["word_count"] for m in metadatas)
+            self._release(url)
+
+            if not self._source_created and not self._refreshing_existing_source():
+                # Documents reference the source, so it must exist before the first insert
+                word_count = sum(m["word_count"] for m in metadatas)
+                await self.storage_ops._create_source_records(
+                    metadatas, chunks, {self.source_id: word_count}, self.request
+                )
+                self._source_created = True
+
+            reused_rows = []
+            shared_rows = []
+            for i, (chunk, metadata) in enumerate(zip(chunks, metadatas, strict=False)):
+                self.total_word_count += metadata["word_count"]
+                canonical = self._link_near_duplicate(url, i, metadata)
+                stored = reusable.get(metadata["chunk_hash"])
+                if stored:
+                    # Unchanged chunk of a changed page - keep its embedding
+                    reused_rows.append(self._reuse_row(url, i, metadata, stored))
+                    if canonical is None:
+                        self._followers.pop(chunk_key(url, i), None)
+                        self._remember_embedding(chunk_key(url, i), stored["embedding"])
+                    continue
+
+                if canonical is not None and not self.use_contextual_embeddings:
+                    # Near-duplicate of an earlier chunk - take its embedding instead of embedding again
+                    embedding = self._canonical_embeddings.get(canonical)
+                    if embedding is not None:
+                        shared_rows.append(self._duplicate_row(url, i, chunk, metadata, embedding))
+                        continue
+                    if canonical in self._followers:
+                        self._followers[canonical].append((url, i, chunk, metadata, markdown))
+                        continue
+
+                batch["urls"].append(url)
+                batch["chunk_numbers"].append(i)
+                batch["contents"].append(chunk)
+                batch["metadatas"].append(metadata)
+                batch["documents"][url] = markdown
+                if len(batch["contents"]) >= self.batch_size:
+                    await self._put(self._embed_queue, batch)
+                    batch = self._new_batch()
+
+            if reused_rows or shared_rows:
+                self.chunks_reused += len(reused_rows)
+                await self._put(self._store_queue, reused_rows + shared_rows)
+
+            self.chunks_created += len(chunks)
+            self.pages_chunked += 1
+
+            if self.extract_code_examples:
+                code_group.append(page)
+                if len(code_group) >= CODE_EXTRACTION_GROUP_SIZE:
+                    await self._put(self._code_queue, code_group)
+                    code_group = []
+
+        if batch["contents"]:
+            await self._put(self._embed_queue, batch)
+        for _ in range(self.embed_workers):
+            await self._put(self._embed_queue, _STOP)
+        if self.extract_code_examples:
+            if code_group:
+                await self._put(self._code_queue, code_group)
+            await self._put(self._code_queue, _STOP)
+
+    async def _queued_pages(self):
+        """Pages from the page queue, held back while the boilerplate detector learns the site."""
+        held: list[dict[str, Any]] = []
+        while True:
+            page = await self._page_queue.get()
+            if page is _STOP:
+                break
+            self._check_cancellation()
+            if self.boilerplate and page.get("markdown"):
+                self.boilerplate.observe(page["markdown"])
+            if self.boilerplate and not self.boilerplate.ready:
+                held.append(page)
+                continue
+            for earlier in held:
+                yield earlier
+            held = []
+            yield page
+        for earlier in held:
+            yield earlier
+
+    def _refreshing_existing_source(self) -> bool:
+        # An incremental refresh keeps the existing source record and its summary
+        return bool(
+            self.page_versions
+            and self.page_versions.incremental
+            and self.page_versions.has_versions()
+        )
+
+    def _link_near_duplicate(self, url: str, chunk_number: int, metadata: dict[str, Any]) -> str | None:
+        """Link a chunk to its canonical chunk; a new canonical chunk is expected to be embedded."""
+        if self._near_duplicates is None:
+            return None
+        key = chunk_key(url, chunk_number)
+        canonical = link_chunk(self._near_duplicates, metadata, key)
+        if canonical is not None:
+            self.chunks_deduplicated += 1
+        elif "chunk_simhash" in metadata and not self.use_contextual_embeddings:
+            self._followers[key] = []
+        return canonical
+
+    def _remember_embedding(self, key: str, embedding: list[float]) -> None:
+        self._canonical_embeddings[key] = embedding
+        self._canonical_embeddings.move_to_end(key)
+        while len(self._canonical_embeddings) > CANONICAL_EMBEDDING_CACHE_SIZE:
+            self._canonical_embeddings.popitem(last=False)
+
+    def _duplicate_row(
+        self, url: str, chunk_number: int, chunk: str, metadata: dict[str, Any], embedding: list[float]
+    ) -> dict[str, Any]:
+        return {
+            "url": url,
+            "chunk_number": chunk_number,
+            "content": chunk,
+            "metadata": {"chunk_size": len(chunk), **metadata},
+            "source_id": self.source_id,
+            "embedding": embedding,
+        }
+
+    def _follower_rows(self, batch: dict[str, Any], rows: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], dict]:
+        """
+        Rows for the near-duplicates waiting on the canonical chunks of an embedded batch.
+
+        Returns:
+            The rows, and a batch of the waiting chunks whose canonical chunk failed to embed
+        """
+        follower_rows = []
+        embedded = set()
+        for row in rows:
+            key = chunk_key(row["url"], row["chunk_number"])
+            embedded.add(key)
+            followers = self._followers.pop(key, None)
+            if followers is None:
+                continue
+            self._remember_embedding(key, row["embedding"])
+            follower_rows.extend(
+                self._duplicate_row(url, i, chunk, metadata, row["embedding"])
+                for url, i, chunk, metadata, _ in followers
+            )
+        orphans = self._new_batch()
+        for url, i in zip(batch["urls"], batch["chunk_numbers"], strict=False):
+            key = chunk_key(url, i)
+            if key in embedded:
+                continue
+            for follower_url, number, chunk, metadata, document in self._followers.pop(key, None) or ():
+                orphans["urls"].append(follower_url)
+                orphans["chunk_numbers"].append(number)
+                orphans["contents"].append(chunk)
+                orphans["metadatas"].append(metadata)
+                orphans["documents"][follower_url] = document
+        return follower_rows, orphans
+
+    def _reuse_row(
+        self, url: str, chunk_number: int, metadata: dict[str, Any], stored: dict[str, Any]
+    ) -> dict[str, Any]:
+        stored_metadata = stored.get("metadata") or {}
+        metadata = {"chunk_size": len(stored["content"]), **metadata}
+        if stored_metadata.get("contextual_embedding"):
+            metadata["contextual_embedding"] = True
+        return {
+            "url": url,
+            "chunk_number": chunk_number,
+            "content": stored["content"],
+            "metadata": metadata,
+            "source_id": self.source_id,
+            "embedding": stored["embedding"],
+        }
+
+    @staticmethod
+    def _new_batch() -> dict[str, Any]:
+        return {"urls": [], "chunk_numbers": [], "contents": [], "metadatas": [], "documents": {}}
+
+    async def _embed_worker(self) -> None:
+        """Embed chunk batches and pass the resulting rows to storage."""
+        try:
+            while True:
+                batch = await self._embed_queue.get()
+                if batch is _STOP:
+                    break
+                self._check_cancellation()
+
+                rows = await self._embed(batch)
+                follower_rows, orphans = self._follower_rows(batch, rows)
+                if orphans["contents"]:
+                    # Their canonical chunk failed to embed, so they are embedded themselves
+                    rows += await self._embed(orphans)
+                rows += follower_rows
+                if rows:
+                    await self._put(self._store_queue, rows)
+                await self._report_progress()
+        finally:
+            self._embed_workers_running -= 1
+
+        # The last embedding worker to finish shuts down storage
+        if self._embed_workers_running == 0:
+            for _ in range(self.store_workers):
+                await self._put(self._store_queue, _STOP)
+
+    async def _embed(self, batch: dict[str, Any]) -> list[dict[str, Any]]:
+        rows = await embed_document_batch(
+            batch["urls"],
+            batch["chunk_numbers"],
+            batch["contents"],
+            batch["metadatas"],
+            batch["documents"],
+            use_contextual_embeddings=self.use_contextual_embeddings,
+            contextual_batch_size=self.contextual_batch_size,
+            cancellation_check=self.cancellation_check,
+            batch_label="Pipeline batch",
+        )
+        self.chunks_embedded += len(rows)
+        # Chunks that failed to embed will never reach storage
+        failed = Counter(batch["urls"]) - Counter(row["url"] for row in rows)
+        for url, count in failed.items():
+            self._release(url, count)
+        return rows
+
+    async def _store_worker(self) -> None:
+        """Replace previous rows for each URL and insert the new rows."""
+        client = self.storage_ops.supabase_client
+        while True:
+            rows = await self._store_queue.get()
+            if rows is _STOP:
+                break
+            self._check_cancellation()
+
+            # Delete rows from earlier crawls once per URL, before its first insert
+            async with self._delete_lock:
+                new_urls = {row["url"] for row in rows} - self._deleted_urls
+                if new_urls:
+                    await delete_documents_for_urls(
+                        client, list(new_urls), self.delete_batch_size, self.cancellation_check
+                    )
+                    self._deleted_urls.update(new_urls)
+
+            self.chunks_stored += await insert_document_batch(client, rows, self.cancellation_check)
+            for url, count in Counter(row["url"] for row in rows).items():
+                self._release(url, count)
+            await self._report_progress()
+
+    async def _code_worker(self) -> None:
+        """Extract and store code examples for groups of pages."""
+        while True:
+            group = await self._code_queue.get()
+            if group is _STOP:
+                break
+            self._check_cancellation()
+
+            url_to_full_document = {page["url"]: page.get("markdown", "") for page in group}
+            try:
+                self.code_examples_count += await self.storage_ops.extract_and_store_code_examples(
+                    group, url_to_full_document, code_index=self._code_index
+                )
+            except Exception as e:
+                # Code examples are best-effort; keep storing documents
+                safe_logfire_error(f"Code extraction failed for {len(group)} pages: {e}")
+            for page in group:
+                self._release(page["url"])
+            await self._report_progress()
@@ -8,11 +8,14 @@ batch crawling, recursive crawling, and overall orchestration with progress trac
 
 import asyncio
 import uuid
-from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterable, Union
 from urllib.parse import urlparse
 
 from ...config.logfire_config import safe_logfire_info, safe_logfire_error, get_logger
 from ...utils import get_supabase_client
+from ..search.cache_warmer import on_source_updated
+from ..search.source_partition_service import get_source_partition_service
 
 # Lazy import socket.IO handlers to avoid circular dependencies
 # These are imported as module-level variables but resolved at runtime
@@ -45,6 +48,13 @@ from .helpers.site_config import SiteConfig
 
 # Import operations
 from .document_storage_operations import DocumentStorageOperations
+from .crawl_pipeline import StreamingCrawlPipeline, is_streaming_pipeline_enabled
+from .incremental_refresh import PageVersionTracker
+from .crawl_checkpoint import CHECKPOINTED_CRAWL_TYPES, CrawlCheckpoint
+from .boilerplate import create_boilerplate_detector
+from .domain_profiles import DomainProfileStore, get_domain_profiles
+from .html_spool import HtmlSpool, create_html_spool
+from .page_cache import PageCache, get_page_cache
 from .progress_mapper import ProgressMapper
 
 logger = get_logger(__name__)
@@ -115,6 +125,23 @@ class CrawlingService:
         if self.progress_id:
             self.progress_state = {"progressId": self.progress_id}
 
+    def set_page_cache(self, page_cache: Optional[PageCache]):
+        """Serve and store this service's crawls through a page cache, or None to bypass it."""
+        self.batch_strategy.page_cache = page_cache
+        self.recursive_strategy.page_cache = page_cache
+        self.single_page_strategy.page_cache = page_cache
+
+    def set_domain_profiles(self, domain_profiles: Optional[DomainProfileStore]):
+        """Render this service's pages with learned per-domain settings, or None for the configured ones."""
+        self.batch_strategy.domain_profiles = domain_profiles
+        self.recursive_strategy.domain_profiles = domain_profiles
+        self.single_page_strategy.domain_profiles = domain_profiles
+
+    def set_html_spool(self, html_spool: Optional[HtmlSpool]):
+        """Move the page HTML of this service's multi-page crawls into a spool, or None to keep it in memory."""
+        self.batch_strategy.html_spool = html_spool
+        self.recursive_strategy.html_spool = html_spool
+
     def cancel(self):
         """Cancel the crawl operation."""
         self._cancelled = True
@@ -200,17 +227,22 @@ class CrawlingService:
             end_progress,
         )
 
-    def parse_sitemap(self, sitemap_url: str) -> List[str]:
+    async def parse_sitemap(self, sitemap_url: str) -> List[str]:
         """Parse a sitemap and extract URLs."""
-        return self.sitemap_strategy.parse_sitemap(sitemap_url)
+        return await self.sitemap_strategy.parse_sitemap(sitemap_url)
 
     async def crawl_batch_with_progress(
         self,
-        urls: List[str],
+        urls: Union[List[str], AsyncIterable[str]],
         max_concurrent: int = None,
         progress_callback=None,
         start_progress: int = 15,
         end_progress: int = 60,
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        save_state: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
     ) -> List[Dict[str, Any]]:
         """Batch crawl multiple URLs in parallel."""
         return await self.batch_strategy.crawl_batch_with_progress(
@@ -221,6 +253,11 @@ class CrawlingService:
             progress_callback,
             start_progress,
             end_progress,
+            on_page=on_page,
+            skip_unchanged=skip_unchanged,
+            resume_state=resume_state,
+            save_state=save_state,
+            on_page_failed=on_page_failed,
         )
 
     async def crawl_recursive_with_progress(
@@ -231,6 +268,13 @@ class CrawlingService:
         progress_callback=None,
         start_progress: int = 10,
         end_progress: int = 60,
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        save_state: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        max_pages: Optional[int] = None,
+        on_budget_reached: Optional[Callable[[], None]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
     ) -> List[Dict[str, Any]]:
         """Recursively crawl internal links from start URLs."""
         return await self.recursive_strategy.crawl_recursive_with_progress(
@@ -242,15 +286,25 @@ class CrawlingService:
             progress_callback,
             start_progress,
             end_progress,
+            on_page=on_page,
+            skip_unchanged=skip_unchanged,
+            resume_state=resume_state,
+            save_state=save_state,
+            max_pages=max_pages,
+            on_budget_reached=on_budget_reached,
+            on_page_failed=on_page_failed,
         )
 
     # Orchestration methods
-    async def orchestrate_crawl(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    async def orchestrate_crawl(
+        self, request: Dict[str, Any], resume_from: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Main orchestration method - non-blocking using asyncio.create_task.
 
         Args:
             request: The crawl request containing url, knowledge_type, tags, max_depth, etc.
+            resume_from: Optional checkpoint row of an interrupted crawl to continue from
 
         Returns:
             Dict containing task_id and status
@@ -266,7 +320,7 @@ class CrawlingService:
             register_orchestration(self.progress_id, self)
 
         # Start the crawl as an async task in the main event loop
-        asyncio.create_task(self._async_orchestrate_crawl(request, task_id))
+        asyncio.create_task(self._async_orchestrate_crawl(request, task_id, resume_from))
 
         # Return immediately
         return {
@@ -276,7 +330,9 @@ class CrawlingService:
             "progress_id": self.progress_id,
         }
 
-    async def _async_orchestrate_crawl(self, request: Dict[str, Any], task_id: str):
+    async def _async_orchestrate_crawl(
+        self, request: Dict[str, Any], task_id: str, resume_from: Optional[Dict[str, Any]] = None
+    ):
         """
         Async orchestration that runs in the main event loop.
         """
@@ -300,6 +356,11 @@ class CrawlingService:
                 )
                 last_heartbeat = current_time
 
+        pipeline = None
+        checkpoint = None
+        html_spool = None
+        domain_profiles = None
+        boilerplate = None
         try:
             url = str(request.get("url", ""))
             safe_logfire_info(f"Starting async crawl orchestration | url={url} | task_id={task_id}")
@@ -336,8 +397,87 @@ class CrawlingService:
             # Analyzing stage
             await update_mapped_progress("analyzing", 50, f"Analyzing URL type for {url}")
 
+            # Per-URL versions let a refresh skip pages that have not changed
+            page_versions = PageVersionTracker(
+                self.supabase_client,
+                original_source_id,
+                incremental=bool(request.get("incremental", False)),
+            )
+            await page_versions.load()
+
+            # A resumed crawl replays the pages it already fetched, even if they aged out
+            page_cache = await get_page_cache()
+            if page_cache and resume_from:
+                page_cache = page_cache.replaying()
+            elif page_cache and request.get("force_fresh"):
+                page_cache = page_cache.fresh()
+            self.set_page_cache(page_cache)
+
+            domain_profiles = await get_domain_profiles()
+            self.set_domain_profiles(domain_profiles)
+
+            # Page HTML is only needed again for code extraction; keep it on disk until then
+            html_spool = await create_html_spool()
+            self.set_html_spool(html_spool)
+
+            # Navigation, headers and footers repeated on every page are stripped before chunking
+            boilerplate = await create_boilerplate_detector(original_source_id)
+
+            # Stream pages into storage while crawling when the pipeline is enabled
+            if await is_streaming_pipeline_enabled():
+                crawl_type = self._detect_crawl_type(url)
+
+                # Only streamed crawls are checkpointed - the fallback path keeps every
+                # page in memory until the crawl ends, so there is nothing durable to resume
+                if self.progress_id and crawl_type in CHECKPOINTED_CRAWL_TYPES:
+                    checkpoint = CrawlCheckpoint(
+                        self.supabase_client,
+                        self.progress_id,
+                        request,
+                        original_source_id,
+                        crawl_type,
+                        resume_from=resume_from,
+                    )
+                    if checkpoint.resume_state:
+                        page_versions.mark_reached(checkpoint.resume_state.get("visited", []))
+
+                pipeline = StreamingCrawlPipeline(
+                    self.doc_storage_ops,
+                    request,
+                    crawl_type,
+                    original_source_id,
+                    progress_callback=self._create_pipeline_progress_callback(),
+                    cancellation_check=self._check_cancellation,
+                    extract_code_examples=request.get("extract_code_examples", True),
+                    page_versions=page_versions,
+                    initial_word_count=checkpoint.initial_word_count if checkpoint else 0,
+                    boilerplate=boilerplate,
+                )
+                if checkpoint:
+                    checkpoint.in_flight = pipeline.pending_urls
+                    checkpoint.stored_word_count = lambda: pipeline.stored_word_count
+                await pipeline.start()
+                await self._run_streaming_crawl(
+                    pipeline,
+                    page_versions,
+                    url,
+                    request,
+                    task_id,
+                    update_mapped_progress,
+                    send_heartbeat_if_needed,
+                    checkpoint,
+                )
+                return
+
             # Detect URL type and perform crawl
-            crawl_results, crawl_type = await self._crawl_by_url_type(url, request)
+            crawl_results, crawl_type = await self._crawl_by_url_type(
+                url,
+                request,
+                skip_unchanged=page_versions.find_unchanged if page_versions.incremental else None,
+                lastmod_unchanged=page_versions.unchanged_since if page_versions.incremental else None,
+                on_budget_reached=page_versions.mark_budget_reached,
+                on_page_failed=page_versions.mark_failed,
+            )
 
             # Check for cancellation after crawling
             self._check_cancellation()
@@ -345,8 +485,21 @@ class CrawlingService:
             # Send heartbeat after potentially long crawl operation
             await send_heartbeat_if_needed()
 
+            # Record page versions; an incremental refresh only stores pages that changed
+            crawl_results = [
+                page
+                for page in crawl_results
+                if not (page_versions.observe(page) == "unchanged" and page_versions.incremental)
+            ]
+
             if not crawl_results:
-                raise ValueError("No content was crawled from the provided URL")
+                if not page_versions.pages_unchanged:
+                    raise ValueError("No content was crawled from the provided URL")
+                version_stats = await page_versions.save(tombstone=True)
+                await self._complete_crawl(
+                    task_id, update_mapped_progress, original_source_id, 0, 0, 0, **version_stats
+                )
+                return
 
             # Processing stage
             await update_mapped_progress("processing", 50, "Processing crawled content")
@@ -386,6 +539,7 @@ class CrawlingService:
                 original_source_id,
                 doc_storage_callback,
                 self._check_cancellation,
+                boilerplate=boilerplate,
             )
 
             # Check for cancellation after document storage
@@ -427,39 +581,23 @@ class CrawlingService:
                 code_examples_found=code_examples_count,
             )
 
-            # Complete - send both the progress update and completion event
-            await update_mapped_progress(
-                "completed",
-                100,
-                f"Crawl completed: {storage_results['chunk_count']} chunks, {code_examples_count} code examples",
-                chunks_stored=storage_results["chunk_count"],
-                code_examples_found=code_examples_count,
-                processed_pages=len(crawl_results),
-                total_pages=len(crawl_results),
-            )
+            version_stats = await page_versions.save(tombstone=page_versions.incremental)
 
-            # Also send the completion event that frontend expects
-            _ensure_socketio_imports()
-            await complete_crawl_progress(
+            await self._complete_crawl(
                 task_id,
-                {
-                    "chunks_stored": storage_results["chunk_count"],
-                    "code_examples_found": code_examples_count,
-                    "processed_pages": len(crawl_results),
-                    "total_pages": len(crawl_results),
-                    "sourceId": storage_results.get("source_id", ""),
-                    "log": "Crawl completed successfully!",
-                },
+                update_mapped_progress,
+                storage_results.get("source_id") or original_source_id,
+                storage_results["chunk_count"],
+                code_examples_count,
+                len(crawl_results),
+                **version_stats,
             )
 
-            # Unregister after successful completion
-            if self.progress_id:
-                unregister_orchestration(self.progress_id)
-                safe_logfire_info(
-                    f"Unregistered orchestration service after completion | progress_id={self.progress_id}"
-                )
-
         except asyncio.CancelledError:
+            if pipeline:
+                await pipeline.abort()
+            if checkpoint:
+                await checkpoint.finish("cancelled")
             safe_logfire_info(f"Crawl operation cancelled | progress_id={self.progress_id}")
             await self._handle_progress_update(
                 task_id,
@@ -476,6 +614,10 @@ class CrawlingService:
                     f"Unregistered orchestration service on cancellation | progress_id={self.progress_id}"
                 )
         except Exception as e:
+            if pipeline:
+                await pipeline.abort()
+            if checkpoint:
+                await checkpoint.finish("failed")
             safe_logfire_error(f"Async crawl orchestration failed | error={str(e)}")
             await self._handle_progress_update(
                 task_id, {"status": "error", "percentage": -1, "log": f"Crawl failed: {str(e)}"}
@@ -486,11 +628,188 @@ class CrawlingService:
                 safe_logfire_info(
                     f"Unregistered orchestration service on error | progress_id={self.progress_id}"
                 )
+        finally:
+            if domain_profiles:
+                await domain_profiles.save(force=True)
+            if boilerplate:
+                await boilerplate.save()
+            if html_spool:
+                self.set_html_spool(None)
+                html_spool.close()
+
+    def _create_pipeline_progress_callback(self) -> Callable[[Dict[str, Any]], Awaitable[None]]:
+        """Create a callback that adds streaming pipeline counters to the progress state."""
+
+        async def callback(stats: Dict[str, Any]):
+            if self.progress_id:
+                _ensure_socketio_imports()
+                self.progress_state.update(stats)
+                await update_crawl_progress(self.progress_id, self.progress_state)
 
-    async def _crawl_by_url_type(self, url: str, request: Dict[str, Any]) -> tuple:
+        return callback
+
+    async def _run_streaming_crawl(
+        self,
+        pipeline: StreamingCrawlPipeline,
+        page_versions: PageVersionTracker,
+        url: str,
+        request: Dict[str, Any],
+        task_id: str,
+        update_mapped_progress: Callable[..., Awaitable[None]],
+        send_heartbeat_if_needed: Callable[[], Awaitable[None]],
+        checkpoint: Optional[CrawlCheckpoint] = None,
+    ):
+        """
+        Crawl while chunking, embedding and storing pages as they arrive, then drain the pipeline.
+        """
+        await self._crawl_by_url_type(
+            url,
+            request,
+            on_page=pipeline.submit_page,
+            skip_unchanged=page_versions.find_unchanged if page_versions.incremental else None,
+            lastmod_unchanged=page_versions.unchanged_since if page_versions.incremental else None,
+            checkpoint=checkpoint,
+            on_budget_reached=page_versions.mark_budget_reached,
+            on_page_failed=page_versions.mark_failed,
+        )
+
+        # Check for cancellation after crawling
+        self._check_cancellation()
+        await send_heartbeat_if_needed()
+
+        resumed = bool(checkpoint and checkpoint.resume_state)
+        if pipeline.pages_received == 0 and not page_versions.pages_unchanged and not resumed:
+            raise ValueError("No content was crawled from the provided URL")
+
+        # Storage has been running alongside the crawl; wait for the remaining pages
+        await update_mapped_progress(
+            "document_storage",
+            50,
+            f"Crawled {pipeline.pages_received} pages, finishing storage...",
+            **pipeline.get_stats(),
+        )
+        storage_results = await pipeline.finish()
+        version_stats = await page_versions.save(tombstone=page_versions.incremental)
+        if checkpoint:
+            await checkpoint.finish("completed")
+
+        self._check_cancellation()
+        await send_heartbeat_if_needed()
+
+        await update_mapped_progress(
+            "finalization",
+            50,
+            "Finalizing crawl results...",
+            chunks_stored=storage_results["chunk_count"],
+            code_examples_found=storage_results["code_examples_count"],
+        )
+
+        await self._complete_crawl(
+            task_id,
+            update_mapped_progress,
+            storage_results["source_id"],
+            storage_results["chunk_count"],
+            storage_results["code_examples_count"],
+            storage_results["pages_processed"],
+            **version_stats,
+        )
+
+    async def _complete_crawl(
+        self,
+        task_id: str,
+        update_mapped_progress: Callable[..., Awaitable[None]],
+        source_id: str,
+        chunk_count: int,
+        code_examples_count: int,
+        page_count: int,
+        **page_stats,
+    ):
+        """Report completion, refresh search caches and unregister the orchestration."""
+        message = f"Crawl completed: {chunk_count} chunks, {code_examples_count} code examples"
+        if page_stats.get("pages_unchanged") or page_stats.get("pages_removed"):
+            message += (
+                f" ({page_stats.get('pages_unchanged', 0)} pages unchanged,"
+                f" {page_stats.get('pages_removed', 0)} removed)"
+            )
+
+        # Complete - send both the progress update and completion event
+        await update_mapped_progress(
+            "completed",
+            100,
+            message,
+            chunks_stored=chunk_count,
+            code_examples_found=code_examples_count,
+            processed_pages=page_count,
+            total_pages=page_count,
+            **page_stats,
+        )
+
+        # Also send the completion event that frontend expects
+        _ensure_socketio_imports()
+        await complete_crawl_progress(
+            task_id,
+            {
+                "chunks_stored": chunk_count,
+                "code_examples_found": code_examples_count,
+                "processed_pages": page_count,
+                "total_pages": page_count,
+                "sourceId": source_id or "",
+                "log": "Crawl completed successfully!",
+                **page_stats,
+            },
+        )
+
+        # Refresh cached search results that may now miss the new content
+        on_source_updated(source_id)
+
+        # Give large sources their own vector index once they pass the size threshold
+        get_source_partition_service().schedule_partition_check(source_id)
+
+        # Unregister after successful completion
+        if self.progress_id:
+            unregister_orchestration(self.progress_id)
+            safe_logfire_info(
+                f"Unregistered orchestration service after completion | progress_id={self.progress_id}"
+            )
+
+    def _detect_crawl_type(self, url: str) -> str:
+        """Classify a URL as a text file, sitemap or regular webpage crawl."""
+        if self.url_handler.is_txt(url):
+            return "text_file"
+        if self.url_handler.is_sitemap(url):
+            return "sitemap"
+        return "webpage"
+
+    async def _crawl_by_url_type(
+        self,
+        url: str,
+        request: Dict[str, Any],
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        lastmod_unchanged: Optional[Callable[[str, Optional[datetime]], bool]] = None,
+        checkpoint: Optional[CrawlCheckpoint] = None,
+        on_budget_reached: Optional[Callable[[], None]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
+    ) -> tuple:
         """
         Detect URL type and perform appropriate crawling.
 
+        Args:
+            url: The URL to crawl
+            request: The original crawl request
+            on_page: Optional async callback that receives each crawled page as it
+                arrives instead of collecting them in the returned list
+            skip_unchanged: Optional async callback returning the URLs of a batch that have
+                not changed since the last crawl (see PageVersionTracker.find_unchanged)
+            lastmod_unchanged: Optional callback telling whether a sitemap URL's lastmod shows it
+                has not changed since the last crawl (see PageVersionTracker.unchanged_since)
+            checkpoint: Optional checkpoint that saves the frontier of sitemap and recursive
+                crawls and holds the state to resume from
+            on_budget_reached: Optional callback, called when the page budget stops a
+                recursive crawl before it reached every page
+            on_page_failed: Optional callback that receives the URL of each page whose
+                crawl failed
+
         Returns:
             Tuple of (crawl_results, crawl_type)
         """
@@ -498,8 +817,11 @@ class CrawlingService:
 
         crawl_results = []
         crawl_type = None
+        url_type = self._detect_crawl_type(url)
+        resume_state = checkpoint.resume_state if checkpoint else None
+        save_state = checkpoint.save if checkpoint else None
 
-        if self.url_handler.is_txt(url):
+        if url_type == "text_file":
             # Handle text files
             if self.progress_id:
                 self.progress_state.update({
@@ -508,42 +830,55 @@ class CrawlingService:
                     "log": "Detected text file, fetching content...",
                 })
                 await update_crawl_progress(self.progress_id, self.progress_state)
-            crawl_results = await self.crawl_markdown_file(
-                url,
-                progress_callback=await self._create_crawl_progress_callback("crawling"),
-                start_progress=10,
-                end_progress=20,
-            )
+            if skip_unchanged and url in await skip_unchanged([url]):
+                crawl_results = []
+            else:
+                crawl_results = await self.crawl_markdown_file(
+                    url,
+                    progress_callback=await self._create_crawl_progress_callback("crawling"),
+                    start_progress=10,
+                    end_progress=20,
+                )
             crawl_type = "text_file"
+            if on_page:
+                for page in crawl_results:
+                    await on_page(page)
+                crawl_results = []
 
-        elif self.url_handler.is_sitemap(url):
+        elif url_type == "sitemap":
             # Handle sitemaps
             if self.progress_id:
                 self.progress_state.update({
                     "status": "crawling",
                     "percentage": 10,
-                    "log": "Detected sitemap, parsing URLs...",
+                    "log": "Detected sitemap, streaming URLs into the crawler...",
                 })
                 await update_crawl_progress(self.progress_id, self.progress_state)
-            sitemap_urls = self.parse_sitemap(url)
-
-            if sitemap_urls:
-                # Emit progress before starting batch crawl
-                if self.progress_id:
-                    self.progress_state.update({
-                        "status": "crawling",
-                        "percentage": 15,
-                        "log": f"Starting batch crawl of {len(sitemap_urls)} URLs...",
-                    })
-                    await update_crawl_progress(self.progress_id, self.progress_state)
 
-                crawl_results = await self.crawl_batch_with_progress(
-                    sitemap_urls,
-                    progress_callback=await self._create_crawl_progress_callback("crawling"),
-                    start_progress=15,
-                    end_progress=20,
-                )
-                crawl_type = "sitemap"
+            # URLs go to the batch crawler while the sitemap is still being read. A resumed
+            # crawl reads the sitemap again and the batch crawler skips the visited URLs.
+            async def sitemap_urls():
+                async for entry in self.sitemap_strategy.iter_sitemap(
+                    url,
+                    include_patterns=request.get("include_patterns") or None,
+                    exclude_patterns=request.get("exclude_patterns") or None,
+                ):
+                    if lastmod_unchanged and lastmod_unchanged(entry.url, entry.lastmod):
+                        continue
+                    yield entry.url
+
+            crawl_results = await self.crawl_batch_with_progress(
+                sitemap_urls(),
+                progress_callback=await self._create_crawl_progress_callback("crawling"),
+                start_progress=15,
+                end_progress=20,
+                on_page=on_page,
+                skip_unchanged=skip_unchanged,
+                resume_state=resume_state,
+                save_state=save_state,
+                on_page_failed=on_page_failed,
+            )
+            crawl_type = "sitemap"
 
         else:
             # Handle regular webpages with recursive crawling
@@ -566,6 +901,13 @@ class CrawlingService:
                 progress_callback=await self._create_crawl_progress_callback("crawling"),
                 start_progress=10,
                 end_progress=20,
+                on_page=on_page,
+                skip_unchanged=skip_unchanged,
+                resume_state=resume_state,
+                save_state=save_state,
+                max_pages=request.get("max_pages"),
+                on_budget_reached=on_budget_reached,
+                on_page_failed=on_page_failed,
             )
             crawl_type = "webpage"
 
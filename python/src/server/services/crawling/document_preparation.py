@@ -0,0 +1,278 @@
+"""
+Document Preparation
+
+Turns crawled pages into chunks and chunk metadata ready for embedding.
+Chunking, word counts, hashing and metadata assembly are pure CPU work. On a
+large crawl they add up to seconds that would otherwise hold the event loop,
+and with it the API and Socket.IO. DocumentPreparer sends pages to a pool of
+worker processes in small groups and hands each group back as soon as it is
+done. Only the fields preparation needs are sent to the workers, and results
+come back as plain lists.
+"""
+
+import asyncio
+import multiprocessing
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+from ..storage.near_duplicates import simhash
+from ..storage.text_chunker import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, TokenChunker
+from .incremental_refresh import content_hash
+
+logger = get_logger(__name__)
+
+DEFAULT_PROCESSES = 2
+
+# Markdown sent to a worker per task; small pages are grouped so the round trip is amortized
+TASK_CHARS = 256 * 1024
+
+# Tasks queued per worker process, so a worker never waits for the next group
+TASKS_PER_PROCESS = 2
+
+# Page fields used by preparation; everything else stays in the parent
+DOCUMENT_FIELDS = ("url", "title", "description", "markdown")
+
+
+@dataclass
+class PreparedDocument:
+    """Chunks of one page with their metadata"""
+
+    index: int
+    url: str
+    chunks: list[str]
+    metadatas: list[dict[str, Any]]
+    word_count: int
+
+
+def build_chunk_metadata(
+    doc: dict[str, Any],
+    chunk: str,
+    chunk_index: int,
+    source_id: str,
+    request: dict[str, Any],
+    crawl_type: str,
+) -> dict[str, Any]:
+    """
+    Build the metadata stored with a single chunk of a crawled document.
+
+    Args:
+        doc: The crawled document the chunk came from
+        chunk: The chunk text
+        chunk_index: Position of the chunk within the document
+        source_id: The source ID for the document
+        request: The original crawl request
+        crawl_type: Type of crawl performed
+
+    Returns:
+        Chunk metadata dict
+    """
+    metadata = {
+        "url": doc.get("url", ""),
+        "title": doc.get("title", ""),
+        "description": doc.get("description", ""),
+        "source_id": source_id,
+        "knowledge_type": request.get("knowledge_type", "documentation"),
+        "crawl_type": crawl_type,
+        "word_count": len(chunk.split()),
+        "char_count": len(chunk),
+        "chunk_index": chunk_index,
+        "chunk_hash": content_hash(chunk),
+        "tags": request.get("tags", []),
+    }
+    fingerprint = simhash(chunk)
+    if fingerprint is not None:
+        metadata["chunk_simhash"] = f"{fingerprint:016x}"
+    return metadata
+
+
+def prepare_documents(
+    docs: list[tuple[int, dict[str, Any]]],
+    source_id: str,
+    request: dict[str, Any],
+    crawl_type: str,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> list[PreparedDocument]:
+    """
+    Chunk a group of pages and build their chunk metadata.
+
+    Runs in a worker process, so it only touches its arguments.
+
+    Args:
+        docs: (position, page) pairs; pages need url, title, description and markdown
+        source_id: The source ID for all documents
+        request: The crawl request fields stored with each chunk
+        crawl_type: Type of crawl performed
+        chunk_tokens: Token budget of a chunk
+        overlap_tokens: Tokens shared by consecutive chunks
+
+    Returns:
+        One PreparedDocument per page, in input order
+    """
+    chunker = TokenChunker(chunk_tokens, overlap_tokens)
+    prepared = []
+    for index, doc in docs:
+        chunks = chunker.split(doc.get("markdown") or "")
+        metadatas = [
+            build_chunk_metadata(doc, chunk, i, source_id, request, crawl_type) for i, chunk in enumerate(chunks)
+        ]
+        word_count = sum(metadata["word_count"] for metadata in metadatas)
+        prepared.append(PreparedDocument(index, doc.get("url", ""), chunks, metadatas, word_count))
+    return prepared
+
+
+class DocumentPreparer:
+    """Prepares crawled pages for storage in a pool of worker processes"""
+
+    def __init__(
+        self,
+        processes: int = DEFAULT_PROCESSES,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+        start_method: str = "spawn",
+    ):
+        """
+        Initialize the preparer. Worker processes start on first use.
+
+        Args:
+            processes: Worker processes; 0 prepares pages in a thread instead
+            chunk_tokens: Token budget of a chunk
+            overlap_tokens: Tokens shared by consecutive chunks
+            start_method: multiprocessing start method; spawn keeps workers free of
+                the server's threads and open connections
+        """
+        self.processes = max(0, processes)
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.start_method = start_method
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def prepare(
+        self,
+        docs: Iterable[dict[str, Any]],
+        source_id: str,
+        request: dict[str, Any],
+        crawl_type: str,
+    ) -> AsyncIterator[PreparedDocument]:
+        """
+        Prepare pages, yielding each one as soon as its group is done.
+
+        Pages without markdown are skipped. Results arrive in completion order;
+        PreparedDocument.index is the page's position in docs.
+        """
+        fields = {"knowledge_type": request.get("knowledge_type", "documentation"), "tags": request.get("tags", [])}
+        limit = max(1, self.processes * TASKS_PER_PROCESS)
+        pending: set[asyncio.Future] = set()
+        try:
+            for group in self._groups(docs):
+                pending.add(asyncio.ensure_future(self._run(group, source_id, fields, crawl_type)))
+                if len(pending) < limit:
+                    continue
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for prepared in task.result():
+                        yield prepared
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for prepared in task.result():
+                        yield prepared
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def prepare_one(
+        self, doc: dict[str, Any], source_id: str, request: dict[str, Any], crawl_type: str
+    ) -> PreparedDocument | None:
+        """Prepare a single page; None when it has no markdown."""
+        async for prepared in self.prepare([doc], source_id, request, crawl_type):
+            return prepared
+        return None
+
+    def shutdown(self) -> None:
+        """Stop the worker processes once work already sent to them is done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # Internal helpers
+
+    def _groups(self, docs: Iterable[dict[str, Any]]) -> Iterable[list[tuple[int, dict[str, Any]]]]:
+        group: list[tuple[int, dict[str, Any]]] = []
+        size = 0
+        for index, doc in enumerate(docs):
+            markdown = doc.get("markdown")
+            if not markdown:
+                continue
+            group.append((index, {name: doc.get(name) or "" for name in DOCUMENT_FIELDS}))
+            size += len(markdown)
+            if size >= TASK_CHARS:
+                yield group
+                group, size = [], 0
+        if group:
+            yield group
+
+    async def _run(self, group, source_id: str, request: dict[str, Any], crawl_type: str) -> list[PreparedDocument]:
+        args = (group, source_id, request, crawl_type, self.chunk_tokens, self.overlap_tokens)
+        if not self.processes:
+            return await asyncio.to_thread(prepare_documents, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), prepare_documents, *args)
+        except BrokenProcessPool:
+            logger.warning("Document preparation worker exited unexpectedly; preparing this group in a thread")
+            self.shutdown()
+            return await asyncio.to_thread(prepare_documents, *args)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._executor
+
+
+_document_preparer: DocumentPreparer | None = None
+
+
+async def get_document_preparer() -> DocumentPreparer:
+    """
+    Get the process-wide preparer, configured from the rag_strategy settings.
+
+    DOCUMENT_PREP_PROCESSES sets the worker processes (0 = prepare in a thread);
+    CHUNK_MAX_TOKENS and CHUNK_OVERLAP_TOKENS size the chunks.
+    """
+    global _document_preparer
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load document preparation settings: {e}")
+        settings = {}
+
+    def _int(key: str, default: int, minimum: int) -> int:
+        try:
+            return max(minimum, int(settings.get(key, default)))
+        except (TypeError, ValueError):
+            return default
+
+    processes = _int("DOCUMENT_PREP_PROCESSES", DEFAULT_PROCESSES, 0)
+    if _document_preparer is None or _document_preparer.processes != processes:
+        if _document_preparer is not None:
+            _document_preparer.shutdown()
+        _document_preparer = DocumentPreparer(processes)
+    _document_preparer.chunk_tokens = _int("CHUNK_MAX_TOKENS", DEFAULT_CHUNK_TOKENS, 1)
+    _document_preparer.overlap_tokens = _int("CHUNK_OVERLAP_TOKENS", DEFAULT_OVERLAP_TOKENS, 0)
+    return _document_preparer
+
+
+def shutdown_document_preparer() -> None:
+    """Stop the process-wide preparer's worker processes."""
+    global _document_preparer
+    if _document_preparer is not None:
+        _document_preparer.shutdown()
+        _document_preparer = None
@@ -4,19 +4,22 @@ Document Storage Operations
 Handles the storage and processing of crawled documents.
 Extracted from crawl_orchestration_service.py for better modularity.
 """
-import asyncio
 from typing import Dict, Any, List, Optional, Callable
 from urllib.parse import urlparse
 
 from ...config.logfire_config import safe_logfire_info, safe_logfire_error
 from ..storage.storage_services import DocumentStorageService
+from ..storage.code_dedup import CodeBlockIndex
 from ..storage.document_storage_service import add_documents_to_supabase
+from ..storage.near_duplicates import chunk_key, create_simhash_index, link_chunk
 from ..storage.code_storage_service import (
     generate_code_summaries_batch,
     add_code_examples_to_supabase
 )
 from ..source_management_service import update_source_info, extract_source_summary
 from .code_extraction_service import CodeExtractionService
+from .boilerplate import BoilerplateDetector
+from .document_preparation import DocumentPreparer, get_document_preparer
 
 
 class DocumentStorageOperations:
@@ -34,6 +37,8 @@ class DocumentStorageOperations:
         self.supabase_client = supabase_client
         self.doc_storage_service = DocumentStorageService(supabase_client)
         self.code_extraction_service = CodeExtractionService(supabase_client)
+        # Set to use a specific preparer instead of the process-wide one
+        self.document_preparer: Optional[DocumentPreparer] = None
     
     async def process_and_store_documents(
         self,
@@ -42,7 +47,8 @@ class DocumentStorageOperations:
         crawl_type: str,
         original_source_id: str,
         progress_callback: Optional[Callable] = None,
-        cancellation_check: Optional[Callable] = None
+        cancellation_check: Optional[Callable] = None,
+        boilerplate: Optional[BoilerplateDetector] = None
     ) -> Dict[str, Any]:
         """
         Process crawled documents and store them in the database.
@@ -54,12 +60,22 @@ class DocumentStorageOperations:
             original_source_id: The source ID for all documents
             progress_callback: Optional callback for progress updates
             cancellation_check: Optional function to check for cancellation
+            boilerplate: Optional detector that strips blocks repeated across the pages before chunking
             
         Returns:
             Dict containing storage statistics and document mappings
         """
-        # Initialize storage service for chunking
-        storage_service = DocumentStorageService(self.supabase_client)
+        preparer = await self.get_document_preparer()
+        
+        if boilerplate:
+            # Every page is in hand, so learn the whole site before stripping any of it
+            for doc in crawl_results:
+                if doc.get('markdown'):
+                    boilerplate.observe(doc['markdown'])
+            crawl_results = [
+                {**doc, 'markdown': boilerplate.strip(doc['markdown'])} if doc.get('markdown') else doc
+                for doc in crawl_results
+            ]
         
         # Prepare data for chunked storage
         all_urls = []
@@ -69,64 +85,34 @@ class DocumentStorageOperations:
         source_word_counts = {}
         url_to_full_document = {}
         
-        # Process and chunk each document
-        for doc_index, doc in enumerate(crawl_results):
-            # Check for cancellation during document processing
+        # Store full documents for code extraction context
+        for doc in crawl_results:
+            if doc.get('markdown'):
+                url_to_full_document[doc.get('url', '')] = doc['markdown']
+        
+        # Chunk documents and build chunk metadata in the preparation worker processes
+        prepared_docs = []
+        async for prepared in preparer.prepare(crawl_results, original_source_id, request, crawl_type):
+            # Check for cancellation as each group of documents comes back
             if cancellation_check:
                 cancellation_check()
-            
-            source_url = doc.get('url', '')
-            markdown_content = doc.get('markdown', '')
-            
-            if not markdown_content:
-                continue
-            
-            # Store full document for code extraction context
-            url_to_full_document[source_url] = markdown_content
-            
-            # CHUNK THE CONTENT
-            chunks = storage_service.smart_chunk_text(markdown_content, chunk_size=5000)
-            
-            # Use the original source_id for all documents
-            source_id = original_source_id
-            safe_logfire_info(f"Using original source_id '{source_id}' for URL '{source_url}'")
-            
-            # Process each chunk
-            for i, chunk in enumerate(chunks):
-                # Check for cancellation during chunk processing
-                if cancellation_check and i % 10 == 0:  # Check every 10 chunks
-                    cancellation_check()
-                
-                all_urls.append(source_url)
-                all_chunk_numbers.append(i)
-                all_contents.append(chunk)
-                
-                # Create metadata for each chunk
-                word_count = len(chunk.split())
-                metadata = {
-                    'url': source_url,
-                    'title': doc.get('title', ''),
-                    'description': doc.get('description', ''),
-                    'source_id': source_id,
-                    'knowledge_type': request.get('knowledge_type', 'documentation'),
-                    'crawl_type': crawl_type,
-                    'word_count': word_count,
-                    'char_count': len(chunk),
-                    'chunk_index': i,
-                    'tags': request.get('tags', [])
-                }
-                all_metadatas.append(metadata)
-                
-                # Accumulate word count
-                source_word_counts[source_id] = source_word_counts.get(source_id, 0) + word_count
-                
-                # Yield control every 10 chunks to prevent event loop blocking
-                if i > 0 and i % 10 == 0:
-                    await asyncio.sleep(0)
-            
-            # Yield control after processing each document
-            if doc_index > 0 and doc_index % 5 == 0:
-                await asyncio.sleep(0)
+            prepared_docs.append(prepared)
+        
+        # Keep the crawl order; groups finish in any order
+        prepared_docs.sort(key=lambda prepared: prepared.index)
+        near_duplicates = await create_simhash_index()
+        for prepared in prepared_docs:
+            if near_duplicates:
+                # Linked chunks are collapsed into their canonical chunk at search time
+                for i, metadata in enumerate(prepared.metadatas):
+                    link_chunk(near_duplicates, metadata, chunk_key(prepared.url, i))
+            all_urls.extend([prepared.url] * len(prepared.chunks))
+            all_chunk_numbers.extend(range(len(prepared.chunks)))
+            all_contents.extend(prepared.chunks)
+            all_metadatas.extend(prepared.metadatas)
+            source_word_counts[original_source_id] = (
+                source_word_counts.get(original_source_id, 0) + prepared.word_count
+            )
         
         # Create/update source record FIRST before storing documents
         if all_contents and all_metadatas:
@@ -164,6 +150,10 @@ class DocumentStorageOperations:
             'source_id': original_source_id
         }
     
+    async def get_document_preparer(self) -> DocumentPreparer:
+        """The preparer set on this instance, or the process-wide one."""
+        return self.document_preparer or await get_document_preparer()
+    
     async def _create_source_records(
         self,
         all_metadatas: List[Dict],
@@ -278,7 +268,8 @@ class DocumentStorageOperations:
         url_to_full_document: Dict[str, str],
         progress_callback: Optional[Callable] = None,
         start_progress: int = 85,
-        end_progress: int = 95
+        end_progress: int = 95,
+        code_index: Optional[CodeBlockIndex] = None
     ) -> int:
         """
         Extract code examples from crawled documents and store them.
@@ -289,6 +280,7 @@ class DocumentStorageOperations:
             progress_callback: Optional callback for progress updates
             start_progress: Starting progress percentage
             end_progress: Ending progress percentage
+            code_index: Code already extracted by this crawl, when it extracts in several calls
             
         Returns:
             Number of code examples stored
@@ -298,7 +290,8 @@ class DocumentStorageOperations:
             url_to_full_document,
             progress_callback,
             start_progress,
-            end_progress
+            end_progress,
+            code_index
         )
         
         return result
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+Domain Profiles
+
+Learns per-domain browser settings from the pages a domain has served. Every
+page otherwise waits a fixed delay_before_return_html and scrolls the full page
+for lazy content. On most sites the content is already complete at
+DOMContentLoaded, so that time is wasted. For the first pages of a domain, and
+again every few hundred pages, the profile renders the page a second time
+without the delay and scroll, then compares the markdown. Once those probes
+agree, later pages of the domain skip the delay and the scroll. Page timeouts
+shrink to a margin above the slowest render seen. A page that times out under
+a shortened timeout is retried with the configured one, and the domain keeps
+the configured timeout from then on.
+
+Profiles are shared by all crawls in the process and saved to a JSON file, so
+future crawls start from what earlier ones learned.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+from .host_scheduler import get_host
+
+logger = get_logger(__name__)
+
+DEFAULT_PROFILE_PATH = os.path.join(tempfile.gettempdir(), "archon-crawl-profiles.json")
+
+# Probe renders of a new domain before its settings are tuned
+PROBE_PAGES = 3
+
+# Consecutive agreeing probes needed to drop the delay and the scroll
+STABLE_PROBES_REQUIRED = 2
+
+# Pages between probes once a domain is profiled
+REPROBE_INTERVAL = 200
+
+# Share of markdown lines two renders must have in common to count as the same content
+STABILITY_THRESHOLD = 0.98
+
+# Successful pages before the page timeout is shortened
+MIN_TIMEOUT_SAMPLES = 5
+
+# Shortened page timeouts are this multiple of the slowest render, within the bounds below
+TIMEOUT_HEADROOM = 4.0
+MIN_PAGE_TIMEOUT_MS = 10000
+
+# Weight of the newest sample in the render time average
+RENDER_TIME_SMOOTHING = 0.3
+
+SAVE_INTERVAL_SECONDS = 30.0
+MAX_PROFILES = 5000
+
+TUNED_CONFIG_CACHE_SIZE = 64
+
+
+@dataclass
+class DomainProfile:
+    """Observed rendering behaviour of one domain"""
+
+    pages: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    render_time: float | None = None
+    max_render_time: float = 0.0
+    probes: int = 0
+    stable_streak: int = 0
+    unstable_probes: int = 0
+    last_probe_page: int = 0
+    keep_page_timeout: bool = False
+    updated_at: float = 0.0
+
+    @property
+    def stable(self) -> bool:
+        return self.stable_streak >= STABLE_PROBES_REQUIRED
+
+
+def _timed_out(result: Any) -> bool:
+    return "timeout" in str(getattr(result, "error_message", "") or "").lower()
+
+
+def _content_lines(result: Any) -> set[str]:
+    markdown = str(getattr(result, "markdown", "") or "")
+    return {line.strip() for line in markdown.splitlines() if line.strip()}
+
+
+def same_content(first: Any, second: Any) -> bool:
+    """Whether two renders of a page produced the same markdown, ignoring small differences."""
+    a = _content_lines(first)
+    b = _content_lines(second)
+    if not a and not b:
+        return True
+    return len(a & b) / len(a | b) >= STABILITY_THRESHOLD
+
+
+class DomainProfileStore:
+    """Per-domain crawl profiles, persisted to a JSON file"""
+
+    def __init__(self, path: str = DEFAULT_PROFILE_PATH):
+        """
+        Initialize the store, loading saved profiles.
+
+        Args:
+            path: JSON file the profiles are loaded from and saved to
+        """
+        self.path = path
+        self._profiles: dict[str, DomainProfile] = {}
+        self._tuned: dict[tuple, tuple[Any, Any]] = {}
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self._load()
+
+    def profile(self, url: str) -> DomainProfile:
+        host = get_host(url)
+        if host not in self._profiles:
+            self._profiles[host] = DomainProfile()
+        return self._profiles[host]
+
+    def tune(self, profile: DomainProfile, config: Any, probing: bool = False) -> Any:
+        """
+        Return the run config adjusted to the domain's profile.
+
+        Args:
+            profile: The domain's profile
+            config: The configured run config
+            probing: Keep the configured delay and scroll, for the render a probe is compared with
+        """
+        delay = getattr(config, "delay_before_return_html", 0) or 0
+        scan = bool(getattr(config, "scan_full_page", False))
+        timeout = getattr(config, "page_timeout", None)
+        if profile.stable and not probing:
+            delay, scan = 0, False
+        if timeout and profile.pages - profile.failures >= MIN_TIMEOUT_SAMPLES and not profile.keep_page_timeout:
+            timeout = int(min(timeout, max(MIN_PAGE_TIMEOUT_MS, profile.max_render_time * TIMEOUT_HEADROOM * 1000)))
+        return self._variant(config, delay_before_return_html=delay, scan_full_page=scan, page_timeout=timeout)
+
+    def start_probe(self, profile: DomainProfile, config: Any) -> Any | None:
+        """
+        Claim a probe of the domain if one is due.
+
+        Returns:
+            The config to probe with (no delay, no scroll), or None when no probe is due
+        """
+        if not getattr(config, "delay_before_return_html", 0) and not getattr(config, "scan_full_page", False):
+            return None
+        due = profile.probes < PROBE_PAGES or profile.pages - profile.last_probe_page >= REPROBE_INTERVAL
+        if not due:
+            return None
+        profile.probes += 1
+        profile.last_probe_page = profile.pages
+        return self._variant(config, delay_before_return_html=0, scan_full_page=False)
+
+    def record_probe(self, profile: DomainProfile, stable: bool) -> None:
+        if stable:
+            profile.stable_streak += 1
+        else:
+            if profile.stable:
+                logger.info("Page content changed after the render delay; restoring the delay for this domain")
+            profile.stable_streak = 0
+            profile.unstable_probes += 1
+        self._touch(profile)
+
+    def record_page(self, profile: DomainProfile, result: Any, elapsed: float) -> None:
+        profile.pages += 1
+        if getattr(result, "success", False):
+            profile.render_time = (
+                elapsed
+                if profile.render_time is None
+                else RENDER_TIME_SMOOTHING * elapsed + (1 - RENDER_TIME_SMOOTHING) * profile.render_time
+            )
+            profile.max_render_time = max(profile.max_render_time, elapsed)
+        else:
+            profile.failures += 1
+            if _timed_out(result):
+                profile.timeouts += 1
+        self._touch(profile)
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            host: {
+                "pages": profile.pages,
+                "failures": profile.failures,
+                "timeouts": profile.timeouts,
+                "render_time": round(profile.render_time, 2) if profile.render_time is not None else None,
+                "stable": profile.stable,
+            }
+            for host, profile in self._profiles.items()
+        }
+
+    async def save(self, force: bool = False) -> None:
+        """Write the profiles to disk if they changed since the last save."""
+        if not self._dirty or (not force and time.monotonic() - self._last_save < SAVE_INTERVAL_SECONDS):
+            return
+        self._dirty = False
+        self._last_save = time.monotonic()
+        recent = sorted(self._profiles.items(), key=lambda item: item[1].updated_at, reverse=True)
+        data = {host: asdict(profile) for host, profile in recent[:MAX_PROFILES]}
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            logger.warning(f"Failed to save crawl domain profiles: {e}")
+
+    # Internal helpers
+
+    def _touch(self, profile: DomainProfile) -> None:
+        profile.updated_at = time.time()
+        self._dirty = True
+
+    def _variant(self, config: Any, **changes) -> Any:
+        """A copy of the config with changes, reused so equal variants are the same object."""
+        if all(getattr(config, name, None) == value for name, value in changes.items()):
+            return config
+        key = (id(config), *sorted(changes.items()))
+        cached = self._tuned.get(key)
+        if cached is not None and cached[0] is config:
+            return cached[1]
+        variant = copy.copy(config)
+        for name, value in changes.items():
+            setattr(variant, name, value)
+        if len(self._tuned) >= TUNED_CONFIG_CACHE_SIZE:
+            self._tuned.clear()
+        self._tuned[key] = (config, variant)
+        return variant
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable crawl domain profiles at {self.path}: {e}")
+            return
+        names = {f.name for f in fields(DomainProfile)}
+        for host, values in data.items():
+            self._profiles[host] = DomainProfile(**{k: v for k, v in values.items() if k in names})
+
+    def _write(self, data: dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class ProfiledCrawler:
+    """Crawler wrapper that renders each page with its domain's tuned settings"""
+
+    def __init__(self, crawler, store: DomainProfileStore):
+        self.crawler = crawler
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.crawler, name)
+
+    async def arun(self, url: str, config=None, **kwargs):
+        if config is None:
+            return await self.crawler.arun(url=url, config=config, **kwargs)
+
+        profile = self.store.profile(url)
+        probe_config = self.store.start_probe(profile, config)
+        probing = probe_config is not None
+        tuned = self.store.tune(profile, config, probing)
+
+        started = time.monotonic()
+        result = await self.crawler.arun(url=url, config=tuned, **kwargs)
+        if _timed_out(result) and getattr(tuned, "page_timeout", None) != getattr(config, "page_timeout", None):
+            logger.info(f"Shortened page timeout was too short for {get_host(url)}, retrying with the configured one")
+            profile.keep_page_timeout = True
+            started = time.monotonic()
+            result = await self.crawler.arun(url=url, config=self.store.tune(profile, config, probing), **kwargs)
+        self.store.record_page(profile, result, time.monotonic() - started)
+
+        if probing and getattr(result, "success", False):
+            try:
+                probe = await self.crawler.arun(url=url, config=probe_config, **kwargs)
+                if getattr(probe, "success", False):
+                    self.store.record_probe(profile, same_content(result, probe))
+            except Exception as e:
+                logger.warning(f"Render probe failed for {url}: {e}")
+        await self.store.save()
+        return result
+
+    async def arun_many(self, urls: list[str], config=None, **kwargs):
+        # One config is shared by the whole batch; per-domain tuning applies to per-page fetches
+        return await self.crawler.arun_many(urls=urls, config=config, **kwargs)
+
+
+def with_domain_profiles(crawler, store: DomainProfileStore | None):
+    """Wrap a crawler so each page is rendered with its domain's profile, if profiles are on."""
+    return ProfiledCrawler(crawler, store) if store else crawler
+
+
+_domain_profiles: DomainProfileStore | None = None
+
+
+async def get_domain_profiles() -> DomainProfileStore | None:
+    """
+    Get the process-wide profile store if CRAWL_DOMAIN_PROFILES is enabled.
+
+    Returns:
+        The store, or None when profiles are off
+    """
+    global _domain_profiles
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load domain profile settings: {e}")
+        settings = {}
+    if str(settings.get("CRAWL_DOMAIN_PROFILES", "true")).lower() != "true":
+        return None
+
+    path = settings.get("CRAWL_DOMAIN_PROFILE_PATH") or DEFAULT_PROFILE_PATH
+    if _domain_profiles is None or _domain_profiles.path != path:
+        _domain_profiles = DomainProfileStore(path)
+    return _domain_profiles
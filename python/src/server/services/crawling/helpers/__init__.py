@@ -6,8 +6,10 @@ This module contains helper utilities for crawling operations.
 
 from .url_handler import URLHandler
 from .site_config import SiteConfig
+from .url_canonicalizer import UrlCanonicalizer
 
 __all__ = [
     'URLHandler',
-    'SiteConfig'
+    'SiteConfig',
+    'UrlCanonicalizer'
 ]
\ No newline at end of file
@@ -10,6 +10,15 @@ from ....config.logfire_config import get_logger
 logger = get_logger(__name__)
 
 
+def code_language(element) -> str:
+    """Language of a code element, from its language- class.
+
+    Module-level so the markdown generator pickles and run configs can be sent
+    to crawl worker processes.
+    """
+    return element.get('class', '').replace('language-', '') if element else ''
+
+
 class SiteConfig:
     """Helper class for site-specific configurations."""
     
@@ -93,6 +102,6 @@ class SiteConfig:
                 "decode_unicode": True,      # Decode unicode characters
                 "strip_empty_lines": False,  # Preserve empty lines in code
                 "preserve_code_formatting": True,  # Custom option if supported
-                "code_language_callback": lambda el: el.get('class', '').replace('language-', '') if el else ''
+                "code_language_callback": code_language
             }
         )
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+URL Canonicalizer Helper
+
+Reduces the many spellings of a page URL to one, so the crawl strategies fetch
+each page once. Canonical URLs are still fetchable: host case, default ports,
+percent-encoding, index files, tracking parameters and parameter order are
+normalized. Identity keys go further and also treat http/https and a trailing
+slash as the same page.
+"""
+import fnmatch
+import re
+from typing import Any, Dict, Iterable, List
+from urllib.parse import parse_qsl, quote, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+
+# Query parameters that never change page content
+DEFAULT_STRIP_PARAMS = (
+    "utm_*",
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_gl",
+    "_hsenc",
+    "_hsmi",
+    "ref_src",
+    "sessionid",
+    "phpsessid",
+    "jsessionid",
+)
+
+INDEX_FILES = ("index.html", "index.htm", "index.php", "default.htm", "default.html", "default.aspx")
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+_PERCENT_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_SESSION_PATH_PARAM = re.compile(r";jsessionid=[^/?#]*", re.IGNORECASE)
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _normalize_escapes(value: str) -> str:
+    """Decode escaped unreserved characters and upper-case the remaining escapes."""
+
+    def _fix(match: re.Match) -> str:
+        char = chr(int(match.group(1), 16))
+        return char if char in _UNRESERVED else f"%{match.group(1).upper()}"
+
+    return _PERCENT_ESCAPE.sub(_fix, value)
+
+
+class UrlCanonicalizer:
+    """Normalizes URLs by configurable rules."""
+
+    def __init__(self, strip_params: Iterable[str] = DEFAULT_STRIP_PARAMS):
+        """
+        Initialize the canonicalizer.
+
+        Args:
+            strip_params: Glob patterns of query parameter names to drop, matched
+                case-insensitively. "*" drops the whole query string.
+        """
+        self.strip_params: List[str] = [p.strip().lower() for p in strip_params if p.strip()]
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "UrlCanonicalizer":
+        """Build a canonicalizer from the CRAWL_URL_STRIP_PARAMS setting (comma separated globs)."""
+        value = settings.get("CRAWL_URL_STRIP_PARAMS")
+        if value is None:
+            return cls()
+        return cls(str(value).split(","))
+
+    def canonicalize(self, url: str) -> str:
+        """
+        Return the canonical, fetchable form of a URL.
+
+        Non-HTTP URLs only lose their fragment.
+        """
+        url = urldefrag(url.strip())[0]
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS:
+            return url
+
+        userinfo, _, hostport = parts.netloc.rpartition("@")
+        hostport = hostport.lower().rstrip(".")
+        if hostport.endswith(DEFAULT_PORTS[scheme]):
+            hostport = hostport[: -len(DEFAULT_PORTS[scheme])]
+        netloc = f"{userinfo}@{hostport}" if userinfo else hostport
+
+        path = _normalize_escapes(_SESSION_PATH_PARAM.sub("", parts.path))
+        if "/./" in path or "/../" in path or path.endswith(("/.", "/..")):
+            path = urlsplit(urljoin(f"{scheme}://{netloc}/", path)).path
+        head, _, last = path.rpartition("/")
+        if last.lower() in INDEX_FILES:
+            path = f"{head}/"
+
+        query = ""
+        if parts.query and "*" not in self.strip_params:
+            params = [
+                (name, value)
+                for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                if not any(fnmatch.fnmatchcase(name.lower(), p) for p in self.strip_params)
+            ]
+            query = urlencode(sorted(params), quote_via=quote, safe="/:@!$'()*,;")
+
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+    def key(self, url: str) -> str:
+        """Identity of a URL: its canonical form on https, without a trailing slash."""
+        canonical = self.canonicalize(url)
+        parts = urlsplit(canonical)
+        if parts.scheme not in DEFAULT_PORTS:
+            return canonical
+        return urlunsplit(("https", parts.netloc, parts.path.rstrip("/"), parts.query, ""))
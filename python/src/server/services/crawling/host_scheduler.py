@@ -0,0 +1,316 @@
+"""
+Host Scheduler
+
+Shares crawl capacity between all running crawls on a per-host basis. Each host
+gets a concurrency window that grows additively while its pages come back fast
+and shrinks multiplicatively (AIMD) when it answers 429/503, times out or slows
+down. URLs are handed to the crawler as soon as their host has room, so a slow
+or throttling host never holds sessions that other hosts could use, and two
+crawls of the same host share one window instead of doubling the load on it.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+from urllib.parse import urlparse
+
+import psutil
+
+from ...config.logfire_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_INITIAL_WINDOW = 2
+DEFAULT_MAX_WINDOW = 10
+DEFAULT_SLOW_LATENCY_SECONDS = 10.0
+MIN_WINDOW = 1.0
+
+# Window multiplier applied on throttling, timeouts and slow responses
+DECREASE_FACTOR = 0.5
+
+# Weight of the newest sample in the per-host latency average
+LATENCY_SMOOTHING = 0.3
+
+# Pause before retrying a host that answered 429/503 without a usable Retry-After
+THROTTLE_BACKOFF_SECONDS = 5.0
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+@dataclass
+class HostWindow:
+    """Concurrency window and recent behaviour of one host"""
+
+    limit: float
+    in_flight: int = 0
+    latency: float | None = None
+    blocked_until: float = 0.0
+    last_decrease: float = 0.0
+    pages: int = 0
+    throttled: int = 0
+    timeouts: int = 0
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+def get_host(url: str) -> str:
+    """Host key used for scheduling; URLs without a host share one window."""
+    return urlparse(url).netloc.lower()
+
+
+class HostScheduler:
+    """Per-host AIMD concurrency windows shared by all crawls in the process"""
+
+    def __init__(
+        self,
+        initial_window: int = DEFAULT_INITIAL_WINDOW,
+        max_window: int = DEFAULT_MAX_WINDOW,
+        slow_latency: float = DEFAULT_SLOW_LATENCY_SECONDS,
+    ):
+        self.initial_window = initial_window
+        self.max_window = max_window
+        self.slow_latency = slow_latency
+        self._windows: dict[str, HostWindow] = {}
+
+    def configure(self, settings: dict[str, Any]) -> None:
+        """Apply window settings from the rag_strategy settings category."""
+        self.initial_window = max(1, int(settings.get("CRAWL_HOST_INITIAL_CONCURRENCY", self.initial_window)))
+        self.max_window = max(self.initial_window, int(settings.get("CRAWL_HOST_MAX_CONCURRENCY", self.max_window)))
+        self.slow_latency = float(settings.get("CRAWL_HOST_SLOW_LATENCY", self.slow_latency))
+
+    def window(self, host: str) -> HostWindow:
+        if host not in self._windows:
+            self._windows[host] = HostWindow(limit=float(self.initial_window))
+        return self._windows[host]
+
+    async def acquire(self, host: str) -> None:
+        """Wait until the host's window has room and it is not backing off."""
+        window = self.window(host)
+        async with window.condition:
+            while True:
+                wait = window.blocked_until - time.monotonic()
+                if wait <= 0 and window.in_flight < int(window.limit):
+                    break
+                try:
+                    await asyncio.wait_for(window.condition.wait(), timeout=wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            window.in_flight += 1
+
+    async def release(
+        self,
+        host: str,
+        latency: float,
+        status_code: int | None = None,
+        timed_out: bool = False,
+        retry_after: str | None = None,
+    ) -> None:
+        """Return a slot and adjust the host's window from the response."""
+        window = self.window(host)
+        async with window.condition:
+            window.in_flight = max(0, window.in_flight - 1)
+            now = time.monotonic()
+
+            if status_code in THROTTLE_STATUS_CODES:
+                window.throttled += 1
+                window.blocked_until = max(window.blocked_until, now + self._backoff(retry_after))
+                self._decrease(host, window, now, f"HTTP {status_code}")
+            elif timed_out:
+                window.timeouts += 1
+                self._decrease(host, window, now, "timeout")
+            else:
+                window.pages += 1
+                window.latency = (
+                    latency
+                    if window.latency is None
+                    else LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * window.latency
+                )
+                if window.latency > self.slow_latency:
+                    self._decrease(host, window, now, f"latency {window.latency:.1f}s")
+                elif window.limit < self.max_window:
+                    # Additive increase: about one extra slot per window's worth of responses
+                    window.limit = min(float(self.max_window), window.limit + 1 / window.limit)
+
+            window.condition.notify_all()
+
+    async def fetch(
+        self,
+        crawler,
+        url: str,
+        config,
+        crawl_slots: asyncio.Semaphore,
+        memory_threshold: float | None = None,
+        check_interval: float = 0.5,
+        fast_path=None,
+        markdown_generator=None,
+        page_cache=None,
+    ) -> Any:
+        """
+        Crawl one URL under its host window.
+
+        Args:
+            crawler: The Crawl4AI crawler instance
+            url: URL to crawl
+            config: CrawlerRunConfig for the page
+            crawl_slots: Semaphore bounding the calling crawl's concurrent pages across all hosts
+            memory_threshold: Hold the page while system memory use is above this percentage
+            check_interval: Seconds between memory checks while holding
+            fast_path: Optional HttpFastPath tried before the browser
+            markdown_generator: Markdown generator the fast path converts pages with
+            page_cache: Optional PageCache; cached pages are returned without taking a slot
+
+        Returns:
+            The crawl result; crawler errors are returned as a failed result
+        """
+        if page_cache:
+            cached = await page_cache.get(url)
+            if cached is not None:
+                return cached
+            result = await self.fetch(
+                crawler,
+                url,
+                config,
+                crawl_slots,
+                memory_threshold=memory_threshold,
+                check_interval=check_interval,
+                fast_path=fast_path,
+                markdown_generator=markdown_generator,
+            )
+            await page_cache.put(url, result)
+            return result
+
+        host = get_host(url)
+        # Take the host slot first so URLs waiting on a busy host do not hold crawl slots
+        await self.acquire(host)
+        latency = 0.0
+        status_code = None
+        timed_out = False
+        retry_after = None
+        try:
+            async with crawl_slots:
+                while memory_threshold and psutil.virtual_memory().percent > memory_threshold:
+                    await asyncio.sleep(check_interval)
+                started = time.monotonic()
+                try:
+                    result = None
+                    if fast_path:
+                        result = await fast_path.fetch(url, markdown_generator)
+                    if result is None:
+                        result = await crawler.arun(url=url, config=config)
+                except Exception as e:
+                    result = SimpleNamespace(
+                        url=url, success=False, markdown=None, html=None, error_message=str(e)
+                    )
+                latency = time.monotonic() - started
+            status_code = getattr(result, "status_code", None)
+            timed_out = "timeout" in str(getattr(result, "error_message", "") or "").lower()
+            headers = getattr(result, "response_headers", None) or {}
+            retry_after = {k.lower(): v for k, v in headers.items()}.get("retry-after")
+            return result
+        finally:
+            await self.release(host, latency, status_code, timed_out, retry_after)
+
+    async def crawl(
+        self,
+        crawler,
+        urls: list[str],
+        config,
+        max_concurrent: int,
+        memory_threshold: float | None = None,
+        check_interval: float = 0.5,
+        fast_path=None,
+        markdown_generator=None,
+        page_cache=None,
+    ) -> AsyncIterator[Any]:
+        """
+        Crawl URLs under the host windows, yielding results as they complete.
+
+        Args:
+            crawler: The Crawl4AI crawler instance
+            urls: URLs to crawl
+            config: CrawlerRunConfig used for every URL
+            max_concurrent: Upper bound on this crawl's concurrent pages across all hosts
+            memory_threshold: Hold new pages while system memory use is above this percentage
+            check_interval: Seconds between memory checks while holding
+            fast_path: Optional HttpFastPath tried before the browser
+            markdown_generator: Markdown generator the fast path converts pages with
+            page_cache: Optional PageCache served from and filled before the host windows
+
+        Yields:
+            Crawl results in completion order
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        crawl_slots = asyncio.Semaphore(max(1, max_concurrent))
+
+        async def _crawl_one(url: str) -> None:
+            try:
+                result = await self.fetch(
+                    crawler,
+                    url,
+                    config,
+                    crawl_slots,
+                    memory_threshold=memory_threshold,
+                    check_interval=check_interval,
+                    fast_path=fast_path,
+                    markdown_generator=markdown_generator,
+                    page_cache=page_cache,
+                )
+            except BaseException:
+                await results.put(None)
+                raise
+            await results.put(result)
+
+        tasks = [asyncio.create_task(_crawl_one(url)) for url in urls]
+        try:
+            for _ in tasks:
+                result = await results.get()
+                if result is not None:
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            host: {
+                "window": round(window.limit, 2),
+                "in_flight": window.in_flight,
+                "latency": round(window.latency, 2) if window.latency is not None else None,
+                "pages": window.pages,
+                "throttled": window.throttled,
+                "timeouts": window.timeouts,
+            }
+            for host, window in self._windows.items()
+        }
+
+    # Internal helpers
+
+    def _decrease(self, host: str, window: HostWindow, now: float, reason: str) -> None:
+        # Responses already in flight report the same congestion; shrink once per round trip
+        if now - window.last_decrease < max(window.latency or 0.0, 1.0):
+            return
+        window.last_decrease = now
+        window.limit = max(MIN_WINDOW, window.limit * DECREASE_FACTOR)
+        logger.info(f"Reducing crawl concurrency for {host} to {int(window.limit)} ({reason})")
+
+    @staticmethod
+    def _backoff(retry_after: str | None) -> float:
+        try:
+            return min(max(float(retry_after), 0.0), MAX_RETRY_AFTER_SECONDS)
+        except (TypeError, ValueError):
+            return THROTTLE_BACKOFF_SECONDS
+
+
+_host_scheduler: HostScheduler | None = None
+
+
+def get_host_scheduler() -> HostScheduler:
+    """Get the process-wide host scheduler."""
+    global _host_scheduler
+    if _host_scheduler is None:
+        _host_scheduler = HostScheduler()
+    return _host_scheduler
@@ -0,0 +1,169 @@
+"""
+HTML Spool
+
+Keeps the raw HTML of crawled pages out of memory until code extraction needs
+it. Rendered HTML is often many times the size of a page's markdown, so a large
+crawl holding it in its results can use gigabytes. Each crawl appends the HTML,
+zlib-compressed, to one file in its own temporary directory and carries small
+SpooledHtml handles in its results instead. Handles are read back lazily through
+a memory map, and the directory is removed when the crawl ends.
+"""
+
+import asyncio
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+
+logger = get_logger(__name__)
+
+# Fast compression; markup compresses well even at the lowest levels
+COMPRESSION_LEVEL = 1
+
+
+class SpooledHtml:
+    """Handle to one page's HTML in an HtmlSpool"""
+
+    __slots__ = ("_spool", "offset", "length", "size")
+
+    def __init__(self, spool: "HtmlSpool", offset: int, length: int, size: int):
+        self._spool = spool
+        self.offset = offset
+        self.length = length
+        # Length of the HTML in characters
+        self.size = size
+
+    def read(self) -> str:
+        return self._spool.read(self.offset, self.length)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"SpooledHtml(offset={self.offset}, size={self.size})"
+
+
+def _remove_spool(file, directory: str) -> None:
+    file.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class HtmlSpool:
+    """Append-only compressed HTML store for one crawl"""
+
+    def __init__(self, directory: str | None = None):
+        """
+        Initialize the spool.
+
+        Args:
+            directory: Parent directory of the spool's temporary directory; defaults
+                to the system temp directory
+        """
+        self.directory = tempfile.mkdtemp(prefix="archon-html-spool-", dir=directory)
+        self._file = open(os.path.join(self.directory, "html.spool"), "w+b")
+        self._finalizer = weakref.finalize(self, _remove_spool, self._file, self.directory)
+        self._lock = threading.Lock()
+        self._map: mmap.mmap | None = None
+        self.bytes = 0
+        self.pages = 0
+        self.html_bytes = 0
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    async def store(self, html: str) -> SpooledHtml:
+        """Compress and append a page's HTML, returning its handle."""
+        return await asyncio.to_thread(self._append, html)
+
+    def read(self, offset: int, length: int) -> str:
+        """Decompress the HTML stored at offset."""
+        with self._lock:
+            if self.closed:
+                raise ValueError("HTML spool is closed")
+            if self._map is None or offset + length > len(self._map):
+                if self._map is not None:
+                    self._map.close()
+                self._file.flush()
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._map[offset : offset + length]
+        return zlib.decompress(data).decode("utf-8")
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"pages": self.pages, "bytes": self.bytes, "html_bytes": self.html_bytes}
+
+    def close(self) -> None:
+        """Remove the spool; handles can no longer be read."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._finalizer()
+
+    # Internal helpers
+
+    def _append(self, html: str) -> SpooledHtml:
+        raw = html.encode("utf-8")
+        data = zlib.compress(raw, COMPRESSION_LEVEL)
+        with self._lock:
+            if self.closed:
+                raise ValueError("HTML spool is closed")
+            offset = self.bytes
+            self._file.seek(offset)
+            self._file.write(data)
+            self.bytes += len(data)
+            self.pages += 1
+            self.html_bytes += len(raw)
+        return SpooledHtml(self, offset, len(data), len(html))
+
+
+async def spool_html(spool: HtmlSpool | None, html: str | None) -> "SpooledHtml | str | None":
+    """
+    Move a page's HTML into the spool, if there is one.
+
+    Returns:
+        A SpooledHtml handle, or the HTML itself when there is no spool or it fails
+    """
+    if spool is None or not html:
+        return html
+    try:
+        return await spool.store(html)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not spool page HTML, keeping it in memory: {e}")
+        return html
+
+
+def read_html(html: "SpooledHtml | str | None") -> str:
+    """Resolve a page's html field, which may be a spool handle, to a string."""
+    if isinstance(html, SpooledHtml):
+        return html.read()
+    return html or ""
+
+
+async def create_html_spool() -> HtmlSpool | None:
+    """
+    Create a spool for one crawl if CRAWL_HTML_SPOOL is enabled.
+
+    Returns:
+        The spool, or None when spooling is off or the directory cannot be created
+    """
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load HTML spool settings: {e}")
+        settings = {}
+    if str(settings.get("CRAWL_HTML_SPOOL", "true")).lower() != "true":
+        return None
+
+    try:
+        return HtmlSpool(settings.get("CRAWL_HTML_SPOOL_DIR") or None)
+    except OSError as e:
+        logger.error(f"HTML spool unavailable, keeping page HTML in memory: {e}")
+        return None
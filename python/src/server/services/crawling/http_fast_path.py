@@ -0,0 +1,272 @@
+"""
+HTTP Fast Path
+
+Fetches pages with a pooled HTTP client and converts them to markdown with the
+crawler's own markdown generator, skipping the headless browser. Pages that
+look like they need JavaScript to render (an empty body, an empty SPA root, a
+"please enable JavaScript" notice) are escalated to the browser. Hosts that keep
+needing the browser are remembered so their later pages go straight to it.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from types import SimpleNamespace
+from typing import Any
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import httpx
+
+from ...config.logfire_config import get_logger
+from .host_scheduler import THROTTLE_STATUS_CODES
+
+logger = get_logger(__name__)
+
+FETCH_TIMEOUT = 15.0
+MAX_CONNECTIONS = 100
+USER_AGENT = "Mozilla/5.0 (compatible; ArchonCrawler/1.0)"
+
+# Pages with less visible text than this are assumed to be rendered client-side
+MIN_TEXT_CHARS = 200
+
+# A host goes straight to the browser after this many escalations outnumbering its fast fetches
+BROWSER_TIER_ESCALATIONS = 3
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# Empty mount points of common client-side frameworks
+_EMPTY_SPA_ROOT = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt|___gatsby|svelte)[\"'][^>]*>\s*</div>", re.IGNORECASE
+)
+_NOSCRIPT_WARNING = re.compile(r"(enable|requires?|turn on)\s+javascript", re.IGNORECASE)
+
+
+class _PageScanner(HTMLParser):
+    """Collects visible text size, noscript text and links in one pass."""
+
+    _HIDDEN = {"script", "style", "template", "noscript", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text_chars = 0
+        self.noscript_text = []
+        self.hrefs = []
+        self._hidden_depth = 0
+        self._in_noscript = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._HIDDEN:
+            self._hidden_depth += 1
+            self._in_noscript = self._in_noscript or tag == "noscript"
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in self._HIDDEN and self._hidden_depth:
+            self._hidden_depth -= 1
+            if tag == "noscript":
+                self._in_noscript = False
+
+    def handle_data(self, data):
+        if self._in_noscript:
+            self.noscript_text.append(data)
+        elif not self._hidden_depth:
+            self.text_chars += len(data.strip())
+
+
+@dataclass
+class _HostTier:
+    fast: int = 0
+    escalated: int = 0
+
+    @property
+    def needs_browser(self) -> bool:
+        return self.escalated >= BROWSER_TIER_ESCALATIONS and self.escalated > self.fast
+
+
+def _scan(html: str) -> _PageScanner | None:
+    scanner = _PageScanner()
+    try:
+        scanner.feed(html)
+        scanner.close()
+    except Exception:
+        return None
+    return scanner
+
+
+def needs_javascript(html: str, scanner: _PageScanner | None = None) -> str | None:
+    """
+    Decide whether a statically fetched page needs a browser to render.
+
+    Returns:
+        The reason to escalate, or None if the static HTML is usable
+    """
+    scanner = scanner or _scan(html)
+    if scanner is None:
+        return "unparseable html"
+    if _EMPTY_SPA_ROOT.search(html) and scanner.text_chars < MIN_TEXT_CHARS * 5:
+        return "empty SPA root"
+    if _NOSCRIPT_WARNING.search(" ".join(scanner.noscript_text)) and scanner.text_chars < MIN_TEXT_CHARS * 5:
+        return "noscript warning"
+    if scanner.text_chars < MIN_TEXT_CHARS:
+        return "empty body"
+    return None
+
+
+def extract_links(
+    html: str, base_url: str, scanner: _PageScanner | None = None
+) -> dict[str, list[dict[str, str]]]:
+    """Extract links in the same shape as crawl4ai results: {"internal": [...], "external": [...]}."""
+    scanner = scanner or _scan(html)
+    if scanner is None:
+        return {"internal": [], "external": []}
+
+    host = urlparse(base_url).netloc.lower().removeprefix("www.")
+    links: dict[str, list[dict[str, str]]] = {"internal": [], "external": []}
+    seen = set()
+    for href in scanner.hrefs:
+        if href.startswith(("mailto:", "javascript:", "tel:", "#")):
+            continue
+        absolute = urldefrag(urljoin(base_url, href))[0]
+        parsed = urlparse(absolute)
+        if parsed.scheme not in ("http", "https") or absolute in seen:
+            continue
+        seen.add(absolute)
+        kind = "internal" if parsed.netloc.lower().removeprefix("www.") == host else "external"
+        links[kind].append({"href": absolute})
+    return links
+
+
+class HttpFastPath:
+    """Tiered fetcher: plain HTTP first, the browser only when a page needs it"""
+
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self._tiers: dict[str, _HostTier] = {}
+        self.pages_fast = 0
+        self.pages_escalated = 0
+
+    def wants_browser(self, url: str) -> bool:
+        """Whether the URL's host has been learned to need the browser."""
+        tier = self._tiers.get(urlparse(url).netloc.lower())
+        return bool(tier and tier.needs_browser)
+
+    async def fetch(self, url: str, markdown_generator) -> Any | None:
+        """
+        Fetch a page without the browser.
+
+        Args:
+            url: The page URL
+            markdown_generator: The crawler's markdown generator, so output matches browser crawls
+
+        Returns:
+            A crawl4ai-like result, or None if the page should be crawled with the browser
+        """
+        if self.wants_browser(url):
+            return None
+
+        host = urlparse(url).netloc.lower()
+        tier = self._tiers.setdefault(host, _HostTier())
+        try:
+            response = await self._get_client().get(url)
+        except httpx.HTTPError as e:
+            logger.debug(f"Fast path fetch failed for {url}, using browser: {e}")
+            return None
+
+        if response.status_code in THROTTLE_STATUS_CODES:
+            # The browser would be throttled too; report it so the host window backs off
+            return SimpleNamespace(
+                url=url,
+                success=False,
+                markdown=None,
+                html=None,
+                links={},
+                status_code=response.status_code,
+                response_headers=dict(response.headers),
+                error_message=f"HTTP {response.status_code}",
+            )
+
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        # Errors, redirects to non-HTML and binary content are left to the browser as before
+        if response.status_code != 200 or content_type not in HTML_CONTENT_TYPES:
+            return None
+
+        html = response.text
+        final_url = str(response.url)
+        # Parsing and markdown conversion are CPU work, so keep them off the event loop
+        reason, markdown, links = await asyncio.to_thread(
+            self._render, html, final_url, markdown_generator
+        )
+        if reason:
+            tier.escalated += 1
+            self.pages_escalated += 1
+            if tier.needs_browser and tier.escalated == BROWSER_TIER_ESCALATIONS:
+                logger.info(f"Crawling {host} with the browser from now on ({reason})")
+            return None
+
+        tier.fast += 1
+        self.pages_fast += 1
+        return SimpleNamespace(
+            url=url,
+            success=True,
+            markdown=markdown,
+            html=html,
+            links=links,
+            status_code=response.status_code,
+            response_headers=dict(response.headers),
+            error_message=None,
+        )
+
+    @staticmethod
+    def _render(html: str, url: str, markdown_generator) -> tuple[str | None, str, dict]:
+        scanner = _scan(html)
+        reason = needs_javascript(html, scanner)
+        if reason:
+            return reason, "", {}
+        generated = markdown_generator.generate_markdown(input_html=html, base_url=url)
+        markdown = getattr(generated, "raw_markdown", generated) or ""
+        if len(markdown.strip()) < MIN_TEXT_CHARS:
+            return "empty markdown", "", {}
+        return None, markdown, extract_links(html, url, scanner)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "pages_fast": self.pages_fast,
+            "pages_escalated": self.pages_escalated,
+            "browser_hosts": sorted(h for h, t in self._tiers.items() if t.needs_browser),
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=FETCH_TIMEOUT,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+            )
+        return self._client
+
+
+_http_fast_path: HttpFastPath | None = None
+
+
+def get_http_fast_path() -> HttpFastPath:
+    """Get the process-wide HTTP fast path."""
+    global _http_fast_path
+    if _http_fast_path is None:
+        _http_fast_path = HttpFastPath()
+    return _http_fast_path
+
+
+async def close_http_fast_path() -> None:
+    """Close the fast path's pooled HTTP client."""
+    if _http_fast_path is not None:
+        await _http_fast_path.close()
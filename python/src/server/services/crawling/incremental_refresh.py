@@ -0,0 +1,417 @@
+"""
+Incremental Refresh
+
+Tracks a version record per crawled URL (ETag, Last-Modified, content hash and
+internal links) so a refresh can skip pages that have not changed. Before a page
+is crawled, a conditional request checks it against the stored validators. After
+a page is crawled, its content hash is compared with the stored one. Pages that
+answer 404 or 410 are tombstoned and their chunks removed. Pages the refresh no
+longer reaches are only tombstoned when the crawl was complete: no page budget
+cut it short and no page failed, since either can leave live pages unreached.
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+
+from ...config.logfire_config import safe_logfire_error, safe_logfire_info
+
+PAGE_VERSIONS_TABLE = "archon_page_versions"
+
+CONDITIONAL_REQUEST_CONCURRENCY = 10
+CONDITIONAL_REQUEST_TIMEOUT = 10.0
+LOAD_PAGE_SIZE = 1000
+SAVE_BATCH_SIZE = 500
+
+# Responses that mean the page is gone for good
+GONE_STATUS_CODES = (404, 410)
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of page or chunk content."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_cache_validators(headers: dict[str, str] | None) -> dict[str, str | None]:
+    """Pull the ETag and Last-Modified validators out of response headers."""
+    lowered = {k.lower(): v for k, v in (headers or {}).items()}
+    return {"etag": lowered.get("etag"), "last_modified": lowered.get("last-modified")}
+
+
+class PageVersionTracker:
+    """Per-source page versions used to skip unchanged pages on refresh"""
+
+    def __init__(self, supabase_client, source_id: str, incremental: bool = False):
+        """
+        Initialize the tracker.
+
+        Args:
+            supabase_client: The Supabase client for database operations
+            source_id: The source whose pages are tracked
+            incremental: Skip unchanged pages and tombstone removed ones. When False,
+                versions are only recorded so a later refresh can be incremental.
+        """
+        self.supabase_client = supabase_client
+        self.source_id = source_id
+        self.incremental = incremental
+
+        self.pages_unchanged = 0
+        self.pages_changed = 0
+        self.pages_new = 0
+        self.pages_removed = 0
+
+        self._versions: dict[str, dict[str, Any]] = {}
+        self._updates: dict[str, dict[str, Any]] = {}
+        self._seen: set[str] = set()
+        self._unchanged: set[str] = set()
+        self._attempted: set[str] = set()
+        self._reached: set[str] = set()
+        self._failed: set[str] = set()
+        self._gone: set[str] = set()
+        self._budget_reached = False
+
+    async def load(self) -> None:
+        """Load the stored versions for the source."""
+        if not self.source_id:
+            return
+
+        def _query(start: int):
+            return (
+                self.supabase_client.table(PAGE_VERSIONS_TABLE)
+                .select(
+                    "url, etag, last_modified, content_hash, word_count, links, status, "
+                    "last_checked_at, last_changed_at"
+                )
+                .eq("source_id", self.source_id)
+                .range(start, start + LOAD_PAGE_SIZE - 1)
+                .execute()
+            )
+
+        try:
+            start = 0
+            while True:
+                response = await asyncio.to_thread(_query, start)
+                rows = response.data or []
+                for row in rows:
+                    self._versions[row["url"]] = row
+                if len(rows) < LOAD_PAGE_SIZE:
+                    break
+                start += LOAD_PAGE_SIZE
+        except Exception as e:
+            # Without versions every page counts as new, which is a full refresh
+            safe_logfire_error(f"Failed to load page versions for '{self.source_id}': {e}")
+            self._versions = {}
+
+        safe_logfire_info(
+            f"Loaded page versions | source_id={self.source_id} | pages={len(self._versions)} | "
+            f"incremental={self.incremental}"
+        )
+
+    def has_versions(self) -> bool:
+        """Whether the source has been crawled with version tracking before."""
+        return bool(self._versions)
+
+    def has_version(self, url: str) -> bool:
+        """Whether the URL was stored by a previous crawl."""
+        version = self._versions.get(url)
+        return bool(version and version.get("status") == "active")
+
+    def mark_reached(self, urls: list[str]) -> None:
+        """
+        Record URLs that exist but have no page to observe, so they are not tombstoned.
+
+        These are URLs reached by an earlier run of a resumed crawl and pages that were
+        crawled successfully but had no content.
+        """
+        self._reached.update(urls)
+
+    def mark_failed(self, url: str) -> None:
+        """Record a URL whose crawl failed, so pages only linked from it are not tombstoned."""
+        self._failed.add(url)
+
+    def mark_budget_reached(self) -> None:
+        """Record that the page budget stopped the crawl before it reached every page."""
+        self._budget_reached = True
+
+    async def find_unchanged(self, urls: list[str]) -> dict[str, list[str]]:
+        """
+        Check URLs against their stored validators with conditional requests.
+
+        Args:
+            urls: URLs about to be crawled
+
+        Returns:
+            The URLs that do not need crawling, mapped to their known internal links
+        """
+        self._attempted.update(urls)
+        if not self.incremental:
+            return {}
+
+        candidates = [
+            url
+            for url in urls
+            if self.has_version(url)
+            and (self._versions[url].get("etag") or self._versions[url].get("last_modified"))
+        ]
+        if not candidates:
+            return {}
+
+        semaphore = asyncio.Semaphore(CONDITIONAL_REQUEST_CONCURRENCY)
+        unchanged: dict[str, list[str]] = {}
+
+        async def _check(client: httpx.AsyncClient, url: str) -> None:
+            version = self._versions[url]
+            headers = {}
+            if version.get("etag"):
+                headers["If-None-Match"] = version["etag"]
+            if version.get("last_modified"):
+                headers["If-Modified-Since"] = version["last_modified"]
+
+            async with semaphore:
+                try:
+                    # Only the status line and headers are needed, so the body is never read
+                    async with client.stream("GET", url, headers=headers) as response:
+                        status = response.status_code
+                        etag = response.headers.get("etag")
+                except httpx.HTTPError:
+                    return
+
+            if status in GONE_STATUS_CODES:
+                self._gone.add(url)
+                unchanged[url] = []
+            elif status == 304 or (etag and etag == version.get("etag")):
+                self._mark_unchanged(url)
+                unchanged[url] = list(version.get("links") or [])
+
+        async with httpx.AsyncClient(
+            timeout=CONDITIONAL_REQUEST_TIMEOUT, follow_redirects=True
+        ) as client:
+            await asyncio.gather(*(_check(client, url) for url in candidates))
+
+        return unchanged
+
+    def unchanged_since(self, url: str, lastmod: datetime | None) -> bool:
+        """
+        Check a sitemap lastmod against the time the URL was last checked.
+
+        Returns:
+            True if the page has not changed since then; it is then recorded as unchanged
+        """
+        if not self.incremental or not lastmod or not self.has_version(url):
+            return False
+        checked = self._versions[url].get("last_checked_at")
+        if not checked:
+            return False
+        try:
+            checked_at = datetime.fromisoformat(str(checked).replace("Z", "+00:00"))
+        except ValueError:
+            return False
+        if checked_at.tzinfo is None:
+            checked_at = checked_at.replace(tzinfo=timezone.utc)
+        if lastmod > checked_at:
+            return False
+        self._attempted.add(url)
+        self._mark_unchanged(url)
+        return True
+
+    def observe(self, page: dict[str, Any]) -> str:
+        """
+        Record a crawled page and classify it against its stored version.
+
+        Returns:
+            "new", "changed" or "unchanged"
+        """
+        url = page.get("url", "")
+        page_hash = content_hash(page.get("markdown", ""))
+        version = self._versions.get(url)
+        self._seen.add(url)
+
+        if version and version.get("status") == "active" and version.get("content_hash") == page_hash:
+            self._mark_unchanged(url, page)
+            return "unchanged"
+
+        state = "changed" if self.has_version(url) else "new"
+        if state == "changed":
+            self.pages_changed += 1
+        else:
+            self.pages_new += 1
+
+        now = datetime.now(timezone.utc).isoformat()
+        self._updates[url] = {
+            "source_id": self.source_id,
+            "url": url,
+            **self._validators(page),
+            "content_hash": page_hash,
+            "word_count": len(page.get("markdown", "").split()),
+            "links": page.get("links") or [],
+            "status": "active",
+            "last_checked_at": now,
+            "last_changed_at": now,
+            "removed_at": None,
+        }
+        return state
+
+    async def get_reusable_chunks(self, url: str) -> dict[str, dict[str, Any]]:
+        """
+        Load the stored chunks of a changed page, keyed by chunk hash.
+
+        Chunks whose hash is unchanged can be stored again without re-embedding.
+        """
+        if not self.incremental or not self.has_version(url):
+            return {}
+        try:
+            response = await asyncio.to_thread(
+                lambda: self.supabase_client.table("archon_crawled_pages")
+                .select("content, metadata, embedding")
+                .eq("url", url)
+                .execute()
+            )
+        except Exception as e:
+            safe_logfire_error(f"Failed to load stored chunks for {url}: {e}")
+            return {}
+
+        reusable = {}
+        for row in response.data or []:
+            chunk_hash = (row.get("metadata") or {}).get("chunk_hash")
+            if chunk_hash and row.get("embedding") is not None:
+                reusable.setdefault(chunk_hash, row)
+        return reusable
+
+    async def save(self, tombstone: bool = False) -> dict[str, int]:
+        """
+        Persist version changes and, for incremental refreshes, tombstone removed pages.
+
+        Args:
+            tombstone: Tombstone active pages that were not reached by this crawl, if
+                the crawl was complete; pages that answered 404 or 410 are always tombstoned
+
+        Returns:
+            Counts of new, changed, unchanged and removed pages
+        """
+        removed = set(self._gone)
+        if tombstone and self.incremental:
+            incomplete = self._incomplete_reason()
+            if incomplete:
+                safe_logfire_info(
+                    f"Keeping pages this crawl did not reach | source_id={self.source_id} | {incomplete}"
+                )
+            else:
+                reached = self._seen | self._attempted | self._reached
+                removed |= {
+                    url
+                    for url, version in self._versions.items()
+                    if version.get("status") == "active" and url not in reached
+                }
+        if removed:
+            await self._tombstone(sorted(removed))
+
+        rows = list(self._updates.values())
+        try:
+            for i in range(0, len(rows), SAVE_BATCH_SIZE):
+                batch = rows[i : i + SAVE_BATCH_SIZE]
+                await asyncio.to_thread(
+                    lambda batch=batch: self.supabase_client.table(PAGE_VERSIONS_TABLE)
+                    .upsert(batch, on_conflict="source_id,url")
+                    .execute()
+                )
+        except Exception as e:
+            safe_logfire_error(f"Failed to save page versions for '{self.source_id}': {e}")
+
+        if self.incremental:
+            # Unchanged pages were never chunked, so the source total comes from the versions
+            await self._update_source_word_count(removed)
+
+        stats = self.get_stats()
+        safe_logfire_info(f"Page versions saved | source_id={self.source_id} | {stats}")
+        return stats
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "pages_new": self.pages_new,
+            "pages_changed": self.pages_changed,
+            "pages_unchanged": self.pages_unchanged,
+            "pages_removed": self.pages_removed,
+        }
+
+    # Internal helpers
+
+    def _incomplete_reason(self) -> str | None:
+        """Why pages this crawl did not reach may still exist, or None if the crawl was complete."""
+        if self._budget_reached:
+            return "the page budget was reached"
+        failed = self._failed - self._seen
+        if failed:
+            # A failed page's links were never followed, so its whole subtree may be unreached
+            return f"{len(failed)} pages failed"
+        return None
+
+    @staticmethod
+    def _validators(page: dict[str, Any]) -> dict[str, str | None]:
+        return {"etag": page.get("etag"), "last_modified": page.get("last_modified")}
+
+    def _mark_unchanged(self, url: str, page: dict[str, Any] | None = None) -> None:
+        if url not in self._unchanged:
+            self._unchanged.add(url)
+            self.pages_unchanged += 1
+        self._seen.add(url)
+        version = self._versions[url]
+        # Upserted rows must all carry the same columns, so unchanged pages repeat their stored values
+        update = {
+            "source_id": self.source_id,
+            "url": url,
+            "etag": version.get("etag"),
+            "last_modified": version.get("last_modified"),
+            "content_hash": version.get("content_hash"),
+            "word_count": version.get("word_count") or 0,
+            "links": version.get("links") or [],
+            "status": "active",
+            "last_checked_at": datetime.now(timezone.utc).isoformat(),
+            "last_changed_at": version.get("last_changed_at"),
+            "removed_at": None,
+        }
+        if page is not None:
+            # Refresh validators and links from the page we just fetched
+            update.update({k: v for k, v in self._validators(page).items() if v})
+            if page.get("links"):
+                update["links"] = page["links"]
+        self._updates[url] = update
+
+    async def _update_source_word_count(self, removed: set[str]) -> None:
+        pages = {**self._versions, **self._updates}
+        total = sum(
+            page.get("word_count") or 0
+            for url, page in pages.items()
+            if page.get("status") == "active" and url not in removed
+        )
+        try:
+            await asyncio.to_thread(
+                lambda: self.supabase_client.table("archon_sources")
+                .update({"total_word_count": total})
+                .eq("source_id", self.source_id)
+                .execute()
+            )
+        except Exception as e:
+            safe_logfire_error(f"Failed to update word count for source '{self.source_id}': {e}")
+
+    async def _tombstone(self, urls: list[str]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        try:
+            for i in range(0, len(urls), SAVE_BATCH_SIZE):
+                batch = urls[i : i + SAVE_BATCH_SIZE]
+
+                def _remove(batch=batch):
+                    self.supabase_client.table("archon_crawled_pages").delete().in_("url", batch).execute()
+                    self.supabase_client.table("archon_code_examples").delete().in_("url", batch).execute()
+                    self.supabase_client.table(PAGE_VERSIONS_TABLE).update({
+                        "status": "removed",
+                        "removed_at": now,
+                    }).eq("source_id", self.source_id).in_("url", batch).execute()
+
+                await asyncio.to_thread(_remove)
+            self.pages_removed += len(urls)
+            safe_logfire_info(f"Tombstoned {len(urls)} removed pages | source_id={self.source_id}")
+        except Exception as e:
+            safe_logfire_error(f"Failed to tombstone removed pages for '{self.source_id}': {e}")
@@ -0,0 +1,342 @@
+"""
+Page Cache
+
+Opt-in local cache of crawled pages, so re-crawling a site during development, a
+refresh, or a retry after a storage failure does not render every page in the
+browser again. Entries are keyed by canonical URL and point at content-addressed
+blobs: zlib-compressed JSON holding the markdown, HTML, links and fetch metadata.
+Pages with identical content share one blob.
+
+Entries expire after a TTL and the least recently used ones are evicted when
+the cache grows past its size limit. Crawls can ask for fresh pages, which skips
+reads but still refreshes the cache. A resumed crawl replays whatever is cached,
+ignoring the TTL, because those pages were fetched for the same crawl.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+from .helpers.url_canonicalizer import UrlCanonicalizer
+
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "archon-page-cache")
+DEFAULT_TTL_HOURS = 24.0
+DEFAULT_MAX_MB = 1024
+
+# Eviction stops once the cache is back under this share of its size limit
+EVICTION_TARGET = 0.9
+
+COMPRESSION_LEVEL = 6
+
+
+class _PageIndex:
+    """Index and blob files shared by all views of one cache directory"""
+
+    def __init__(self, directory: str, ttl_seconds: float, max_bytes: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._canonicalizer = UrlCanonicalizer()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, blob TEXT NOT NULL, size INTEGER NOT NULL, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_blob ON pages (blob)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self.bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.directory, "blobs", blob[:2], blob)
+
+    def read(self, url: str, ignore_ttl: bool) -> dict[str, Any] | None:
+        key = self._canonicalizer.key(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blob, fetched_at FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            blob, fetched_at = row
+            now = time.time()
+            if not ignore_ttl and now - fetched_at > self.ttl_seconds:
+                return None
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                return json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+
+    def write(self, url: str, payload: dict[str, Any]) -> None:
+        data = zlib.compress(json.dumps(payload, sort_keys=True).encode("utf-8"), COMPRESSION_LEVEL)
+        blob = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        key = self._canonicalizer.key(url)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT blob, size FROM pages WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (key, url, blob, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, blob, len(data), now, now),
+            )
+            self.bytes += len(data) - (old[1] if old else 0)
+            if old and old[0] != blob:
+                self._drop_blob_if_unused(old[0])
+            if self.bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones, until under the target size."""
+        target = self.max_bytes * EVICTION_TARGET
+        expired = self._db.execute(
+            "SELECT key, blob, size FROM pages WHERE fetched_at < ?", (now - self.ttl_seconds,)
+        ).fetchall()
+        evicted = self._remove(expired)
+        while self.bytes > target:
+            oldest = self._db.execute(
+                "SELECT key, blob, size FROM pages ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not oldest:
+                break
+            needed = []
+            freed = 0
+            for row in oldest:
+                needed.append(row)
+                freed += row[2]
+                if self.bytes - freed <= target:
+                    break
+            evicted += self._remove(needed)
+        if evicted:
+            logger.info(f"Evicted {evicted} pages from the page cache ({self.bytes} bytes remain)")
+
+    def _remove(self, rows: list[tuple]) -> int:
+        for key, blob, size in rows:
+            self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self.bytes -= size
+            self._drop_blob_if_unused(blob)
+        return len(rows)
+
+    def _drop_blob_if_unused(self, blob: str) -> None:
+        if self._db.execute("SELECT 1 FROM pages WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+            return
+        try:
+            os.unlink(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+
+
+class PageCache:
+    """Content-addressed page store on local disk"""
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+    ):
+        """
+        Initialize the page cache.
+
+        Args:
+            directory: Directory holding the index and blobs; created if missing
+            ttl_seconds: Age after which an entry is no longer served
+            max_bytes: Compressed size above which least recently used entries are evicted
+        """
+        self._index = _PageIndex(directory, ttl_seconds, max_bytes)
+        self.read_enabled = True
+        self.ignore_ttl = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self) -> str:
+        return self._index.directory
+
+    def configure(self, ttl_seconds: float, max_bytes: int) -> None:
+        self._index.ttl_seconds = ttl_seconds
+        self._index.max_bytes = max_bytes
+
+    def fresh(self) -> "PageCache":
+        """A view of this cache that does not serve pages but still stores them."""
+        return self._view(read_enabled=False, ignore_ttl=False)
+
+    def replaying(self) -> "PageCache":
+        """A view of this cache that serves pages regardless of their age."""
+        return self._view(read_enabled=True, ignore_ttl=True)
+
+    async def get(self, url: str) -> Any | None:
+        """
+        Look up a page.
+
+        Returns:
+            A crawl4ai-like result with from_cache=True, or None on a miss
+        """
+        if not self.read_enabled:
+            return None
+        try:
+            payload = await asyncio.to_thread(self._index.read, url, self.ignore_ttl)
+        except Exception as e:
+            logger.warning(f"Page cache read failed for {url}: {e}")
+            payload = None
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return SimpleNamespace(
+            url=url,
+            success=True,
+            markdown=payload.get("markdown"),
+            html=payload.get("html"),
+            links=payload.get("links") or {},
+            status_code=payload.get("status_code"),
+            response_headers=payload.get("response_headers") or {},
+            error_message=None,
+            from_cache=True,
+        )
+
+    async def put(self, url: str, result: Any) -> None:
+        """Store a successful crawl result; failed results and cache hits are ignored."""
+        if not getattr(result, "success", False) or not getattr(result, "markdown", None):
+            return
+        if getattr(result, "from_cache", False):
+            return
+        payload = {
+            "markdown": str(result.markdown),
+            "html": getattr(result, "html", None),
+            "links": getattr(result, "links", None) or {},
+            "status_code": getattr(result, "status_code", None),
+            "response_headers": dict(getattr(result, "response_headers", None) or {}),
+        }
+        try:
+            await asyncio.to_thread(self._index.write, url, payload)
+        except Exception as e:
+            # A page that is not cached is only fetched again next time
+            logger.warning(f"Page cache write failed for {url}: {e}")
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "directory": self._index.directory,
+            "bytes": self._index.bytes,
+            "max_bytes": self._index.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _view(self, read_enabled: bool, ignore_ttl: bool) -> "PageCache":
+        view = copy.copy(self)
+        view.read_enabled = read_enabled
+        view.ignore_ttl = ignore_ttl
+        view.hits = 0
+        view.misses = 0
+        return view
+
+
+class CachedCrawler:
+    """Crawler wrapper that serves arun/arun_many from a page cache"""
+
+    def __init__(self, crawler, page_cache: PageCache):
+        self.crawler = crawler
+        self.page_cache = page_cache
+
+    def __getattr__(self, name):
+        return getattr(self.crawler, name)
+
+    async def arun(self, url: str, config=None, **kwargs):
+        cached = await self.page_cache.get(url)
+        if cached is not None:
+            return cached
+        result = await self.crawler.arun(url=url, config=config, **kwargs)
+        await self.page_cache.put(url, result)
+        return result
+
+    async def arun_many(self, urls: list[str], config=None, **kwargs):
+        """Stream cached pages first, then the crawler's results for the rest."""
+        cached = []
+        missing = []
+        for url in urls:
+            result = await self.page_cache.get(url)
+            if result is None:
+                missing.append(url)
+            else:
+                cached.append(result)
+        results = await self.crawler.arun_many(urls=missing, config=config, **kwargs) if missing else []
+
+        async def _stream():
+            for result in cached:
+                yield result
+            if hasattr(results, "__aiter__"):
+                async for result in results:
+                    await self.page_cache.put(result.url, result)
+                    yield result
+            else:
+                for result in results:
+                    await self.page_cache.put(result.url, result)
+                    yield result
+
+        return _stream()
+
+
+def with_page_cache(crawler, page_cache: PageCache | None):
+    """Wrap a crawler so arun/arun_many go through the page cache, if there is one."""
+    return CachedCrawler(crawler, page_cache) if page_cache else crawler
+
+
+_page_cache: PageCache | None = None
+
+
+async def get_page_cache() -> PageCache | None:
+    """
+    Get the process-wide page cache if CRAWL_PAGE_CACHE is enabled.
+
+    Returns:
+        The page cache, or None when caching is off or the cache cannot be opened
+    """
+    global _page_cache
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load page cache settings: {e}")
+        return None
+    if str(settings.get("CRAWL_PAGE_CACHE", "false")).lower() != "true":
+        return None
+
+    try:
+        directory = settings.get("CRAWL_PAGE_CACHE_DIR") or DEFAULT_CACHE_DIR
+        ttl_seconds = float(settings.get("CRAWL_PAGE_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)) * 3600
+        max_bytes = int(float(settings.get("CRAWL_PAGE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        if _page_cache is None or _page_cache.directory != directory:
+            _page_cache = PageCache(directory, ttl_seconds, max_bytes)
+        else:
+            _page_cache.configure(ttl_seconds, max_bytes)
+    except (OSError, sqlite3.Error, ValueError) as e:
+        logger.error(f"Page cache unavailable, crawling without it: {e}")
+        return None
+    return _page_cache
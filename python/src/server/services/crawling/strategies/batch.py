@@ -4,15 +4,60 @@ Batch Crawling Strategy
 Handles batch crawling of multiple URLs in parallel.
 """
 
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterable, AsyncIterator, Union
 
 from crawl4ai import CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 from ....config.logfire_config import get_logger
 from ...credential_service import credential_service
+from ..helpers.url_canonicalizer import UrlCanonicalizer
+from ..domain_profiles import with_domain_profiles
+from ..host_scheduler import get_host_scheduler
+from ..html_spool import spool_html
+from ..http_fast_path import get_http_fast_path
+from ..incremental_refresh import get_cache_validators
+from ..page_cache import with_page_cache
+from ..visited_set import DEFAULT_MEMORY_LIMIT, VisitedSet
 
 logger = get_logger(__name__)
 
 
+async def _iter_urls(urls: Union[List[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    if isinstance(urls, list):
+        for url in urls:
+            yield url
+    else:
+        async for url in urls:
+            yield url
+
+
+async def _iter_batches(
+    urls: Union[List[str], AsyncIterable[str]],
+    batch_size: int,
+    seen: VisitedSet,
+    canonicalizer: UrlCanonicalizer,
+) -> AsyncIterator[List[str]]:
+    """
+    Group a list or stream of URLs into batches of canonical URLs.
+
+    URLs already in the seen set, including variants of the same page, are left
+    out. Each batch is added to the seen set when it is handed out.
+    """
+    batch: Dict[str, str] = {}
+    async for url in _iter_urls(urls):
+        url = canonicalizer.canonicalize(url)
+        key = canonicalizer.key(url)
+        if key in batch or url in seen:
+            continue
+        batch[key] = url
+        if len(batch) >= batch_size:
+            seen.update(batch.values())
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        seen.update(batch.values())
+        yield list(batch.values())
+
+
 class BatchCrawlStrategy:
     """Strategy for crawling multiple URLs in batch."""
 
@@ -26,28 +71,54 @@ class BatchCrawlStrategy:
         """
         self.crawler = crawler
         self.markdown_generator = markdown_generator
+        # Optional PageCache set by the orchestrator for the current crawl
+        self.page_cache = None
+        # Optional DomainProfileStore that tunes each page's render settings
+        self.domain_profiles = None
+        # Optional HtmlSpool the current crawl's page HTML is moved into
+        self.html_spool = None
+
+    def _profiled_crawler(self):
+        """The crawler, rendering each page with its domain's profile when profiles are on."""
+        return with_domain_profiles(self.crawler, self.domain_profiles)
 
     async def crawl_batch_with_progress(
         self,
-        urls: List[str],
+        urls: Union[List[str], AsyncIterable[str]],
         transform_url_func: Callable[[str], str],
         is_documentation_site_func: Callable[[str], bool],
         max_concurrent: int = None,
         progress_callback: Optional[Callable] = None,
         start_progress: int = 15,
         end_progress: int = 60,
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        save_state: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Batch crawl multiple URLs in parallel with progress reporting.
 
         Args:
-            urls: List of URLs to crawl
+            urls: List of URLs to crawl, or an async stream of URLs that is crawled in
+                batches as it is read
             transform_url_func: Function to transform URLs (e.g., GitHub URLs)
             is_documentation_site_func: Function to check if URL is a documentation site
             max_concurrent: Maximum concurrent crawls
             progress_callback: Optional callback for progress updates
             start_progress: Starting progress percentage
             end_progress: Ending progress percentage
+            on_page: Optional async callback that receives each successful page as it
+                arrives. When given, pages are handed off instead of collected and an
+                empty list is returned.
+            skip_unchanged: Optional async callback that receives each batch of URLs before
+                it is crawled and returns the ones that have not changed since the last crawl
+            resume_state: Saved state of an interrupted crawl. Its visited URLs are skipped.
+            save_state: Optional async callback that receives a callable building the crawl
+                state (visited URLs) after each batch so the crawl can be resumed
+            on_page_failed: Optional callback that receives the URL of each page whose
+                crawl failed
 
         Returns:
             List of crawl results
@@ -66,6 +137,12 @@ class BatchCrawlStrategy:
                 max_concurrent = int(settings.get("CRAWL_MAX_CONCURRENT", "10"))
             memory_threshold = float(settings.get("MEMORY_THRESHOLD_PERCENT", "80"))
             check_interval = float(settings.get("DISPATCHER_CHECK_INTERVAL", "0.5"))
+            use_host_scheduler = str(settings.get("CRAWL_HOST_SCHEDULER", "true")).lower() == "true"
+            if use_host_scheduler:
+                get_host_scheduler().configure(settings)
+            use_fast_path = str(settings.get("CRAWL_HTTP_FAST_PATH", "true")).lower() == "true"
+            canonicalizer = UrlCanonicalizer.from_settings(settings)
+            visited_memory_limit = int(settings.get("CRAWL_VISITED_MEMORY_LIMIT", str(DEFAULT_MEMORY_LIMIT)))
         except (ValueError, KeyError, TypeError) as e:
             # Critical configuration errors should fail fast in alpha
             logger.error(f"Invalid crawl settings format: {e}", exc_info=True)
@@ -80,38 +157,46 @@ class BatchCrawlStrategy:
                 max_concurrent = 10  # Safe default to prevent memory issues
             memory_threshold = 80.0
             check_interval = 0.5
+            use_host_scheduler = True
+            use_fast_path = True
+            canonicalizer = UrlCanonicalizer()
+            visited_memory_limit = DEFAULT_MEMORY_LIMIT
             settings = {}  # Empty dict for defaults
 
-        # Check if any URLs are documentation sites
-        has_doc_sites = any(is_documentation_site_func(url) for url in urls)
-
-        if has_doc_sites:
-            logger.info("Detected documentation sites in batch, using enhanced configuration")
-            # Use generic documentation selectors for batch crawling
-            crawl_config = CrawlerRunConfig(
-                cache_mode=CacheMode.BYPASS,
-                stream=True,  # Enable streaming for faster parallel processing
-                markdown_generator=self.markdown_generator,
-                wait_until=settings.get("CRAWL_WAIT_STRATEGY", "domcontentloaded"),
-                page_timeout=int(settings.get("CRAWL_PAGE_TIMEOUT", "30000")),
-                delay_before_return_html=float(settings.get("CRAWL_DELAY_BEFORE_HTML", "1.0")),
-                wait_for_images=False,  # Skip images for faster crawling
-                scan_full_page=True,  # Trigger lazy loading
-                exclude_all_images=False,
-                remove_overlay_elements=True,
-                process_iframes=True,
-            )
-        else:
-            # Configuration for regular batch crawling
-            crawl_config = CrawlerRunConfig(
-                cache_mode=CacheMode.BYPASS,
-                stream=True,  # Enable streaming
-                markdown_generator=self.markdown_generator,
-                wait_until=settings.get("CRAWL_WAIT_STRATEGY", "domcontentloaded"),
-                page_timeout=int(settings.get("CRAWL_PAGE_TIMEOUT", "45000")),
-                delay_before_return_html=float(settings.get("CRAWL_DELAY_BEFORE_HTML", "0.5")),
-                scan_full_page=True,
-            )
+        def build_crawl_config(has_doc_sites: bool):
+            """Build the run config, with enhanced settings for documentation sites"""
+            if has_doc_sites:
+                logger.info("Detected documentation sites in batch, using enhanced configuration")
+                # Use generic documentation selectors for batch crawling
+                return CrawlerRunConfig(
+                    cache_mode=CacheMode.BYPASS,
+                    stream=True,  # Enable streaming for faster parallel processing
+                    markdown_generator=self.markdown_generator,
+                    wait_until=settings.get("CRAWL_WAIT_STRATEGY", "domcontentloaded"),
+                    page_timeout=int(settings.get("CRAWL_PAGE_TIMEOUT", "30000")),
+                    delay_before_return_html=float(settings.get("CRAWL_DELAY_BEFORE_HTML", "1.0")),
+                    wait_for_images=False,  # Skip images for faster crawling
+                    scan_full_page=True,  # Trigger lazy loading
+                    exclude_all_images=False,
+                    remove_overlay_elements=True,
+                    process_iframes=True,
+                )
+            else:
+                # Configuration for regular batch crawling
+                return CrawlerRunConfig(
+                    cache_mode=CacheMode.BYPASS,
+                    stream=True,  # Enable streaming
+                    markdown_generator=self.markdown_generator,
+                    wait_until=settings.get("CRAWL_WAIT_STRATEGY", "domcontentloaded"),
+                    page_timeout=int(settings.get("CRAWL_PAGE_TIMEOUT", "45000")),
+                    delay_before_return_html=float(settings.get("CRAWL_DELAY_BEFORE_HTML", "0.5")),
+                    scan_full_page=True,
+                )
+
+        # Check if any URLs are documentation sites; a stream is judged by its first batch
+        crawl_config = None
+        if isinstance(urls, list):
+            crawl_config = build_crawl_config(any(is_documentation_site_func(url) for url in urls))
 
         dispatcher = MemoryAdaptiveDispatcher(
             memory_threshold_percent=memory_threshold,
@@ -125,42 +210,86 @@ class BatchCrawlStrategy:
                 step_info = {"currentStep": message, "stepMessage": message, **kwargs}
                 await progress_callback("crawling", percentage, message, step_info=step_info)
 
-        total_urls = len(urls)
-        await report_progress(start_progress, f"Starting to crawl {total_urls} URLs...")
+        # Every URL handed to a batch; the batch being crawled is left out of checkpoints
+        visited = VisitedSet(canonicalizer.key, visited_memory_limit)
+        crawling: set = set()
+        if resume_state:
+            visited.update(resume_state.get("visited", []))
+            logger.info(f"Resuming batch crawl, skipping {len(visited)} already visited URLs")
+
+        # A list has a known size; a stream (such as a sitemap still being parsed) grows as it is read
+        if isinstance(urls, list):
+            total_urls = len({canonicalizer.key(url) for url in urls if url not in visited})
+            await report_progress(start_progress, f"Starting to crawl {total_urls} URLs...")
+        else:
+            total_urls = 0
+            await report_progress(start_progress, "Starting to crawl URLs as they are discovered...")
 
         # Use configured batch size
         successful_results = []
+        successful_count = 0
         processed = 0
+        discovered = 0
 
-        # Transform all URLs at the beginning
-        url_mapping = {}  # Map transformed URLs back to original
-        transformed_urls = []
-        for url in urls:
-            transformed = transform_url_func(url)
-            transformed_urls.append(transformed)
-            url_mapping[transformed] = url
+        async for original_urls in _iter_batches(urls, batch_size, visited, canonicalizer):
+            crawling = set(original_urls)
+            batch_start = discovered
+            discovered += len(original_urls)
+            batch_end = discovered
+            known_total = max(total_urls, discovered)
+            if crawl_config is None:
+                crawl_config = build_crawl_config(
+                    any(is_documentation_site_func(url) for url in original_urls)
+                )
 
-        for i in range(0, total_urls, batch_size):
-            batch_urls = transformed_urls[i : i + batch_size]
-            batch_start = i
-            batch_end = min(i + batch_size, total_urls)
+            # Transform URLs and map them back to the originals
+            url_mapping = {}
+            batch_urls = []
+            for url in original_urls:
+                transformed = transform_url_func(url)
+                batch_urls.append(transformed)
+                url_mapping[transformed] = url
 
             # Report batch start with smooth progress
             progress_percentage = start_progress + int(
-                (i / total_urls) * (end_progress - start_progress)
+                (batch_start / known_total) * (end_progress - start_progress)
             )
             await report_progress(
                 progress_percentage,
-                f"Processing batch {batch_start + 1}-{batch_end} of {total_urls} URLs...",
+                f"Processing batch {batch_start + 1}-{batch_end} of {known_total} URLs...",
             )
 
-            # Crawl this batch using arun_many with streaming
+            # Leave out pages that have not changed since the last crawl
+            if skip_unchanged:
+                unchanged = await skip_unchanged(original_urls)
+                if unchanged:
+                    batch_urls = [url for url in batch_urls if url_mapping[url] not in unchanged]
+                    processed += len(unchanged)
+                    logger.info(f"Skipping {len(unchanged)} unchanged URLs in batch")
+                if not batch_urls:
+                    crawling = set()
+                    continue
+
+            # Crawl this batch with streaming, sharing per-host capacity with other crawls
             logger.info(
                 f"Starting parallel crawl of batch {batch_start + 1}-{batch_end} ({len(batch_urls)} URLs)"
             )
-            batch_results = await self.crawler.arun_many(
-                urls=batch_urls, config=crawl_config, dispatcher=dispatcher
-            )
+            if use_host_scheduler:
+                batch_results = get_host_scheduler().crawl(
+                    self._profiled_crawler(),
+                    batch_urls,
+                    crawl_config,
+                    max_concurrent,
+                    memory_threshold=memory_threshold,
+                    check_interval=check_interval,
+                    fast_path=get_http_fast_path() if use_fast_path else None,
+                    markdown_generator=self.markdown_generator,
+                    page_cache=self.page_cache,
+                )
+            else:
+                batch_results = await with_page_cache(self._profiled_crawler(), self.page_cache).arun_many(
+                    urls=batch_urls, config=crawl_config, dispatcher=dispatcher
+                )
 
             # Handle streaming results
             async for result in batch_results:
@@ -168,31 +297,47 @@ class BatchCrawlStrategy:
                 if result.success and result.markdown:
                     # Map back to original URL
                     original_url = url_mapping.get(result.url, result.url)
-                    successful_results.append({
+                    page = {
                         "url": original_url,
                         "markdown": result.markdown,
-                        "html": result.html,  # Use raw HTML
-                    })
-                else:
+                        "html": await spool_html(self.html_spool, result.html),  # Use raw HTML
+                        **get_cache_validators(getattr(result, "response_headers", None)),
+                    }
+                    successful_count += 1
+                    if on_page:
+                        await on_page(page)
+                    else:
+                        successful_results.append(page)
+                elif not result.success:
                     logger.warning(
                         f"Failed to crawl {result.url}: {getattr(result, 'error_message', 'Unknown error')}"
                     )
+                    if on_page_failed:
+                        on_page_failed(url_mapping.get(result.url, result.url))
+                else:
+                    logger.info(f"Crawled {result.url} but it has no content")
 
                 # Report individual URL progress with smooth increments
                 progress_percentage = start_progress + int(
-                    (processed / total_urls) * (end_progress - start_progress)
+                    (processed / known_total) * (end_progress - start_progress)
                 )
                 # Report more frequently for smoother progress
                 if (
-                    processed % 5 == 0 or processed == total_urls
+                    processed % 5 == 0 or processed == known_total
                 ):  # Report every 5 URLs or at the end
                     await report_progress(
                         progress_percentage,
-                        f"Crawled {processed}/{total_urls} pages ({len(successful_results)} successful)",
+                        f"Crawled {processed}/{known_total} pages ({successful_count} successful)",
                     )
 
+            crawling = set()
+            if save_state:
+                await save_state(
+                    lambda: {"pending": [], "visited": [url for url in visited if url not in crawling]}
+                )
+
         await report_progress(
             end_progress,
-            f"Batch crawling completed: {len(successful_results)}/{total_urls} pages successful",
+            f"Batch crawling completed: {successful_count}/{discovered} pages successful",
         )
         return successful_results
@@ -2,15 +2,31 @@
 Recursive Crawling Strategy
 
 Handles recursive crawling of websites by following internal links.
+
+By default links are crawled from a priority work queue keyed by depth: links are
+queued as soon as their page arrives and a new page starts whenever one finishes,
+so the crawler never waits for the slowest page of a depth level before going
+deeper. Shallower pages are still crawled first, and the depth limit and page
+budget are enforced exactly.
 """
 
-from typing import List, Dict, Any, Optional, Callable
-from urllib.parse import urldefrag
+import asyncio
+import heapq
+import itertools
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
 
 from crawl4ai import CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 from ....config.logfire_config import get_logger
 from ...credential_service import credential_service
+from ..helpers.url_canonicalizer import UrlCanonicalizer
 from ..helpers.url_handler import URLHandler
+from ..domain_profiles import with_domain_profiles
+from ..host_scheduler import get_host_scheduler
+from ..html_spool import spool_html
+from ..http_fast_path import get_http_fast_path
+from ..incremental_refresh import get_cache_validators
+from ..page_cache import with_page_cache
+from ..visited_set import DEFAULT_MEMORY_LIMIT, VisitedSet
 
 logger = get_logger(__name__)
 
@@ -28,8 +44,18 @@ class RecursiveCrawlStrategy:
         """
         self.crawler = crawler
         self.markdown_generator = markdown_generator
+        # Optional PageCache set by the orchestrator for the current crawl
+        self.page_cache = None
+        # Optional DomainProfileStore that tunes each page's render settings
+        self.domain_profiles = None
+        # Optional HtmlSpool the current crawl's page HTML is moved into
+        self.html_spool = None
         self.url_handler = URLHandler()
 
+    def _profiled_crawler(self):
+        """The crawler, rendering each page with its domain's profile when profiles are on."""
+        return with_domain_profiles(self.crawler, self.domain_profiles)
+
     async def crawl_recursive_with_progress(
         self,
         start_urls: List[str],
@@ -40,6 +66,13 @@ class RecursiveCrawlStrategy:
         progress_callback: Optional[Callable] = None,
         start_progress: int = 10,
         end_progress: int = 60,
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        save_state: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        max_pages: Optional[int] = None,
+        on_budget_reached: Optional[Callable[[], None]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Recursively crawl internal links from start URLs up to a maximum depth with progress reporting.
@@ -53,6 +86,23 @@ class RecursiveCrawlStrategy:
             progress_callback: Optional callback for progress updates
             start_progress: Starting progress percentage
             end_progress: Ending progress percentage
+            on_page: Optional async callback that receives each successful page as it
+                arrives. When given, pages are handed off instead of collected and an
+                empty list is returned.
+            skip_unchanged: Optional async callback that receives each batch of URLs before
+                it is crawled and returns the ones that have not changed since the last crawl,
+                mapped to their known internal links so the crawl can still go deeper
+            resume_state: Saved state of an interrupted crawl - the depth it reached, the
+                URLs still pending at that depth, the URLs found for the next depth and the
+                visited URLs
+            save_state: Optional async callback that receives the crawl state, or a
+                callable that builds it, after each batch so the crawl can be resumed
+            max_pages: Maximum number of pages to crawl, including unchanged pages that
+                were skipped. Defaults to the CRAWL_MAX_PAGES setting; 0 means no limit.
+            on_budget_reached: Optional callback, called when max_pages stops the crawl
+                before every reachable page was crawled
+            on_page_failed: Optional callback that receives the URL of each page whose
+                crawl failed
 
         Returns:
             List of crawl results
@@ -71,6 +121,15 @@ class RecursiveCrawlStrategy:
                 max_concurrent = int(settings.get("CRAWL_MAX_CONCURRENT", "10"))
             memory_threshold = float(settings.get("MEMORY_THRESHOLD_PERCENT", "80"))
             check_interval = float(settings.get("DISPATCHER_CHECK_INTERVAL", "0.5"))
+            use_host_scheduler = str(settings.get("CRAWL_HOST_SCHEDULER", "true")).lower() == "true"
+            if use_host_scheduler:
+                get_host_scheduler().configure(settings)
+            use_fast_path = str(settings.get("CRAWL_HTTP_FAST_PATH", "true")).lower() == "true"
+            continuous = str(settings.get("CRAWL_CONTINUOUS_RECURSIVE", "true")).lower() == "true"
+            if max_pages is None:
+                max_pages = int(settings.get("CRAWL_MAX_PAGES", "0"))
+            canonicalizer = UrlCanonicalizer.from_settings(settings)
+            visited_memory_limit = int(settings.get("CRAWL_VISITED_MEMORY_LIMIT", str(DEFAULT_MEMORY_LIMIT)))
         except (ValueError, KeyError, TypeError) as e:
             # Critical configuration errors should fail fast in alpha
             logger.error(f"Invalid crawl settings format: {e}", exc_info=True)
@@ -85,6 +144,13 @@ class RecursiveCrawlStrategy:
                 max_concurrent = 10  # Safe default to prevent memory issues
             memory_threshold = 80.0
             check_interval = 0.5
+            use_host_scheduler = True
+            use_fast_path = True
+            continuous = True
+            if max_pages is None:
+                max_pages = 0
+            canonicalizer = UrlCanonicalizer()
+            visited_memory_limit = DEFAULT_MEMORY_LIMIT
             settings = {}  # Empty dict for defaults
 
         # Check if start URLs include documentation sites
@@ -132,21 +198,84 @@ class RecursiveCrawlStrategy:
                 step_info = {"currentStep": message, "stepMessage": message, **kwargs}
                 await progress_callback("crawling", percentage, message, **step_info)
 
-        visited = set()
-
-        def normalize_url(url):
-            return urldefrag(url)[0]
+        fast_path = get_http_fast_path() if use_fast_path else None
+        normalize_url = canonicalizer.canonicalize
+        visited = VisitedSet(canonicalizer.key, visited_memory_limit)
+
+        # Checkpoints written by the work queue can only be resumed by it
+        if continuous or (resume_state and "queue" in resume_state):
+            crawl_slots = asyncio.Semaphore(max(1, max_concurrent))
+
+            async def fetch_page(url: str):
+                if use_host_scheduler:
+                    return await get_host_scheduler().fetch(
+                        self._profiled_crawler(),
+                        url,
+                        run_config,
+                        crawl_slots,
+                        memory_threshold=memory_threshold,
+                        check_interval=check_interval,
+                        fast_path=fast_path,
+                        markdown_generator=self.markdown_generator,
+                        page_cache=self.page_cache,
+                    )
+                async with crawl_slots:
+                    return await with_page_cache(self._profiled_crawler(), self.page_cache).arun(
+                        url=url, config=run_config
+                    )
+
+            return await self._crawl_continuous(
+                start_urls,
+                transform_url_func,
+                fetch_page,
+                max_depth,
+                max_pages,
+                batch_size,
+                report_progress,
+                start_progress,
+                end_progress,
+                canonicalizer,
+                visited,
+                on_page=on_page,
+                skip_unchanged=skip_unchanged,
+                resume_state=resume_state,
+                save_state=save_state,
+                on_budget_reached=on_budget_reached,
+                on_page_failed=on_page_failed,
+            )
 
         current_urls = set([normalize_url(u) for u in start_urls])
+        resumed_next_level = set()
+        start_depth = 0
+        if resume_state:
+            start_depth = min(int(resume_state.get("depth", 0)), max(max_depth - 1, 0))
+            current_urls = set(resume_state.get("pending", []))
+            resumed_next_level = set(resume_state.get("next_level", []))
+            visited.update(resume_state.get("visited", []))
+            logger.info(
+                f"Resuming recursive crawl at depth {start_depth + 1} with {len(current_urls)} pending "
+                f"URLs ({len(visited)} already visited)"
+            )
         results_all = []
+        total_successful = 0
         total_processed = 0
-
-        for depth in range(max_depth):
-            urls_to_crawl = [
-                normalize_url(url) for url in current_urls if normalize_url(url) not in visited
-            ]
+        budget_reached = False
+
+        for depth in range(start_depth, max_depth):
+            # One URL per page: variants of a URL share its canonical key
+            level_urls: Dict[str, str] = {}
+            for url in current_urls:
+                url = normalize_url(url)
+                if url not in visited:
+                    level_urls.setdefault(canonicalizer.key(url), url)
+            urls_to_crawl = list(level_urls.values())
+            # A resumed crawl may have finished its depth already and only have the next level left
+            next_level_urls = resumed_next_level if depth == start_depth else set()
             if not urls_to_crawl:
-                break
+                if not next_level_urls:
+                    break
+                current_urls = next_level_urls
+                continue
 
             # Calculate progress for this depth level
             depth_start = start_progress + int(
@@ -162,13 +291,38 @@ class RecursiveCrawlStrategy:
             )
 
             # Use configured batch size for recursive crawling
-            next_level_urls = set()
             depth_successful = 0
 
             for batch_idx in range(0, len(urls_to_crawl), batch_size):
                 batch_urls = urls_to_crawl[batch_idx : batch_idx + batch_size]
                 batch_end_idx = min(batch_idx + batch_size, len(urls_to_crawl))
 
+                if max_pages:
+                    remaining = max_pages - len(visited)
+                    if remaining < len(batch_urls):
+                        budget_reached = True
+                        logger.info(f"Page budget of {max_pages} reached at depth {depth + 1}")
+                        if on_budget_reached:
+                            on_budget_reached()
+                    batch_urls = batch_urls[: max(remaining, 0)]
+                    if not batch_urls:
+                        break
+
+                # Leave out pages that have not changed, but keep following their links
+                if skip_unchanged:
+                    unchanged = await skip_unchanged(batch_urls)
+                    for url, known_links in unchanged.items():
+                        visited.add(url)
+                        total_processed += 1
+                        for link in known_links:
+                            if link not in visited and not self.url_handler.is_binary_file(link):
+                                next_level_urls.add(link)
+                    if unchanged:
+                        batch_urls = [url for url in batch_urls if url not in unchanged]
+                        logger.info(f"Skipping {len(unchanged)} unchanged URLs at depth {depth + 1}")
+                    if not batch_urls:
+                        continue
+
                 # Transform URLs and create mapping for this batch
                 url_mapping = {}
                 transformed_batch_urls = []
@@ -185,16 +339,29 @@ class RecursiveCrawlStrategy:
                     batch_progress,
                     f"Depth {depth + 1}: crawling URLs {batch_idx + 1}-{batch_end_idx} of {len(urls_to_crawl)}",
                     totalPages=total_processed + batch_idx,
-                    processedPages=len(results_all),
-                )
-
-                # Use arun_many for native parallel crawling with streaming
-                logger.info(f"Starting parallel crawl of {len(batch_urls)} URLs with arun_many")
-                batch_results = await self.crawler.arun_many(
-                    urls=transformed_batch_urls, config=run_config, dispatcher=dispatcher
+                    processedPages=total_successful,
                 )
 
-                # Handle streaming results from arun_many
+                # Crawl in parallel with streaming, sharing per-host capacity with other crawls
+                logger.info(f"Starting parallel crawl of {len(batch_urls)} URLs")
+                if use_host_scheduler:
+                    batch_results = get_host_scheduler().crawl(
+                        self._profiled_crawler(),
+                        transformed_batch_urls,
+                        run_config,
+                        max_concurrent,
+                        memory_threshold=memory_threshold,
+                        check_interval=check_interval,
+                        fast_path=fast_path,
+                        markdown_generator=self.markdown_generator,
+                        page_cache=self.page_cache,
+                    )
+                else:
+                    batch_results = await with_page_cache(self._profiled_crawler(), self.page_cache).arun_many(
+                        urls=transformed_batch_urls, config=run_config, dispatcher=dispatcher
+                    )
+
+                # Handle streaming results
                 i = 0
                 async for result in batch_results:
                     # Map back to original URL using the mapping dict
@@ -205,27 +372,40 @@ class RecursiveCrawlStrategy:
                     total_processed += 1
 
                     if result.success and result.markdown:
-                        results_all.append({
+                        links = getattr(result, "links", {}) or {}
+                        internal_links = list(dict.fromkeys(
+                            normalize_url(link["href"]) for link in links.get("internal", [])
+                        ))
+                        page = {
                             "url": original_url,
                             "markdown": result.markdown,
-                            "html": result.html,  # Always use raw HTML for code extraction
-                        })
+                            "html": await spool_html(self.html_spool, result.html),  # Always use raw HTML for code extraction
+                            "links": internal_links,
+                            **get_cache_validators(getattr(result, "response_headers", None)),
+                        }
+                        if on_page:
+                            await on_page(page)
+                        else:
+                            results_all.append(page)
                         depth_successful += 1
+                        total_successful += 1
 
                         # Find internal links for next depth
-                        links = getattr(result, "links", {}) or {}
-                        for link in links.get("internal", []):
-                            next_url = normalize_url(link["href"])
+                        for next_url in internal_links:
                             # Skip binary files and already visited URLs
                             is_binary = self.url_handler.is_binary_file(next_url)
                             if next_url not in visited and not is_binary:
                                 next_level_urls.add(next_url)
                             elif is_binary:
                                 logger.debug(f"Skipping binary file from crawl queue: {next_url}")
-                    else:
+                    elif not result.success:
                         logger.warning(
                             f"Failed to crawl {original_url}: {getattr(result, 'error_message', 'Unknown error')}"
                         )
+                        if on_page_failed:
+                            on_page_failed(original_url)
+                    else:
+                        logger.info(f"Crawled {original_url} but it has no content")
 
                     # Report progress every few URLs
                     current_idx = batch_idx + i + 1
@@ -237,10 +417,21 @@ class RecursiveCrawlStrategy:
                             current_progress,
                             f"Depth {depth + 1}: processed {current_idx}/{len(urls_to_crawl)} URLs ({depth_successful} successful)",
                             totalPages=total_processed,
-                            processedPages=len(results_all),
+                            processedPages=total_successful,
                         )
                     i += 1
 
+                if save_state:
+                    await save_state({
+                        "depth": depth,
+                        "pending": urls_to_crawl[batch_end_idx:],
+                        "next_level": sorted(next_level_urls),
+                        "visited": list(visited),
+                    })
+
+                if budget_reached:
+                    break
+
             current_urls = next_level_urls
 
             # Report completion of this depth
@@ -248,9 +439,268 @@ class RecursiveCrawlStrategy:
                 depth_end,
                 f"Depth {depth + 1} completed: {depth_successful} pages crawled, {len(next_level_urls)} URLs found for next depth",
             )
+            if budget_reached:
+                break
+
+        await report_progress(
+            end_progress,
+            f"Recursive crawling completed: {total_successful} total pages crawled across {max_depth} depth levels",
+        )
+        return results_all
+
+    async def _crawl_continuous(
+        self,
+        start_urls: List[str],
+        transform_url_func: Callable[[str], str],
+        fetch_page: Callable[[str], Awaitable[Any]],
+        max_depth: int,
+        max_pages: int,
+        max_in_flight: int,
+        report_progress: Callable[..., Awaitable[None]],
+        start_progress: int,
+        end_progress: int,
+        canonicalizer: UrlCanonicalizer,
+        visited: VisitedSet,
+        on_page: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        skip_unchanged: Optional[Callable[[List[str]], Awaitable[Dict[str, List[str]]]]] = None,
+        resume_state: Optional[Dict[str, Any]] = None,
+        save_state: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        on_budget_reached: Optional[Callable[[], None]] = None,
+        on_page_failed: Optional[Callable[[str], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Crawl from a priority work queue keyed by depth.
+
+        Start URLs are depth 0. A page's links are queued at its depth + 1 as soon as
+        it arrives, and only while that is below max_depth. A URL found at several
+        depths is crawled once, at the shallowest; if it is found closer to the start
+        after it was crawled, its links are queued again from the shallower depth so
+        pages within max_depth are not cut off. Pages are claimed against the
+        budget before they are fetched, so exactly max_pages pages are crawled when
+        enough are reachable.
+
+        Args:
+            fetch_page: Async callable that crawls one (transformed) URL and returns its result
+            max_in_flight: Upper bound on pages dispatched and not yet finished
+            canonicalizer: Normalizes discovered URLs; URLs with the same key are one page
+            visited: Visited set the crawl claims pages in
+
+        Returns:
+            List of crawl results, or an empty list when on_page is given
+        """
+        queue: List[Tuple[int, int, str]] = []
+        # Canonical key -> (depth, URL) of every URL waiting in the queue
+        queued: Dict[str, Tuple[int, str]] = {}
+        # Canonical key -> shallowest depth of every page this run dispatched, and the
+        # links of those past depth 0 that finished, to follow again if found shallower
+        reached: Dict[str, int] = {}
+        page_links: Dict[str, List[str]] = {}
+        order = itertools.count()
+
+        def enqueue(url: str, depth: int) -> None:
+            if depth >= max_depth:
+                return
+            url = canonicalizer.canonicalize(url)
+            key = canonicalizer.key(url)
+            if url in visited:
+                lower_depth(key, depth)
+                return
+            if key in queued and queued[key][0] <= depth:
+                return
+            if self.url_handler.is_binary_file(url):
+                logger.debug(f"Skipping binary file from crawl queue: {url}")
+                return
+            # A shallower rediscovery is pushed again; the deeper entry goes stale
+            queued[key] = (depth, url)
+            heapq.heappush(queue, (depth, next(order), url))
+
+        def lower_depth(key: str, depth: int) -> None:
+            # Each call is one level deeper, so the recursion stops at max_depth
+            if key not in reached or reached[key] <= depth:
+                return
+            reached[key] = depth
+            for link in page_links.get(key, []):
+                enqueue(link, depth + 1)
+
+        def follow_links(url: str, depth: int, links: List[str]) -> None:
+            key = canonicalizer.key(url)
+            # Use the shallowest depth the page was found at while it was being fetched
+            depth = reached.get(key, depth)
+            if depth:
+                page_links[key] = links
+            for link in links:
+                enqueue(link, depth + 1)
+
+        def next_group(limit: int) -> List[Tuple[int, str]]:
+            group = []
+            while queue and len(group) < limit:
+                depth, _, url = heapq.heappop(queue)
+                key = canonicalizer.key(url)
+                if queued.get(key) != (depth, url) or url in visited:
+                    continue
+                del queued[key]
+                group.append((depth, url))
+            return group
+
+        if resume_state:
+            visited.update(resume_state.get("visited", []))
+            if "queue" in resume_state:
+                for depth, url in resume_state["queue"]:
+                    enqueue(url, int(depth))
+                # Pages that were crawled but not stored: their links are already queued
+                for url in resume_state.get("pending", []):
+                    enqueue(url, max_depth - 1)
+            else:
+                # Checkpoint of a level-by-level crawl
+                depth = int(resume_state.get("depth", 0))
+                for url in resume_state.get("pending", []):
+                    enqueue(url, depth)
+                for url in resume_state.get("next_level", []):
+                    enqueue(url, depth + 1)
+            logger.info(
+                f"Resuming recursive crawl with {len(queued)} queued URLs "
+                f"({len(visited)} already visited)"
+            )
+        else:
+            for url in start_urls:
+                enqueue(url, 0)
+
+        in_progress: Dict[asyncio.Task, Tuple[str, int]] = {}
+        results_all = []
+        total_successful = 0
+        total_processed = 0
+        deepest = 0
+
+        def budget_left() -> int:
+            return max_pages - len(visited) if max_pages else max_in_flight
+
+        def snapshot() -> Dict[str, Any]:
+            # Pages still being fetched go back on the queue at their own depth
+            running = {url: reached.get(canonicalizer.key(url), depth) for url, depth in in_progress.values()}
+            entries = [[depth, url] for depth, url in queued.values()]
+            entries += [[depth, url] for url, depth in running.items()]
+            return {
+                "queue": sorted(entries),
+                "pending": [],
+                "visited": [url for url in visited if url not in running],
+            }
+
+        async def report(message: str) -> None:
+            if max_pages:
+                expected = max_pages
+            else:
+                expected = total_processed + len(in_progress) + len(queued)
+            fraction = total_processed / expected if expected else 1.0
+            await report_progress(
+                start_progress + int(min(fraction, 1.0) * (end_progress - start_progress)),
+                message,
+                totalPages=total_processed,
+                processedPages=total_successful,
+            )
+
+        await report(f"Crawling up to depth {max_depth}: {len(queued)} URLs queued")
+
+        try:
+            while queue or in_progress:
+                room = min(max_in_flight - len(in_progress), budget_left())
+                if room > 0 and queue:
+                    group = next_group(room)
+                    unchanged = {}
+                    # Leave out pages that have not changed, but keep following their links
+                    if skip_unchanged and group:
+                        unchanged = await skip_unchanged([url for _, url in group])
+                        for depth, url in group:
+                            if url in unchanged:
+                                visited.add(url)
+                                reached[canonicalizer.key(url)] = depth
+                                total_processed += 1
+                                follow_links(url, depth, unchanged[url])
+                        if unchanged:
+                            logger.info(f"Skipping {len(unchanged)} unchanged URLs")
+
+                    for depth, url in group:
+                        if url in unchanged:
+                            continue
+                        visited.add(url)
+                        reached[canonicalizer.key(url)] = depth
+                        deepest = max(deepest, depth)
+                        task = asyncio.create_task(fetch_page(transform_url_func(url)))
+                        in_progress[task] = (url, depth)
+
+                    if unchanged:
+                        # Skipped pages freed their slots; refill before waiting
+                        continue
+
+                if not in_progress:
+                    if budget_left() <= 0:
+                        # Only live entries count; stale ones were superseded or already crawled
+                        if queued:
+                            logger.info(
+                                f"Page budget of {max_pages} reached with {len(queued)} URLs still queued"
+                            )
+                            if on_budget_reached:
+                                on_budget_reached()
+                        break
+                    continue
+
+                done, _ = await asyncio.wait(in_progress, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth = in_progress.pop(task)
+                    total_processed += 1
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Failed to crawl {url}: {e}")
+                        if on_page_failed:
+                            on_page_failed(url)
+                        continue
+
+                    if result.success and result.markdown:
+                        links = getattr(result, "links", {}) or {}
+                        internal_links = list(dict.fromkeys(
+                            canonicalizer.canonicalize(link["href"]) for link in links.get("internal", [])
+                        ))
+                        page = {
+                            "url": url,
+                            "markdown": result.markdown,
+                            "html": await spool_html(self.html_spool, result.html),  # Always use raw HTML for code extraction
+                            "links": internal_links,
+                            **get_cache_validators(getattr(result, "response_headers", None)),
+                        }
+                        if on_page:
+                            await on_page(page)
+                        else:
+                            results_all.append(page)
+                        total_successful += 1
+                        follow_links(url, depth, internal_links)
+                    elif not result.success:
+                        logger.warning(
+                            f"Failed to crawl {url}: {getattr(result, 'error_message', 'Unknown error')}"
+                        )
+                        if on_page_failed:
+                            on_page_failed(url)
+                    else:
+                        logger.info(f"Crawled {url} but it has no content")
+
+                    if total_processed % 5 == 0:
+                        await report(
+                            f"Depth {deepest + 1}/{max_depth}: processed {total_processed} URLs "
+                            f"({total_successful} successful), {len(queued)} queued"
+                        )
+
+                if save_state:
+                    # Built only when a checkpoint is written; the visited set can be large
+                    await save_state(snapshot)
+        finally:
+            for task in in_progress:
+                task.cancel()
+            if in_progress:
+                await asyncio.gather(*in_progress, return_exceptions=True)
 
         await report_progress(
             end_progress,
-            f"Recursive crawling completed: {len(results_all)} total pages crawled across {max_depth} depth levels",
+            f"Recursive crawling completed: {total_successful} total pages crawled across {deepest + 1} depth levels",
+            totalPages=total_processed,
+            processedPages=total_successful,
         )
         return results_all
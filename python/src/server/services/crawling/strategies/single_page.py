@@ -9,6 +9,8 @@ from typing import Dict, Any, List, Optional, Callable, Awaitable
 
 from crawl4ai import CrawlerRunConfig, CacheMode
 from ....config.logfire_config import get_logger
+from ..domain_profiles import with_domain_profiles
+from ..page_cache import with_page_cache
 
 logger = get_logger(__name__)
 
@@ -26,7 +28,15 @@ class SinglePageCrawlStrategy:
         """
         self.crawler = crawler
         self.markdown_generator = markdown_generator
+        # Optional PageCache set by the orchestrator for the current crawl
+        self.page_cache = None
+        # Optional DomainProfileStore that tunes each page's render settings
+        self.domain_profiles = None
     
+    def _profiled_crawler(self):
+        """The crawler, rendering each page with its domain's profile when profiles are on."""
+        return with_domain_profiles(self.crawler, self.domain_profiles)
+
     def _get_wait_selector_for_docs(self, url: str) -> str:
         """Get appropriate wait selector based on documentation framework."""
         url_lower = url.lower()
@@ -136,7 +146,9 @@ class SinglePageCrawlStrategy:
                 logger.info(f"Using wait_until: {crawl_config.wait_until}, page_timeout: {crawl_config.page_timeout}")
                 
                 try:
-                    result = await self.crawler.arun(url=url, config=crawl_config)
+                    result = await with_page_cache(self._profiled_crawler(), self.page_cache).arun(
+                        url=url, config=crawl_config
+                    )
                 except Exception as e:
                     last_error = f"Crawler exception for {url}: {str(e)}"
                     logger.error(last_error)
@@ -247,7 +259,9 @@ class SinglePageCrawlStrategy:
                 stream=False
             )
             
-            result = await self.crawler.arun(url=url, config=crawl_config)
+            result = await with_page_cache(self._profiled_crawler(), self.page_cache).arun(
+                url=url, config=crawl_config
+            )
             if result.success and result.markdown:
                 logger.info(f"Successfully crawled markdown file: {url}")
                 
@@ -1,55 +1,219 @@
 """
 Sitemap Crawling Strategy
 
-Handles crawling of URLs from XML sitemaps.
+Handles crawling of URLs from XML sitemaps. Sitemaps are streamed over a pooled
+HTTP client and parsed incrementally, so large and gzipped sitemaps never have
+to fit in memory, and the children of sitemap indexes are read concurrently.
 """
-import traceback
-from typing import List
+import asyncio
+import fnmatch
+import zlib
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
 from xml.etree import ElementTree
-import requests
+
+import httpx
 
 from ....config.logfire_config import get_logger
+from ..helpers.url_canonicalizer import UrlCanonicalizer
+from ..visited_set import VisitedSet
 
 logger = get_logger(__name__)
 
+SITEMAP_TIMEOUT = 30.0
+SITEMAP_FETCH_CONCURRENCY = 5
+
+# Sitemap indexes may nest; stop following them past this depth
+MAX_INDEX_DEPTH = 3
+
+# URLs buffered ahead of the crawler before parsing pauses
+ENTRY_QUEUE_SIZE = 1000
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_DONE = object()
+
+
+@dataclass
+class SitemapEntry:
+    """A page URL listed in a sitemap"""
+
+    url: str
+    lastmod: Optional[datetime] = None
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime from a sitemap <lastmod>, treating dates without a zone as UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def matches_patterns(
+    url: str, include_patterns: Optional[List[str]] = None, exclude_patterns: Optional[List[str]] = None
+) -> bool:
+    """Whether a URL passes the include and exclude glob patterns."""
+    if include_patterns and not any(fnmatch.fnmatch(url, p) for p in include_patterns):
+        return False
+    return not (exclude_patterns and any(fnmatch.fnmatch(url, p) for p in exclude_patterns))
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
 
 class SitemapCrawlStrategy:
     """Strategy for parsing and crawling sitemaps."""
-    
-    def parse_sitemap(self, sitemap_url: str) -> List[str]:
+
+    async def iter_sitemap(
+        self,
+        sitemap_url: str,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        modified_since: Optional[datetime] = None,
+        canonicalizer: Optional[UrlCanonicalizer] = None,
+    ) -> AsyncIterator[SitemapEntry]:
+        """
+        Stream the page URLs of a sitemap, following sitemap indexes.
+
+        Args:
+            sitemap_url: URL of the sitemap or sitemap index
+            include_patterns: Glob patterns a URL must match one of to be kept
+            exclude_patterns: Glob patterns that drop a URL
+            modified_since: Drop URLs whose lastmod is older than this
+            canonicalizer: Decides which listed URLs are the same page; defaults to the
+                standard rules
+
+        Yields:
+            Each distinct page URL as soon as it is parsed
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=ENTRY_QUEUE_SIZE)
+        semaphore = asyncio.Semaphore(SITEMAP_FETCH_CONCURRENCY)
+        seen_sitemaps = {sitemap_url}
+        seen_urls = VisitedSet((canonicalizer or UrlCanonicalizer()).key)
+
+        async def _read(client: httpx.AsyncClient, url: str, depth: int) -> None:
+            children = []
+            async with semaphore:
+                async for kind, entry in self._parse_stream(client, url):
+                    if kind == "sitemap":
+                        if entry.url not in seen_sitemaps:
+                            seen_sitemaps.add(entry.url)
+                            children.append(entry.url)
+                        continue
+                    if not seen_urls.add(entry.url):
+                        continue
+                    if not matches_patterns(entry.url, include_patterns, exclude_patterns):
+                        continue
+                    if modified_since and entry.lastmod and entry.lastmod < modified_since:
+                        continue
+                    await queue.put(entry)
+
+            if children:
+                if depth >= MAX_INDEX_DEPTH:
+                    logger.warning(f"Not following {len(children)} nested sitemaps below {url}: too deep")
+                    return
+                logger.info(f"Sitemap index {url} lists {len(children)} sitemaps")
+                await asyncio.gather(*(_read(client, child, depth + 1) for child in children))
+
+        async def _produce(client: httpx.AsyncClient) -> None:
+            try:
+                await _read(client, sitemap_url, 0)
+            except Exception as e:
+                logger.error(f"Unexpected error in sitemap parsing: {e}", exc_info=True)
+            finally:
+                await queue.put(_DONE)
+
+        logger.info(f"Parsing sitemap: {sitemap_url}")
+        async with httpx.AsyncClient(
+            timeout=SITEMAP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=SITEMAP_FETCH_CONCURRENCY),
+        ) as client:
+            producer = asyncio.create_task(_produce(client))
+            count = 0
+            try:
+                while True:
+                    entry = await queue.get()
+                    if entry is _DONE:
+                        break
+                    count += 1
+                    yield entry
+            finally:
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+                seen_urls.close()
+        logger.info(f"Successfully extracted {count} URLs from {len(seen_sitemaps)} sitemaps")
+
+    async def parse_sitemap(self, sitemap_url: str) -> List[str]:
         """
         Parse a sitemap and extract URLs with comprehensive error handling.
-        
+
         Args:
             sitemap_url: URL of the sitemap to parse
-            
+
         Returns:
             List of URLs extracted from the sitemap
         """
-        urls = []
-        
+        return [entry.url async for entry in self.iter_sitemap(sitemap_url)]
+
+    async def _parse_stream(self, client: httpx.AsyncClient, url: str) -> AsyncIterator[tuple]:
+        """Fetch one sitemap and yield ("url" | "sitemap", SitemapEntry) pairs as they are parsed."""
+        parser = ElementTree.XMLPullParser(events=("start", "end"))
+        root = None
+        decompressor = None
+        first_chunk = True
+
+        def _drain():
+            nonlocal root
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                kind = _local_name(elem.tag)
+                if kind not in ("url", "sitemap"):
+                    continue
+                loc = lastmod = None
+                for child in elem:
+                    name = _local_name(child.tag)
+                    if name == "loc":
+                        loc = (child.text or "").strip()
+                    elif name == "lastmod":
+                        lastmod = parse_lastmod(child.text)
+                if loc:
+                    yield kind, SitemapEntry(loc, lastmod)
+                # Finished entries are dropped so memory stays flat on huge sitemaps
+                root.clear()
+
         try:
-            logger.info(f"Parsing sitemap: {sitemap_url}")
-            resp = requests.get(sitemap_url, timeout=30)
-            
-            if resp.status_code != 200:
-                logger.error(f"Failed to fetch sitemap: HTTP {resp.status_code}")
-                return urls
-            
-            try:
-                tree = ElementTree.fromstring(resp.content)
-                urls = [loc.text for loc in tree.findall('.//{*}loc') if loc.text]
-                logger.info(f"Successfully extracted {len(urls)} URLs from sitemap")
-                
-            except ElementTree.ParseError as e:
-                logger.error(f"Error parsing sitemap XML: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error parsing sitemap: {e}")
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error fetching sitemap: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error in sitemap parsing: {e}")
-            logger.error(traceback.format_exc())
-        
-        return urls
\ No newline at end of file
+            async with client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    logger.error(f"Failed to fetch sitemap {url}: HTTP {response.status_code}")
+                    return
+                async for chunk in response.aiter_bytes():
+                    if first_chunk:
+                        first_chunk = False
+                        # .xml.gz files are served as gzip bodies, not gzip transfer encoding
+                        if chunk.startswith(GZIP_MAGIC):
+                            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    if decompressor:
+                        chunk = decompressor.decompress(chunk)
+                    parser.feed(chunk)
+                    for item in _drain():
+                        yield item
+            if decompressor:
+                parser.feed(decompressor.flush())
+            parser.close()
+            for item in _drain():
+                yield item
+        except httpx.HTTPError as e:
+            logger.error(f"Network error fetching sitemap {url}: {e}")
+        except (ElementTree.ParseError, zlib.error) as e:
+            logger.error(f"Error parsing sitemap {url}: {e}")
@@ -0,0 +1,185 @@
+"""
+Visited Set
+
+Remembers which URLs a crawl has seen in bounded memory. Small crawls use an
+in-memory dict. Past a size limit the entries spill to an exact SQLite set in a
+temporary file, fronted by a scalable Bloom filter so most lookups of new URLs
+never touch the disk. The file is removed by close() or when the set is garbage
+collected.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+import weakref
+from collections.abc import Callable, Iterator
+
+from ...config.logfire_config import get_logger
+
+logger = get_logger(__name__)
+
+# Entries kept in memory before spilling to disk
+DEFAULT_MEMORY_LIMIT = 100_000
+
+# False positive rate of each Bloom filter layer; a false positive costs one disk lookup
+BLOOM_ERROR_RATE = 0.001
+
+# SQLite page cache per visited set, in KiB
+DISK_CACHE_KIB = 2048
+
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter over strings"""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _remove_database(connection: sqlite3.Connection, path: str) -> None:
+    connection.close()
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class VisitedSet:
+    """Set of URLs keyed by identity, in bounded memory"""
+
+    def __init__(
+        self,
+        key: Callable[[str], str] | None = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    ):
+        """
+        Initialize the visited set.
+
+        Args:
+            key: Maps a URL to its identity; URLs with the same key are the same entry.
+                Iteration yields the URL each entry was first added with.
+            memory_limit: Entries kept in memory before spilling to disk
+        """
+        self._key = key or (lambda url: url)
+        self.memory_limit = max(1, memory_limit)
+        self._memory: dict[str, str] | None = {}
+        self._filters: list[BloomFilter] = []
+        self._db: sqlite3.Connection | None = None
+        self._finalizer = None
+        self._count = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._db is not None
+
+    def add(self, url: str) -> bool:
+        """Add a URL; returns False if an entry with the same key was already there."""
+        key = self._key(url)
+        if self._memory is not None:
+            if key in self._memory:
+                return False
+            self._memory[key] = url
+            self._count += 1
+            if self._count > self.memory_limit:
+                self._spill()
+            return True
+
+        if self._maybe_contains(key) and self._on_disk(key):
+            return False
+        self._db.execute("INSERT INTO visited (key, url) VALUES (?, ?)", (key, url))
+        self._bloom_add(key)
+        self._count += 1
+        return True
+
+    def update(self, urls) -> None:
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        key = self._key(url)
+        if self._memory is not None:
+            return key in self._memory
+        return self._maybe_contains(key) and self._on_disk(key)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        if self._memory is not None:
+            yield from list(self._memory.values())
+            return
+        # Read in pages so callers may add while iterating
+        last = ""
+        while True:
+            rows = self._db.execute(
+                "SELECT key, url FROM visited WHERE key > ? ORDER BY key LIMIT 1000", (last,)
+            ).fetchall()
+            if not rows:
+                return
+            for _, url in rows:
+                yield url
+            last = rows[-1][0]
+
+    def close(self) -> None:
+        """Drop the entries and remove the spill file."""
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+            self._db = None
+        self._memory = {}
+        self._filters = []
+        self._count = 0
+
+    # Internal helpers
+
+    def _spill(self) -> None:
+        fd, path = tempfile.mkstemp(prefix="archon-visited-", suffix=".db")
+        os.close(fd)
+        db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        # The file is scratch space for one crawl; durability is not needed
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute(f"PRAGMA cache_size=-{DISK_CACHE_KIB}")
+        db.execute("CREATE TABLE visited (key TEXT PRIMARY KEY, url TEXT NOT NULL) WITHOUT ROWID")
+        db.execute("BEGIN")
+        db.executemany("INSERT INTO visited (key, url) VALUES (?, ?)", self._memory.items())
+        db.execute("COMMIT")
+        self._db = db
+        self._finalizer = weakref.finalize(self, _remove_database, db, path)
+        for key in self._memory:
+            self._bloom_add(key)
+        self._memory = None
+        logger.info(f"Visited set passed {self.memory_limit} URLs, continuing on disk at {path}")
+
+    def _bloom_add(self, key: str) -> None:
+        # Each full layer is followed by one twice its size
+        if not self._filters or self._filters[-1].count >= self._filters[-1].capacity:
+            capacity = self._filters[-1].capacity * 2 if self._filters else self.memory_limit * 2
+            self._filters.append(BloomFilter(capacity))
+        self._filters[-1].add(key)
+
+    def _maybe_contains(self, key: str) -> bool:
+        return any(key in bloom for bloom in self._filters)
+
+    def _on_disk(self, key: str) -> bool:
+        return self._db.execute("SELECT 1 FROM visited WHERE key = ?", (key,)).fetchone() is not None
@@ -9,9 +9,13 @@ from .agentic_rag_strategy import AgenticRAGStrategy
 
 # Strategy implementations
 from .base_search_strategy import BaseSearchStrategy
+from .context_packer import ContextPacker, estimate_tokens, pack_context
 from .hybrid_search_strategy import HybridSearchStrategy
+from .query_log_service import QueryLogService, get_query_log_service
 from .rag_service import RAGService
 from .reranking_strategy import RerankingStrategy
+from .search_cache import SearchCache, get_search_cache
+from .source_partition_service import SourcePartitionService, get_source_partition_service
 
 __all__ = [
     # Main service classes
@@ -21,4 +25,16 @@ __all__ = [
     "HybridSearchStrategy",
     "RerankingStrategy",
     "AgenticRAGStrategy",
+    # Result post-processing
+    "ContextPacker",
+    "pack_context",
+    "estimate_tokens",
+    # Caching and query logging
+    "SearchCache",
+    "get_search_cache",
+    "QueryLogService",
+    "get_query_log_service",
+    # Source-partitioned vector indexes
+    "SourcePartitionService",
+    "get_source_partition_service",
 ]
@@ -12,15 +12,31 @@ Key features:
 - Programming language and framework-aware search
 """
 
+import re
 from typing import Any
 
 from supabase import Client
 
 from ...config.logfire_config import get_logger, safe_span
 from ..embeddings.embedding_service import create_embedding
+from .keyword_extractor import extract_keywords
+from .search_cache import get_query_embedding
 
 logger = get_logger(__name__)
 
+# A single code symbol: useQueryClient, BaseModel.model_validate, std::vector, foo->bar, run()
+IDENTIFIER_PATTERN = re.compile(
+    r"^[A-Za-z_$][\w$]*(?:(?:\.|::|->|#)[A-Za-z_$][\w$]*)*(?:\(\))?$"
+)
+
+# Error messages such as "TypeError: Cannot read properties of undefined"
+ERROR_STRING_PATTERN = re.compile(r"^[A-Za-z_][\w.]*(?:Error|Exception|Warning)\b:?")
+
+QUOTE_CHARS = "`'\""
+
+# Trigram lookups need at least one full trigram to use the index
+MIN_LOOKUP_LENGTH = 3
+
 
 class AgenticRAGStrategy:
     """Strategy class implementing agentic RAG for code example search and extraction"""
@@ -89,7 +105,7 @@ class AgenticRAGStrategy:
         ) as span:
             try:
                 # Create embedding for the query (no enhancement)
-                query_embedding = await create_embedding(query)
+                query_embedding = await get_query_embedding(query, create_embedding)
 
                 if not query_embedding:
                     logger.error("Failed to create embedding for code example query")
@@ -346,9 +362,15 @@ class AgenticRAGStrategy:
 
         code_indicators = [kw for kw in code_keywords if kw in query_lower]
 
+        # Exact symbols and error strings are served by the trigram fast path
+        lookup_type, lookup_text = self._classify_lookup(query)
+
         # Determine if query is code-related
         is_code_query = (
-            len(detected_languages) > 0 or len(detected_frameworks) > 0 or len(code_indicators) > 0
+            len(detected_languages) > 0
+            or len(detected_frameworks) > 0
+            or len(code_indicators) > 0
+            or lookup_type is not None
         )
 
         return {
@@ -361,8 +383,90 @@ class AgenticRAGStrategy:
             "frameworks": detected_frameworks,
             "code_indicators": code_indicators,
             "enhanced_query_recommended": is_code_query,
+            "lookup_type": lookup_type,
+            "lookup_text": lookup_text,
         }
 
+    def _classify_lookup(self, query: str) -> tuple[str | None, str | None]:
+        """
+        Decide whether a query names an exact identifier or error string.
+
+        Returns:
+            Tuple of (lookup_type, lookup_text) where lookup_type is "identifier",
+            "error_string" or "quoted", or (None, None) for natural language queries
+        """
+        stripped = query.strip()
+        if len(stripped) >= 2 and stripped[0] in QUOTE_CHARS and stripped[-1] == stripped[0]:
+            text = stripped[1:-1].strip()
+            if len(text) >= MIN_LOOKUP_LENGTH:
+                return "quoted", text
+            return None, None
+
+        text = stripped.strip(QUOTE_CHARS)
+        if len(text) < MIN_LOOKUP_LENGTH:
+            return None, None
+
+        if ERROR_STRING_PATTERN.match(text) and extract_keywords(text):
+            return "error_string", text
+
+        if " " in text or not IDENTIFIER_PATTERN.match(text):
+            return None, None
+
+        # Plain words ("authentication", "react") are better served semantically;
+        # only code-shaped tokens take the identifier path
+        has_code_shape = (
+            any(sep in text for sep in ("_", ".", "::", "->", "#", "()"))
+            or re.search(r"[a-z][A-Z]", text) is not None
+            or (sum(c.isupper() for c in text) >= 2 and any(c.islower() for c in text))
+        )
+        if not has_code_shape:
+            return None, None
+
+        return "identifier", text.removesuffix("()")
+
+    async def search_code_examples_by_text(
+        self,
+        text: str,
+        match_count: int = 10,
+        source_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Find code examples containing an exact identifier or string via the trigram index.
+
+        This skips the embedding round trip entirely, so symbol lookups return in
+        milliseconds.
+
+        Args:
+            text: The identifier or string to look up
+            match_count: Maximum number of results to return
+            source_id: Optional source ID to filter results
+
+        Returns:
+            List of matching code examples; similarity is 1.0 for exact-case matches
+            in the code, 0.9 for case-insensitive ones and 0.8 for summary-only matches
+        """
+        with safe_span("code_text_lookup", text_length=len(text), match_count=match_count) as span:
+            try:
+                rpc_params = {"search_text": text, "match_count": match_count}
+                if source_id:
+                    rpc_params["source_filter"] = source_id
+
+                response = self.supabase_client.rpc(
+                    "match_archon_code_examples_by_text", rpc_params
+                ).execute()
+
+                results = response.data or []
+                for result in results:
+                    result["match_type"] = "identifier"
+
+                span.set_attribute("results_found", len(results))
+                return results
+
+            except Exception as e:
+                logger.warning(f"Code text lookup failed, falling back to vector search: {e}")
+                span.set_attribute("error", str(e))
+                return []
+
 
 # Utility functions for standalone usage
 def create_agentic_rag_strategy(supabase_client: Client) -> AgenticRAGStrategy:
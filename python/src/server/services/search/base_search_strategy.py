@@ -50,15 +50,15 @@ class BaseSearchStrategy:
                 # Build RPC parameters
                 rpc_params = {"query_embedding": query_embedding, "match_count": match_count}
 
-                # Add filter parameters
-                if filter_metadata:
-                    if "source" in filter_metadata:
-                        rpc_params["source_filter"] = filter_metadata["source"]
-                        rpc_params["filter"] = {}
-                    else:
-                        rpc_params["filter"] = filter_metadata
-                else:
-                    rpc_params["filter"] = {}
+                # Add filter parameters. The source goes to its own indexed column filter;
+                # remaining keys (knowledge_type, tags, ...) become a metadata containment
+                # filter, which the RPC pre-filters on the GIN index when it is selective
+                metadata_filter = dict(filter_metadata or {})
+                source_filter = metadata_filter.pop("source", None)
+                if source_filter:
+                    rpc_params["source_filter"] = source_filter
+                rpc_params["filter"] = metadata_filter
+                span.set_attribute("metadata_filter_keys", ",".join(sorted(metadata_filter)))
 
                 # Execute search
                 response = self.supabase_client.rpc(table_rpc, rpc_params).execute()
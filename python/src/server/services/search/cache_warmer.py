@@ -0,0 +1,206 @@
+"""
+Cache Warmer
+
+Re-runs the most popular logged queries to pre-populate the query embedding and
+result caches. Warming happens after startup and after each ingestion that touches
+a source, so the first users after a deploy or re-crawl still get cached latency.
+
+The warmer runs on its own low-priority budget: it has a private rate limiter and
+backs off whenever live traffic is using the shared embedding rate limiter, so it
+never competes with user queries for provider rate limits.
+"""
+
+import asyncio
+from typing import Any
+
+from ...config.logfire_config import get_logger, safe_span
+from ..credential_service import credential_service
+from ..threading_service import RateLimitConfig, RateLimiter, get_threading_service
+from .query_log_service import get_query_log_service
+from .search_cache import get_search_cache
+
+logger = get_logger(__name__)
+
+# Low-priority budget for warming - a small slice of the provider limits
+WARMER_RATE_LIMIT = RateLimitConfig(tokens_per_minute=20_000, requests_per_minute=60, max_concurrent=1)
+
+# Pause warming while live traffic uses more than this share of the shared limiter
+LIVE_TRAFFIC_UTILIZATION_THRESHOLD = 0.5
+IDLE_POLL_SECONDS = 2.0
+MAX_IDLE_WAIT_SECONDS = 120.0
+
+# Delay after startup so warming does not slow down the first live requests
+STARTUP_DELAY_SECONDS = 30.0
+
+# Estimated embedding tokens per warmed query, for the private rate limiter
+TOKENS_PER_QUERY = 50
+
+DEFAULT_TOP_K = 100
+
+
+class CacheWarmer:
+    """Warms search caches from the query log on a low-priority budget"""
+
+    def __init__(self, rate_limit_config: RateLimitConfig | None = None):
+        self.rate_limiter = RateLimiter(rate_limit_config or WARMER_RATE_LIMIT)
+        self._tasks: dict[str | None, asyncio.Task] = {}
+
+    async def _get_settings(self) -> tuple[bool, int]:
+        """Return (enabled, top_k) from settings."""
+        try:
+            enabled = str(await credential_service.get_credential("CACHE_WARMING_ENABLED", "true"))
+            top_k = int(await credential_service.get_credential("CACHE_WARMING_TOP_K", DEFAULT_TOP_K))
+            return enabled.lower() in ("true", "1", "yes", "on"), top_k
+        except Exception:
+            return True, DEFAULT_TOP_K
+
+    async def _wait_for_idle(self) -> None:
+        """Wait while live traffic is using the shared rate limiter."""
+        shared = get_threading_service().rate_limiter
+        waited = 0.0
+        while waited < MAX_IDLE_WAIT_SECONDS and (
+            shared.semaphore.locked()
+            or shared.get_utilization() > LIVE_TRAFFIC_UTILIZATION_THRESHOLD
+        ):
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+            waited += IDLE_POLL_SECONDS
+
+    async def warm(self, source_id: str | None = None) -> int:
+        """
+        Re-run the top-K popular queries and store their results in the caches.
+
+        Args:
+            source_id: Only warm queries that can touch this source (None warms all)
+
+        Returns:
+            Number of queries warmed
+        """
+        enabled, top_k = await self._get_settings()
+        if not enabled or top_k <= 0:
+            return 0
+
+        # Imported lazily - rag_service imports this package's cache helpers
+        from .rag_service import RAGService
+
+        with safe_span("cache_warming", source_id=source_id, top_k=top_k) as span:
+            queries = await get_query_log_service().get_popular_queries(
+                limit=top_k, source_id=source_id
+            )
+            if not queries:
+                span.set_attribute("queries_warmed", 0)
+                return 0
+
+            rag_service = RAGService()
+            warmed = 0
+            for entry in queries:
+                await self._wait_for_idle()
+                async with self.rate_limiter.semaphore:
+                    await self.rate_limiter.acquire(TOKENS_PER_QUERY)
+                    try:
+                        await self._warm_query(rag_service, entry)
+                        warmed += 1
+                    except Exception as e:
+                        logger.debug(f"Cache warming failed for '{entry.get('query_text')}': {e}")
+
+            span.set_attribute("queries_warmed", warmed)
+            logger.info(f"Cache warming completed | queries={warmed} | source_id={source_id}")
+            return warmed
+
+    @staticmethod
+    async def _warm_query(rag_service, entry: dict[str, Any]) -> None:
+        # Replay the query as it was asked; entries logged before query_text existed only have the key
+        query = entry.get("query_text") or entry["normalized_query"]
+        source = entry.get("source_filter")
+        match_count = entry.get("match_count") or 5
+        filters = entry.get("filters") or {}
+
+        if entry.get("query_type") == "code_examples":
+            await rag_service.search_code_examples_service(
+                query=query,
+                source_id=source,
+                match_count=match_count,
+                use_cache=False,
+                log_query=False,
+            )
+        else:
+            await rag_service.perform_rag_query(
+                query=query,
+                source=source,
+                match_count=match_count,
+                token_budget=filters.get("token_budget"),
+                knowledge_type=filters.get("knowledge_type"),
+                tags=filters.get("tags"),
+                use_cache=False,
+                log_query=False,
+            )
+
+    def schedule(self, source_id: str | None = None, delay: float = 0.0) -> asyncio.Task | None:
+        """
+        Schedule a background warm, coalescing with one already pending for the same scope.
+
+        Args:
+            source_id: Source whose queries should be warmed (None for all)
+            delay: Seconds to wait before warming
+
+        Returns:
+            The scheduled task, or None when no event loop is running
+        """
+        existing = self._tasks.get(source_id)
+        if existing and not existing.done():
+            return existing
+
+        async def _run():
+            try:
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.warm(source_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache warming failed | source_id={source_id} | error={e}")
+
+        try:
+            task = asyncio.get_running_loop().create_task(_run())
+        except RuntimeError:
+            return None
+        self._tasks[source_id] = task
+        return task
+
+    async def stop(self) -> None:
+        """Cancel any pending warming tasks."""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        self._tasks.clear()
+
+
+_cache_warmer: CacheWarmer | None = None
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """Get the process-wide cache warmer."""
+    global _cache_warmer
+    if _cache_warmer is None:
+        _cache_warmer = CacheWarmer()
+    return _cache_warmer
+
+
+def on_source_updated(source_id: str | None) -> None:
+    """
+    Invalidate cached results for a source after ingestion and re-warm its popular queries.
+
+    Safe to call from any ingestion path; it never raises.
+    """
+    try:
+        get_search_cache().invalidate_source(source_id)
+        get_cache_warmer().schedule(source_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh caches for source {source_id}: {e}")
+
+
+def on_source_deleted(source_id: str | None) -> None:
+    """Invalidate cached results that may reference a deleted source."""
+    try:
+        get_search_cache().invalidate_source(source_id)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate caches for source {source_id}: {e}")
@@ -0,0 +1,271 @@
+"""
+Context Packer
+
+Packs RAG search results into a caller-specified token budget so downstream
+agents receive the most relevant context with as little redundant text as possible.
+
+Packing pipeline:
+1. Merge adjacent chunks (consecutive chunk_number) from the same URL into one passage
+2. Drop passages that are near-duplicates of a higher-scoring passage
+3. Extract query-relevant windows from each passage instead of blind prefixes
+4. Greedily fill the token budget in relevance order
+"""
+
+import re
+from typing import Any
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+from ...config.logfire_config import get_logger
+from .keyword_extractor import extract_keywords
+
+logger = get_logger(__name__)
+
+# Rough characters-per-token ratio for English/markdown when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Passages whose word-shingle overlap exceeds this are treated as duplicates
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+# Passages smaller than this are not worth including after trimming
+MIN_PASSAGE_TOKENS = 32
+
+_SEGMENT_SPLIT = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a piece of text.
+
+    Uses tiktoken when installed, otherwise a characters-per-token heuristic.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to its first max_tokens tokens.
+
+    Uses tiktoken when installed, otherwise a characters-per-token heuristic. A character
+    split across the cut is dropped rather than decoded as a replacement character.
+    """
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = _ENCODING.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return b"".join(_ENCODING.decode_tokens_bytes(tokens[:max_tokens])).decode("utf-8", errors="ignore")
+
+
+def _shingles(text: str, size: int = 5) -> set[int]:
+    """Hash overlapping word n-grams of a text."""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {hash(" ".join(words))} if words else set()
+    return {hash(" ".join(words[i : i + size])) for i in range(len(words) - size + 1)}
+
+
+class ContextPacker:
+    """Merges, deduplicates and trims search results to fit a token budget"""
+
+    def __init__(
+        self,
+        duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+        min_passage_tokens: int = MIN_PASSAGE_TOKENS,
+    ):
+        self.duplicate_threshold = duplicate_threshold
+        self.min_passage_tokens = min_passage_tokens
+
+    def pack(
+        self,
+        results: list[dict[str, Any]],
+        query: str,
+        token_budget: int,
+        content_key: str = "content",
+    ) -> list[dict[str, Any]]:
+        """
+        Pack search results into at most token_budget tokens of context.
+
+        Args:
+            results: Search results with url, chunk_number, content, metadata and similarity
+            query: The original search query, used to pick relevant windows
+            token_budget: Maximum total tokens of packed content
+            content_key: Key holding the text of each result
+
+        Returns:
+            Packed passages ordered by relevance. Each passage keeps the fields of its
+            best-scoring source chunk and adds chunk_numbers, tokens and truncated.
+        """
+        if token_budget <= 0 or not results:
+            return []
+
+        passages = self._merge_adjacent(results, content_key)
+        passages = self._remove_near_duplicates(passages, content_key)
+
+        keywords = [kw.lower() for kw in extract_keywords(query, min_length=2, max_keywords=10)]
+
+        packed: list[dict[str, Any]] = []
+        remaining = token_budget
+        for passage in passages:
+            if remaining < self.min_passage_tokens and packed:
+                break
+
+            text = passage[content_key]
+            tokens = estimate_tokens(text)
+            truncated = False
+            if tokens > remaining:
+                text = self._extract_window(text, keywords, remaining)
+                tokens = estimate_tokens(text)
+                truncated = True
+                if not text or tokens > remaining or (tokens < self.min_passage_tokens and packed):
+                    continue
+
+            passage[content_key] = text
+            passage["tokens"] = tokens
+            passage["truncated"] = truncated
+            packed.append(passage)
+            remaining -= tokens
+
+        logger.debug(
+            f"Packed {len(results)} results into {len(packed)} passages "
+            f"using {token_budget - remaining}/{token_budget} tokens"
+        )
+        return packed
+
+    def _merge_adjacent(
+        self, results: list[dict[str, Any]], content_key: str
+    ) -> list[dict[str, Any]]:
+        """Merge results from the same URL whose chunk numbers are consecutive."""
+        by_url: dict[str, list[dict[str, Any]]] = {}
+        passages: list[dict[str, Any]] = []
+
+        for result in results:
+            url = result.get("url") or result.get("metadata", {}).get("url")
+            if url is None or result.get("chunk_number") is None:
+                passage = dict(result)
+                passage["chunk_numbers"] = []
+                passages.append(passage)
+                continue
+            by_url.setdefault(url, []).append(result)
+
+        for chunks in by_url.values():
+            # Identical chunks can come back twice (e.g. from hybrid merges)
+            unique = {c["chunk_number"]: c for c in chunks}
+            ordered = [unique[n] for n in sorted(unique)]
+
+            group = [ordered[0]]
+            for chunk in ordered[1:]:
+                if chunk["chunk_number"] == group[-1]["chunk_number"] + 1:
+                    group.append(chunk)
+                else:
+                    passages.append(self._combine(group, content_key))
+                    group = [chunk]
+            passages.append(self._combine(group, content_key))
+
+        passages.sort(key=lambda p: p.get("similarity", 0.0) or 0.0, reverse=True)
+        return passages
+
+    @staticmethod
+    def _combine(group: list[dict[str, Any]], content_key: str) -> dict[str, Any]:
+        """Build one passage out of a run of consecutive chunks."""
+        best = max(group, key=lambda c: c.get("similarity", 0.0) or 0.0)
+        passage = dict(best)
+        passage[content_key] = "\n\n".join(c.get(content_key, "") or "" for c in group)
+        passage["chunk_numbers"] = [c["chunk_number"] for c in group]
+        return passage
+
+    def _remove_near_duplicates(
+        self, passages: list[dict[str, Any]], content_key: str
+    ) -> list[dict[str, Any]]:
+        """Drop passages that mostly repeat a higher-ranked passage."""
+        kept: list[dict[str, Any]] = []
+        kept_shingles: list[set[int]] = []
+
+        for passage in passages:
+            shingles = _shingles(passage.get(content_key, "") or "")
+            if not shingles:
+                # Nothing to compare, e.g. symbol-only code; keep it
+                kept.append(passage)
+                continue
+
+            duplicate = False
+            for existing in kept_shingles:
+                overlap = len(shingles & existing) / min(len(shingles), len(existing))
+                if overlap >= self.duplicate_threshold:
+                    duplicate = True
+                    break
+
+            if not duplicate:
+                kept.append(passage)
+                kept_shingles.append(shingles)
+
+        return kept
+
+    @staticmethod
+    def _extract_window(text: str, keywords: list[str], token_budget: int) -> str:
+        """
+        Return the contiguous run of segments with the most keyword hits that fits the budget.
+
+        Falls back to the leading segments when no keyword occurs in the text.
+        """
+        segments = [s for s in _SEGMENT_SPLIT.split(text) if s and s.strip()]
+        if not segments:
+            return ""
+
+        costs = [estimate_tokens(s) + 1 for s in segments]
+        scores = [sum(1 for kw in keywords if kw in s.lower()) for s in segments]
+
+        # Two-pointer sweep for the best-scoring window within budget
+        best_start, best_end, best_score = 0, 0, -1
+        start = 0
+        window_cost = 0
+        window_score = 0
+        for end in range(len(segments)):
+            window_cost += costs[end]
+            window_score += scores[end]
+            while window_cost > token_budget and start <= end:
+                window_cost -= costs[start]
+                window_score -= scores[start]
+                start += 1
+            if start <= end and window_score > best_score:
+                best_start, best_end, best_score = start, end + 1, window_score
+
+        if best_score < 0:
+            # Not even a single segment fits; hard-trim the most relevant one
+            best = max(range(len(segments)), key=lambda i: scores[i])
+            return trim_to_tokens(segments[best], token_budget).strip()
+
+        return " ".join(s.strip() for s in segments[best_start:best_end])
+
+
+def pack_context(
+    results: list[dict[str, Any]],
+    query: str,
+    token_budget: int,
+    content_key: str = "content",
+) -> list[dict[str, Any]]:
+    """
+    Convenience function to pack search results into a token budget.
+
+    Args:
+        results: Search results to pack
+        query: The original search query
+        token_budget: Maximum total tokens of packed content
+        content_key: Key holding the text of each result
+
+    Returns:
+        Packed passages ordered by relevance
+    """
+    return ContextPacker().pack(results, query, token_budget, content_key=content_key)
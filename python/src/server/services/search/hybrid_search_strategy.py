@@ -18,6 +18,7 @@ from supabase import Client
 from ...config.logfire_config import get_logger, safe_span
 from ..embeddings.embedding_service import create_embedding
 from .keyword_extractor import build_search_terms, extract_keywords
+from .search_cache import get_query_embedding
 
 logger = get_logger(__name__)
 
@@ -93,11 +94,18 @@ class HybridSearchStrategy:
 
                 # Add metadata filters if provided
                 if filter_metadata:
-                    if "source" in filter_metadata and table_name in ["documents", "crawled_pages"]:
+                    if "source" in filter_metadata and table_name in ["documents", "crawled_pages", "archon_crawled_pages"]:
                         query_builder = query_builder.eq("source_id", filter_metadata["source"])
                     elif "source_id" in filter_metadata:
                         query_builder = query_builder.eq("source_id", filter_metadata["source_id"])
 
+                    # Other keys (knowledge_type, tags, ...) match like the vector search filter
+                    metadata_filter = {
+                        k: v for k, v in filter_metadata.items() if k not in ("source", "source_id")
+                    }
+                    if metadata_filter:
+                        query_builder = query_builder.contains("metadata", metadata_filter)
+
                 # Execute query with limit
                 response = query_builder.limit(match_count * 2).execute()
 
@@ -220,7 +228,7 @@ class HybridSearchStrategy:
         with safe_span("hybrid_search_code_examples") as span:
             try:
                 # Create query embedding (no enhancement needed)
-                query_embedding = await create_embedding(query)
+                query_embedding = await get_query_embedding(query, create_embedding)
 
                 if not query_embedding:
                     logger.error("Failed to create embedding for code example query")
@@ -0,0 +1,156 @@
+"""
+Query Log Service
+
+Lightweight persistent logging of search queries. Entries are buffered in memory
+and written to archon_query_log in batches so logging never adds a database round
+trip to a live search. The log drives cache warming of the most popular queries.
+"""
+
+import asyncio
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ...utils import get_supabase_client
+from .search_cache import normalize_query
+
+logger = get_logger(__name__)
+
+QUERY_LOG_TABLE = "archon_query_log"
+
+# Flush when this many entries are buffered, or after the flush interval
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 10.0
+
+# Entries beyond this are dropped if the database is unreachable
+MAX_BUFFERED_ENTRIES = 5000
+
+
+class QueryLogService:
+    """Buffered writer and reader for the search query log"""
+
+    def __init__(self, supabase_client=None):
+        self._supabase_client = supabase_client
+        self._buffer: list[dict[str, Any]] = []
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def supabase_client(self):
+        if self._supabase_client is None:
+            self._supabase_client = get_supabase_client()
+        return self._supabase_client
+
+    def record(
+        self,
+        query_type: str,
+        query: str,
+        source: str | None,
+        match_count: int,
+        latency_ms: float,
+        result_ids: list[Any],
+        filters: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Buffer a query log entry. Never raises and never blocks the caller.
+
+        Args:
+            query_type: "rag" or "code_examples"
+            query: The query text, stored as given and normalized for grouping
+            source: Optional source filter
+            match_count: Requested number of results
+            latency_ms: End-to-end latency of the search
+            result_ids: IDs of the returned results
+            filters: Any additional request parameters (e.g. token_budget)
+        """
+        try:
+            if len(self._buffer) >= MAX_BUFFERED_ENTRIES:
+                return
+
+            self._buffer.append({
+                "query_type": query_type,
+                "query_text": query,
+                "normalized_query": normalize_query(query),
+                "source_filter": source or None,
+                "match_count": match_count,
+                "filters": filters or {},
+                "latency_ms": int(latency_ms),
+                "result_ids": [str(rid) for rid in result_ids],
+            })
+
+            if len(self._buffer) >= FLUSH_BATCH_SIZE:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush(FLUSH_INTERVAL_SECONDS)
+        except Exception as e:
+            logger.debug(f"Failed to record query log entry: {e}")
+
+    def _schedule_flush(self, delay: float) -> None:
+        # A full batch (delay 0) always gets its own flush; interval flushes are coalesced
+        if delay > 0 and self._flush_task and not self._flush_task.done():
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush(delay))
+        except RuntimeError:
+            # No running loop (e.g. sync test context) - entries stay buffered
+            pass
+
+    async def _delayed_flush(self, delay: float) -> None:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write buffered entries to the database. Returns the number written."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+
+            batch, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(
+                    lambda: self.supabase_client.table(QUERY_LOG_TABLE).insert(batch).execute()
+                )
+                return len(batch)
+            except Exception as e:
+                logger.warning(f"Failed to write {len(batch)} query log entries: {e}")
+                # Keep the entries for the next flush, within the buffer bound
+                self._buffer = (batch + self._buffer)[:MAX_BUFFERED_ENTRIES]
+                return 0
+
+    async def get_popular_queries(
+        self, limit: int = 100, since_days: int = 7, source_id: str | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Get the most frequent queries in the recent log.
+
+        Args:
+            limit: Maximum number of distinct queries to return
+            since_days: Only consider queries from the last N days
+            source_id: Only return queries filtered on this source (and unfiltered ones)
+
+        Returns:
+            List of dicts with query_type, query_text (as most recently asked), normalized_query,
+            source_filter, match_count, filters and hit_count, most popular first
+        """
+        params: dict[str, Any] = {"max_count": limit, "since_days": since_days}
+        if source_id:
+            params["source"] = source_id
+        try:
+            response = await asyncio.to_thread(
+                lambda: self.supabase_client.rpc("get_popular_archon_queries", params).execute()
+            )
+            return response.data or []
+        except Exception as e:
+            logger.warning(f"Failed to load popular queries: {e}")
+            return []
+
+
+_query_log_service: QueryLogService | None = None
+
+
+def get_query_log_service() -> QueryLogService:
+    """Get the process-wide query log service."""
+    global _query_log_service
+    if _query_log_service is None:
+        _query_log_service = QueryLogService()
+    return _query_log_service
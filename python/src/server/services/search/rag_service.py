@@ -8,25 +8,34 @@ It combines multiple RAG strategies in a pipeline fashion:
 2. + Hybrid search (if enabled) - combines vector + keyword
 3. + Reranking (if enabled) - reorders results using CrossEncoder
 4. + Agentic RAG (if enabled) - enhanced code example search
+5. + Context packing (if a token budget is given) - fits results into N tokens
 
 Multiple strategies can be enabled simultaneously and work together.
 """
 
 import os
+import time
 from typing import Any
 
 from ...config.logfire_config import get_logger, safe_span
 from ...utils import get_supabase_client
 from ..embeddings.embedding_service import create_embedding
+from ..storage.near_duplicates import collapse_duplicates
 from .agentic_rag_strategy import AgenticRAGStrategy
 
 # Import all strategies
 from .base_search_strategy import BaseSearchStrategy
+from .context_packer import ContextPacker
 from .hybrid_search_strategy import HybridSearchStrategy
+from .query_log_service import get_query_log_service
 from .reranking_strategy import RerankingStrategy
+from .search_cache import get_query_embedding, get_search_cache
 
 logger = get_logger(__name__)
 
+# Results fetched per requested result, so collapsing near-duplicates still leaves match_count
+DUPLICATE_FETCH_FACTOR = 2
+
 
 class RAGService:
     """
@@ -46,6 +55,11 @@ class RAGService:
         # Initialize optional strategies
         self.hybrid_strategy = HybridSearchStrategy(self.supabase_client, self.base_strategy)
         self.agentic_strategy = AgenticRAGStrategy(self.supabase_client, self.base_strategy)
+        self.context_packer = ContextPacker()
+
+        # Shared caches and query log (process-wide)
+        self.search_cache = get_search_cache()
+        self.query_log = get_query_log_service()
 
         # Initialize reranking strategy based on settings
         self.reranking_strategy = None
@@ -113,7 +127,7 @@ class RAGService:
         ) as span:
             try:
                 # Create embedding for the query
-                query_embedding = await create_embedding(query)
+                query_embedding = await get_query_embedding(query, create_embedding)
 
                 if not query_embedding:
                     logger.error("Failed to create embedding for query")
@@ -173,7 +187,15 @@ class RAGService:
         )
 
     async def perform_rag_query(
-        self, query: str, source: str = None, match_count: int = 5
+        self,
+        query: str,
+        source: str = None,
+        match_count: int = 5,
+        token_budget: int | None = None,
+        knowledge_type: str | None = None,
+        tags: list[str] | None = None,
+        use_cache: bool = True,
+        log_query: bool = True,
     ) -> tuple[bool, dict[str, Any]]:
         """
         Perform a comprehensive RAG query that combines all enabled strategies.
@@ -182,11 +204,19 @@ class RAGService:
         1. Start with vector search
         2. Apply hybrid search if enabled
         3. Apply reranking if enabled
+        4. Pack results into the token budget if one is given
 
         Args:
             query: The search query
             source: Optional source domain to filter results
             match_count: Maximum number of results to return
+            token_budget: Optional maximum tokens of returned content. When set, adjacent
+                chunks are merged, near-duplicates dropped and query-relevant windows
+                extracted instead of truncating each result to 1000 characters.
+            knowledge_type: Optional knowledge type to filter results (e.g. "technical")
+            tags: Optional tags that every result must carry
+            use_cache: Serve from the result cache when possible (the cache is always refreshed)
+            log_query: Record the query in the query log for cache warming
 
         Returns:
             Tuple of (success, result_dict)
@@ -196,19 +226,57 @@ class RAGService:
         ) as span:
             try:
                 logger.info(f"RAG query started: {query[:100]}{'...' if len(query) > 100 else ''}")
+                start_time = time.perf_counter()
 
                 # Build filter metadata
-                filter_metadata = {"source": source} if source else None
+                filter_metadata = {}
+                if source:
+                    filter_metadata["source"] = source
+                if knowledge_type:
+                    filter_metadata["knowledge_type"] = knowledge_type
+                if tags:
+                    filter_metadata["tags"] = list(tags)
+
+                # Request parameters recorded in the query log so warming can replay them
+                request_filters = {
+                    key: value
+                    for key, value in (
+                        ("token_budget", token_budget),
+                        ("knowledge_type", knowledge_type),
+                        ("tags", tags),
+                    )
+                    if value
+                }
 
                 # Check which strategies are enabled
                 use_hybrid_search = self.get_bool_setting("USE_HYBRID_SEARCH", False)
                 use_reranking = self.get_bool_setting("USE_RERANKING", False)
 
+                # Serve repeated queries from the result cache
+                cache_key = self.search_cache.result_key(
+                    "rag",
+                    query,
+                    source,
+                    match_count=match_count,
+                    token_budget=token_budget,
+                    knowledge_type=knowledge_type,
+                    tags=tuple(sorted(tags)) if tags else None,
+                    hybrid=use_hybrid_search,
+                    reranking=self.reranking_strategy is not None,
+                )
+                if use_cache:
+                    cached = self.search_cache.get_results(cache_key)
+                    if cached is not None:
+                        span.set_attribute("cache_hit", True)
+                        if log_query:
+                            self._log_query("rag", query, source, match_count, start_time, cached, request_filters)
+                        return True, {**cached, "cache_hit": True}
+
                 # Step 1 & 2: Get results (with hybrid search if enabled)
                 results = await self.search_documents(
                     query=query,
-                    match_count=match_count,
-                    filter_metadata=filter_metadata,
+                    match_count=match_count * DUPLICATE_FETCH_FACTOR,
+                    filter_metadata=filter_metadata or None,
                     use_hybrid_search=use_hybrid_search,
                 )
 
@@ -219,12 +287,17 @@ class RAGService:
                 formatted_results = []
                 for i, result in enumerate(results):
                     try:
+                        content = result.get("content", "")
                         formatted_result = {
                             "id": result.get("id", f"result_{i}"),
-                            "content": result.get("content", "")[:1000],  # Limit content
+                            # Packing trims to the budget later, otherwise limit content here
+                            "content": content if token_budget else content[:1000],
                             "metadata": result.get("metadata", {}),
                             "similarity_score": result.get("similarity", 0.0),
                         }
+                        if token_budget:
+                            formatted_result["url"] = result.get("url")
+                            formatted_result["chunk_number"] = result.get("chunk_number")
                         formatted_results.append(formatted_result)
                     except Exception as format_error:
                         logger.warning(f"Failed to format result {i}: {format_error}")
@@ -243,6 +316,25 @@ class RAGService:
                         logger.warning(f"Reranking failed: {e}")
                         reranking_applied = False
 
+                # Chunks linked as near-duplicates at ingestion show once, under their best-ranked copy
+                formatted_results = collapse_duplicates(formatted_results)[:match_count]
+
+                # Step 4: Pack into the token budget if requested
+                tokens_used = None
+                if token_budget and formatted_results:
+                    # Rank passages by reranker score when available, similarity otherwise
+                    for result in formatted_results:
+                        result["similarity"] = result.get(
+                            "rerank_score", result.get("similarity_score", 0.0)
+                        )
+                    formatted_results = self.context_packer.pack(
+                        formatted_results, query, token_budget
+                    )
+                    for result in formatted_results:
+                        result.pop("similarity", None)
+                    tokens_used = sum(r["tokens"] for r in formatted_results)
+                    span.set_attribute("tokens_used", tokens_used)
+
                 # Build response
                 response_data = {
                     "results": formatted_results,
@@ -254,11 +346,19 @@ class RAGService:
                     "search_mode": "hybrid" if use_hybrid_search else "vector",
                     "reranking_applied": reranking_applied,
                 }
+                if token_budget:
+                    response_data["token_budget"] = token_budget
+                    response_data["tokens_used"] = tokens_used or 0
 
                 span.set_attribute("final_results_count", len(formatted_results))
                 span.set_attribute("reranking_applied", reranking_applied)
                 span.set_attribute("success", True)
 
+                self.search_cache.set_results(cache_key, response_data)
+                if log_query:
+                    self._log_query("rag", query, source, match_count, start_time, response_data, request_filters)
+                response_data = {**response_data, "cache_hit": False}
+
                 logger.info(f"RAG query completed - {len(formatted_results)} results found")
                 return True, response_data
 
@@ -276,7 +376,12 @@ class RAGService:
                 }
 
     async def search_code_examples_service(
-        self, query: str, source_id: str | None = None, match_count: int = 5
+        self,
+        query: str,
+        source_id: str | None = None,
+        match_count: int = 5,
+        use_cache: bool = True,
+        log_query: bool = True,
     ) -> tuple[bool, dict[str, Any]]:
         """
         Search for code examples using agentic strategy with hybrid search and reranking.
@@ -291,6 +396,8 @@ class RAGService:
             query: The search query
             source_id: Optional source ID to filter results
             match_count: Maximum number of results to return
+            use_cache: Serve from the result cache when possible (the cache is always refreshed)
+            log_query: Record the query in the query log for cache warming
 
         Returns:
             Tuple of (success, result_dict)
@@ -309,14 +416,46 @@ class RAGService:
                         "query": query,
                     }
 
+                start_time = time.perf_counter()
+
                 # Check which strategies are enabled
                 use_hybrid_search = self.get_bool_setting("USE_HYBRID_SEARCH", False)
                 use_reranking = self.get_bool_setting("USE_RERANKING", False)
 
+                # Serve repeated queries from the result cache
+                cache_key = self.search_cache.result_key(
+                    "code_examples",
+                    query,
+                    source_id,
+                    match_count=match_count,
+                    hybrid=use_hybrid_search,
+                    reranking=self.reranking_strategy is not None,
+                )
+                if use_cache:
+                    cached = self.search_cache.get_results(cache_key)
+                    if cached is not None:
+                        span.set_attribute("cache_hit", True)
+                        if log_query:
+                            self._log_query("code_examples", query, source_id, match_count, start_time, cached)
+                        return True, {**cached, "cache_hit": True}
+
                 # Prepare filter
                 filter_metadata = {"source": source_id} if source_id and source_id.strip() else None
 
-                if use_hybrid_search:
+                # Exact identifiers and error strings go to the trigram index first,
+                # skipping the embedding round trip when they match
+                analysis = self.agentic_strategy.analyze_code_query(query)
+                results = []
+                if analysis["lookup_type"]:
+                    results = await self.agentic_strategy.search_code_examples_by_text(
+                        text=analysis["lookup_text"],
+                        match_count=match_count,
+                        source_id=source_id,
+                    )
+                search_mode = "identifier" if results else ("hybrid" if use_hybrid_search else "vector")
+                span.set_attribute("lookup_type", analysis["lookup_type"] or "none")
+
+                if search_mode == "hybrid":
                     # Use hybrid search for code examples
                     results = await self.hybrid_strategy.search_code_examples_hybrid(
                         query=query,
@@ -324,7 +463,7 @@ class RAGService:
                         filter_metadata=filter_metadata,
                         source_id=source_id,
                     )
-                else:
+                elif search_mode == "vector":
                     # Use standard agentic search
                     results = await self.agentic_strategy.search_code_examples(
                         query=query,
@@ -333,8 +472,8 @@ class RAGService:
                         source_id=source_id,
                     )
 
-                # Apply reranking if we have a strategy
-                if self.reranking_strategy and results:
+                # Apply reranking if we have a strategy (exact lookups are already precise)
+                if self.reranking_strategy and results and search_mode != "identifier":
                     try:
                         results = await self.reranking_strategy.rerank_results(
                             query, results, content_key="content"
@@ -346,6 +485,7 @@ class RAGService:
                 formatted_results = []
                 for result in results:
                     formatted_result = {
+                        "id": result.get("id"),
                         "url": result.get("url"),
                         "code": result.get("content"),
                         "summary": result.get("summary"),
@@ -361,19 +501,45 @@ class RAGService:
                 response_data = {
                     "query": query,
                     "source_filter": source_id,
-                    "search_mode": "hybrid" if use_hybrid_search else "vector",
-                    "reranking_applied": self.reranking_strategy is not None,
+                    "search_mode": search_mode,
+                    "reranking_applied": self.reranking_strategy is not None and search_mode != "identifier",
                     "results": formatted_results,
                     "count": len(formatted_results),
                 }
 
                 span.set_attribute("results_found", len(formatted_results))
-                span.set_attribute("hybrid_used", use_hybrid_search)
+                span.set_attribute("hybrid_used", search_mode == "hybrid")
                 span.set_attribute("reranking_used", use_reranking)
 
-                return True, response_data
+                self.search_cache.set_results(cache_key, response_data)
+                if log_query:
+                    self._log_query("code_examples", query, source_id, match_count, start_time, response_data)
+
+                return True, {**response_data, "cache_hit": False}
 
             except Exception as e:
                 logger.error(f"Code example search failed: {e}")
                 span.set_attribute("error", str(e))
                 return False, {"query": query, "error": str(e)}
+
+    def _log_query(
+        self,
+        query_type: str,
+        query: str,
+        source: str | None,
+        match_count: int,
+        start_time: float,
+        response_data: dict[str, Any],
+        filters: dict[str, Any] | None = None,
+    ) -> None:
+        """Record a completed query in the query log (buffered, never raises)."""
+        results = response_data.get("results", [])
+        self.query_log.record(
+            query_type=query_type,
+            query=query,
+            source=source,
+            match_count=match_count,
+            latency_ms=(time.perf_counter() - start_time) * 1000,
+            result_ids=[r.get("id") for r in results if r.get("id") is not None],
+            filters=filters or None,
+        )
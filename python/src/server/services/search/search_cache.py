@@ -0,0 +1,173 @@
+"""
+Search Cache
+
+In-memory caches for the search hot path:
+- Query embeddings, so repeated queries skip the embedding API round trip
+- Final RAG / code example responses, keyed by normalized query and parameters
+
+Result entries remember which source they were filtered on so ingestion into a
+source can invalidate exactly the entries that may now be stale.
+"""
+
+import copy
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..embeddings.embedding_service import create_embedding
+from ..llm_provider_service import get_embedding_model
+
+logger = get_logger(__name__)
+
+# Embeddings only change when the embedding model changes, so keep them for a day
+EMBEDDING_CACHE_TTL = 24 * 60 * 60
+EMBEDDING_CACHE_SIZE = 5000
+
+# Results go stale as new content is ingested; ingestion also invalidates explicitly
+RESULT_CACHE_TTL = 15 * 60
+RESULT_CACHE_SIZE = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache keys and query logging.
+
+    Only whitespace is collapsed: identifier searches such as "useState" and "usestate"
+    are different queries.
+    """
+    return _WHITESPACE.sub(" ", query or "").strip()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, predicate) -> int:
+        """Remove every entry whose key matches the predicate. Returns the number removed."""
+        stale = [key for key in self._data if predicate(key)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SearchCache:
+    """Embedding and result caches shared by all RAGService instances"""
+
+    def __init__(self):
+        self.embeddings = TTLCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL)
+        self.results = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+    @staticmethod
+    def result_key(kind: str, query: str, source: str | None, **params: Any) -> tuple:
+        """Build a result cache key. The source is kept at index 2 for invalidation."""
+        return (kind, normalize_query(query), source or None, tuple(sorted(params.items())))
+
+    def get_results(self, key: tuple) -> dict[str, Any] | None:
+        """A copy of the cached response, so callers can change it freely."""
+        value = self.results.get(key)
+        return copy.deepcopy(value) if value is not None else None
+
+    def set_results(self, key: tuple, value: dict[str, Any]) -> None:
+        """Cache a copy of a response; the caller keeps the original."""
+        self.results.set(key, copy.deepcopy(value))
+
+    def invalidate_source(self, source_id: str | None) -> int:
+        """
+        Drop cached results that may include content from a source.
+
+        Unfiltered queries can return content from any source, so they are always dropped.
+        """
+        removed = self.results.invalidate(lambda key: key[2] is None or key[2] == source_id)
+        if removed:
+            logger.debug(f"Invalidated {removed} cached search results for source {source_id}")
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+
+_search_cache: SearchCache | None = None
+
+
+def get_search_cache() -> SearchCache:
+    """Get the process-wide search cache."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
+
+
+async def get_query_embedding(
+    query: str, embed: Callable[[str], Awaitable[list[float]]] | None = None
+) -> list[float]:
+    """
+    Create an embedding for a search query, reusing a cached one when available.
+
+    Args:
+        query: The search query
+        embed: Embedding function to call on a cache miss (defaults to create_embedding)
+
+    Returns:
+        The query embedding (empty list when embedding creation returned nothing)
+    """
+    cache = get_search_cache()
+    # The model is part of the key so switching embedding models never mixes vector spaces
+    key = (await get_embedding_model(), normalize_query(query))
+
+    embedding = cache.embeddings.get(key)
+    if embedding is not None:
+        return embedding
+
+    embedding = await (embed or create_embedding)(query)
+    if embedding:
+        cache.embeddings.set(key, embedding)
+    return embedding
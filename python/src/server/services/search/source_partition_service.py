@@ -0,0 +1,203 @@
+"""
+Source Partition Service
+
+Keeps source-filtered vector search fast as the knowledge base grows. Once a source
+passes a configurable number of rows, a partial ivfflat index restricted to that
+source is built for archon_crawled_pages and archon_code_examples. The match RPCs
+inline the source filter so the planner routes filtered searches to the source's
+own index instead of scanning the global index and filtering afterwards.
+
+Building an index blocks writes to its table until it is done, so the check that
+runs after each crawl or upload only builds indexes when SOURCE_PARTITION_AUTO_BUILD
+is enabled. Otherwise indexes are built by the migration's backfill.
+"""
+
+import asyncio
+from typing import Any
+
+from ...config.logfire_config import get_logger, safe_span
+from ...utils import get_supabase_client
+from ..credential_service import credential_service
+
+logger = get_logger(__name__)
+
+PARTITIONED_TABLES = ("archon_crawled_pages", "archon_code_examples")
+PARTITION_REGISTRY_TABLE = "archon_source_partitions"
+
+DEFAULT_MIN_ROWS = 10_000
+
+# Rebuild a source's index once it has grown this much since it was built,
+# so the ivfflat list count keeps up with the data
+REBUILD_GROWTH_FACTOR = 2.0
+
+
+class SourcePartitionService:
+    """Creates, refreshes and drops per-source partial vector indexes"""
+
+    def __init__(self, supabase_client=None):
+        self._supabase_client = supabase_client
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def supabase_client(self):
+        if self._supabase_client is None:
+            self._supabase_client = get_supabase_client()
+        return self._supabase_client
+
+    async def _get_min_rows(self) -> int:
+        try:
+            return int(await credential_service.get_credential("SOURCE_PARTITION_MIN_ROWS", DEFAULT_MIN_ROWS))
+        except Exception:
+            return DEFAULT_MIN_ROWS
+
+    async def _auto_build_enabled(self) -> bool:
+        try:
+            value = await credential_service.get_credential("SOURCE_PARTITION_AUTO_BUILD", "false")
+        except Exception:
+            return False
+        return str(value).lower() == "true"
+
+    async def _count_rows(self, table: str, source_id: str) -> int:
+        response = await asyncio.to_thread(
+            lambda: self.supabase_client.table(table)
+            .select("id", count="exact", head=True)
+            .eq("source_id", source_id)
+            .execute()
+        )
+        return response.count or 0
+
+    async def get_partitions(self, source_id: str | None = None) -> list[dict[str, Any]]:
+        """
+        List registered source partitions.
+
+        Args:
+            source_id: Only return partitions for this source
+
+        Returns:
+            Registry rows with source_id, table_name, index_name, row_count and lists
+        """
+
+        def _query():
+            query = self.supabase_client.table(PARTITION_REGISTRY_TABLE).select("*")
+            if source_id:
+                query = query.eq("source_id", source_id)
+            return query.execute()
+
+        try:
+            response = await asyncio.to_thread(_query)
+            return response.data or []
+        except Exception as e:
+            logger.warning(f"Failed to load source partitions: {e}")
+            return []
+
+    async def ensure_source_partitions(self, source_id: str) -> list[str]:
+        """
+        Build or rebuild the partial vector indexes for a source that has passed the size threshold.
+
+        Args:
+            source_id: The source to check
+
+        Returns:
+            Names of the tables whose index was created or rebuilt
+        """
+        if not source_id:
+            return []
+
+        min_rows = await self._get_min_rows()
+        if min_rows <= 0:
+            return []
+
+        with safe_span("ensure_source_partitions", source_id=source_id, min_rows=min_rows) as span:
+            existing = {p["table_name"]: p for p in await self.get_partitions(source_id)}
+            updated = []
+
+            for table in PARTITIONED_TABLES:
+                try:
+                    row_count = await self._count_rows(table, source_id)
+                    if row_count < min_rows:
+                        continue
+
+                    current = existing.get(table)
+                    if current and row_count < (current.get("row_count") or 0) * REBUILD_GROWTH_FACTOR:
+                        continue
+
+                    await asyncio.to_thread(
+                        lambda table=table, current=current: self.supabase_client.rpc(
+                            "create_archon_source_partition",
+                            {"source": source_id, "target_table": table, "rebuild": current is not None},
+                        ).execute()
+                    )
+                    updated.append(table)
+                    logger.info(
+                        f"{'Rebuilt' if current else 'Created'} source partition index | "
+                        f"source_id={source_id} | table={table} | rows={row_count}"
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to partition {table} for source {source_id}: {e}")
+
+            span.set_attribute("tables_updated", len(updated))
+            return updated
+
+    async def drop_source_partitions(self, source_id: str) -> int:
+        """
+        Drop all partial vector indexes for a source.
+
+        Returns:
+            Number of indexes dropped
+        """
+        if not source_id:
+            return 0
+        try:
+            response = await asyncio.to_thread(
+                lambda: self.supabase_client.rpc(
+                    "drop_archon_source_partitions", {"source": source_id}
+                ).execute()
+            )
+            return int(response.data or 0)
+        except Exception as e:
+            logger.warning(f"Failed to drop source partitions for {source_id}: {e}")
+            return 0
+
+    def schedule_partition_check(self, source_id: str | None) -> asyncio.Task | None:
+        """
+        Check a source's size in the background after ingestion, coalescing repeated checks.
+
+        Does nothing unless SOURCE_PARTITION_AUTO_BUILD is enabled, since a build blocks
+        writes to the table, including those of other crawls still running.
+
+        Returns:
+            The scheduled task, or None when there is nothing to do or no running loop
+        """
+        if not source_id:
+            return None
+
+        existing = self._tasks.get(source_id)
+        if existing and not existing.done():
+            return existing
+
+        async def _run():
+            try:
+                if await self._auto_build_enabled():
+                    await self.ensure_source_partitions(source_id)
+            except Exception as e:
+                logger.warning(f"Source partition check failed | source_id={source_id} | error={e}")
+            finally:
+                self._tasks.pop(source_id, None)
+
+        try:
+            task = asyncio.get_running_loop().create_task(_run())
+        except RuntimeError:
+            return None
+        self._tasks[source_id] = task
+        return task
+
+
+_source_partition_service: SourcePartitionService | None = None
+
+
+def get_source_partition_service() -> SourcePartitionService:
+    """Get the process-wide source partition service."""
+    global _source_partition_service
+    if _source_partition_service is None:
+        _source_partition_service = SourcePartitionService()
+    return _source_partition_service
@@ -371,6 +371,16 @@ class SourceManagementService:
         try:
             logger.info(f"Starting delete_source for source_id: {source_id}")
 
+            # Drop the source's partial vector indexes first so the row deletes below
+            # don't have to maintain them
+            try:
+                self.supabase_client.rpc(
+                    "drop_archon_source_partitions", {"source": source_id}
+                ).execute()
+            except Exception as partition_error:
+                # Non-critical - the indexes only cover this source's rows
+                logger.warning(f"Failed to drop source partition indexes (non-critical): {partition_error}")
+
             # Delete from crawled_pages table
             try:
                 logger.info(f"Deleting from crawled_pages table for source_id: {source_id}")
@@ -432,6 +442,11 @@ class SourceManagementService:
                 logger.warning(f"Failed to delete from archon_project_sources (non-critical): {project_sources_error}")
                 project_sources_deleted = 0
 
+            # Drop cached search results that may still reference the deleted content
+            from .search.cache_warmer import on_source_deleted
+
+            on_source_deleted(source_id)
+
             logger.info("Delete operation completed successfully")
             return True, {
                 "source_id": source_id,
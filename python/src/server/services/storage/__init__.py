@@ -5,12 +5,18 @@ Handles document and code storage operations.
 """
 
 from .base_storage_service import BaseStorageService
+from .code_dedup import CodeBlockIndex
 from .code_storage_service import (
     add_code_examples_to_supabase,
     extract_code_blocks,
     generate_code_example_summary,
 )
-from .document_storage_service import add_documents_to_supabase
+from .document_storage_service import (
+    add_documents_to_supabase,
+    delete_documents_for_urls,
+    embed_document_batch,
+    insert_document_batch,
+)
 from .storage_services import DocumentStorageService
 
 __all__ = [
@@ -20,7 +26,11 @@ __all__ = [
     "DocumentStorageService",
     # Document storage utilities
     "add_documents_to_supabase",
+    "delete_documents_for_urls",
+    "embed_document_batch",
+    "insert_document_batch",
     # Code storage utilities
+    "CodeBlockIndex",
     "extract_code_blocks",
     "generate_code_example_summary",
     "add_code_examples_to_supabase",
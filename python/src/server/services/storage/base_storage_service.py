@@ -15,6 +15,7 @@ from typing import Any
 from urllib.parse import urlparse
 
 from ...config.logfire_config import get_logger, safe_span
+from .text_chunker import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, TokenChunker
 
 logger = get_logger(__name__)
 
@@ -36,19 +37,27 @@ class BaseStorageService(ABC):
 
         self.threading_service = get_utils_threading_service()
 
-    def smart_chunk_text(self, text: str, chunk_size: int = 5000) -> list[str]:
+    def smart_chunk_text(
+        self,
+        text: str,
+        chunk_size: int = DEFAULT_CHUNK_TOKENS,
+        overlap: int = DEFAULT_OVERLAP_TOKENS,
+    ) -> list[str]:
         """
         Split text into chunks intelligently, preserving context.
 
-        This function implements a context-aware chunking strategy that:
+        Chunks are sized in embedding-model tokens and built in a single pass by
+        TokenChunker, which:
         1. Preserves code blocks (```) as complete units when possible
         2. Prefers to break at paragraph boundaries (\\n\\n)
-        3. Falls back to sentence boundaries (. ) if needed
+        3. Falls back to sentence and line boundaries if needed
         4. Only splits mid-content when absolutely necessary
+        5. Repeats up to `overlap` tokens of trailing prose at the start of the next chunk
 
         Args:
             text: Text to chunk
-            chunk_size: Maximum chunk size (default: 5000)
+            chunk_size: Maximum chunk size in tokens (default: 1200)
+            overlap: Tokens shared by consecutive chunks (default: 100)
 
         Returns:
             List of text chunks
@@ -57,61 +66,23 @@ class BaseStorageService(ABC):
             logger.warning("Invalid text provided for chunking")
             return []
 
-        chunks = []
-        start = 0
-        text_length = len(text)
-
-        while start < text_length:
-            # Determine the end of this chunk
-            end = start + chunk_size
-
-            # If we're at the end of the text, take what's left
-            if end >= text_length:
-                chunk = text[start:].strip()
-                if chunk:
-                    chunks.append(chunk)
-                break
-
-            # Try to find a good break point
-            chunk = text[start:end]
-
-            # First, try to break at a code block boundary
-            code_block_pos = chunk.rfind("```")
-            if code_block_pos != -1 and code_block_pos > chunk_size * 0.3:
-                end = start + code_block_pos
-
-            # If no code block, try paragraph break
-            elif "\n\n" in chunk:
-                last_break = chunk.rfind("\n\n")
-                if last_break > chunk_size * 0.3:
-                    end = start + last_break
-
-            # If no paragraph break, try sentence break
-            elif ". " in chunk:
-                last_period = chunk.rfind(". ")
-                if last_period > chunk_size * 0.3:
-                    end = start + last_period + 1
-
-            # Extract chunk and clean it up
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-
-            # Move start position for next chunk
-            start = end
-
-        return chunks
+        return TokenChunker(chunk_size, overlap).split(text)
 
     async def smart_chunk_text_async(
-        self, text: str, chunk_size: int = 5000, progress_callback: Callable | None = None
+        self,
+        text: str,
+        chunk_size: int = DEFAULT_CHUNK_TOKENS,
+        progress_callback: Callable | None = None,
+        overlap: int = DEFAULT_OVERLAP_TOKENS,
     ) -> list[str]:
         """
         Async version of smart_chunk_text with optional progress reporting.
 
         Args:
             text: Text to chunk
-            chunk_size: Maximum chunk size
+            chunk_size: Maximum chunk size in tokens
             progress_callback: Optional callback for progress updates
+            overlap: Tokens shared by consecutive chunks
 
         Returns:
             List of text chunks
@@ -123,10 +94,10 @@ class BaseStorageService(ABC):
                 # For large texts, run chunking in thread pool
                 if len(text) > 50000:  # 50KB threshold
                     chunks = await self.threading_service.run_cpu_intensive(
-                        self.smart_chunk_text, text, chunk_size
+                        self.smart_chunk_text, text, chunk_size, overlap
                     )
                 else:
-                    chunks = self.smart_chunk_text(text, chunk_size)
+                    chunks = self.smart_chunk_text(text, chunk_size, overlap)
 
                 if progress_callback:
                     await progress_callback("Text chunking completed", 100)
@@ -0,0 +1,157 @@
+"""
+Code Block Deduplication
+
+Documentation repeats the same snippet in many places: once per tab of a
+language switcher, once per framework version, and on every page that shows
+the same setup step. Comparing every block with every other block is quadratic
+in the number of blocks and, through SequenceMatcher, in their length.
+
+CodeBlockIndex gives each block a MinHash signature of its normalized
+character shingles, computed in one pass with one-permutation hashing, and
+files it under a set of LSH bands. Only blocks sharing a band with an indexed
+block are compared exactly, so a page with hundreds of snippets costs a few
+comparisons per snippet. One index can be kept for a whole crawl, so a snippet
+repeated across pages is stored once.
+"""
+
+import hashlib
+import re
+from difflib import SequenceMatcher
+
+# Blocks at least this similar after normalization are variants of one example
+SIMILARITY_THRESHOLD = 0.85
+
+# Characters per shingle
+SHINGLE_CHARS = 5
+
+# Signature slots, filled by the low bits of each shingle hash; a power of two
+SIGNATURE_SLOTS = 64
+
+# Slots per LSH band. With 16 bands of 4 slots, blocks with a shingle overlap (Jaccard) of
+# 0.6 become candidates 9 times in 10 and blocks with an overlap of 0.3 about once in 8
+BAND_ROWS = 4
+
+# Groups kept per band value; a band shared by more blocks than this says little
+MAX_BUCKET_SIZE = 64
+
+_SLOT_BITS = SIGNATURE_SLOTS.bit_length() - 1
+_EMPTY = 1 << (64 - _SLOT_BITS)
+
+_WHITESPACE = re.compile(r"\s+")
+_TYPING_EXTENSIONS_IMPORT = re.compile(r"from typing_extensions import")
+_ANNOTATED_IMPORT = re.compile(r"from typing import Annotated[^,\n]*,?")
+_ANNOTATED_EXTENSIONS_IMPORT = re.compile(r"from typing_extensions import Annotated[^,\n]*,?")
+_ANNOTATED_WRAPPER = re.compile(r"Annotated\[\s*([^,\]]+)[^]]*\]")
+_ANNOTATED_PARAMETER = re.compile(r":\s*Annotated\[[^\]]+\]\s*=")
+_TRAILING_COMMA_PAREN = re.compile(r",\s*\)")
+_TRAILING_COMMA_BRACKET = re.compile(r",\s*]")
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalize code for similarity comparison by removing version-specific variations.
+
+    Args:
+        code: The code string to normalize
+
+    Returns:
+        Normalized code string for comparison
+    """
+    # Remove extra whitespace and normalize line endings
+    normalized = _WHITESPACE.sub(" ", code.strip())
+
+    # Remove common version-specific imports that don't change functionality
+    normalized = _TYPING_EXTENSIONS_IMPORT.sub("from typing import", normalized)
+    normalized = _ANNOTATED_IMPORT.sub("", normalized)
+    normalized = _ANNOTATED_EXTENSIONS_IMPORT.sub("", normalized)
+
+    # Annotated[type, dependency] -> type
+    normalized = _ANNOTATED_WRAPPER.sub(r"\1", normalized)
+    normalized = _ANNOTATED_PARAMETER.sub("=", normalized)
+
+    # Remove trailing commas
+    normalized = _TRAILING_COMMA_PAREN.sub(")", normalized)
+    return _TRAILING_COMMA_BRACKET.sub("]", normalized)
+
+
+def code_similarity(normalized1: str, normalized2: str, threshold: float = 0.0) -> float:
+    """
+    Similarity ratio of two normalized code strings, between 0.0 and 1.0.
+
+    Pairs that cannot reach the threshold return 0.0 without the full comparison.
+    """
+    matcher = SequenceMatcher(None, normalized1, normalized2)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    return matcher.ratio()
+
+
+def code_signature(normalized: str) -> tuple[int, ...]:
+    """MinHash signature of a normalized code string's character shingles."""
+    shingles = {normalized[i : i + SHINGLE_CHARS] for i in range(max(1, len(normalized) - SHINGLE_CHARS + 1))}
+    signature = [_EMPTY] * SIGNATURE_SLOTS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        slot = value & (SIGNATURE_SLOTS - 1)
+        value >>= _SLOT_BITS
+        if value < signature[slot]:
+            signature[slot] = value
+    return tuple(signature)
+
+
+class CodeBlockIndex:
+    """Groups code blocks that are variants of the same example"""
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.comparisons = 0
+        self._bands: list[dict[tuple[int, ...], list[int]]] = [{} for _ in range(SIGNATURE_SLOTS // BAND_ROWS)]
+        self._exact: dict[str, int] = {}
+        # Normalized code of each group's first block, which later blocks are compared with
+        self._groups: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def assign(self, code: str) -> tuple[int, bool]:
+        """
+        Find the group of a code block, starting a new group when it matches none.
+
+        Returns:
+            The group number and whether the block started it
+        """
+        normalized = normalize_code(code)
+        group = self._exact.get(normalized)
+        if group is not None:
+            return group, False
+
+        signature = code_signature(normalized)
+        bands = self._band_values(signature)
+        candidates: set[int] = set()
+        for band, buckets in zip(bands, self._bands, strict=False):
+            if band is not None:
+                candidates.update(buckets.get(band, ()))
+        # The earliest matching group wins, as when every block was compared in order
+        for candidate in sorted(candidates):
+            self.comparisons += 1
+            if code_similarity(normalized, self._groups[candidate], self.threshold) >= self.threshold:
+                return candidate, False
+
+        group = len(self._groups)
+        self._groups.append(normalized)
+        self._exact[normalized] = group
+        for band, buckets in zip(bands, self._bands, strict=False):
+            if band is not None:
+                bucket = buckets.setdefault(band, [])
+                if len(bucket) < MAX_BUCKET_SIZE:
+                    bucket.append(group)
+        return group, True
+
+    @staticmethod
+    def _band_values(signature: tuple[int, ...]) -> list[tuple[int, ...] | None]:
+        values = []
+        for start in range(0, SIGNATURE_SLOTS, BAND_ROWS):
+            band = signature[start : start + BAND_ROWS]
+            # Short blocks leave slots empty; a band of empty slots would match every short block
+            values.append(None if all(value == _EMPTY for value in band) else band)
+        return values
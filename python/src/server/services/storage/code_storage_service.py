@@ -9,7 +9,6 @@ import json
 import os
 import re
 from collections.abc import Callable
-from difflib import SequenceMatcher
 from typing import Any
 from urllib.parse import urlparse
 
@@ -18,6 +17,7 @@ from supabase import Client
 from ...config.logfire_config import search_logger
 from ..embeddings.contextual_embedding_service import generate_contextual_embeddings_batch
 from ..embeddings.embedding_service import create_embeddings_batch
+from .code_dedup import CodeBlockIndex
 
 
 def _get_model_choice() -> str:
@@ -42,60 +42,6 @@ def _get_max_workers() -> int:
     return int(os.getenv("CONTEXTUAL_EMBEDDINGS_MAX_WORKERS", "3"))
 
 
-def _normalize_code_for_comparison(code: str) -> str:
-    """
-    Normalize code for similarity comparison by removing version-specific variations.
-
-    Args:
-        code: The code string to normalize
-
-    Returns:
-        Normalized code string for comparison
-    """
-    # Remove extra whitespace and normalize line endings
-    normalized = re.sub(r"\s+", " ", code.strip())
-
-    # Remove common version-specific imports that don't change functionality
-    # Handle typing imports variations
-    normalized = re.sub(r"from typing_extensions import", "from typing import", normalized)
-    normalized = re.sub(r"from typing import Annotated[^,\n]*,?", "", normalized)
-    normalized = re.sub(r"from typing_extensions import Annotated[^,\n]*,?", "", normalized)
-
-    # Remove Annotated wrapper variations for comparison
-    # This handles: Annotated[type, dependency] -> type
-    normalized = re.sub(r"Annotated\[\s*([^,\]]+)[^]]*\]", r"\1", normalized)
-
-    # Normalize common FastAPI parameter patterns
-    normalized = re.sub(r":\s*Annotated\[[^\]]+\]\s*=", "=", normalized)
-
-    # Remove trailing commas and normalize punctuation spacing
-    normalized = re.sub(r",\s*\)", ")", normalized)
-    normalized = re.sub(r",\s*]", "]", normalized)
-
-    return normalized
-
-
-def _calculate_code_similarity(code1: str, code2: str) -> float:
-    """
-    Calculate similarity between two code strings using normalized comparison.
-
-    Args:
-        code1: First code string
-        code2: Second code string
-
-    Returns:
-        Similarity ratio between 0.0 and 1.0
-    """
-    # Normalize both code strings for comparison
-    norm1 = _normalize_code_for_comparison(code1)
-    norm2 = _normalize_code_for_comparison(code2)
-
-    # Use difflib's SequenceMatcher for similarity calculation
-    similarity = SequenceMatcher(None, norm1, norm2).ratio()
-
-    return similarity
-
-
 def _select_best_code_variant(similar_blocks: list[dict[str, Any]]) -> dict[str, Any]:
     """
     Select the best variant from a list of similar code blocks.
@@ -154,13 +100,17 @@ def _select_best_code_variant(similar_blocks: list[dict[str, Any]]) -> dict[str,
     return best_block
 
 
-def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[dict[str, Any]]:
+def extract_code_blocks(
+    markdown_content: str, min_length: int = None, settings: dict[str, str] | None = None
+) -> list[dict[str, Any]]:
     """
     Extract code blocks from markdown content along with context.
 
     Args:
         markdown_content: The markdown content to extract code blocks from
         min_length: Minimum length of code blocks to extract (default: from settings or 250)
+        settings: Code extraction settings to use instead of the credential cache, for
+            callers running outside the server process
 
     Returns:
         List of dictionaries containing code blocks and their context
@@ -170,6 +120,8 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
         from ...services.credential_service import credential_service
 
         def _get_setting_fallback(key: str, default: str) -> str:
+            if settings and key in settings:
+                return settings[key]
             if credential_service._cache_initialized and key in credential_service._cache:
                 return credential_service._cache[key]
             return os.getenv(key, default)
@@ -227,7 +179,7 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
             search_logger.info(
                 f"Attempting to extract from inner content (length: {len(inner_content)})"
             )
-            return extract_code_blocks(inner_content, min_length)
+            return extract_code_blocks(inner_content, min_length, settings)
         # For normal language identifiers (e.g., ```python, ```javascript), process normally
         # No need to skip anything - the extraction logic will handle it correctly
         start_offset = 0
@@ -451,34 +403,15 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
 
     search_logger.debug(f"Starting deduplication process for {len(code_blocks)} code blocks")
 
-    # Group similar code blocks together
-    similarity_threshold = 0.85  # 85% similarity threshold
-    grouped_blocks = []
-    processed_indices = set()
-
-    for i, block1 in enumerate(code_blocks):
-        if i in processed_indices:
-            continue
-
-        # Start a new group with this block
-        similar_group = [block1]
-        processed_indices.add(i)
-
-        # Find all similar blocks
-        for j, block2 in enumerate(code_blocks):
-            if j <= i or j in processed_indices:
-                continue
-
-            similarity = _calculate_code_similarity(block1["code"], block2["code"])
-
-            if similarity >= similarity_threshold:
-                similar_group.append(block2)
-                processed_indices.add(j)
-                search_logger.debug(f"Found similar code blocks with {similarity:.2f} similarity")
+    # Group similar code blocks together; only blocks the index pairs up are compared
+    index = CodeBlockIndex()
+    similar_groups: dict[int, list[dict[str, Any]]] = {}
+    for block in code_blocks:
+        group, _ = index.assign(block["code"])
+        similar_groups.setdefault(group, []).append(block)
 
-        # Select the best variant from the similar group
-        best_variant = _select_best_code_variant(similar_group)
-        grouped_blocks.append(best_variant)
+    # Select the best variant from each similar group
+    grouped_blocks = [_select_best_code_variant(group) for group in similar_groups.values()]
 
     deduplicated_count = len(code_blocks) - len(grouped_blocks)
     if deduplicated_count > 0:
@@ -0,0 +1,199 @@
+"""
+Near-Duplicate Chunks
+
+Versioned docs (v1/v2/latest), mirrored pages and localized copies produce many
+chunks that are almost identical. Each chunk gets a 64-bit SimHash of its word
+shingles, and chunks whose SimHashes differ in only a few bits are linked to
+the first such chunk of the crawl, their canonical chunk. A linked chunk is
+stored with the canonical chunk's embedding instead of being embedded again,
+and search collapses each group to its best-scoring chunk.
+
+Lookups use the pigeonhole principle: with max_distance + 1 bands, two hashes
+within max_distance bits agree exactly on at least one band. Each band is a dict
+lookup, so the index answers in near-constant time however many chunks it holds.
+"""
+
+import hashlib
+import re
+from typing import Any
+
+from ...config.logfire_config import get_logger
+from ..credential_service import credential_service
+
+logger = get_logger(__name__)
+
+SIMHASH_BITS = 64
+
+# Chunks whose SimHashes differ in at most this many bits are near-duplicates
+DEFAULT_MAX_DISTANCE = 3
+
+# Words per shingle
+SHINGLE_WORDS = 3
+
+# Chunks with fewer shingles than this are too short for a meaningful SimHash
+MIN_SHINGLES = 8
+
+# Keys kept per band value; a band shared by more chunks than this says little
+MAX_BUCKET_SIZE = 64
+
+_WORD = re.compile(r"\w+")
+
+# Mask selecting the lowest bit of each 64-bit word in a packed integer, by word count
+_WORD_MASKS: dict[int, int] = {}
+
+
+def _word_mask(count: int) -> int:
+    mask = _WORD_MASKS.get(count)
+    if mask is None:
+        mask = ((1 << (SIMHASH_BITS * count)) - 1) // ((1 << SIMHASH_BITS) - 1)
+        if len(_WORD_MASKS) < 4096:
+            _WORD_MASKS[count] = mask
+    return mask
+
+
+def simhash(text: str) -> int | None:
+    """
+    64-bit SimHash of a text's word shingles.
+
+    Returns:
+        The hash, or None when the text is too short to compare
+    """
+    words = _WORD.findall(text.lower())
+    count = len(words) - SHINGLE_WORDS + 1
+    if count < MIN_SHINGLES:
+        return None
+    digests = b"".join(
+        hashlib.blake2b(" ".join(words[i : i + SHINGLE_WORDS]).encode("utf-8"), digest_size=8).digest()
+        for i in range(count)
+    )
+    # All shingle hashes packed into one integer; each bit position is counted with one mask and popcount
+    packed = int.from_bytes(digests, "little")
+    mask = _word_mask(count)
+    value = 0
+    for bit in range(SIMHASH_BITS):
+        if (packed & (mask << bit)).bit_count() * 2 > count:
+            value |= 1 << bit
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def chunk_key(url: str, chunk_number: int) -> str:
+    return f"{url}#{chunk_number}"
+
+
+def duplicate_group(result: dict[str, Any]) -> str | None:
+    """The near-duplicate group a stored chunk belongs to, if ingestion linked it to one."""
+    return (result.get("metadata") or {}).get("duplicate_of")
+
+
+class SimHashIndex:
+    """Finds stored SimHashes within a Hamming distance of a new one"""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max(0, min(max_distance, 15))
+        bands = self.max_distance + 1
+        self._band_bits = SIMHASH_BITS // bands
+        self._bands: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(bands)]
+        self.size = 0
+
+    def find(self, value: int) -> str | None:
+        """The key of an indexed hash within max_distance of value, if any."""
+        best: tuple[int, str] | None = None
+        for band, buckets in zip(self._band_values(value), self._bands, strict=False):
+            for other, key in buckets.get(band, ()):
+                distance = hamming_distance(value, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, key)
+                    if distance == 0:
+                        return key
+        return best[1] if best else None
+
+    def add(self, value: int, key: str) -> None:
+        for band, buckets in zip(self._band_values(value), self._bands, strict=False):
+            bucket = buckets.setdefault(band, [])
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append((value, key))
+        self.size += 1
+
+    def _band_values(self, value: int) -> list[int]:
+        mask = (1 << self._band_bits) - 1
+        # The last band takes any bits left over by the division
+        values = [(value >> (i * self._band_bits)) & mask for i in range(len(self._bands) - 1)]
+        values.append(value >> ((len(self._bands) - 1) * self._band_bits))
+        return values
+
+
+def link_chunk(index: SimHashIndex, metadata: dict[str, Any], key: str) -> str | None:
+    """
+    Link a chunk to an earlier near-duplicate, or index it as a canonical chunk.
+
+    Args:
+        index: The crawl's index of canonical chunks
+        metadata: Chunk metadata with the "chunk_simhash" set by preparation; gains "duplicate_of" when linked
+        key: The chunk's own key, from chunk_key()
+
+    Returns:
+        The canonical chunk's key, or None when the chunk is canonical itself or too short to compare
+    """
+    value = metadata.get("chunk_simhash")
+    if not value:
+        return None
+    value = int(value, 16)
+    canonical = index.find(value)
+    if canonical is not None and canonical != key:
+        metadata["duplicate_of"] = canonical
+        return canonical
+    index.add(value, key)
+    return None
+
+
+async def create_simhash_index() -> SimHashIndex | None:
+    """
+    Create an index for a crawl if CHUNK_NEAR_DUPLICATES is enabled.
+
+    CHUNK_DEDUP_MAX_DISTANCE sets the Hamming distance within which chunks are linked.
+    """
+    try:
+        settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        logger.warning(f"Failed to load near-duplicate settings: {e}")
+        settings = {}
+    if str(settings.get("CHUNK_NEAR_DUPLICATES", "true")).lower() != "true":
+        return None
+    try:
+        max_distance = int(settings.get("CHUNK_DEDUP_MAX_DISTANCE", DEFAULT_MAX_DISTANCE))
+    except (TypeError, ValueError):
+        max_distance = DEFAULT_MAX_DISTANCE
+    return SimHashIndex(max_distance)
+
+
+def collapse_duplicates(results: list[dict[str, Any]], url_key: str = "url") -> list[dict[str, Any]]:
+    """
+    Keep the first result of each near-duplicate group.
+
+    Results are expected best first. The kept result's metadata lists the URLs
+    of the duplicates it stands for under "duplicate_urls".
+    """
+    kept: list[dict[str, Any]] = []
+    by_group: dict[str, dict[str, Any]] = {}
+    for result in results:
+        metadata = result.get("metadata") or {}
+        if "chunk_index" in metadata:
+            own = chunk_key(result.get(url_key) or metadata.get("url", ""), metadata["chunk_index"])
+        else:
+            own = str(id(result))
+        group = duplicate_group(result) or own
+        first = by_group.get(group)
+        if first is None:
+            by_group[group] = result
+            kept.append(result)
+            continue
+        url = result.get(url_key) or metadata.get("url")
+        first_metadata = first.setdefault("metadata", {})
+        duplicate_urls = first_metadata.setdefault("duplicate_urls", [])
+        if url and url not in duplicate_urls:
+            duplicate_urls.append(url)
+    return kept
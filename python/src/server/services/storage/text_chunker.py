@@ -0,0 +1,295 @@
+"""
+Text Chunker
+
+Splits text into chunks sized by embedding-model tokens rather than characters,
+so chunks use the model's context evenly and none are truncated by the provider.
+Text is consumed as a stream of segments of any size and chunks are produced as
+soon as they are complete, so a very large document never has to be held, sliced
+or searched as a whole. Paragraphs and code blocks are found with regular
+expressions and tokenized once; only blocks larger than a chunk are split further.
+
+Chunks break at the strongest boundary available past the first 30% of the
+budget: around fenced code blocks first, then paragraphs, then sentences and
+lines. Consecutive chunks share up to overlap_tokens of trailing prose, never
+code, so a sentence cut from one chunk's context still appears in the next.
+"""
+
+import re
+from collections.abc import Generator, Iterable, Iterator
+from dataclasses import dataclass
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+DEFAULT_CHUNK_TOKENS = 1200
+DEFAULT_OVERLAP_TOKENS = 100
+
+# Rough characters-per-token ratio for English/markdown when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Boundaries in the first part of a chunk are not used, to avoid tiny chunks
+MIN_BREAK_SHARE = 0.3
+
+# A line longer than this is cut at whitespace before its end arrives
+MAX_PENDING_CHARS = 64 * 1024
+
+# Segment size used when chunking a string
+STRING_SEGMENT_CHARS = 1024 * 1024
+
+# Boundary strengths, weakest to strongest
+INSIDE_CODE = 0
+SENTENCE = 1
+PARAGRAPH = 2
+CODE_BLOCK = 3
+
+_FENCE = re.compile(r"^[ \t]*```", re.MULTILINE)
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[ \t]+|\n")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the embedding-model tokens in a piece of text.
+
+    Uses tiktoken when installed, otherwise a characters-per-token heuristic.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _decodes_cleanly(tokens: list[int]) -> bool:
+    try:
+        b"".join(_ENCODING.decode_tokens_bytes(tokens)).decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _clean_cut(tokens: list[int], start: int, end: int) -> int:
+    """
+    The token position nearest before end where tokens[start:cut] decodes to whole characters.
+
+    A character can span several tokens, and cutting between them would leave
+    replacement characters on both sides. A character longer than the whole
+    budget is kept in one piece instead.
+    """
+    cut = end
+    while cut > start + 1 and not _decodes_cleanly(tokens[start:cut]):
+        cut -= 1
+    if _decodes_cleanly(tokens[start:cut]):
+        return cut
+    cut = end
+    while cut < len(tokens) and not _decodes_cleanly(tokens[start:cut]):
+        cut += 1
+    return cut
+
+
+@dataclass
+class _Piece:
+    text: str
+    tokens: int
+    # Strength of the boundary after this piece
+    boundary: int
+    in_code: bool
+    overlap: bool = False
+
+
+class TokenChunker:
+    """Streaming, token-budgeted text chunker"""
+
+    def __init__(self, max_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS):
+        """
+        Initialize the chunker.
+
+        Args:
+            max_tokens: Token budget of a chunk
+            overlap_tokens: Tokens of trailing prose repeated at the start of the next chunk
+        """
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+
+    def split(self, text: str) -> list[str]:
+        """Chunk a whole string."""
+        segments = (text[i : i + STRING_SEGMENT_CHARS] for i in range(0, len(text), STRING_SEGMENT_CHARS))
+        return list(self.chunks(segments))
+
+    def chunks(self, segments: Iterable[str]) -> Iterator[str]:
+        """Chunk a stream of text segments, yielding chunks as they complete."""
+        buffer: list[_Piece] = []
+        total = 0
+
+        for piece in self._pieces(segments):
+            if not piece.text:
+                # A fence is about to open: make the boundary before it a code block boundary
+                if buffer:
+                    buffer[-1].boundary = CODE_BLOCK
+                continue
+            for part in self._fit(piece):
+                while buffer and total + part.tokens > self.max_tokens:
+                    chunk, buffer = self._cut(buffer, part.tokens)
+                    total = sum(p.tokens for p in buffer)
+                    if chunk:
+                        yield chunk
+                buffer.append(part)
+                total += part.tokens
+
+        if any(not p.overlap for p in buffer):
+            chunk = "".join(p.text for p in buffer).strip()
+            if chunk:
+                yield chunk
+
+    # Internal helpers
+
+    def _pieces(self, segments: Iterable[str]) -> Iterator[_Piece]:
+        """Turn the text stream into paragraphs and code blocks tagged with the boundary after them."""
+        pending = ""
+        in_code = False
+        for segment in segments:
+            if not segment:
+                continue
+            data = pending + segment
+            end = data.rfind("\n") + 1
+            if not end:
+                if len(data) <= MAX_PENDING_CHARS:
+                    pending = data
+                    continue
+                # A line with no end in sight is cut at whitespace so memory stays bounded
+                end = data.rfind(" ", 0, MAX_PENDING_CHARS) + 1 or MAX_PENDING_CHARS
+            pending = data[end:]
+            in_code = yield from self._block_pieces(data[:end], in_code)
+        if pending:
+            yield from self._block_pieces(pending, in_code)
+
+    def _block_pieces(self, block: str, in_code: bool) -> Generator[_Piece, None, bool]:
+        """Pieces of a run of whole lines; returns whether it ends inside a code block."""
+        pos = 0
+        for fence in _FENCE.finditer(block):
+            line_end = block.find("\n", fence.end()) + 1 or len(block)
+            if not in_code:
+                yield from self._prose_pieces(block[pos : fence.start()])
+                # Marker that makes the boundary before the opening fence a code block boundary
+                yield _Piece("", 0, CODE_BLOCK, False)
+                pos = fence.start()
+            else:
+                code = block[pos:line_end]
+                yield _Piece(code, count_tokens(code), CODE_BLOCK, True)
+                pos = line_end
+            in_code = not in_code
+        rest = block[pos:]
+        if rest and in_code:
+            yield _Piece(rest, count_tokens(rest), INSIDE_CODE, True)
+        elif rest:
+            yield from self._prose_pieces(rest)
+        return in_code
+
+    def _prose_pieces(self, text: str) -> Iterator[_Piece]:
+        pos = 0
+        for match in _PARAGRAPH_BREAK.finditer(text):
+            paragraph = text[pos : match.end()]
+            yield _Piece(paragraph, count_tokens(paragraph), PARAGRAPH, False)
+            pos = match.end()
+        if pos < len(text):
+            rest = text[pos:]
+            yield _Piece(rest, count_tokens(rest), SENTENCE, False)
+
+    def _fit(self, piece: _Piece) -> list[_Piece]:
+        """Split a piece that is larger than a whole chunk at lines and sentences, or mid-text as a last resort."""
+        if piece.tokens <= self.max_tokens:
+            return [piece]
+        parts = []
+        boundary = INSIDE_CODE if piece.in_code else SENTENCE
+        for text in self._split_lines(piece.text, piece.in_code):
+            tokens = count_tokens(text)
+            if tokens <= self.max_tokens:
+                parts.append(_Piece(text, tokens, boundary, piece.in_code))
+            else:
+                parts.extend(_Piece(t, count_tokens(t), INSIDE_CODE, piece.in_code) for t in self._hard_split(text))
+        parts[-1].boundary = piece.boundary
+        return parts
+
+    def _split_lines(self, text: str, in_code: bool) -> list[str]:
+        if in_code:
+            return text.splitlines(keepends=True)
+        parts = []
+        pos = 0
+        for match in _SENTENCE_BREAK.finditer(text):
+            if match.end() < len(text):
+                parts.append(text[pos : match.end()])
+                pos = match.end()
+        parts.append(text[pos:])
+        return parts
+
+    def _hard_split(self, text: str) -> list[str]:
+        if _ENCODING is not None:
+            tokens = _ENCODING.encode(text, disallowed_special=())
+            texts = []
+            start = 0
+            while start < len(tokens):
+                end = _clean_cut(tokens, start, min(start + self.max_tokens, len(tokens)))
+                texts.append(_ENCODING.decode(tokens[start:end]))
+                start = end
+            return texts
+        width = self.max_tokens * CHARS_PER_TOKEN
+        texts = []
+        while len(text) > width:
+            cut = text.rfind(" ", width // 2, width) + 1 or width
+            texts.append(text[:cut])
+            text = text[cut:]
+        texts.append(text)
+        return texts
+
+    def _tail(self, text: str, budget: int) -> str:
+        """The longest run of whole trailing sentences of a text that fits in the budget."""
+        tail = ""
+        starts = [match.end() for match in _SENTENCE_BREAK.finditer(text.rstrip())]
+        for start in reversed(starts):
+            candidate = text[start:]
+            if count_tokens(candidate) > budget:
+                break
+            tail = candidate
+        return tail
+
+    def _cut(self, buffer: list[_Piece], incoming: int) -> tuple[str, list[_Piece]]:
+        """
+        Emit a chunk from the front of the buffer.
+
+        Returns:
+            The chunk text and the pieces left in the buffer, starting with the overlap
+        """
+        threshold = self.max_tokens * MIN_BREAK_SHARE
+        best: dict[int, int] = {}
+        running = 0
+        for index, piece in enumerate(buffer):
+            running += piece.tokens
+            if not piece.overlap and running >= threshold:
+                best[piece.boundary] = index
+        # Without a boundary past the threshold, cut just before the incoming piece
+        cut = best[max(best)] if best else len(buffer) - 1
+
+        emitted = buffer[: cut + 1]
+        rest = buffer[cut + 1 :]
+        chunk = "".join(p.text for p in emitted).strip()
+
+        # Repeat trailing prose, keeping room for the rest of the buffer and the incoming piece
+        room = min(self.overlap_tokens, self.max_tokens - sum(p.tokens for p in rest) - incoming)
+        overlap: list[_Piece] = []
+        used = 0
+        for piece in reversed(emitted):
+            if piece.in_code or room - used <= 0:
+                break
+            if used + piece.tokens > room:
+                tail = self._tail(piece.text, room - used)
+                if tail:
+                    overlap.append(_Piece(tail, count_tokens(tail), SENTENCE, False, overlap=True))
+                break
+            overlap.append(_Piece(piece.text, piece.tokens, piece.boundary, False, overlap=True))
+            used += piece.tokens
+        overlap.reverse()
+        return chunk, overlap + rest
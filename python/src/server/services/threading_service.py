@@ -146,6 +146,15 @@ class RateLimiter:
 
         return 0
 
+    def get_utilization(self) -> float:
+        """Fraction (0-1) of the per-minute request or token budget currently used"""
+        self._clean_old_entries(time.time())
+        usage = self._get_current_usage()
+        return max(
+            usage["requests"] / usage["max_requests"] if usage["max_requests"] else 0.0,
+            usage["tokens"] / usage["max_tokens"] if usage["max_tokens"] else 0.0,
+        )
+
     def _get_current_usage(self) -> dict[str, int]:
         """Get current usage statistics"""
         current_tokens = sum(tokens for _, tokens in self.token_usage)
@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+Crawl Throughput Benchmark
+
+Serves a generated documentation site on localhost and runs it through the real
+crawl -> chunk -> code extraction path. Embeddings and storage are replaced by
+local fakes. Reports pages/sec, peak RSS (including crawl worker processes),
+event loop lag and the time spent in each stage, and writes the results as JSON
+so runs can be compared across releases.
+
+Usage (from the python/ directory):
+    python -m src.server.testing.crawl_benchmark --pages 500 --fanout 8 --latency-ms 50 --output bench.json
+    python -m src.server.testing.crawl_benchmark --pages 500 --compare bench.json
+    python -m src.server.testing.crawl_benchmark --chunk-mb 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import psutil
+
+SCHEMA_VERSION = 1
+
+# Fake embedding size; matches the default embedding model
+EMBEDDING_DIMENSIONS = 1536
+
+LAG_SAMPLE_INTERVAL = 0.05
+RSS_SAMPLE_INTERVAL = 0.1
+
+# Metrics compared between runs, and whether higher is better
+COMPARED_METRICS = {
+    "pages_per_second": True,
+    "elapsed_seconds": False,
+    "peak_rss_mb": False,
+    "event_loop_lag_ms.p95": False,
+}
+
+WORDS = (
+    "configure request handler client server token cache index query schema field value "
+    "stream batch worker session route model document chunk vector source crawl page link"
+).split()
+
+
+@dataclass
+class SiteSpec:
+    """Shape of the generated documentation site"""
+
+    pages: int = 200
+    fanout: int = 8
+    code_blocks: int = 3
+    paragraphs: int = 6
+    latency_ms: float = 0.0
+    seed: int = 1
+
+    @property
+    def depth(self) -> int:
+        """Link depth needed to reach every page from the home page."""
+        depth, reached, level = 0, 1, 1
+        while reached < self.pages:
+            level *= max(1, self.fanout)
+            reached += level
+            depth += 1
+        return depth
+
+
+def page_path(index: int) -> str:
+    return "/" if index == 0 else f"/docs/page-{index}.html"
+
+
+def page_links(spec: SiteSpec, index: int) -> list[int]:
+    """Pages linked from a page: its children in a tree, the home page and two cross links."""
+    rng = random.Random(spec.seed * 1_000_003 + index)
+    children = range(index * spec.fanout + 1, min(spec.pages, index * spec.fanout + spec.fanout + 1))
+    cross = [rng.randrange(spec.pages) for _ in range(2)]
+    return list(dict.fromkeys([0, *children, *cross]))
+
+
+def _code_block(rng: random.Random, number: int) -> str:
+    name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{number}"
+    lines = [
+        f"def {name}(client, options=None):",
+        f'    """{rng.choice(WORDS).title()} the {rng.choice(WORDS)}."""',
+    ]
+    for i in range(rng.randint(12, 24)):
+        call = f"client.{rng.choice(WORDS)}({rng.choice(WORDS)!r}, retries={i % 4})"
+        lines.append(f"    {rng.choice(WORDS)}_{i} = {call}")
+    lines.append(f"    return {rng.choice(WORDS)}_0")
+    return "\n".join(lines)
+
+
+def render_page(spec: SiteSpec, index: int) -> str:
+    """HTML of one generated page; the same spec always produces the same site."""
+    rng = random.Random(spec.seed * 7_919 + index)
+    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} Guide {index}"
+    nav = "".join(f'<li><a href="{page_path(link)}">Page {link}</a></li>' for link in page_links(spec, index))
+    body = []
+    for p in range(spec.paragraphs):
+        body.append(f"<h2>Section {p + 1}</h2>")
+        body.append("<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120))) + ".</p>")
+        if p < spec.code_blocks:
+            code = _code_block(rng, p).replace("&", "&amp;").replace("<", "&lt;")
+            body.append(f'<pre><code class="language-python">{code}</code></pre>')
+    for extra in range(spec.paragraphs, spec.code_blocks):
+        code = _code_block(rng, extra).replace("&", "&amp;").replace("<", "&lt;")
+        body.append(f'<pre><code class="language-python">{code}</code></pre>')
+    return (
+        f"<!DOCTYPE html><html><head><title>{title}</title></head><body>"
+        f'<nav class="sidebar"><ul>{nav}</ul></nav>'
+        f'<main><article class="markdown"><h1>{title}</h1>{"".join(body)}</article></main>'
+        "</body></html>"
+    )
+
+
+def render_markdown(spec: SiteSpec, index: int) -> str:
+    """Markdown of one generated page, as the crawler would produce it."""
+    rng = random.Random(spec.seed * 7_919 + index)
+    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} Guide {index}"
+    body = [f"# {title}"]
+    for p in range(spec.paragraphs):
+        body.append(f"## Section {p + 1}")
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) for _ in range(rng.randint(4, 8))]
+        body.append(". ".join(s.capitalize() for s in sentences) + ".")
+        if p < spec.code_blocks:
+            body.append(f"```python\n{_code_block(rng, p)}\n```")
+    return "\n\n".join(body) + "\n\n"
+
+
+def render_sitemap(spec: SiteSpec, base_url: str) -> str:
+    entries = "".join(f"<url><loc>{base_url}{page_path(i)}</loc></url>" for i in range(spec.pages))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+    )
+
+
+class SyntheticDocsSite:
+    """Generated documentation site served on localhost from a background thread"""
+
+    def __init__(self, spec: SiteSpec):
+        self.spec = spec
+        self.requests = 0
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "SyntheticDocsSite":
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site.requests += 1
+                if site.spec.latency_ms:
+                    time.sleep(site.spec.latency_ms / 1000)
+                path = self.path.split("?", 1)[0]
+                if path == "/sitemap.xml":
+                    self._send(200, "application/xml", render_sitemap(site.spec, site.base_url))
+                    return
+                index = 0 if path in ("/", "/index.html") else None
+                if path.startswith("/docs/page-") and path.endswith(".html"):
+                    try:
+                        index = int(path[len("/docs/page-") : -len(".html")])
+                    except ValueError:
+                        index = None
+                if index is None or not 0 <= index < site.spec.pages:
+                    self._send(404, "text/html", "<html><body>Not found</body></html>")
+                    return
+                self._send(200, "text/html; charset=utf-8", render_page(site.spec, index))
+
+            def _send(self, status: int, content_type: str, body: str):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="synthetic-docs-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task"""
+
+    def __init__(self, interval: float = LAG_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict[str, float]:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return summarize_ms(self.samples)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+
+class RssSampler:
+    """Samples the resident memory of this process and its children"""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return round(self.peak / (1024 * 1024), 1)
+
+    def _run(self) -> None:
+        process = psutil.Process()
+        while True:
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+
+def summarize_ms(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+    return {
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p95": round(p95 * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def fake_embedding(text: str) -> list[float]:
+    """Deterministic stand-in for an embedding; costs about as much as parsing an API response."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=64).digest()
+    return [digest[i % 64] / 255.0 for i in range(EMBEDDING_DIMENSIONS)]
+
+
+class FakeStore:
+    """In-memory stand-in for the document and code example tables"""
+
+    def __init__(self):
+        self.documents: list[dict[str, Any]] = []
+        self.code_examples: list[dict[str, Any]] = []
+
+    def add_documents(self, url: str, chunks: list[str]) -> None:
+        for number, chunk in enumerate(chunks):
+            self.documents.append(
+                {"url": url, "chunk_number": number, "content": chunk, "embedding": fake_embedding(chunk)}
+            )
+
+    def add_code_examples(self, blocks: list[dict[str, Any]]) -> None:
+        for block in blocks:
+            self.code_examples.append({**block, "embedding": fake_embedding(block.get("code", ""))})
+
+
+def _create_crawler(kind: str, workers: int):
+    if kind == "pool":
+        from ..services.crawl_worker_pool import CrawlWorkerPool
+
+        return CrawlWorkerPool(workers)
+    from crawl4ai import AsyncWebCrawler
+
+    from ..services.crawler_manager import build_browser_config
+
+    return AsyncWebCrawler(config=build_browser_config())
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run_benchmark(
+    spec: SiteSpec,
+    mode: str = "recursive",
+    max_concurrent: int = 10,
+    settings: dict[str, Any] | None = None,
+    crawler=None,
+    crawler_kind: str = "browser",
+    workers: int = 2,
+    label: str = "",
+) -> dict[str, Any]:
+    """
+    Crawl a synthetic site and measure the crawl, chunk and code extraction stages.
+
+    Args:
+        spec: Shape of the generated site
+        mode: "recursive" follows links from the home page; "sitemap" batch-crawls the sitemap
+        max_concurrent: Concurrent pages for the crawl
+        settings: rag_strategy settings the crawl runs with; unset keys use the code defaults
+        crawler: Crawler to use instead of creating one; it must already be entered
+        crawler_kind: "browser" for one in-process browser, "pool" for crawl worker processes
+        workers: Worker processes when crawler_kind is "pool"
+        label: Free-form name stored with the results
+
+    Returns:
+        Results in the benchmark JSON format
+    """
+    from ..services.crawling.boilerplate import BoilerplateDetector
+    from ..services.crawling.code_extraction_service import CodeExtractionService
+    from ..services.crawling.crawling_service import CrawlingService
+    from ..services.crawling.document_preparation import get_document_preparer
+    from ..services.crawling.domain_profiles import DomainProfileStore
+    from ..services.crawling.html_spool import create_html_spool, read_html
+    from ..services.credential_service import credential_service
+
+    settings = dict(settings or {})
+    owns_crawler = crawler is None
+    if owns_crawler:
+        crawler = _create_crawler(crawler_kind, workers)
+        await crawler.__aenter__()
+
+    stages: dict[str, float] = {}
+    store = FakeStore()
+    # Nothing here may reach the database: settings come from the benchmark and storage is faked
+    offline = object()
+    lag = LoopLagMonitor()
+    rss = RssSampler()
+
+    try:
+        with SyntheticDocsSite(spec) as site, tempfile.TemporaryDirectory() as scratch, patch.object(
+            credential_service, "get_credentials_by_category", AsyncMock(return_value=settings)
+        ):
+            rss.start()
+            lag.start()
+            started = time.perf_counter()
+
+            # Same per-crawl setup as the orchestrator; the page cache stays off so runs are comparable
+            service = CrawlingService(crawler, supabase_client=offline)
+            html_spool = await create_html_spool()
+            service.set_html_spool(html_spool)
+            if str(settings.get("CRAWL_DOMAIN_PROFILES", "true")).lower() == "true":
+                # A fresh store, so what earlier runs learned does not change this one
+                service.set_domain_profiles(DomainProfileStore(os.path.join(scratch, "profiles.json")))
+            pages: list[dict[str, Any]] = []
+
+            async def on_page(page: dict[str, Any]) -> None:
+                pages.append(page)
+
+            stage_started = time.perf_counter()
+            if mode == "sitemap":
+                urls = await service.parse_sitemap(f"{site.base_url}/sitemap.xml")
+                await service.crawl_batch_with_progress(urls, max_concurrent=max_concurrent, on_page=on_page)
+            else:
+                await service.crawl_recursive_with_progress(
+                    [f"{site.base_url}/"], max_depth=spec.depth + 1, max_concurrent=max_concurrent, on_page=on_page
+                )
+            stages["crawl"] = time.perf_counter() - stage_started
+            crawl_seconds = stages["crawl"]
+
+            stage_started = time.perf_counter()
+            documents = pages
+            if str(settings.get("CRAWL_BOILERPLATE_REMOVAL", "true")).lower() == "true":
+                # A fresh detector, so a template saved by an earlier run does not change this one
+                boilerplate = BoilerplateDetector("benchmark", directory=scratch)
+                for page in pages:
+                    boilerplate.observe(str(page["markdown"]))
+                documents = [{**page, "markdown": boilerplate.strip(str(page["markdown"]))} for page in pages]
+            preparer = await get_document_preparer()
+            chunked = [
+                (prepared.url, prepared.chunks)
+                async for prepared in preparer.prepare(documents, "benchmark", {}, "webpage")
+            ]
+            stages["chunk"] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            code_blocks = await CodeExtractionService(offline)._extract_code_blocks_from_documents(pages)
+            stages["code_extraction"] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            for url, chunks in chunked:
+                store.add_documents(url, chunks)
+            store.add_code_examples(code_blocks)
+            stages["embed_store"] = time.perf_counter() - stage_started
+
+            elapsed = time.perf_counter() - started
+            lag_summary = await lag.stop()
+            peak_rss_mb = rss.stop()
+            site_requests = site.requests
+            html_bytes = sum(len(read_html(page.get("html"))) for page in pages)
+            if html_spool:
+                html_spool.close()
+    finally:
+        if owns_crawler:
+            await crawler.__aexit__(None, None, None)
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "label": label,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": psutil.cpu_count(),
+        "site": asdict(spec),
+        "config": {
+            "mode": mode,
+            "crawler": crawler_kind if owns_crawler else type(crawler).__name__,
+            "workers": workers if crawler_kind == "pool" else 0,
+            "max_concurrent": max_concurrent,
+            "settings": settings,
+        },
+        "results": {
+            "pages_crawled": len(pages),
+            "site_requests": site_requests,
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_second": round(len(pages) / crawl_seconds, 2) if crawl_seconds else 0.0,
+            "peak_rss_mb": peak_rss_mb,
+            "event_loop_lag_ms": lag_summary,
+            "stages": {name: round(seconds, 3) for name, seconds in stages.items()},
+            "markdown_bytes": sum(len(str(page["markdown"])) for page in pages),
+            "html_bytes": html_bytes,
+            "chunks": len(store.documents),
+            "code_blocks": len(store.code_examples),
+        },
+    }
+
+
+def run_chunker_benchmark(
+    megabytes: float, spec: SiteSpec | None = None, max_tokens: int | None = None, overlap: int | None = None
+) -> dict[str, Any]:
+    """
+    Stream generated markdown through the text chunker and measure its throughput.
+
+    The text is generated page by page as the chunker consumes it, so peak RSS
+    reflects the chunker rather than the size of the corpus.
+    """
+    from ..services.storage.text_chunker import (
+        _ENCODING,
+        DEFAULT_CHUNK_TOKENS,
+        DEFAULT_OVERLAP_TOKENS,
+        TokenChunker,
+    )
+
+    spec = spec or SiteSpec()
+    chunker = TokenChunker(max_tokens or DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS if overlap is None else overlap)
+    target = int(megabytes * 1024 * 1024)
+    consumed = 0
+
+    def segments():
+        nonlocal consumed
+        index = 0
+        while consumed < target:
+            text = render_markdown(spec, index)
+            consumed += len(text)
+            index += 1
+            yield text
+
+    rss = RssSampler()
+    rss.start()
+    started = time.perf_counter()
+    chunks = sum(1 for _ in chunker.chunks(segments()))
+    elapsed = time.perf_counter() - started
+    peak_rss_mb = rss.stop()
+
+    return {
+        "megabytes": round(consumed / (1024 * 1024), 1),
+        "tokenizer": "tiktoken" if _ENCODING is not None else "estimate",
+        "max_tokens": chunker.max_tokens,
+        "overlap_tokens": chunker.overlap_tokens,
+        "elapsed_seconds": round(elapsed, 3),
+        "megabytes_per_second": round(consumed / (1024 * 1024) / elapsed, 2) if elapsed else 0.0,
+        "chunks": chunks,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _metric(results: dict[str, Any], path: str) -> float | None:
+    value: Any = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare_results(baseline: dict[str, Any], current: dict[str, Any], tolerance: float = 0.1) -> list[str]:
+    """
+    Compare two benchmark results.
+
+    Returns:
+        One line per metric that got worse by more than the tolerance (a fraction)
+    """
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS.items():
+        before = _metric(baseline.get("results", {}), path)
+        after = _metric(current.get("results", {}), path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{path}: {before} -> {after} ({change:+.1%})")
+    return regressions
+
+
+def _parse_settings(values: list[str]) -> dict[str, str]:
+    settings = {}
+    for value in values:
+        key, sep, setting = value.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Settings must be KEY=VALUE, got {value!r}")
+        settings[key.strip()] = setting.strip()
+    return settings
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Crawl throughput benchmark against a local synthetic site")
+    parser.add_argument("--pages", type=int, default=SiteSpec.pages, help="Pages in the generated site")
+    parser.add_argument("--fanout", type=int, default=SiteSpec.fanout, help="Child links per page")
+    parser.add_argument("--code-blocks", type=int, default=SiteSpec.code_blocks, help="Code blocks per page")
+    parser.add_argument("--latency-ms", type=float, default=SiteSpec.latency_ms, help="Artificial server latency")
+    parser.add_argument("--seed", type=int, default=SiteSpec.seed, help="Seed of the generated content")
+    parser.add_argument("--mode", choices=["recursive", "sitemap"], default="recursive")
+    parser.add_argument("--crawler", choices=["browser", "pool"], default="browser")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes for --crawler pool")
+    parser.add_argument("--max-concurrent", type=int, default=10)
+    parser.add_argument("--setting", action="append", default=[], metavar="KEY=VALUE", help="rag_strategy setting")
+    parser.add_argument("--label", default="", help="Name stored with the results")
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed regression as a fraction")
+    parser.add_argument("--chunk-mb", type=float, help="Only measure the text chunker over this much markdown")
+    args = parser.parse_args(argv)
+
+    spec = SiteSpec(
+        pages=args.pages,
+        fanout=args.fanout,
+        code_blocks=args.code_blocks,
+        latency_ms=args.latency_ms,
+        seed=args.seed,
+    )
+    if args.chunk_mb:
+        print(json.dumps(run_chunker_benchmark(args.chunk_mb, spec), indent=2))
+        return 0
+
+    results = asyncio.run(
+        run_benchmark(
+            spec,
+            mode=args.mode,
+            max_concurrent=args.max_concurrent,
+            settings=_parse_settings(args.setting),
+            crawler_kind=args.crawler,
+            workers=args.workers,
+            label=args.label,
+        )
+    )
+
+    print(json.dumps(results["results"], indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("site") != results["site"] or baseline.get("config") != results["config"]:
+            print("Warning: baseline was run with a different site or configuration")
+        regressions = compare_results(baseline, results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
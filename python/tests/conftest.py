@@ -1,6 +1,7 @@
 """Simple test configuration for Archon - Essential tests only."""
 
 import os
+import sys
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -27,6 +28,19 @@ def prevent_real_db_calls():
         yield
 
 
+@pytest.fixture(autouse=True)
+def reset_search_caches():
+    """Keep process-wide search caches from leaking results between tests."""
+    for module_name, attribute in (
+        ("src.server.services.search.search_cache", "_search_cache"),
+        ("src.server.services.search.query_log_service", "_query_log_service"),
+    ):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            setattr(module, attribute, None)
+    yield
+
+
 @pytest.fixture
 def mock_supabase_client():
     """Mock Supabase client for testing."""
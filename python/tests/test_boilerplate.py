@@ -0,0 +1,62 @@
+"""Tests for cross-page boilerplate removal."""
+
+import pytest
+
+from src.server.services.crawling.boilerplate import LEARN_PAGES, BoilerplateDetector
+
+NAV = "\n".join(f"- [Guide {i}](https://docs.example.com/guide-{i})" for i in range(12))
+FOOTER = "© 2025 Example Inc. All rights reserved. We use cookies to improve your experience."
+
+
+def _page(i):
+    # The active nav entry differs per page, so the nav block itself never repeats exactly
+    nav = NAV.replace(f"- [Guide {i % 12}]", f"- **[Guide {i % 12}]**")
+    return (
+        f"{nav}\n\n# Page {i}\n\n## Usage\n\n"
+        f"Page {i} explains feature {i} in detail with its own words.\n\n"
+        f"```python\nclient = Client()  # {'same on every page'}\n```\n\n{FOOTER}"
+    )
+
+
+def test_repeated_blocks_are_stripped_and_content_is_kept(tmp_path):
+    detector = BoilerplateDetector("docs.example.com", directory=str(tmp_path))
+    for i in range(LEARN_PAGES):
+        detector.observe(_page(i))
+    assert detector.ready
+
+    stripped = detector.strip(_page(3))
+
+    assert "Guide 7" not in stripped
+    assert FOOTER not in stripped
+    assert stripped.startswith("# Page 3")
+    # Headings and code are kept even though every page has them
+    assert "## Usage" in stripped
+    assert "client = Client()" in stripped
+    assert "feature 3" in stripped
+    assert detector.get_stats()["blocks_removed"] == 2
+
+
+def test_small_crawls_strip_nothing(tmp_path):
+    detector = BoilerplateDetector("docs.example.com", directory=str(tmp_path))
+    for i in range(3):
+        detector.observe(_page(i))
+
+    assert detector.strip(_page(1)) == _page(1)
+
+
+@pytest.mark.asyncio
+async def test_saved_template_strips_from_the_first_page_of_a_refresh(tmp_path):
+    first = BoilerplateDetector("docs.example.com", directory=str(tmp_path))
+    for i in range(LEARN_PAGES):
+        first.observe(_page(i))
+    await first.save()
+
+    refresh = BoilerplateDetector("docs.example.com", directory=str(tmp_path))
+    await refresh.load()
+    other_source = BoilerplateDetector("other.example.com", directory=str(tmp_path))
+    await other_source.load()
+
+    assert refresh.ready
+    refresh.observe(_page(50))
+    assert FOOTER not in refresh.strip(_page(50))
+    assert not other_source.ready
@@ -0,0 +1,72 @@
+"""Tests for classifying extracted code blocks."""
+
+from src.server.services.crawling.code_classifier import CodeClassifier, detect_language, scan_code
+from src.server.services.crawling.code_extraction_service import CodeExtractionService
+
+PYTHON = "\n".join([
+    "import json",
+    "",
+    "def load_config(path):",
+    "    with open(path) as f:",
+    "        data = json.load(f)",
+    "    return data.get('settings', {})",
+])
+
+PROSE = (
+    "This section explains how the service works. The client sends a request and the server "
+    "answers it. These steps are repeated for every page that was crawled, however long it is."
+)
+
+TREE = "\n".join([
+    "project/",
+    "├── src/",
+    "│   ├── main.py",
+    "│   └── util.py",
+    "└── tests/",
+    "    └── test_main.py",
+])
+
+
+def _classifier():
+    return CodeExtractionService(None)._code_classifier()
+
+
+def test_scan_records_code_prose_and_diagram_features():
+    code = scan_code(PYTHON)
+    prose = scan_code(PROSE)
+    tree = scan_code(TREE)
+
+    assert {"imports", "declarations", "function_calls", "assignments", "keywords"} <= set(code.indicators)
+    assert code.non_empty_lines == 5 and code.comment_lines == 0
+    assert not code.malformed
+    assert prose.prose_score / prose.word_count > 0.15
+    assert tree.diagram_lines == 5
+    assert scan_code("result = format(value)\nimportant = 1\nx = 2").malformed
+    assert scan_code("x = '&lt;div&gt;'\ny = 1\nz = 2").malformed
+
+
+def test_classifier_keeps_code_and_rejects_prose_comments_and_diagrams():
+    classifier = _classifier()
+
+    assert classifier.is_code(PYTHON, "python")
+    assert not classifier.is_code(PROSE)
+    assert not classifier.is_code("\n".join(f"# step {i}: call run() = {i}" for i in range(5)) + "\nrun()")
+    assert not classifier.is_code(TREE)
+    assert not classifier.is_code(PYTHON, "mermaid")
+    # A tagged block must show its language's indicators
+    assert not classifier.is_code("x = [1, 2]\ny = x[0] + 1\nprint(y)", "rust")
+    # Filters can be switched off
+    assert CodeClassifier(min_indicators=0, diagram_filtering=False).is_code(TREE + "\nx = 1")
+
+
+def test_language_detection_and_contextual_minimum_length():
+    assert detect_language(PYTHON) == "python"
+    assert detect_language("func main() {\n\tfmt.Println(1)\n}\npackage main") == "go"
+    assert detect_language("SELECT 1;") == ""
+
+    classifier = _classifier()
+    assert classifier.min_length_for("python", "") == 200
+    assert classifier.min_length_for("java", "A short example:") == 210
+    assert classifier.min_length_for("json", "The complete file") == 150
+    assert classifier.min_length_for("unknown", "") == 250
+    assert CodeClassifier(min_length=400, contextual_length=False).min_length_for("json", "example") == 400
@@ -0,0 +1,73 @@
+"""Tests for code block deduplication"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.server.services.crawling.code_extraction_pool import CodeExtractionPool
+from src.server.services.crawling.code_extraction_service import CodeExtractionService
+from src.server.services.storage.code_dedup import CodeBlockIndex
+from src.server.services.storage.code_storage_service import extract_code_blocks
+
+HANDLER = "\n".join(
+    ["@app.get('/items/{item_id}')", "async def read_item(item_id: int, q: str | None = None):"]
+    + [f"    value_{i} = await fetch_value(item_id, offset={i})" for i in range(12)]
+    + ["    return {'item_id': item_id, 'q': q}"]
+)
+ANNOTATED = HANDLER.replace("q: str | None = None", "q: Annotated[str | None, Query()] = None")
+CLIENT = "\n".join(
+    ["const client = new Client({ apiKey: process.env.API_KEY });"]
+    + [f"const page{i} = await client.pages.list({{ cursor: page{i - 1}?.next, limit: {i * 10} }});" for i in range(12)]
+)
+
+
+def test_index_groups_variants_and_separates_different_code():
+    index = CodeBlockIndex()
+
+    assert index.assign(HANDLER) == (0, True)
+    assert index.assign(CLIENT) == (1, True)
+    assert index.assign(ANNOTATED) == (0, False)
+    assert index.assign(HANDLER.replace("    ", "  ")) == (0, False)
+    assert len(index) == 2
+    # Only blocks sharing a band are compared
+    assert index.comparisons <= 2
+
+
+def test_extract_code_blocks_keeps_the_best_variant_of_each_example():
+    markdown = "\n\n".join(
+        [
+            "Read an item:",
+            f"```\n{HANDLER}\n```",
+            "List pages with the client:",
+            f"```javascript\n{CLIENT}\n```",
+            "With Annotated dependencies:",
+            f"```python\n{ANNOTATED}\n```",
+        ]
+    )
+
+    blocks = extract_code_blocks(markdown, min_length=100)
+
+    assert len(blocks) == 2
+    handler = next(block for block in blocks if "read_item" in block["code"])
+    # The variant with a language wins
+    assert handler["language"] == "python"
+    assert handler["consolidated_variants"] == 2
+
+
+@pytest.mark.asyncio
+async def test_code_repeated_across_documents_is_extracted_once():
+    pages = [
+        {"url": f"https://docs.example.com/{version}/items", "markdown": f"Handler:\n\n```python\n{HANDLER}\n```"}
+        for version in ("v1", "v2")
+    ]
+    pages.append({"url": "https://docs.example.com/client", "markdown": f"Client:\n\n```javascript\n{CLIENT}\n```"})
+    service = CodeExtractionService(MagicMock())
+    service.extraction_pool = CodeExtractionPool(processes=0)
+    index = CodeBlockIndex()
+
+    first = await service._extract_code_blocks_from_documents(pages[:2], code_index=index)
+    # A later call of the same crawl shares the index
+    later = await service._extract_code_blocks_from_documents(pages, code_index=index)
+
+    assert [block["source_url"] for block in first] == ["https://docs.example.com/v1/items"]
+    assert [block["source_url"] for block in later] == ["https://docs.example.com/client"]
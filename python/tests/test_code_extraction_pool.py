@@ -0,0 +1,98 @@
+"""Tests for extracting code from crawled pages in worker processes."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.server.services.crawling import code_extraction_pool
+from src.server.services.crawling.code_extraction_pool import CodeExtractionPool
+from src.server.services.crawling.code_extraction_service import CodeExtractionService
+
+SETTINGS = dict(CodeExtractionService.EXTRACTION_SETTINGS)
+
+FUNCTION = "\n".join(
+    ["def load_settings(path: str) -> dict:"]
+    + [f"    value_{i} = read_option(path, 'option_{i}', default={i})" for i in range(12)]
+    + ["    return {'path': path}"]
+)
+
+
+def _pages(count):
+    pages = []
+    for i in range(count):
+        if i % 3 == 0:
+            markdown = f"Page {i}\n\n```python\n{FUNCTION.replace('path', f'path_{i}')}\n```"
+        elif i % 3 == 1:
+            markdown = f"Page {i} has no code."
+        else:
+            markdown = ""
+        pages.append({"url": f"https://example.com/{i}", "markdown": markdown, "html": ""})
+    return pages
+
+
+async def _collect(pool, pages):
+    return {index: blocks async for index, blocks in pool.extract(pages, SETTINGS)}
+
+
+def _slow_extract(doc, settings):
+    if doc["url"].endswith("/slow"):
+        time.sleep(60)
+    if "/busy" in doc["url"]:
+        time.sleep(0.5)
+    return [{"code": doc["markdown"], "language": ""}]
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_extract_the_same_blocks_as_a_thread():
+    pages = _pages(9)
+    pool = CodeExtractionPool(processes=2, start_method="fork")
+    try:
+        in_processes = await _collect(pool, pages)
+    finally:
+        pool.shutdown()
+    in_thread = await _collect(CodeExtractionPool(processes=0), pages)
+
+    # Every page is yielded once, pages without content with no blocks
+    assert sorted(in_processes) == list(range(9))
+    assert in_processes == in_thread
+    assert [index for index, blocks in in_thread.items() if blocks] == [0, 3, 6]
+    assert "path_3" in in_thread[3][0]["code"]
+
+
+@pytest.mark.asyncio
+async def test_page_past_its_timeout_is_skipped_and_the_rest_finish():
+    pages = [{"url": f"https://example.com/{name}", "markdown": name} for name in ("a", "slow", "b", "c")]
+    pool = CodeExtractionPool(processes=2, timeout=1.0, start_method="fork")
+    started = time.monotonic()
+    try:
+        with patch.object(code_extraction_pool, "extract_document", _slow_extract):
+            extracted = await _collect(pool, pages)
+    finally:
+        pool.shutdown()
+
+    assert time.monotonic() - started < 20
+    assert extracted[1] == []
+    assert [extracted[i][0]["code"] for i in (0, 2, 3)] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_timeout_in_one_crawl_leaves_concurrent_crawls_running():
+    pool = CodeExtractionPool(processes=1, timeout=1.0, start_method="fork")
+    hanging = [{"url": "https://example.com/slow", "markdown": "slow"}]
+    crawls = [
+        [{"url": f"https://example.com/busy-{crawl}-{i}", "markdown": f"{crawl}-{i}"} for i in range(3)]
+        for crawl in range(3)
+    ]
+    try:
+        with patch.object(code_extraction_pool, "extract_document", _slow_extract):
+            results = await asyncio.gather(*(_collect(pool, pages) for pages in [hanging, *crawls]))
+        # Finished calls leave their workers for the next call
+        assert 0 < len(pool._idle) <= code_extraction_pool.MAX_IDLE_EXECUTORS
+    finally:
+        pool.shutdown()
+
+    assert results[0] == {0: []}
+    for crawl, extracted in enumerate(results[1:]):
+        assert [extracted[i][0]["code"] for i in range(3)] == [f"{crawl}-{i}" for i in range(3)]
@@ -0,0 +1,129 @@
+"""
+Tests for token-budgeted context packing of RAG results
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.server.services.search import context_packer
+from src.server.services.search.context_packer import ContextPacker, estimate_tokens, pack_context
+
+
+def _result(url, chunk_number, content, similarity=0.8):
+    return {
+        "id": f"{url}#{chunk_number}",
+        "url": url,
+        "chunk_number": chunk_number,
+        "content": content,
+        "metadata": {"source": "example.com"},
+        "similarity": similarity,
+    }
+
+
+class _ByteEncoding:
+    """One token per UTF-8 byte, so non-ASCII text costs several tokens per character"""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode("utf-8"))
+
+    def decode_tokens_bytes(self, tokens):
+        return [bytes([token]) for token in tokens]
+
+
+class TestContextPacker:
+    """Test context packing behaviour"""
+
+    @pytest.fixture
+    def packer(self):
+        return ContextPacker(min_passage_tokens=1)
+
+    def test_merges_adjacent_chunks_from_same_url(self, packer):
+        """Consecutive chunks of one URL become a single passage"""
+        results = [
+            _result("https://a.dev/page", 2, "Second part about hooks.", 0.7),
+            _result("https://a.dev/page", 1, "First part about hooks.", 0.9),
+            _result("https://a.dev/page", 5, "Unrelated later section.", 0.5),
+        ]
+
+        packed = packer.pack(results, "hooks", token_budget=1000)
+
+        assert len(packed) == 2
+        assert packed[0]["chunk_numbers"] == [1, 2]
+        assert packed[0]["content"].index("First") < packed[0]["content"].index("Second")
+        assert packed[1]["chunk_numbers"] == [5]
+
+    def test_removes_near_duplicates(self, packer):
+        """Mirrored passages on different URLs are only included once"""
+        text = "The useQueryClient hook returns the current QueryClient instance for the app. " * 5
+        results = [
+            _result("https://a.dev/v1/hooks", 0, text, 0.9),
+            _result("https://a.dev/v2/hooks", 0, text + "New in v2.", 0.8),
+        ]
+
+        packed = packer.pack(results, "useQueryClient", token_budget=1000)
+
+        assert len(packed) == 1
+        assert packed[0]["url"] == "https://a.dev/v1/hooks"
+
+    def test_respects_token_budget(self, packer):
+        """Total packed tokens never exceed the budget"""
+        results = [
+            _result(f"https://a.dev/page{i}", 0, f"Sentence {i} about routing. " * 40, 0.9 - i * 0.01)
+            for i in range(10)
+        ]
+
+        packed = packer.pack(results, "routing", token_budget=300)
+
+        assert packed
+        assert sum(estimate_tokens(p["content"]) for p in packed) <= 300
+        assert sum(p["tokens"] for p in packed) <= 300
+
+    def test_extracts_query_relevant_window(self, packer):
+        """Oversized passages keep the part that mentions the query, not the prefix"""
+        filler = "Installation steps are described elsewhere. " * 30
+        relevant = "Middleware runs before every request. Configure middleware in settings."
+        results = [_result("https://a.dev/guide", 0, filler + relevant + " " + filler)]
+
+        packed = packer.pack(results, "configure middleware", token_budget=40)
+
+        assert len(packed) == 1
+        assert packed[0]["truncated"] is True
+        assert "middleware" in packed[0]["content"].lower()
+
+    def test_zero_budget_returns_nothing(self):
+        """A non-positive budget packs nothing"""
+        assert pack_context([_result("https://a.dev", 0, "text")], "text", 0) == []
+
+    def test_results_without_url_are_kept(self, packer):
+        """Results missing url/chunk_number are packed individually"""
+        results = [{"id": "x", "content": "Standalone content about caching.", "similarity": 0.6}]
+
+        packed = packer.pack(results, "caching", token_budget=100)
+
+        assert len(packed) == 1
+        assert packed[0]["chunk_numbers"] == []
+
+    def test_dense_text_is_trimmed_to_the_budget(self, packer):
+        """A passage with no sentence breaks is cut by tokens, not by an estimated character count"""
+        text = "".join(chr(0x4E00 + i * 37 % 20000) for i in range(2000))
+        results = [_result("https://a.dev/zh", 0, text)]
+
+        with patch.object(context_packer, "_ENCODING", _ByteEncoding()):
+            packed = packer.pack(results, "查询", token_budget=50)
+
+        assert len(packed) == 1
+        assert 0 < packed[0]["tokens"] <= 50
+        # 16 whole characters fit; the bytes of the 17th are dropped rather than decoded
+        assert packed[0]["content"] == text[:16]
+
+    def test_passages_without_words_are_kept(self, packer):
+        """Symbol-only passages have nothing to compare and are not dropped as duplicates"""
+        results = [
+            _result("https://a.dev/ops", 0, "=> <= != ** ::", 0.9),
+            _result("https://a.dev/ops", 3, "Operators are listed above.", 0.8),
+        ]
+
+        packed = packer.pack(results, "operators", token_budget=100)
+
+        assert [p["chunk_numbers"] for p in packed] == [[0], [3]]
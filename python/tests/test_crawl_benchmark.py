@@ -0,0 +1,113 @@
+"""Tests for the crawl throughput benchmark harness."""
+
+import asyncio
+import re
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.server.testing.crawl_benchmark import (
+    SiteSpec,
+    SyntheticDocsSite,
+    compare_results,
+    page_links,
+    run_benchmark,
+)
+
+
+def _fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, ""
+
+
+class _HttpCrawler:
+    """Fetches pages over HTTP and converts them to rough markdown, standing in for the browser."""
+
+    async def arun(self, url, config=None):
+        status, html = await asyncio.to_thread(_fetch, url)
+        links = [{"href": urllib.parse.urljoin(url, href)} for href in re.findall(r'href="([^"]+)"', html)]
+        markdown = re.sub(r'<pre><code class="language-(\w+)">', r"\n```\1\n", html)
+        markdown = re.sub(r"</code></pre>", "\n```\n", markdown)
+        markdown = re.sub(r"<[^>]+>", "\n", markdown).replace("&lt;", "<").replace("&amp;", "&")
+        return SimpleNamespace(
+            url=url,
+            success=status == 200,
+            markdown=markdown,
+            html=html,
+            links={"internal": links},
+            status_code=status,
+            response_headers={},
+            error_message=None if status == 200 else f"HTTP {status}",
+        )
+
+
+def test_synthetic_site_is_reachable_from_the_home_page():
+    spec = SiteSpec(pages=60, fanout=4, code_blocks=2)
+    reached = {0}
+    frontier = [0]
+    for _ in range(spec.depth):
+        frontier = [link for page in frontier for link in page_links(spec, page) if link not in reached]
+        reached.update(frontier)
+    assert reached == set(range(spec.pages))
+
+    with SyntheticDocsSite(spec) as site:
+        status, home = _fetch(f"{site.base_url}/")
+        _, page = _fetch(f"{site.base_url}/docs/page-7.html")
+        _, sitemap = _fetch(f"{site.base_url}/sitemap.xml")
+        missing, _ = _fetch(f"{site.base_url}/docs/page-60.html")
+
+    assert status == 200
+    assert page.count('<code class="language-python">') == 2
+    assert sitemap.count("<loc>") == 60
+    assert missing == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["recursive", "sitemap"])
+async def test_benchmark_runs_the_crawl_chunk_and_code_path(mode):
+    spec = SiteSpec(pages=25, fanout=5, code_blocks=2)
+    with (
+        patch("src.server.services.crawling.strategies.recursive.CrawlerRunConfig"),
+        patch("src.server.services.crawling.strategies.recursive.MemoryAdaptiveDispatcher"),
+        patch("src.server.services.crawling.strategies.batch.CrawlerRunConfig"),
+        patch("src.server.services.crawling.strategies.batch.MemoryAdaptiveDispatcher"),
+    ):
+        results = await run_benchmark(
+            spec,
+            mode=mode,
+            settings={
+                "CRAWL_HTTP_FAST_PATH": "false",
+                "CRAWL_DOMAIN_PROFILES": "false",
+                "DOCUMENT_PREP_PROCESSES": "0",
+                "CODE_EXTRACTION_PROCESSES": "0",
+            },
+            crawler=_HttpCrawler(),
+            label="test",
+        )
+
+    measured = results["results"]
+    assert results["schema_version"] == 1
+    assert results["site"]["pages"] == 25
+    assert measured["pages_crawled"] == 25
+    assert measured["pages_per_second"] > 0
+    assert set(measured["stages"]) == {"crawl", "chunk", "code_extraction", "embed_store"}
+    assert measured["chunks"] >= 25
+    assert measured["code_blocks"] > 0
+    assert measured["html_bytes"] > measured["markdown_bytes"] / 2
+    assert measured["peak_rss_mb"] > 0
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"results": {"pages_per_second": 100.0, "peak_rss_mb": 500.0, "event_loop_lag_ms": {"p95": 10.0}}}
+    current = {"results": {"pages_per_second": 80.0, "peak_rss_mb": 520.0, "event_loop_lag_ms": {"p95": 5.0}}}
+
+    regressions = compare_results(baseline, current, tolerance=0.1)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("pages_per_second")
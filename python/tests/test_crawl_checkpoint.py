@@ -0,0 +1,120 @@
+"""
+Tests for crawl checkpoints and resume
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.crawl_checkpoint import CrawlCheckpoint
+
+
+def _checkpoint(**kwargs):
+    return CrawlCheckpoint(
+        MagicMock(),
+        "progress-1",
+        {"url": "https://example.com", "max_depth": 2},
+        "example.com",
+        "webpage",
+        **kwargs,
+    )
+
+
+def test_resume_state_requeues_pages_that_were_not_stored():
+    checkpoint = _checkpoint(
+        resume_from={
+            "state": {
+                "depth": 1,
+                "pending": ["https://example.com/c"],
+                "visited": ["https://example.com", "https://example.com/a", "https://example.com/b"],
+                "stored_word_count": 42,
+            },
+            "in_flight": ["https://example.com/b"],
+        }
+    )
+
+    assert checkpoint.resume_state["pending"] == ["https://example.com/b", "https://example.com/c"]
+    assert "https://example.com/b" not in checkpoint.resume_state["visited"]
+    assert checkpoint.initial_word_count == 42
+
+
+@pytest.mark.asyncio
+async def test_save_is_throttled_and_records_in_flight_urls():
+    checkpoint = _checkpoint(
+        in_flight=lambda: {"https://example.com/b"},
+        stored_word_count=lambda: 7,
+        interval=60,
+    )
+    table = checkpoint.supabase_client.table.return_value
+
+    assert await checkpoint.save({"pending": [], "visited": ["https://example.com"]})
+    assert not await checkpoint.save({"pending": [], "visited": ["https://example.com", "x"]})
+
+    row = table.upsert.call_args.args[0]
+    assert row["in_flight"] == ["https://example.com/b"]
+    assert row["state"]["stored_word_count"] == 7
+    assert row["pages_visited"] == 1
+    assert table.upsert.call_count == 1
+
+    # Cancelling writes the latest state even though the save was throttled
+    await checkpoint.finish("cancelled")
+    row = table.upsert.call_args.args[0]
+    assert row["status"] == "cancelled"
+    assert row["pages_visited"] == 2
+
+
+@pytest.mark.asyncio
+async def test_completed_crawl_deletes_its_checkpoint():
+    checkpoint = _checkpoint()
+    await checkpoint.save({"pending": [], "visited": []})
+
+    await checkpoint.finish("completed")
+
+    table = checkpoint.supabase_client.table.return_value
+    table.delete.return_value.eq.assert_called_with("progress_id", "progress-1")
+
+
+@pytest.mark.asyncio
+async def test_recursive_crawl_resumes_from_saved_frontier():
+    from src.server.services.crawling.strategies.recursive import RecursiveCrawlStrategy
+
+    crawled = []
+
+    async def _arun(url, config=None):
+        crawled.append(url)
+        return MagicMock(url=url, success=True, markdown="text", html="", links={}, status_code=200)
+
+    crawler = MagicMock()
+    crawler.arun = AsyncMock(side_effect=_arun)
+    strategy = RecursiveCrawlStrategy(crawler, MagicMock())
+    saved = []
+
+    with (
+        patch("src.server.services.crawling.strategies.recursive.credential_service") as creds,
+        patch("src.server.services.crawling.strategies.recursive.CrawlerRunConfig"),
+        patch("src.server.services.crawling.strategies.recursive.MemoryAdaptiveDispatcher"),
+    ):
+        creds.get_credentials_by_category = AsyncMock(return_value={
+            "CRAWL_HTTP_FAST_PATH": "false",
+            "CRAWL_CONTINUOUS_RECURSIVE": "false",
+        })
+        await strategy.crawl_recursive_with_progress(
+            ["https://example.com"],
+            lambda url: url,
+            lambda url: False,
+            max_depth=3,
+            on_page=AsyncMock(),
+            resume_state={
+                "depth": 1,
+                "pending": ["https://example.com/b"],
+                "next_level": ["https://example.com/deep"],
+                "visited": ["https://example.com", "https://example.com/a"],
+            },
+            save_state=AsyncMock(side_effect=saved.append),
+        )
+
+    # Visited pages are not fetched again; the saved next level is crawled after the pending URLs
+    assert crawled == ["https://example.com/b", "https://example.com/deep"]
+    assert saved[0]["depth"] == 1
+    assert saved[-1]["depth"] == 2
+    assert "https://example.com/deep" in saved[-1]["visited"]
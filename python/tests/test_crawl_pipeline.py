@@ -0,0 +1,271 @@
+"""
+Tests for the streaming crawl pipeline
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.crawl_pipeline import StreamingCrawlPipeline
+from src.server.services.crawling.document_preparation import DocumentPreparer
+from src.server.services.crawling.document_storage_operations import DocumentStorageOperations
+
+PIPELINE_MODULE = "src.server.services.crawling.crawl_pipeline"
+PREPARATION_MODULE = "src.server.services.crawling.document_preparation"
+
+SETTINGS = {
+    "CRAWL_PIPELINE_QUEUE_SIZE": "2",
+    "CRAWL_PIPELINE_BATCH_SIZE": "2",
+    "CRAWL_PIPELINE_EMBED_WORKERS": "2",
+    "CRAWL_PIPELINE_STORE_WORKERS": "2",
+}
+
+
+def _rows(urls, chunk_numbers, contents, metadatas, documents, **kwargs):
+    return [
+        {"url": url, "chunk_number": n, "content": c, "metadata": m}
+        for url, n, c, m in zip(urls, chunk_numbers, contents, metadatas, strict=False)
+    ]
+
+
+@pytest.fixture
+def storage_ops():
+    ops = DocumentStorageOperations(MagicMock())
+    ops.document_preparer = DocumentPreparer(processes=0)
+    ops._create_source_records = AsyncMock()
+    ops.extract_and_store_code_examples = AsyncMock(return_value=1)
+    with patch(f"{PREPARATION_MODULE}.TokenChunker") as chunker:
+        chunker.return_value.split.side_effect = lambda text: text.split("|")
+        yield ops
+
+
+@pytest.mark.asyncio
+async def test_pages_are_chunked_embedded_and_stored(storage_ops):
+    delete = AsyncMock()
+    insert = AsyncMock(side_effect=lambda client, rows, check=None: len(rows))
+    progress = AsyncMock()
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", AsyncMock(side_effect=_rows)),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", insert),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", delete),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops,
+            {"knowledge_type": "technical", "tags": ["docs"]},
+            "webpage",
+            "example.com",
+            progress_callback=progress,
+        )
+        await pipeline.start()
+        for i in range(5):
+            await pipeline.submit_page({"url": f"https://example.com/{i}", "markdown": "one two|three"})
+        await pipeline.submit_page({"url": "https://example.com/empty", "markdown": ""})
+        results = await pipeline.finish()
+
+    assert results["chunk_count"] == 10
+    assert results["pages_processed"] == 5
+    assert results["total_word_count"] == 15
+    assert results["code_examples_count"] == 1
+    assert pipeline.chunks_stored == 10
+
+    # The source record is created once, before anything is stored
+    storage_ops._create_source_records.assert_awaited_once()
+
+    # Each URL's previous rows are deleted exactly once
+    deleted = [url for call in delete.await_args_list for url in call.args[1]]
+    assert sorted(deleted) == sorted(f"https://example.com/{i}" for i in range(5))
+
+    stored = [row for call in insert.await_args_list for row in call.args[1]]
+    assert {row["metadata"]["tags"][0] for row in stored} == {"docs"}
+    progress.assert_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stage_failure_is_raised_to_the_crawler(storage_ops):
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", AsyncMock(side_effect=RuntimeError("boom"))),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", AsyncMock()),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops, {}, "webpage", "example.com", extract_code_examples=False
+        )
+        await pipeline.start()
+
+        with pytest.raises(RuntimeError, match="boom"):
+            for i in range(50):
+                await pipeline.submit_page({"url": f"https://example.com/{i}", "markdown": "a|b"})
+            await pipeline.finish()
+
+        await pipeline.abort()
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_reuses_unchanged_chunk_embeddings(storage_ops):
+    from src.server.services.crawling.incremental_refresh import PageVersionTracker, content_hash
+
+    tracker = PageVersionTracker(MagicMock(), "example.com", incremental=True)
+    tracker._versions = {
+        "https://example.com/same": {"status": "active", "content_hash": content_hash("a|b")},
+        "https://example.com/edited": {"status": "active", "content_hash": content_hash("a|old")},
+    }
+    tracker.get_reusable_chunks = AsyncMock(
+        return_value={content_hash("a"): {"content": "a", "metadata": {}, "embedding": "[0.1]"}}
+    )
+    embed = AsyncMock(side_effect=_rows)
+    insert = AsyncMock(side_effect=lambda client, rows, check=None: len(rows))
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", embed),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", insert),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops, {}, "webpage", "example.com", page_versions=tracker
+        )
+        await pipeline.start()
+        await pipeline.submit_page({"url": "https://example.com/same", "markdown": "a|b"})
+        await pipeline.submit_page({"url": "https://example.com/edited", "markdown": "a|new"})
+        await pipeline.finish()
+
+    # Only the edited chunk is embedded; the unchanged page is skipped entirely
+    embedded = [c for call in embed.await_args_list for c in call.args[2]]
+    assert embedded == ["new"]
+    assert pipeline.chunks_reused == 1
+    assert pipeline.chunks_stored == 2
+    assert tracker.pages_unchanged == 1
+    # The existing source record is kept on refresh
+    storage_ops._create_source_records.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refresh_with_an_empty_page_still_tombstones_removed_pages(storage_ops):
+    from src.server.services.crawling.incremental_refresh import PageVersionTracker, content_hash
+
+    tracker = PageVersionTracker(MagicMock(), "example.com", incremental=True)
+    tracker._versions = {
+        url: {"status": "active", "content_hash": content_hash("a|b")}
+        for url in ("https://example.com/same", "https://example.com/stub", "https://example.com/removed")
+    }
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", AsyncMock(side_effect=_rows)),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", AsyncMock()),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops, {}, "webpage", "example.com", page_versions=tracker
+        )
+        await pipeline.start()
+        await pipeline.submit_page({"url": "https://example.com/same", "markdown": "a|b"})
+        # Crawled successfully, but a redirect stub has no content
+        await pipeline.submit_page({"url": "https://example.com/stub", "markdown": ""})
+        await pipeline.finish()
+
+    stats = await tracker.save(tombstone=True)
+
+    assert stats["pages_removed"] == 1
+    deleted = tracker.supabase_client.table.return_value.delete.return_value.in_.call_args_list
+    assert deleted[0].args == ("url", ["https://example.com/removed"])
+
+
+@pytest.mark.asyncio
+async def test_pages_stay_in_flight_until_stored(storage_ops):
+    insert = AsyncMock(side_effect=lambda client, rows, check=None: len(rows))
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", AsyncMock(side_effect=_rows)),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", insert),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops, {}, "webpage", "example.com", initial_word_count=10
+        )
+        await pipeline.submit_page({"url": "https://example.com/a", "markdown": "one two|three"})
+        assert pipeline.pending_urls() == {"https://example.com/a"}
+        await pipeline.finish()
+
+    assert pipeline.pending_urls() == set()
+    assert pipeline.stored_word_count == 13
+
+
+@pytest.mark.asyncio
+async def test_boilerplate_is_stripped_before_chunking(storage_ops, tmp_path):
+    from src.server.services.crawling.boilerplate import BoilerplateDetector
+
+    detector = BoilerplateDetector("example.com", directory=str(tmp_path), learn_pages=5)
+    insert = AsyncMock(side_effect=lambda client, rows, check=None: len(rows))
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", AsyncMock(side_effect=_rows)),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", insert),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(
+            storage_ops, {}, "webpage", "example.com", extract_code_examples=False, boilerplate=detector
+        )
+        await pipeline.start()
+        for i in range(7):
+            await pipeline.submit_page(
+                {"url": f"https://example.com/{i}", "markdown": f"Home | Docs | Blog\n\nPage {i} body"}
+            )
+        results = await pipeline.finish()
+
+    stored = sorted(row["content"] for call in insert.await_args_list for row in call.args[1])
+    # Pages held while the site was learned are stripped too
+    assert stored == [f"Page {i} body" for i in range(7)]
+    assert results["pages_processed"] == 7
+    assert pipeline.get_stats()["boilerplate_chars_removed"] > 0
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_chunks_share_the_canonical_embedding(storage_ops):
+    text = " ".join(f"Install the client library version {i} and configure the token." for i in range(20))
+    embed = AsyncMock(
+        side_effect=lambda urls, numbers, contents, metadatas, documents, **kwargs: [
+            {**row, "embedding": [float(len(row["content"]))]}
+            for row in _rows(urls, numbers, contents, metadatas, documents)
+        ]
+    )
+    insert = AsyncMock(side_effect=lambda client, rows, check=None: len(rows))
+
+    with (
+        patch(f"{PIPELINE_MODULE}.credential_service") as mock_credentials,
+        patch("src.server.services.storage.near_duplicates.credential_service") as near_credentials,
+        patch(f"{PIPELINE_MODULE}.embed_document_batch", embed),
+        patch(f"{PIPELINE_MODULE}.insert_document_batch", insert),
+        patch(f"{PIPELINE_MODULE}.delete_documents_for_urls", AsyncMock()),
+    ):
+        mock_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        near_credentials.get_credentials_by_category = AsyncMock(return_value=SETTINGS)
+        pipeline = StreamingCrawlPipeline(storage_ops, {}, "webpage", "example.com", extract_code_examples=False)
+        await pipeline.start()
+        for version in ("v1", "v2", "latest"):
+            await pipeline.submit_page({"url": f"https://example.com/{version}/install", "markdown": f"{text}|short"})
+        await pipeline.finish()
+
+    embedded = [content for call in embed.await_args_list for content in call.args[2]]
+    stored = {row["url"]: row for call in insert.await_args_list for row in call.args[1] if row["chunk_number"] == 0}
+    # The long chunk is embedded once; the short chunks are too small to compare
+    assert embedded.count(text) == 1
+    assert embedded.count("short") == 3
+    assert pipeline.chunks_deduplicated == 2
+    assert pipeline.chunks_stored == 6
+    canonical = stored["https://example.com/v1/install"]
+    for version in ("v2", "latest"):
+        duplicate = stored[f"https://example.com/{version}/install"]
+        assert duplicate["metadata"]["duplicate_of"] == "https://example.com/v1/install#0"
+        assert duplicate["embedding"] == canonical["embedding"]
@@ -0,0 +1,103 @@
+"""Tests for the multi-process crawl worker pool."""
+
+import asyncio
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.server.services.crawl_worker_pool import CrawlWorkerPool
+
+
+class _FakeCrawler:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    async def arun(self, url, config=None):
+        if "crash" in url:
+            os._exit(1)
+        if "boom" in url:
+            raise RuntimeError("render failed")
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            url=url,
+            success=True,
+            markdown=f"# {url}\n\nrendered with {config}",
+            html="<html></html>",
+            links={"internal": [{"href": f"{url}/next"}]},
+            status_code=200,
+            response_headers={"ETag": '"v1"'},
+            error_message=None,
+        )
+
+
+def _fake_crawler_factory():
+    return _FakeCrawler()
+
+
+def _pool(**kwargs):
+    # fork keeps the test module importable in the workers without a real crawler
+    return CrawlWorkerPool(2, max_in_flight=2, crawler_factory=_fake_crawler_factory, start_method="fork", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_arun_many_streams_results_in_crawler_format():
+    urls = [f"https://example.com/page{i}" for i in range(12)] + ["https://example.com/boom"]
+
+    async with _pool() as pool:
+        results = [result async for result in await pool.arun_many(urls=urls, config="cfg", dispatcher=None)]
+        stats = pool.get_stats()
+
+    assert sorted(result.url for result in results) == sorted(urls)
+    failed = [result for result in results if not result.success]
+    assert [result.url for result in failed] == ["https://example.com/boom"]
+    assert "render failed" in failed[0].error_message
+    page = next(result for result in results if result.url == urls[0])
+    assert page.markdown == f"# {urls[0]}\n\nrendered with cfg"
+    assert page.links == {"internal": [{"href": f"{urls[0]}/next"}]}
+    assert page.response_headers == {"ETag": '"v1"'}
+    assert stats["pages"] == len(urls)
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dead_worker_fails_its_page_and_is_replaced():
+    async with _pool() as pool:
+        crashed = await pool.arun("https://example.com/crash")
+        assert not crashed.success
+        assert "exited" in crashed.error_message
+        assert crashed.url == "https://example.com/crash"
+
+        results = await asyncio.gather(*(pool.arun(f"https://example.com/after{i}") for i in range(4)))
+        assert all(result.success for result in results)
+        assert pool.get_stats()["restarts"] == 1
+        assert pool.get_stats()["alive"] == 2
+
+
+@pytest.mark.asyncio
+async def test_unpicklable_config_is_a_failed_result():
+    async with _pool() as pool:
+        result = await pool.arun("https://example.com/page", config=threading.Lock())
+        assert not result.success
+        assert "cannot be sent to crawl workers" in result.error_message
+        assert pool.get_stats()["pages"] == 0
+
+
+@pytest.mark.asyncio
+async def test_crawl_service_run_config_reaches_spawned_workers():
+    crawl4ai = pytest.importorskip("crawl4ai")
+    if not isinstance(crawl4ai.CrawlerRunConfig, type):
+        pytest.skip("crawl4ai is not installed")
+    from src.server.services.crawling.helpers.site_config import SiteConfig
+
+    config = crawl4ai.CrawlerRunConfig(markdown_generator=SiteConfig.get_markdown_generator())
+    pool = CrawlWorkerPool(1, crawler_factory=_fake_crawler_factory, start_method="spawn")
+    async with pool:
+        result = await pool.arun("https://example.com/page", config=config)
+
+    assert result.success, result.error_message
+    assert result.url == "https://example.com/page"
@@ -0,0 +1,84 @@
+"""Tests for preparing crawled pages in worker processes."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.document_preparation import DocumentPreparer
+from src.server.services.crawling.document_storage_operations import DocumentStorageOperations
+
+PREPARATION_MODULE = "src.server.services.crawling.document_preparation"
+
+
+def _pages(count):
+    return [
+        {
+            "url": f"https://example.com/{i}",
+            "title": f"Page {i}",
+            "markdown": "\n\n".join(f"Paragraph {j} of page {i} has a few words." for j in range(40)) if i % 4 else "",
+            "html": "<html></html>",
+        }
+        for i in range(count)
+    ]
+
+
+async def _collect(preparer, pages):
+    return [prepared async for prepared in preparer.prepare(pages, "example.com", {"tags": ["docs"]}, "webpage")]
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_prepare_the_same_chunks_as_a_thread():
+    pages = _pages(12)
+    pool = DocumentPreparer(processes=2, chunk_tokens=80, overlap_tokens=10, start_method="fork")
+    try:
+        with patch(f"{PREPARATION_MODULE}.TASK_CHARS", 2000):
+            in_processes = await _collect(pool, pages)
+    finally:
+        pool.shutdown()
+    in_thread = await _collect(DocumentPreparer(processes=0, chunk_tokens=80, overlap_tokens=10), pages)
+
+    # Pages without markdown are skipped; the rest keep their position in the crawl
+    assert sorted(p.index for p in in_processes) == [i for i in range(12) if i % 4]
+    by_index = {p.index: (p.url, p.chunks, p.metadatas) for p in in_processes}
+    assert by_index == {p.index: (p.url, p.chunks, p.metadatas) for p in in_thread}
+    first = in_thread[0]
+    assert len(first.chunks) > 1
+    assert first.metadatas[1]["chunk_index"] == 1
+    assert first.metadatas[0]["tags"] == ["docs"]
+    assert first.word_count == sum(len(chunk.split()) for chunk in first.chunks)
+
+
+@pytest.mark.asyncio
+async def test_small_pages_are_grouped_into_one_task():
+    preparer = DocumentPreparer(processes=0)
+    groups = []
+
+    def _prepare(group, *args):
+        groups.append([index for index, _ in group])
+        return []
+
+    with patch(f"{PREPARATION_MODULE}.prepare_documents", side_effect=_prepare):
+        await _collect(preparer, _pages(8))
+
+    assert groups == [[1, 2, 3, 5, 6, 7]]
+
+
+@pytest.mark.asyncio
+async def test_stored_documents_keep_the_crawl_order():
+    ops = DocumentStorageOperations(MagicMock())
+    ops.document_preparer = DocumentPreparer(processes=0, chunk_tokens=80)
+    ops._create_source_records = AsyncMock()
+    store = AsyncMock()
+
+    with (
+        patch(f"{PREPARATION_MODULE}.TASK_CHARS", 1),
+        patch("src.server.services.crawling.document_storage_operations.add_documents_to_supabase", store),
+    ):
+        result = await ops.process_and_store_documents(_pages(8), {}, "webpage", "example.com")
+
+    stored = store.await_args.kwargs
+    urls = list(dict.fromkeys(stored["urls"]))
+    assert urls == [f"https://example.com/{i}" for i in (1, 2, 3, 5, 6, 7)]
+    assert result["chunk_count"] == len(stored["contents"])
+    assert result["total_word_count"] == sum(m["word_count"] for m in stored["metadatas"])
+    assert set(result["url_to_full_document"]) == set(urls)
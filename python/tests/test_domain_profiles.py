@@ -0,0 +1,103 @@
+"""Tests for learned per-domain crawl profiles."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.server.services.crawling.domain_profiles import (
+    MIN_PAGE_TIMEOUT_MS,
+    PROBE_PAGES,
+    DomainProfileStore,
+    ProfiledCrawler,
+)
+
+
+def _config():
+    return SimpleNamespace(delay_before_return_html=1.0, scan_full_page=True, page_timeout=30000)
+
+
+class _Crawler:
+    """Renders pages whose content may depend on the render delay."""
+
+    def __init__(self, late_content=False, timeout_below=None):
+        self.late_content = late_content
+        self.timeout_below = timeout_below
+        self.configs = []
+
+    async def arun(self, url, config=None):
+        self.configs.append(config)
+        if self.timeout_below and config.page_timeout < self.timeout_below:
+            return SimpleNamespace(url=url, success=False, markdown=None, error_message="Page.goto: Timeout exceeded")
+        markdown = f"# {url}\n\nBody"
+        if self.late_content and config.delay_before_return_html:
+            markdown += "\n\nLoaded by script"
+        return SimpleNamespace(url=url, success=True, markdown=markdown, error_message=None)
+
+
+@pytest.mark.asyncio
+async def test_stable_domain_drops_delay_and_scroll(tmp_path):
+    store = DomainProfileStore(str(tmp_path / "profiles.json"))
+    crawler = _Crawler()
+    profiled = ProfiledCrawler(crawler, store)
+    config = _config()
+
+    for i in range(PROBE_PAGES + 3):
+        await profiled.arun(f"https://docs.example.com/p{i}", config=config)
+
+    # One extra render per probe, then later pages run without the delay and the scroll
+    assert len(crawler.configs) == PROBE_PAGES * 2 + 3
+    last = crawler.configs[-1]
+    assert last.delay_before_return_html == 0
+    assert last.scan_full_page is False
+    assert config.delay_before_return_html == 1.0
+    assert store.get_stats()["docs.example.com"]["stable"]
+
+
+@pytest.mark.asyncio
+async def test_content_that_changes_after_the_delay_keeps_it(tmp_path):
+    store = DomainProfileStore(str(tmp_path / "profiles.json"))
+    crawler = _Crawler(late_content=True)
+    profiled = ProfiledCrawler(crawler, store)
+
+    for i in range(PROBE_PAGES + 3):
+        await profiled.arun(f"https://app.example.com/p{i}", config=_config())
+
+    assert crawler.configs[-1].delay_before_return_html == 1.0
+    assert crawler.configs[-1].scan_full_page is True
+    assert not store.get_stats()["app.example.com"]["stable"]
+
+
+@pytest.mark.asyncio
+async def test_shortened_timeout_is_retried_with_the_configured_one(tmp_path):
+    store = DomainProfileStore(str(tmp_path / "profiles.json"))
+    crawler = _Crawler()
+    profiled = ProfiledCrawler(crawler, store)
+
+    for i in range(8):
+        await profiled.arun(f"https://fast.example.com/p{i}", config=_config())
+    assert crawler.configs[-1].page_timeout == MIN_PAGE_TIMEOUT_MS
+
+    # The site slows down: pages now need more than the shortened timeout
+    crawler.timeout_below = 20000
+    result = await profiled.arun("https://fast.example.com/slow", config=_config())
+
+    assert result.success
+    assert crawler.configs[-1].page_timeout == 30000
+    await profiled.arun("https://fast.example.com/next", config=_config())
+    assert crawler.configs[-1].page_timeout == 30000
+
+
+@pytest.mark.asyncio
+async def test_profiles_persist_across_stores(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    store = DomainProfileStore(path)
+    profiled = ProfiledCrawler(_Crawler(), store)
+    for i in range(PROBE_PAGES):
+        await profiled.arun(f"https://docs.example.com/p{i}", config=_config())
+    await store.save(force=True)
+
+    crawler = _Crawler()
+    await ProfiledCrawler(crawler, DomainProfileStore(path)).arun("https://docs.example.com/new", config=_config())
+
+    assert len(crawler.configs) == 1
+    assert crawler.configs[0].delay_before_return_html == 0
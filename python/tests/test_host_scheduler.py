@@ -0,0 +1,95 @@
+"""
+Tests for the per-host crawl scheduler
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from src.server.services.crawling.host_scheduler import HostScheduler
+
+
+class FakeCrawler:
+    """Crawler whose pages take a per-host delay and answer with a per-host status."""
+
+    def __init__(self, delays=None, statuses=None):
+        self.delays = delays or {}
+        self.statuses = statuses or {}
+        self.active = {}
+        self.peak = {}
+        self.order = []
+
+    async def arun(self, url, config=None):
+        host = url.split("/")[2]
+        self.active[host] = self.active.get(host, 0) + 1
+        self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        await asyncio.sleep(self.delays.get(host, 0))
+        self.active[host] -= 1
+        self.order.append(url)
+        return SimpleNamespace(
+            url=url, success=True, markdown="x", html="", status_code=self.statuses.get(host, 200)
+        )
+
+
+async def _collect(scheduler, crawler, urls, max_concurrent=10):
+    return [r async for r in scheduler.crawl(crawler, urls, None, max_concurrent)]
+
+
+@pytest.mark.asyncio
+async def test_windows_limit_concurrency_per_host():
+    scheduler = HostScheduler(initial_window=2, max_window=2)
+    crawler = FakeCrawler(delays={"a.com": 0.01, "b.com": 0.01})
+    urls = [f"https://a.com/{i}" for i in range(6)] + [f"https://b.com/{i}" for i in range(6)]
+
+    results = await _collect(scheduler, crawler, urls)
+
+    assert len(results) == 12
+    assert crawler.peak == {"a.com": 2, "b.com": 2}
+
+
+@pytest.mark.asyncio
+async def test_slow_host_does_not_block_fast_host():
+    scheduler = HostScheduler(initial_window=1)
+    crawler = FakeCrawler(delays={"slow.com": 0.2})
+    urls = ["https://slow.com/1", "https://slow.com/2"] + [f"https://fast.com/{i}" for i in range(5)]
+
+    await _collect(scheduler, crawler, urls)
+
+    assert crawler.order[:5] == [f"https://fast.com/{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_window_grows_on_success_and_halves_on_throttling():
+    scheduler = HostScheduler(initial_window=2, max_window=10)
+
+    for _ in range(10):
+        await scheduler.acquire("a.com")
+        await scheduler.release("a.com", 0.1, status_code=200)
+    grown = scheduler.window("a.com").limit
+    assert grown > 4
+
+    with patch("src.server.services.crawling.host_scheduler.THROTTLE_BACKOFF_SECONDS", 0):
+        await scheduler.acquire("a.com")
+        await scheduler.release("a.com", 0.1, status_code=429)
+        # A second response from the same round trip does not shrink the window again
+        await scheduler.acquire("a.com")
+        await scheduler.release("a.com", 0.1, status_code=429)
+
+    window = scheduler.window("a.com")
+    assert window.limit == pytest.approx(grown / 2)
+    assert window.throttled == 2
+
+
+@pytest.mark.asyncio
+async def test_throttled_host_backs_off_for_retry_after():
+    scheduler = HostScheduler(initial_window=1)
+    await scheduler.acquire("a.com")
+    await scheduler.release("a.com", 0.1, status_code=503, retry_after="0.2")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await scheduler.acquire("a.com")
+
+    assert loop.time() - started >= 0.15
@@ -0,0 +1,69 @@
+"""Tests for the on-disk HTML spool."""
+
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.html_spool import HtmlSpool, SpooledHtml, read_html, spool_html
+from src.server.services.crawling.strategies.recursive import RecursiveCrawlStrategy
+
+
+@pytest.mark.asyncio
+async def test_handles_read_back_lazily_as_the_spool_grows(tmp_path):
+    spool = HtmlSpool(str(tmp_path))
+    pages = [f"<html><body><pre>page {i} ü</pre>{'x' * 5000}</body></html>" for i in range(20)]
+
+    first = await spool.store(pages[0])
+    assert first.read() == pages[0]
+
+    # Stored after the spool was mapped for the first read
+    handles = [first] + [await spool.store(html) for html in pages[1:]]
+    assert [read_html(handle) for handle in handles] == pages
+    assert len(handles[3]) == len(pages[3])
+    assert spool.get_stats()["pages"] == 20
+    assert spool.bytes < spool.html_bytes / 10
+
+
+@pytest.mark.asyncio
+async def test_close_removes_the_spool(tmp_path):
+    spool = HtmlSpool(str(tmp_path))
+    handle = await spool.store("<html>page</html>")
+    directory = spool.directory
+
+    spool.close()
+
+    assert not os.path.exists(directory)
+    with pytest.raises(ValueError):
+        handle.read()
+    # Without a usable spool the HTML stays inline
+    assert await spool_html(spool, "<html>page</html>") == "<html>page</html>"
+    assert await spool_html(None, "<html>page</html>") == "<html>page</html>"
+    assert read_html(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_recursive_crawl_pages_carry_spool_handles(tmp_path):
+    async def _arun(url, config=None):
+        return MagicMock(
+            url=url, success=True, markdown="text", html=f"<html>{url}</html>", links={}, status_code=200
+        )
+
+    crawler = MagicMock()
+    crawler.arun = AsyncMock(side_effect=_arun)
+    strategy = RecursiveCrawlStrategy(crawler, MagicMock())
+    strategy.html_spool = HtmlSpool(str(tmp_path))
+
+    with (
+        patch("src.server.services.crawling.strategies.recursive.credential_service") as creds,
+        patch("src.server.services.crawling.strategies.recursive.CrawlerRunConfig"),
+        patch("src.server.services.crawling.strategies.recursive.MemoryAdaptiveDispatcher"),
+    ):
+        creds.get_credentials_by_category = AsyncMock(return_value={"CRAWL_HTTP_FAST_PATH": "false"})
+        pages = await strategy.crawl_recursive_with_progress(
+            ["https://example.com"], lambda url: url, lambda url: False, max_depth=1
+        )
+
+    assert len(pages) == 1
+    assert isinstance(pages[0]["html"], SpooledHtml)
+    assert read_html(pages[0]["html"]) == "<html>https://example.com</html>"
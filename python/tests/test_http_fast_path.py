@@ -0,0 +1,86 @@
+"""
+Tests for the HTTP fast path
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from src.server.services.crawling.http_fast_path import HttpFastPath, extract_links, needs_javascript
+
+ARTICLE = "<p>" + "Static documentation text. " * 20 + "</p>"
+STATIC_PAGE = f"""<html><head><title>Docs</title><script>var x = 1;</script></head>
+<body><nav><a href="/guide">Guide</a><a href="https://other.com/x">Other</a>
+<a href="#top">Top</a></nav>{ARTICLE}</body></html>"""
+SPA_PAGE = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+NOSCRIPT_PAGE = "<html><body><noscript>Please enable JavaScript to view this site.</noscript><p>Loading</p></body></html>"
+
+
+def test_needs_javascript_heuristics():
+    assert needs_javascript(STATIC_PAGE) is None
+    assert needs_javascript(SPA_PAGE) == "empty SPA root"
+    assert needs_javascript(NOSCRIPT_PAGE) == "noscript warning"
+    assert needs_javascript("<html><body><p>Hi</p></body></html>") == "empty body"
+
+
+def test_extract_links_matches_crawler_shape():
+    links = extract_links(STATIC_PAGE, "https://docs.example.com/start")
+
+    assert links["internal"] == [{"href": "https://docs.example.com/guide"}]
+    assert links["external"] == [{"href": "https://other.com/x"}]
+
+
+def _fast_path(pages):
+    fast_path = HttpFastPath()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status, body = pages.get(request.url.path, (404, ""))
+        return httpx.Response(status, text=body, headers={"Content-Type": "text/html; charset=utf-8"})
+
+    fast_path._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fast_path
+
+
+@pytest.fixture
+def markdown_generator():
+    generator = MagicMock()
+    generator.generate_markdown = MagicMock(
+        side_effect=lambda input_html, base_url: SimpleNamespace(raw_markdown="# Docs\n\n" + ARTICLE)
+    )
+    return generator
+
+
+@pytest.mark.asyncio
+async def test_static_pages_skip_the_browser(markdown_generator):
+    fast_path = _fast_path({"/docs": (200, STATIC_PAGE)})
+
+    result = await fast_path.fetch("https://example.com/docs", markdown_generator)
+
+    assert result.success
+    assert result.markdown.startswith("# Docs")
+    assert result.links["internal"] == [{"href": "https://example.com/guide"}]
+    assert fast_path.pages_fast == 1
+
+
+@pytest.mark.asyncio
+async def test_hosts_that_keep_needing_javascript_go_straight_to_the_browser(markdown_generator):
+    fast_path = _fast_path({f"/{i}": (200, SPA_PAGE) for i in range(5)})
+
+    for i in range(3):
+        assert await fast_path.fetch(f"https://spa.com/{i}", markdown_generator) is None
+
+    assert fast_path.wants_browser("https://spa.com/4")
+    assert fast_path.get_stats()["browser_hosts"] == ["spa.com"]
+    markdown_generator.generate_markdown.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_errors_escalate_and_throttling_is_reported(markdown_generator):
+    fast_path = _fast_path({"/forbidden": (403, ""), "/busy": (429, "")})
+
+    assert await fast_path.fetch("https://example.com/forbidden", markdown_generator) is None
+    throttled = await fast_path.fetch("https://example.com/busy", markdown_generator)
+    assert not throttled.success
+    assert throttled.status_code == 429
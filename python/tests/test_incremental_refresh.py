@@ -0,0 +1,174 @@
+"""
+Tests for incremental refresh page versions
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.server.services.crawling.incremental_refresh import (
+    PageVersionTracker,
+    content_hash,
+    get_cache_validators,
+)
+
+
+def _tracker(versions, incremental=True):
+    tracker = PageVersionTracker(MagicMock(), "example.com", incremental=incremental)
+    tracker._versions = {v["url"]: {"status": "active", **v} for v in versions}
+    return tracker
+
+
+def test_get_cache_validators_is_case_insensitive():
+    validators = get_cache_validators({"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024"})
+    assert validators == {"etag": '"abc"', "last_modified": "Mon, 01 Jan 2024"}
+
+
+def test_observe_classifies_pages():
+    tracker = _tracker([
+        {"url": "https://example.com/same", "content_hash": content_hash("same")},
+        {"url": "https://example.com/edited", "content_hash": content_hash("old")},
+    ])
+
+    assert tracker.observe({"url": "https://example.com/same", "markdown": "same"}) == "unchanged"
+    assert tracker.observe({"url": "https://example.com/edited", "markdown": "new"}) == "changed"
+    assert tracker.observe({"url": "https://example.com/added", "markdown": "x"}) == "new"
+    assert tracker.get_stats() == {
+        "pages_new": 1,
+        "pages_changed": 1,
+        "pages_unchanged": 1,
+        "pages_removed": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_find_unchanged_uses_conditional_requests():
+    tracker = _tracker([
+        {"url": "https://example.com/a", "etag": '"a1"', "links": ["https://example.com/c"]},
+        {"url": "https://example.com/b", "etag": '"b1"'},
+        {"url": "https://example.com/gone", "last_modified": "Mon, 01 Jan 2024"},
+    ])
+    seen_headers = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers[str(request.url)] = dict(request.headers)
+        if request.url.path == "/a":
+            return httpx.Response(304)
+        if request.url.path == "/gone":
+            return httpx.Response(404)
+        return httpx.Response(200, headers={"ETag": '"b2"'})
+
+    real_client = httpx.AsyncClient
+    with patch(
+        "src.server.services.crawling.incremental_refresh.httpx.AsyncClient",
+        lambda **kwargs: real_client(transport=httpx.MockTransport(handler), **kwargs),
+    ):
+        unchanged = await tracker.find_unchanged(
+            ["https://example.com/a", "https://example.com/b", "https://example.com/gone"]
+        )
+
+    assert unchanged == {"https://example.com/a": ["https://example.com/c"], "https://example.com/gone": []}
+    assert seen_headers["https://example.com/a"]["if-none-match"] == '"a1"'
+    assert tracker.pages_unchanged == 1
+
+
+@pytest.mark.asyncio
+async def test_save_tombstones_pages_the_crawl_did_not_reach():
+    tracker = _tracker([
+        {"url": "https://example.com/kept", "content_hash": content_hash("kept"), "word_count": 1},
+        {"url": "https://example.com/removed", "content_hash": content_hash("old"), "word_count": 5},
+    ])
+    tracker.observe({"url": "https://example.com/kept", "markdown": "kept"})
+
+    stats = await tracker.save(tombstone=True)
+
+    assert stats["pages_removed"] == 1
+    client = tracker.supabase_client
+    client.table.assert_any_call("archon_crawled_pages")
+    deleted = client.table.return_value.delete.return_value.in_.call_args_list
+    assert deleted[0].args == ("url", ["https://example.com/removed"])
+    client.table.return_value.update.assert_any_call({"total_word_count": 1})
+
+
+@pytest.mark.asyncio
+async def test_budget_cutoff_only_tombstones_pages_that_are_gone():
+    tracker = _tracker([
+        {"url": "https://example.com/kept", "content_hash": content_hash("kept")},
+        {"url": "https://example.com/unreached", "content_hash": content_hash("old")},
+        {"url": "https://example.com/gone", "etag": '"g1"'},
+    ])
+    tracker.observe({"url": "https://example.com/kept", "markdown": "kept"})
+    tracker._attempted.add("https://example.com/gone")
+    tracker._gone.add("https://example.com/gone")
+    tracker.mark_budget_reached()
+
+    stats = await tracker.save(tombstone=True)
+
+    assert stats["pages_removed"] == 1
+    deleted = tracker.supabase_client.table.return_value.delete.return_value.in_.call_args_list
+    assert deleted[0].args == ("url", ["https://example.com/gone"])
+
+
+@pytest.mark.asyncio
+async def test_failed_page_keeps_pages_the_crawl_did_not_reach():
+    tracker = _tracker([
+        {"url": "https://example.com/parent", "content_hash": content_hash("parent")},
+        {"url": "https://example.com/child", "content_hash": content_hash("child")},
+    ])
+    # The parent's crawl failed, so its links were not followed
+    tracker.mark_failed("https://example.com/parent")
+
+    stats = await tracker.save(tombstone=True)
+
+    assert stats["pages_removed"] == 0
+    tracker.supabase_client.table.return_value.delete.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_full_crawl_never_tombstones():
+    tracker = _tracker([{"url": "https://example.com/old", "content_hash": "x"}], incremental=False)
+
+    stats = await tracker.save(tombstone=True)
+
+    assert stats["pages_removed"] == 0
+    tracker.supabase_client.table.return_value.delete.assert_not_called()
+
+
+def test_sitemap_lastmod_skips_pages_checked_since():
+    from datetime import datetime, timezone
+
+    tracker = _tracker([
+        {"url": "https://example.com/old", "last_checked_at": "2024-06-01T00:00:00+00:00"},
+        {"url": "https://example.com/edited", "last_checked_at": "2024-06-01T00:00:00+00:00"},
+    ])
+
+    assert tracker.unchanged_since("https://example.com/old", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    assert not tracker.unchanged_since("https://example.com/edited", datetime(2024, 7, 1, tzinfo=timezone.utc))
+    assert not tracker.unchanged_since("https://example.com/new", datetime(2024, 5, 1, tzinfo=timezone.utc))
+    assert tracker.pages_unchanged == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_does_not_read_the_page_cache():
+    from src.server.api_routes import knowledge_api
+
+    service = MagicMock()
+    service.get_item = AsyncMock(return_value={"url": "https://example.com", "metadata": {}})
+    orchestration = MagicMock()
+    orchestration.return_value.orchestrate_crawl = AsyncMock()
+
+    with (
+        patch.object(knowledge_api, "KnowledgeItemService", return_value=service),
+        patch.object(knowledge_api, "get_supabase_client"),
+        patch.object(knowledge_api, "get_crawler", AsyncMock(return_value=MagicMock())),
+        patch.object(knowledge_api, "start_crawl_progress", AsyncMock()),
+        patch.object(knowledge_api, "CrawlOrchestrationService", orchestration),
+        patch("asyncio.sleep", AsyncMock()),
+    ):
+        response = await knowledge_api.refresh_knowledge_item("example.com", incremental=True)
+        await knowledge_api.active_crawl_tasks[response["progressId"]]
+
+    request = orchestration.return_value.orchestrate_crawl.await_args.args[0]
+    assert request["incremental"] is True
+    assert request["force_fresh"] is True
@@ -0,0 +1,68 @@
+"""Tests for near-duplicate chunk detection"""
+
+from src.server.services.storage.near_duplicates import (
+    SimHashIndex,
+    chunk_key,
+    collapse_duplicates,
+    hamming_distance,
+    link_chunk,
+    simhash,
+)
+
+TEXT = " ".join(
+    f"Step {i}: run the migration, restart the server and check that the dashboard loads without errors."
+    for i in range(30)
+)
+
+
+def test_simhash_keeps_near_duplicates_close_and_different_text_far():
+    edited = TEXT.replace("Step 7:", "Step seven:")
+    other = " ".join(f"Chapter {i} covers query planning, index selection and join order." for i in range(30))
+
+    assert hamming_distance(simhash(TEXT), simhash(TEXT.upper())) == 0
+    assert hamming_distance(simhash(TEXT), simhash(edited)) <= 3
+    assert hamming_distance(simhash(TEXT), simhash(other)) > 10
+    assert simhash("too short to compare") is None
+
+
+def test_index_links_chunks_to_the_first_near_duplicate():
+    index = SimHashIndex(max_distance=3)
+    first = {"chunk_simhash": f"{simhash(TEXT):016x}"}
+    edited = {"chunk_simhash": f"{simhash(TEXT.replace('Step 7:', 'Step seven:')):016x}"}
+    short = {"word_count": 2}
+
+    assert link_chunk(index, first, chunk_key("https://a.com/v1", 0)) is None
+    assert link_chunk(index, edited, chunk_key("https://a.com/v2", 0)) == "https://a.com/v1#0"
+    assert link_chunk(index, short, chunk_key("https://a.com/v2", 1)) is None
+    assert edited["duplicate_of"] == "https://a.com/v1#0"
+    assert "duplicate_of" not in first
+    assert index.size == 1
+
+    # Bits flipped in every band are beyond the distance
+    value = int(first["chunk_simhash"], 16)
+    assert index.find(value ^ 0b1011) == "https://a.com/v1#0"
+    assert index.find(value ^ (1 | 1 << 16 | 1 << 32 | 1 << 48)) is None
+
+
+def _result(result_id, url=None, duplicate_of=None):
+    metadata = {"url": url, "chunk_index": 0} if url else {}
+    if duplicate_of:
+        metadata["duplicate_of"] = duplicate_of
+    return {"id": result_id, "content": "...", "metadata": metadata}
+
+
+def test_search_results_collapse_to_the_best_ranked_copy():
+    results = [
+        _result(1, "https://a.com/v2", duplicate_of="https://a.com/v1#0"),
+        _result(2, "https://a.com/other"),
+        _result(3, "https://a.com/v1"),
+        _result(4, "https://a.com/v3", duplicate_of="https://a.com/v1#0"),
+        # Results without chunk metadata are never collapsed
+        _result(5),
+        _result(6),
+    ]
+
+    collapsed = collapse_duplicates(results)
+
+    assert [r["id"] for r in collapsed] == [1, 2, 5, 6]
+    assert collapsed[0]["metadata"]["duplicate_urls"] == ["https://a.com/v1", "https://a.com/v3"]
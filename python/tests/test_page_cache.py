@@ -0,0 +1,95 @@
+"""Tests for the local page cache."""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.server.services.crawling.host_scheduler import HostScheduler
+from src.server.services.crawling.page_cache import CachedCrawler, PageCache
+
+
+def _result(url, markdown="# Page\n\nBody text", html="<html><body>Body text</body></html>"):
+    return SimpleNamespace(
+        url=url,
+        success=True,
+        markdown=markdown,
+        html=html,
+        links={"internal": [{"href": f"{url}/next"}]},
+        status_code=200,
+        response_headers={"ETag": '"v1"'},
+        error_message=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_round_trip_by_canonical_url_with_shared_blobs(tmp_path):
+    cache = PageCache(str(tmp_path))
+
+    await cache.put("https://Example.com/docs/?utm_source=x", _result("https://example.com/docs/"))
+    await cache.put("https://example.com/mirror/docs/", _result("https://example.com/docs/"))
+
+    cached = await cache.get("http://example.com/docs")
+    assert cached.from_cache
+    assert cached.markdown == "# Page\n\nBody text"
+    assert cached.links == {"internal": [{"href": "https://example.com/docs//next"}]}
+    assert cached.response_headers == {"ETag": '"v1"'}
+    assert await cache.get("https://example.com/other") is None
+    assert cache.get_stats()["hits"] == 1
+
+    # Identical content is stored once
+    blobs = [f for _, _, files in os.walk(tmp_path / "blobs") for f in files]
+    assert len(blobs) == 1
+    assert (await cache.get("https://example.com/mirror/docs/")).markdown == cached.markdown
+
+
+@pytest.mark.asyncio
+async def test_failed_results_are_not_cached(tmp_path):
+    cache = PageCache(str(tmp_path))
+
+    await cache.put("https://example.com/a", SimpleNamespace(success=False, markdown=None))
+
+    assert await cache.get("https://example.com/a") is None
+
+
+@pytest.mark.asyncio
+async def test_ttl_fresh_and_replaying_views(tmp_path):
+    cache = PageCache(str(tmp_path), ttl_seconds=0.05)
+    await cache.put("https://example.com/a", _result("https://example.com/a"))
+
+    assert await cache.fresh().get("https://example.com/a") is None
+    await asyncio.sleep(0.1)
+    assert await cache.get("https://example.com/a") is None
+    # A resumed crawl replays pages that aged out
+    assert await cache.replaying().get("https://example.com/a") is not None
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_pages_past_size_limit(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=10_000)
+    for i in range(20):
+        await cache.put(f"https://example.com/{i}", _result(f"https://example.com/{i}", markdown=os.urandom(400).hex()))
+        time.sleep(0.001)
+
+    assert cache.get_stats()["bytes"] <= 10_000
+    assert await cache.get("https://example.com/19") is not None
+    assert await cache.get("https://example.com/0") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_skip_the_crawler(tmp_path):
+    cache = PageCache(str(tmp_path))
+    crawler = MagicMock()
+    crawler.arun = AsyncMock(side_effect=lambda url, config=None: _result(url))
+    scheduler = HostScheduler()
+
+    first = await scheduler.fetch(crawler, "https://example.com/a", None, asyncio.Semaphore(1), page_cache=cache)
+    second = await scheduler.fetch(crawler, "https://example.com/a", None, asyncio.Semaphore(1), page_cache=cache)
+    third = await CachedCrawler(crawler, cache).arun("https://example.com/a")
+
+    assert crawler.arun.await_count == 1
+    assert not getattr(first, "from_cache", False)
+    assert second.from_cache and third.from_cache
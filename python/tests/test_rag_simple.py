@@ -96,6 +96,65 @@ class TestRAGServiceSearch:
         call_args = mock_supabase.rpc.call_args[0]
         assert call_args[0] == "match_archon_crawled_pages"
 
+    @pytest.mark.asyncio
+    async def test_vector_search_keeps_metadata_filters_with_source(self, rag_service, mock_supabase):
+        """Test source and metadata filters are both sent to the RPC"""
+        await rag_service.base_strategy.vector_search(
+            query_embedding=[0.1] * 1536,
+            match_count=5,
+            filter_metadata={"source": "docs.example.com", "knowledge_type": "technical"},
+        )
+
+        rpc_params = mock_supabase.rpc.call_args[0][1]
+        assert rpc_params["source_filter"] == "docs.example.com"
+        assert rpc_params["filter"] == {"knowledge_type": "technical"}
+
+    @pytest.mark.asyncio
+    async def test_perform_rag_query_with_metadata_filters(self, rag_service):
+        """Test knowledge_type and tags are passed through as metadata filters"""
+        with patch.object(rag_service, "search_documents") as mock_search:
+            mock_search.return_value = []
+
+            success, _ = await rag_service.perform_rag_query(
+                query="auth flow", source="docs.example.com", knowledge_type="technical", tags=["auth"]
+            )
+
+            assert success is True
+            assert mock_search.call_args.kwargs["filter_metadata"] == {
+                "source": "docs.example.com",
+                "knowledge_type": "technical",
+                "tags": ["auth"],
+            }
+
+    @pytest.mark.asyncio
+    async def test_perform_rag_query_keeps_match_count_when_duplicates_collapse(self, rag_service):
+        """Test near-duplicates are collapsed without returning fewer results"""
+        candidates = [
+            {"id": "1", "content": "v1", "similarity": 0.9, "metadata": {"url": "https://a.com/v1", "chunk_index": 0}},
+            *(
+                {
+                    "id": str(i),
+                    "content": f"v{i}",
+                    "similarity": 0.9 - i / 100,
+                    "metadata": {"url": f"https://a.com/v{i}", "chunk_index": 0, "duplicate_of": "https://a.com/v1#0"},
+                }
+                for i in (2, 3)
+            ),
+            *({"id": str(i), "content": f"other {i}", "similarity": 0.5, "metadata": {}} for i in (4, 5, 6)),
+        ]
+
+        async def _search(**kwargs):
+            return candidates[: kwargs["match_count"]]
+
+        with patch.object(rag_service, "search_documents", side_effect=_search):
+            success, result = await rag_service.perform_rag_query(
+                query="versioned docs", match_count=3, use_cache=False, log_query=False
+            )
+
+        assert success is True
+        assert [r["id"] for r in result["results"]] == ["1", "4", "5"]
+        assert result["results"][0]["metadata"]["duplicate_urls"] == ["https://a.com/v2", "https://a.com/v3"]
+
     @pytest.mark.asyncio
     async def test_search_documents_with_embedding(self, rag_service):
         """Test document search with mocked embedding"""
@@ -292,6 +351,20 @@ class TestAgenticRAGCore:
         assert analysis["is_code_query"] is True
         assert "python" in analysis["languages"]
 
+    def test_identifier_query_classification(self, agentic_strategy):
+        """Test exact identifiers and error strings are routed to the text lookup"""
+        assert agentic_strategy.analyze_code_query("useQueryClient")["lookup_type"] == "identifier"
+        assert (
+            agentic_strategy.analyze_code_query("BaseModel.model_validate")["lookup_text"]
+            == "BaseModel.model_validate"
+        )
+        assert (
+            agentic_strategy.analyze_code_query("TypeError: x is not a function")["lookup_type"]
+            == "error_string"
+        )
+        assert agentic_strategy.analyze_code_query("authentication")["lookup_type"] is None
+        assert agentic_strategy.analyze_code_query("react hooks example")["lookup_type"] is None
+
 
 class TestRAGIntegrationSimple:
     """Simple integration tests"""
@@ -431,6 +504,41 @@ class TestRAGIntegrationSimple:
             assert "def example_function" in code_result["code"]
             assert code_result["summary"] == "Example function that returns greeting"
 
+    @pytest.mark.asyncio
+    async def test_identifier_code_search_skips_vector_search(self, rag_service, mock_supabase):
+        """Test identifier queries are answered by the trigram lookup without embedding"""
+        mock_supabase.rpc.return_value.execute.return_value.data = [
+            {
+                "id": 1,
+                "content": "const queryClient = useQueryClient()",
+                "summary": "Access the query client",
+                "url": "https://tanstack.com/query",
+                "metadata": {},
+                "source_id": "tanstack.com",
+                "similarity": 1.0,
+            }
+        ]
+        with (
+            patch.object(rag_service.agentic_strategy, "is_enabled", return_value=True),
+            patch.object(rag_service.agentic_strategy, "search_code_examples") as mock_agentic,
+            patch.object(rag_service, "get_bool_setting", return_value=False),
+            patch.object(rag_service.query_log, "record") as mock_record,
+        ):
+            success, result = await rag_service.search_code_examples_service(
+                query="useQueryClient", match_count=5, use_cache=False
+            )
+
+        assert success is True
+        assert result["search_mode"] == "identifier"
+        assert result["results"][0]["similarity"] == 1.0
+        assert result["results"][0]["id"] == 1
+        assert mock_record.call_args.kwargs["result_ids"] == [1]
+        mock_supabase.rpc.assert_called_with(
+            "match_archon_code_examples_by_text",
+            {"search_text": "useQueryClient", "match_count": 5},
+        )
+        mock_agentic.assert_not_called()
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
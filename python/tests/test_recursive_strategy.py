@@ -0,0 +1,169 @@
+"""Tests for the work-queue recursive crawl."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.strategies.recursive import RecursiveCrawlStrategy
+
+SITE = {
+    "https://example.com": ["https://example.com/a", "https://example.com/b"],
+    "https://example.com/a": ["https://example.com/a1", "https://example.com/b"],
+    "https://example.com/b": ["https://example.com/b1", "https://example.com/a1"],
+    "https://example.com/a1": ["https://example.com/deep"],
+    "https://example.com/b1": [],
+    "https://example.com/deep": [],
+}
+
+
+def _make_crawler(crawled, delays=None, events=None, site=SITE):
+    async def _arun(url, config=None):
+        crawled.append(url)
+        await asyncio.sleep((delays or {}).get(url, 0))
+        if events is not None:
+            events.append(f"done {url}")
+        links = {"internal": [{"href": link} for link in site.get(url, [])]}
+        return MagicMock(url=url, success=True, markdown="text", html="", links=links, status_code=200)
+
+    crawler = MagicMock()
+    crawler.arun = AsyncMock(side_effect=_arun)
+    return crawler
+
+
+async def _crawl(crawler, settings=None, **kwargs):
+    strategy = RecursiveCrawlStrategy(crawler, MagicMock())
+    pages = []
+
+    async def _on_page(page):
+        pages.append(page["url"])
+
+    with (
+        patch("src.server.services.crawling.strategies.recursive.credential_service") as creds,
+        patch("src.server.services.crawling.strategies.recursive.CrawlerRunConfig"),
+        patch("src.server.services.crawling.strategies.recursive.MemoryAdaptiveDispatcher"),
+    ):
+        creds.get_credentials_by_category = AsyncMock(
+            return_value={"CRAWL_HTTP_FAST_PATH": "false", **(settings or {})}
+        )
+        await strategy.crawl_recursive_with_progress(
+            ["https://example.com"], lambda url: url, lambda url: False, on_page=_on_page, **kwargs
+        )
+    return pages
+
+
+@pytest.mark.asyncio
+async def test_links_are_crawled_before_their_depth_level_finishes():
+    crawled = []
+    events = []
+    # /b is slow; /a's links must not wait for it
+    crawler = _make_crawler(crawled, delays={"https://example.com/b": 0.2}, events=events)
+
+    pages = await _crawl(crawler, max_depth=3)
+
+    assert events.index("done https://example.com/a1") < events.index("done https://example.com/b")
+    assert set(pages) == set(crawled)
+    # Depth 3 pages are never fetched with max_depth=3, and each page is fetched once
+    assert "https://example.com/deep" not in crawled
+    assert len(crawled) == len(set(crawled)) == 5
+
+
+@pytest.mark.asyncio
+async def test_page_found_shallower_after_it_was_crawled_has_its_links_followed():
+    crawled = []
+    site = {
+        "https://example.com": ["https://example.com/a", "https://example.com/b"],
+        "https://example.com/a": ["https://example.com/x"],
+        "https://example.com/b": ["https://example.com/c"],
+        "https://example.com/c": ["https://example.com/x"],
+        "https://example.com/x": ["https://example.com/y"],
+        "https://example.com/y": ["https://example.com/z"],
+    }
+    # /a is slow, so /x is first reached through /b and /c at depth 3, then through /a at depth 2
+    crawler = _make_crawler(crawled, delays={"https://example.com/a": 0.2}, site=site)
+    budget_reached = MagicMock()
+
+    pages = await _crawl(crawler, max_depth=4, on_budget_reached=budget_reached)
+
+    assert crawled.index("https://example.com/x") < crawled.index("https://example.com/y")
+    # /y is at depth 3 and /z at depth 4; each page is still fetched once
+    assert "https://example.com/y" in pages
+    assert "https://example.com/z" not in crawled
+    assert len(crawled) == len(set(crawled)) == 6
+    budget_reached.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_only_unsuccessful_pages_are_reported_as_failed():
+    crawled = []
+    crawler = _make_crawler(crawled)
+    arun = crawler.arun.side_effect
+
+    async def _arun(url, config=None):
+        result = await arun(url, config)
+        if url.endswith("/a"):
+            result.markdown = ""
+        if url.endswith("/b"):
+            result.success = False
+        return result
+
+    crawler.arun.side_effect = _arun
+    failed = MagicMock()
+
+    pages = await _crawl(crawler, max_depth=2, on_page_failed=failed)
+
+    assert "https://example.com/a" not in pages
+    failed.assert_called_once_with("https://example.com/b")
+
+
+@pytest.mark.asyncio
+async def test_page_budget_is_exact():
+    crawled = []
+    budget_reached = MagicMock()
+
+    pages = await _crawl(_make_crawler(crawled), max_depth=5, max_pages=3, on_budget_reached=budget_reached)
+
+    assert len(crawled) == 3
+    budget_reached.assert_called()
+    # Shallower pages are taken first
+    assert set(crawled) == {"https://example.com", "https://example.com/a", "https://example.com/b"}
+    assert len(pages) == 3
+
+
+@pytest.mark.asyncio
+async def test_page_budget_from_settings_applies_to_level_by_level_crawl():
+    crawled = []
+    budget_reached = MagicMock()
+
+    await _crawl(
+        _make_crawler(crawled),
+        settings={"CRAWL_CONTINUOUS_RECURSIVE": "false", "CRAWL_MAX_PAGES": "4"},
+        max_depth=5,
+        on_budget_reached=budget_reached,
+    )
+
+    assert len(crawled) == 4
+    budget_reached.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_resumes_work_queue_checkpoint():
+    crawled = []
+    saved = []
+
+    await _crawl(
+        _make_crawler(crawled),
+        max_depth=3,
+        resume_state={
+            "queue": [[1, "https://example.com/b"], [2, "https://example.com/a1"]],
+            "pending": [],
+            "visited": ["https://example.com", "https://example.com/a"],
+        },
+        save_state=AsyncMock(side_effect=saved.append),
+    )
+
+    # /b1 is found at depth 2 from the resumed /b; nothing visited is fetched again
+    assert sorted(crawled) == ["https://example.com/a1", "https://example.com/b", "https://example.com/b1"]
+    state = saved[-1]()
+    assert state["queue"] == []
+    assert "https://example.com/b1" in state["visited"]
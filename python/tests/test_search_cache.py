@@ -0,0 +1,153 @@
+"""
+Tests for search caching, query logging and cache warming
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.search.search_cache import (
+    SearchCache,
+    TTLCache,
+    get_query_embedding,
+    normalize_query,
+)
+
+
+class TestTTLCache:
+    """Test the LRU/TTL cache primitive"""
+
+    def test_get_and_set(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        with patch("src.server.services.search.search_cache.time.monotonic", return_value=0):
+            cache.set("a", 1)
+        with patch("src.server.services.search.search_cache.time.monotonic", return_value=61):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestSearchCache:
+    """Test result caching and source invalidation"""
+
+    def test_normalize_query(self):
+        assert normalize_query("  React   Hooks\n") == "React Hooks"
+
+    def test_result_key_is_query_normalized(self):
+        key_a = SearchCache.result_key("rag", "React Hooks", "react.dev", match_count=5)
+        key_b = SearchCache.result_key("rag", "React   Hooks ", "react.dev", match_count=5)
+        assert key_a == key_b
+
+    def test_result_key_keeps_identifier_case(self):
+        key_a = SearchCache.result_key("rag", "useState", "react.dev", match_count=5)
+        key_b = SearchCache.result_key("rag", "usestate", "react.dev", match_count=5)
+        assert key_a != key_b
+
+    def test_invalidate_source(self):
+        cache = SearchCache()
+        react_key = SearchCache.result_key("rag", "hooks", "react.dev", match_count=5)
+        vue_key = SearchCache.result_key("rag", "hooks", "vuejs.org", match_count=5)
+        global_key = SearchCache.result_key("rag", "hooks", None, match_count=5)
+        for key in (react_key, vue_key, global_key):
+            cache.set_results(key, {"results": []})
+
+        removed = cache.invalidate_source("react.dev")
+
+        assert removed == 2
+        assert cache.get_results(react_key) is None
+        assert cache.get_results(global_key) is None
+        assert cache.get_results(vue_key) == {"results": []}
+
+    def test_cached_results_are_copies(self):
+        cache = SearchCache()
+        key = SearchCache.result_key("rag", "hooks", None, match_count=5)
+        response = {"results": [{"id": 1, "content": "useState"}]}
+        cache.set_results(key, response)
+
+        response["results"].append({"id": 2})
+        cache.get_results(key)["results"][0]["content"] = "changed"
+
+        assert cache.get_results(key) == {"results": [{"id": 1, "content": "useState"}]}
+
+    @pytest.mark.asyncio
+    async def test_query_embedding_is_cached(self):
+        embed = AsyncMock(return_value=[0.1] * 8)
+        with patch(
+            "src.server.services.search.search_cache.get_embedding_model",
+            AsyncMock(return_value="text-embedding-3-small"),
+        ):
+            first = await get_query_embedding("useQueryClient", embed)
+            second = await get_query_embedding("useQueryClient ", embed)
+
+        assert first == second
+        embed.assert_called_once_with("useQueryClient")
+
+
+class TestQueryLogService:
+    """Test buffered query logging"""
+
+    @pytest.mark.asyncio
+    async def test_record_and_flush(self):
+        from src.server.services.search.query_log_service import QueryLogService
+
+        mock_client = MagicMock()
+        service = QueryLogService(supabase_client=mock_client)
+
+        service.record("rag", "  Auth Flow ", "supabase.com", 5, 12.7, [1, 2])
+        written = await service.flush()
+
+        assert written == 1
+        mock_client.table.assert_called_with("archon_query_log")
+        rows = mock_client.table.return_value.insert.call_args[0][0]
+        assert rows[0]["query_text"] == "  Auth Flow "
+        assert rows[0]["normalized_query"] == "Auth Flow"
+        assert rows[0]["result_ids"] == ["1", "2"]
+        assert rows[0]["latency_ms"] == 12
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_entries(self):
+        from src.server.services.search.query_log_service import QueryLogService
+
+        mock_client = MagicMock()
+        mock_client.table.return_value.insert.return_value.execute.side_effect = Exception("down")
+        service = QueryLogService(supabase_client=mock_client)
+
+        service.record("rag", "query", None, 5, 1.0, [])
+
+        assert await service.flush() == 0
+        assert len(service._buffer) == 1
+
+
+class TestCacheWarmer:
+    """Test replaying logged queries"""
+
+    @pytest.mark.asyncio
+    async def test_replays_the_query_as_asked(self):
+        from src.server.services.search.cache_warmer import CacheWarmer
+
+        rag_service = MagicMock()
+        rag_service.perform_rag_query = AsyncMock()
+        entry = {"query_type": "rag", "query_text": "useQueryClient", "normalized_query": "usequeryclient"}
+
+        await CacheWarmer._warm_query(rag_service, entry)
+
+        assert rag_service.perform_rag_query.call_args.kwargs["query"] == "useQueryClient"
@@ -0,0 +1,85 @@
+"""
+Tests for streaming sitemap parsing
+"""
+
+import gzip
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.server.services.crawling.strategies.sitemap import SitemapCrawlStrategy, parse_lastmod
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+INDEX = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex {NS}>
+  <sitemap><loc>https://example.com/docs.xml.gz</loc></sitemap>
+  <sitemap><loc>https://example.com/blog.xml</loc></sitemap>
+  <sitemap><loc>https://example.com/sitemap.xml</loc></sitemap>
+</sitemapindex>"""
+
+DOCS = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NS}>
+  <url><loc>https://example.com/docs/a</loc><lastmod>2024-05-01</lastmod></url>
+  <url><loc>https://example.com/docs/b</loc><lastmod>2023-01-01T00:00:00Z</lastmod></url>
+  <url><loc>https://example.com/docs/internal/c</loc></url>
+</urlset>"""
+
+BLOG = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NS}>
+  <url><loc>https://example.com/blog/post</loc></url>
+  <url><loc>https://example.com/docs/a</loc></url>
+</urlset>"""
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/sitemap.xml":
+        return httpx.Response(200, content=INDEX.encode())
+    if request.url.path == "/docs.xml.gz":
+        return httpx.Response(200, content=gzip.compress(DOCS.encode()))
+    if request.url.path == "/blog.xml":
+        return httpx.Response(200, content=BLOG.encode())
+    return httpx.Response(404)
+
+
+async def _entries(**kwargs):
+    real_client = httpx.AsyncClient
+    with patch(
+        "src.server.services.crawling.strategies.sitemap.httpx.AsyncClient",
+        lambda **kw: real_client(transport=httpx.MockTransport(_handler), **kw),
+    ):
+        return [e async for e in SitemapCrawlStrategy().iter_sitemap("https://example.com/sitemap.xml", **kwargs)]
+
+
+def test_parse_lastmod_accepts_w3c_dates():
+    assert parse_lastmod("2024-05-01") == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert parse_lastmod("2024-05-01T10:00:00Z") == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert parse_lastmod("yesterday") is None
+
+
+@pytest.mark.asyncio
+async def test_index_is_followed_through_gzipped_children_once():
+    entries = await _entries()
+
+    assert sorted(e.url for e in entries) == [
+        "https://example.com/blog/post",
+        "https://example.com/docs/a",
+        "https://example.com/docs/b",
+        "https://example.com/docs/internal/c",
+    ]
+    lastmods = {e.url: e.lastmod for e in entries}
+    assert lastmods["https://example.com/docs/a"] == datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_patterns_and_lastmod_filter_urls():
+    entries = await _entries(
+        include_patterns=["https://example.com/docs/*"],
+        exclude_patterns=["*/internal/*"],
+        modified_since=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+
+    # docs/b is older than the cutoff; URLs without a lastmod are always kept
+    assert [e.url for e in entries] == ["https://example.com/docs/a"]
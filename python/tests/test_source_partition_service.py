@@ -0,0 +1,79 @@
+"""
+Tests for per-source partial vector index management
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.search.source_partition_service import SourcePartitionService
+
+
+def _service(row_counts: dict[str, int], partitions: list[dict] | None = None):
+    mock_client = MagicMock()
+
+    def table(name):
+        table_mock = MagicMock()
+        query = table_mock.select.return_value.eq.return_value
+        if name == "archon_source_partitions":
+            query.execute.return_value.data = partitions or []
+        else:
+            query.execute.return_value.count = row_counts.get(name, 0)
+        return table_mock
+
+    mock_client.table.side_effect = table
+    return SourcePartitionService(supabase_client=mock_client), mock_client
+
+
+@pytest.fixture(autouse=True)
+def min_rows_setting():
+    with patch(
+        "src.server.services.search.source_partition_service.credential_service.get_credential",
+        AsyncMock(return_value="1000"),
+    ):
+        yield
+
+
+class TestSourcePartitionService:
+    """Test partition creation thresholds"""
+
+    @pytest.mark.asyncio
+    async def test_creates_index_for_large_source_only(self):
+        service, client = _service({"archon_crawled_pages": 5000, "archon_code_examples": 10})
+
+        updated = await service.ensure_source_partitions("docs.example.com")
+
+        assert updated == ["archon_crawled_pages"]
+        client.rpc.assert_called_once_with(
+            "create_archon_source_partition",
+            {"source": "docs.example.com", "target_table": "archon_crawled_pages", "rebuild": False},
+        )
+
+    @pytest.mark.asyncio
+    async def test_skips_existing_index_until_source_grows(self):
+        existing = [{"table_name": "archon_crawled_pages", "row_count": 4000}]
+        service, client = _service({"archon_crawled_pages": 5000}, existing)
+
+        assert await service.ensure_source_partitions("docs.example.com") == []
+        client.rpc.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_index_after_growth(self):
+        existing = [{"table_name": "archon_crawled_pages", "row_count": 2000}]
+        service, client = _service({"archon_crawled_pages": 5000}, existing)
+
+        assert await service.ensure_source_partitions("docs.example.com") == ["archon_crawled_pages"]
+        assert client.rpc.call_args[0][1]["rebuild"] is True
+
+    @pytest.mark.asyncio
+    async def test_post_crawl_check_only_builds_when_auto_build_is_enabled(self):
+        for auto_build, expected_calls in (("false", 0), ("true", 1)):
+            service, client = _service({"archon_crawled_pages": 5000})
+            settings = {"SOURCE_PARTITION_MIN_ROWS": "1000", "SOURCE_PARTITION_AUTO_BUILD": auto_build}
+            with patch(
+                "src.server.services.search.source_partition_service.credential_service.get_credential",
+                AsyncMock(side_effect=lambda key, default=None, settings=settings: settings.get(key, default)),
+            ):
+                await service.schedule_partition_check("docs.example.com")
+
+            assert client.rpc.call_count == expected_calls
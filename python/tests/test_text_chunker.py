@@ -0,0 +1,86 @@
+"""Tests for the token-aware streaming text chunker."""
+
+from unittest.mock import patch
+
+from src.server.services.storage import text_chunker
+from src.server.services.storage.text_chunker import TokenChunker, count_tokens
+
+
+class _ByteEncoding:
+    """A byte-level tokenizer, so multi-byte characters span several tokens."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text.encode("utf-8"))
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+    def decode_tokens_bytes(self, tokens):
+        return [bytes([token]) for token in tokens]
+
+
+def _prose(sentences, start=0):
+    return " ".join(f"Sentence number {i} talks about crawling and chunking." for i in range(start, start + sentences))
+
+
+def test_chunks_fit_the_token_budget_and_keep_all_text():
+    text = "\n\n".join(_prose(6, i * 6) for i in range(40))
+    chunker = TokenChunker(max_tokens=200, overlap_tokens=0)
+
+    chunks = chunker.split(text)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+    # Paragraph boundaries are preferred over sentence boundaries
+    assert all(chunk.endswith("chunking.") for chunk in chunks)
+
+
+def test_code_blocks_are_kept_whole_and_never_repeated():
+    code = "```python\n" + "\n".join(f"value_{i} = compute({i})" for i in range(20)) + "\n```"
+    text = f"{_prose(12)}\n\n{code}\n\n{_prose(12, 12)}"
+
+    chunks = TokenChunker(max_tokens=250, overlap_tokens=40).split(text)
+
+    assert sum(code in chunk for chunk in chunks) == 1
+    assert sum(chunk.count("value_3 =") for chunk in chunks) == 1
+
+
+def test_overlap_repeats_trailing_sentences_in_the_next_chunk():
+    text = _prose(80)
+
+    chunks = TokenChunker(max_tokens=150, overlap_tokens=30).split(text)
+
+    assert len(chunks) > 2
+    for previous, current in zip(chunks, chunks[1:], strict=False):
+        repeated = previous[previous.rfind(current.split(". ")[0]) :]
+        assert 0 < len(repeated) < len(current)
+        assert current.startswith(repeated)
+
+
+def test_streamed_segments_match_the_whole_string():
+    text = "\n\n".join(_prose(5, i * 5) + "\n\n```\ncode line\n```" for i in range(30))
+    chunker = TokenChunker(max_tokens=120, overlap_tokens=20)
+    segments = [text[i : i + 37] for i in range(0, len(text), 37)]
+
+    assert list(chunker.chunks(segments)) == chunker.split(text)
+
+
+def test_oversized_lines_are_split_to_the_budget():
+    text = "x" * 10_000 + "\n\n" + "word " * 3_000
+
+    chunks = TokenChunker(max_tokens=100, overlap_tokens=10).split(text)
+
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks).replace(" ", "").count("x") == 10_000
+
+
+def test_hard_splits_never_cut_through_a_character():
+    text = "é" * 9 + "€" * 4
+
+    with patch.object(text_chunker, "_ENCODING", _ByteEncoding()):
+        parts = TokenChunker(max_tokens=5, overlap_tokens=0)._hard_split(text)
+        assert all(count_tokens(part) <= 5 for part in parts)
+
+    assert "".join(parts) == text
+    assert "\ufffd" not in "".join(parts)
@@ -0,0 +1,63 @@
+"""Tests for URL canonicalization and the bounded visited set."""
+
+from src.server.services.crawling.helpers.url_canonicalizer import UrlCanonicalizer
+from src.server.services.crawling.visited_set import BloomFilter, VisitedSet
+
+
+def test_canonicalize_normalizes_spellings_of_a_page():
+    canonicalizer = UrlCanonicalizer()
+
+    assert (
+        canonicalizer.canonicalize("HTTPS://Docs.Example.com:443/a/./b/../index.html?utm_source=x&b=2&a=1#top")
+        == "https://docs.example.com/a/?a=1&b=2"
+    )
+    assert canonicalizer.canonicalize("http://example.com/%7euser/%2f") == "http://example.com/~user/%2F"
+    assert canonicalizer.canonicalize("https://example.com/app;jsessionid=ABC?page=2") == (
+        "https://example.com/app?page=2"
+    )
+    assert canonicalizer.canonicalize("mailto:someone@example.com#x") == "mailto:someone@example.com"
+
+
+def test_key_treats_scheme_and_trailing_slash_as_one_page():
+    canonicalizer = UrlCanonicalizer()
+
+    assert canonicalizer.key("http://example.com/docs/") == canonicalizer.key("https://EXAMPLE.com/docs")
+    assert canonicalizer.key("https://example.com/docs?v=1") != canonicalizer.key("https://example.com/docs?v=2")
+
+
+def test_strip_params_from_settings():
+    canonicalizer = UrlCanonicalizer.from_settings({"CRAWL_URL_STRIP_PARAMS": "sort, view_*"})
+
+    assert canonicalizer.canonicalize("https://example.com/?sort=asc&view_mode=grid&page=3&utm_x=1") == (
+        "https://example.com/?page=3&utm_x=1"
+    )
+    assert UrlCanonicalizer(["*"]).canonicalize("https://example.com/list?page=3") == "https://example.com/list"
+
+
+def test_visited_set_spills_to_disk_and_stays_exact():
+    canonicalizer = UrlCanonicalizer()
+    visited = VisitedSet(canonicalizer.key, memory_limit=10)
+    urls = [f"https://example.com/page/{i}" for i in range(500)]
+
+    for url in urls:
+        assert visited.add(url)
+    assert visited.spilled
+    assert len(visited) == 500
+
+    assert not visited.add("http://example.com/page/7/")
+    assert "https://example.com/page/499" in visited
+    assert "https://example.com/page/500" not in visited
+    assert sorted(visited) == sorted(urls)
+
+    visited.close()
+    assert len(visited) == 0
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(str(i))
+
+    assert all(str(i) in bloom for i in range(1000))
+    false_positives = sum(str(i) in bloom for i in range(1000, 11000))
+    assert false_positives < 100